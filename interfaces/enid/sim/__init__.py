@@ -0,0 +1,43 @@
+"""
+enid fabric model - package entry
+
+Discrete-event, flit-level model of enid endpoints, credit-based links and
+switches (board-ivy star or neighbour ring), with synthetic and recorded traffic, the packet codec
+and a multi-module Amber co-simulation over it.
+See `interfaces/enid/sim/README.md`.
+"""
+
+from .codec import Frame, FrameView, Header, decode, encode_many, iter_frames
+from .fabric import ARBITERS, INGRESS, TOPOLOGIES, EventQueue, Fabric, FabricParams, Packet, Report, percentile
+from .sweep import Point, saturation
+from .system import EnidPort, SystemParams, SystemReport
+from .system import run as run_system
+from .traffic import PATTERNS, read_trace, synthetic, write_trace
+
+__all__ = [
+    "Frame",
+    "FrameView",
+    "Header",
+    "decode",
+    "encode_many",
+    "iter_frames",
+    "ARBITERS",
+    "INGRESS",
+    "TOPOLOGIES",
+    "EventQueue",
+    "Fabric",
+    "FabricParams",
+    "Packet",
+    "Report",
+    "percentile",
+    "Point",
+    "saturation",
+    "EnidPort",
+    "SystemParams",
+    "SystemReport",
+    "run_system",
+    "PATTERNS",
+    "read_trace",
+    "synthetic",
+    "write_trace",
+]
@@ -0,0 +1,195 @@
+import argparse
+import json
+import sys
+import time
+from itertools import product
+from pathlib import Path
+
+from processors.amber.asm.assembler import AsmError
+from processors.amber.skald.codegen import CodegenError
+from processors.amber.skald.lexer import LexError
+from processors.amber.skald.parser import ParseError
+
+from . import codec, sweep, system, traffic
+from .fabric import ARBITERS, INGRESS, TOPOLOGIES, FabricParams
+from .transport import TRANSPORTS
+
+
+def cmd_run(args) -> int:
+    # a trace runs until delivered and counts from its start
+    cycles = args.cycles if args.cycles is not None or args.trace else 20_000
+    warmup = args.warmup if args.warmup is not None else 0 if args.trace else 2000
+    loads = [None] if args.trace else [sweep.SATURATION_LOAD] if args.saturation else args.load
+    combos = list(product(args.topology, args.ingress, args.arbiter, args.depth, args.cr_w, args.vcs, loads))
+    points = []
+    try:
+        for topology, ingress, arbiter, depth, cr_w, vcs, load in combos:
+            params = FabricParams(n_ports=args.ports, link_w=args.link_w, depth=depth, cr_w=cr_w, vcs=vcs,
+                                  link_latency=args.link_latency, credit_latency=args.credit_latency,
+                                  route_latency=args.route_latency, cut_through=not args.store_and_forward,
+                                  pay_crc=args.pay_crc, ingress=ingress, arbiter=arbiter, topology=topology,
+                                  islip_iters=args.islip_iters, prio=tuple(args.prio))
+            if params.credits < depth:
+                print(f"note: CR_W={cr_w} counts only {params.credits} of {depth} credits", file=sys.stderr)
+            points.append(sweep.Point(params, args.pattern, load or 0.5, tuple(args.bytes), cycles, warmup,
+                                      args.seed, args.ctrl, args.hot, args.hot_frac,
+                                      str(args.trace) if args.trace is not None else None))
+        if args.record is not None:
+            with open(args.record, "w", encoding="utf-8") as fp:
+                traffic.write_trace(points[0].packets(), fp)
+        rows = len(points) > 1 or args.saturation
+        if rows:
+            print(f"; TOPO INGRESS ARBITER  DEPTH  CR_W  VCS  {'SAT' if args.saturation else 'LOAD'}  OFFERED  "
+                  f"ACCEPTED   P50   P90   P99  WAIT   HOL%  BUF_BITS")
+        for (topology, ingress, arbiter, depth, cr_w, vcs, load), rep in zip(combos, sweep.run(points, args.workers)):
+            if rows:
+                hol = 100 * sum(rep.hol) / len(rep.hol)
+                print(f"{topology:6} {ingress:7} {arbiter:8} {depth:6} {cr_w:5} {vcs:4} "
+                      f"{load if load is not None else 0:5.2f} {rep.offered_load:8.3f} {rep.throughput:9.3f} "
+                      f"{rep.p(50):5} {rep.p(90):5} {rep.p(99):5} {rep.mean_wait:5.1f} {hol:6.2f} "
+                      f"{rep.buffer_bits:9}")
+            else:
+                rep.write(sys.stdout, per_port=True)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+def cmd_capture(args) -> int:
+    frames = codec.random_frames(args.count, args.seed, args.pay_crc, args.max_len)
+    buf = codec.encode_many(frames)
+    try:
+        args.out.write_bytes(buf)
+        if args.hex is not None:
+            with open(args.hex, "w", encoding="utf-8") as fp:
+                flits = codec.write_flits(buf, fp, args.link_w)
+            print(f"{args.hex}: {flits} flits of {args.link_w} bits")
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    print(f"{args.out}: {len(frames)} frames, {len(buf)} bytes")
+    return 0
+
+
+def cmd_check(args) -> int:
+    try:
+        buf = args.capture.read_bytes()
+        start = time.perf_counter()
+        frames = hdr_bad = pay_bad = 0
+        by_type = [0] * 16
+        for f in codec.iter_frames(buf):
+            frames += 1
+            by_type[f.type] += 1
+            if not f.hdr_ok:
+                hdr_bad += 1
+                if args.verbose:
+                    print(f"offset {f.offset}: header CRC {f.hdr_crc:04X} does not match")
+            elif f.pay_ok is False:
+                pay_bad += 1
+                if args.verbose:
+                    print(f"offset {f.offset}: payload CRC does not match")
+        wall = time.perf_counter() - start
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    types = ", ".join(f"{n} {codec.TYPE_NAMES[t] if t < 4 else t}" for t, n in enumerate(by_type) if n)
+    print(f"{frames} frames ({types}), {len(buf)} bytes")
+    print(f"header CRC failures: {hdr_bad}, payload CRC failures: {pay_bad}")
+    print(f"decoded in {wall:.3f} s ({len(buf) / max(wall, 1e-9) / 1e6:.1f} MB/s)")
+    return 1 if hdr_bad or pay_bad else 0
+
+
+def cmd_system(args) -> int:
+    try:
+        params = system.SystemParams(quantum=args.quantum, latency=args.latency, link_w=args.link_w,
+                                     ep_latency=args.ep_latency, rx_depth=args.rx_depth,
+                                     max_cycles=args.max_cycles, transport=args.transport, pay_crc=args.pay_crc)
+        rep = system.run([str(p) for p in args.programs], params)
+    except (OSError, ValueError, AsmError, LexError, ParseError, CodegenError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    if args.json is not None:
+        args.json.write_text(json.dumps(rep.to_json(), indent=2) + "\n", encoding="utf-8")
+    rep.write(sys.stdout)
+    return 0 if rep.state == "halted" else 1
+
+
+def main():
+    p = argparse.ArgumentParser(description="enid fabric model and packet codec")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    sp = sub.add_parser("run", help="Simulate endpoints and switches under synthetic or recorded traffic")
+    sp.add_argument("--ports", type=int, default=8, help="Switch ports (N_PORTS), one endpoint each")
+    sp.add_argument("--link-w", type=int, default=16, help="Flit width in bits (LINK_W)")
+    sp.add_argument("--depth", type=int, nargs="+", default=[8], help="Ingress FIFO depths per VC to sweep")
+    sp.add_argument("--cr-w", type=int, nargs="+", default=[5], help="Credit counter widths (CR_W) to sweep")
+    sp.add_argument("--vcs", type=int, nargs="+", default=[2], help="VC counts to sweep")
+    sp.add_argument("--link-latency", type=int, default=FabricParams.link_latency, help="Flit cycles across a link")
+    sp.add_argument("--credit-latency", type=int, default=FabricParams.credit_latency,
+                    help="Cycles for a freed entry's credit to reach the sender")
+    sp.add_argument("--route-latency", type=int, default=FabricParams.route_latency,
+                    help="Cycles from a header to its output request")
+    sp.add_argument("--topology", nargs="+", choices=TOPOLOGIES, default=["star"],
+                    help="board-ivy switch (star) and/or neighbour links only (ring) to sweep")
+    sp.add_argument("--ingress", nargs="+", choices=INGRESS, default=["fifo"],
+                    help="Ingress buffers to sweep: a FIFO per VC or virtual output queues")
+    sp.add_argument("--arbiter", nargs="+", choices=ARBITERS, default=["rr"], help="Switch allocators to sweep")
+    sp.add_argument("--islip-iters", type=int, default=FabricParams.islip_iters, help="iSLIP iterations per cycle")
+    sp.add_argument("--prio", type=int, nargs="+", default=[], help="Modules with strict priority (priority arbiter)")
+    sp.add_argument("--store-and-forward", action="store_true", help="Wait for whole packets instead of cut-through")
+    sp.add_argument("--pay-crc", action="store_true", help="Add the pay_crc32 tail to every packet")
+    sp.add_argument("--trace", type=Path, help="Recorded traffic (CYCLE SRC DST [VC [BYTES]] lines)")
+    sp.add_argument("--pattern", choices=traffic.PATTERNS, default="uniform", help="Synthetic destinations")
+    sp.add_argument("--load", type=float, nargs="+", default=[0.5], help="Offered flits/cycle per endpoint to sweep")
+    sp.add_argument("--bytes", type=int, nargs="+", default=[32], help="Payload sizes, drawn uniformly")
+    sp.add_argument("--ctrl", type=float, default=0.1, help="Share of packets on VC 0 (ctrl)")
+    sp.add_argument("--hot", type=int, default=0, help="Hotspot module")
+    sp.add_argument("--hot-frac", type=float, default=0.5, help="Share of packets sent to the hotspot")
+    sp.add_argument("--seed", type=int, default=0, help="Traffic seed")
+    sp.add_argument("--cycles", type=int, help="Cycles to simulate (default 20000; a trace runs until delivered)")
+    sp.add_argument("--warmup", type=int, help="Cycles left out of the statistics (default 2000, 0 for a trace)")
+    sp.add_argument("--saturation", action="store_true",
+                    help="Measure saturation throughput: run every combination at full offered load")
+    sp.add_argument("--workers", type=int, help="Worker processes for sweeps (default: CPU count, 1 = in-process)")
+    sp.add_argument("--record", type=Path, help="Write the synthetic traffic (of the first combination) as a trace")
+    sp.set_defaults(func=cmd_run)
+
+    sp = sub.add_parser("capture", help="Write a capture of random encoded frames")
+    sp.add_argument("out", type=Path, help="Capture file (frames back to back)")
+    sp.add_argument("--count", type=int, default=10_000, help="Frames to generate")
+    sp.add_argument("--seed", type=int, default=0, help="Generator seed")
+    sp.add_argument("--max-len", type=int, default=256, help="Largest data length in bytes")
+    sp.add_argument("--pay-crc", action="store_true", help="Add the pay_crc32 tail to every frame")
+    sp.add_argument("--hex", type=Path, help="Also write the frames as $readmemh flit vectors")
+    sp.add_argument("--link-w", type=int, default=16, help="Flit width in bits for --hex (LINK_W)")
+    sp.set_defaults(func=cmd_capture)
+
+    sp = sub.add_parser("check", help="Decode a capture and verify its header and payload CRCs")
+    sp.add_argument("capture", type=Path, help="Capture file (frames back to back)")
+    sp.add_argument("-v", "--verbose", action="store_true", help="List every frame that fails a CRC")
+    sp.set_defaults(func=cmd_check)
+
+    sp = sub.add_parser("system", help="Co-simulate Amber firmware on several modules connected by enid")
+    sp.add_argument("programs", type=Path, nargs="+", help="Program of module 0, 1, ... (.asm, .skald or .hex)")
+    sp.add_argument("--transport", choices=TRANSPORTS, default="socket",
+                    help="Module/switch channels: Unix sockets or shared-memory rings")
+    sp.add_argument("--quantum", type=int, default=system.SystemParams.quantum, help="Cycles between module syncs")
+    sp.add_argument("--latency", type=int, default=system.SystemParams.latency,
+                    help="Cycles from EP to EP before serialisation (exact when >= --quantum)")
+    sp.add_argument("--link-w", type=int, default=system.SystemParams.link_w, help="Switch output bits per cycle")
+    sp.add_argument("--ep-latency", type=int, default=system.SystemParams.ep_latency,
+                    help="Cycles for an EP to answer a remote mem request")
+    sp.add_argument("--rx-depth", type=int, default=system.SystemParams.rx_depth,
+                    help="Messages an EP queues before refusing (RETRY)")
+    sp.add_argument("--max-cycles", type=int, default=system.SystemParams.max_cycles, help="Stop after this cycle")
+    sp.add_argument("--pay-crc", action="store_true", help="Add the pay_crc32 tail to every frame")
+    sp.add_argument("--json", type=Path, help="Also write the report as JSON")
+    sp.set_defaults(func=cmd_system)
+
+    args = p.parse_args()
+    raise SystemExit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,423 @@
+"""enid packet codec: header/body layout, CRC16/CRC32 and batch encode/decode.
+
+Wire layout of a frame, big-endian throughout:
+
+    header   8 bytes  ver[63:60] type[59:56] vc[55:54] flags[53:48]
+                      dest_mod[47:44] dest_sub[43:42] src_mod[41:38]
+                      src_sub[37:36] length[35:20] seq[19:12] reserved[11:0]
+    hdr_crc  2 bytes  CRC-16/CCITT-FALSE of the 8 header bytes
+    body              mem:  op[47:46] reserved[45:36] addr[35:0] (6 bytes),
+                            then `length` data bytes for WR (none for RD)
+                      msg:  msg_class, msg_tag, then `length` data bytes
+                      ack:  `length` data bytes (read data answering
+                            a mem RD, none otherwise)
+                      nack: empty
+    pay_crc  4 bytes  CRC-32 (IEEE) of the body, if flags has FLAG_PAY_CRC
+
+An ack or nack answers the request with the same seq from its destination.
+
+`spec.md` lists 68 bits of header fields for a "64-bit" header; here the
+fields other than hdr_crc16 fill the 64-bit word (12 bits reserved) and
+the CRC follows it, so the header is `HEADER_BYTES` on the wire. Flag bit
+assignments (`FLAG_*`) are this codec's; `spec.md` only names them.
+
+Scalar CRCs use the C table-driven `binascii.crc_hqx` and `zlib.crc32`.
+The NumPy paths (`crc16_words_np`, `decode_headers_np`,
+`encode_headers_np`) run CRC16 slice-by-8 over whole arrays of header
+words at once: one pass of eight table lookups per header.
+
+`FrameView` parses in place: fields are read from the buffer with
+`struct.unpack_from` and payloads are `memoryview` slices, so walking a
+capture with `iter_frames` copies nothing. `encode_many` packs frames
+into one preallocated buffer.
+"""
+from __future__ import annotations
+
+import binascii
+import random
+import struct
+import zlib
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Sequence, TextIO, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:  # only the *_np batch paths need it
+    np = None
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+VERSION = 1
+
+# Packet types and memory ops (src/enid_defs.vh)
+PT_MEM, PT_MSG, PT_ACK, PT_NACK = 0, 1, 2, 3
+MEM_RD, MEM_WR = 0, 1
+TYPE_NAMES = ("mem", "msg", "ack", "nack")
+
+FLAG_PRIO = 0x01
+FLAG_CUT_THROUGH = 0x02
+FLAG_PAY_CRC = 0x04
+
+WORD_BYTES = 8
+HEADER_BYTES = WORD_BYTES + 2  # header word + hdr_crc16
+MEM_PREFIX_BYTES = 6
+MSG_PREFIX_BYTES = 2
+CRC32_BYTES = 4
+ADDR_MASK = (1 << 36) - 1
+
+# name, shift, width within the header word
+FIELDS: Tuple[Tuple[str, int, int], ...] = (
+    ("ver", 60, 4),
+    ("type", 56, 4),
+    ("vc", 54, 2),
+    ("flags", 48, 6),
+    ("dest_mod", 44, 4),
+    ("dest_sub", 42, 2),
+    ("src_mod", 38, 4),
+    ("src_sub", 36, 2),
+    ("length", 20, 16),
+    ("seq", 12, 8),
+)
+
+_HDR = struct.Struct(">QH")
+_U16 = struct.Struct(">H")
+_U32 = struct.Struct(">I")
+_MEM = struct.Struct(">HI")  # prefix as 16 + 32 bits
+
+
+# --- CRCs --------------------------------------------------------------------------
+CRC16_POLY = 0x1021
+CRC16_INIT = 0xFFFF
+
+
+def crc16(data: Buffer, crc: int = CRC16_INIT) -> int:
+    """CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF, no reflection)."""
+    return binascii.crc_hqx(data, crc)
+
+
+def crc32(data: Buffer, crc: int = 0) -> int:
+    """CRC-32 as in IEEE 802.3 (zlib)."""
+    return zlib.crc32(data, crc)
+
+
+def _crc16_tables() -> List[List[int]]:
+    """Slice-by-8 tables: T[k][b] is the CRC of byte b followed by k zero bytes."""
+    t0 = []
+    for b in range(256):
+        c = b << 8
+        for _ in range(8):
+            c = ((c << 1) ^ CRC16_POLY if c & 0x8000 else c << 1) & 0xFFFF
+        t0.append(c)
+    tables = [t0]
+    for _ in range(7):
+        prev = tables[-1]
+        tables.append([((c << 8) & 0xFFFF) ^ t0[c >> 8] for c in prev])
+    return tables
+
+
+CRC16_TABLES = _crc16_tables()
+_np_tables = None
+
+
+def crc16_words_np(words):
+    """CRC16 of many 64-bit header words (big-endian bytes), slice-by-8 over the array."""
+    global _np_tables
+    if np is None:
+        raise ImportError("crc16_words_np needs NumPy")
+    if _np_tables is None:
+        _np_tables = np.array(CRC16_TABLES, dtype=np.uint16)
+    t = _np_tables
+    x = np.asarray(words, dtype=np.uint64) ^ np.uint64(CRC16_INIT << 48)
+    crc = t[7][(x >> np.uint64(56)).astype(np.intp)]
+    for k in range(6, -1, -1):
+        crc ^= t[k][((x >> np.uint64(8 * k)) & np.uint64(0xFF)).astype(np.intp)]
+    return crc
+
+
+# --- Headers and frames ----------------------------------------------------------
+@dataclass
+class Header:
+    type: int
+    dest_mod: int
+    dest_sub: int = 0
+    src_mod: int = 0
+    src_sub: int = 0
+    length: int = 0  # data bytes (for RD: bytes requested)
+    seq: int = 0
+    vc: int = 0
+    flags: int = 0
+    ver: int = VERSION
+
+    def word(self) -> int:
+        w = 0
+        for name, shift, width in FIELDS:
+            v = getattr(self, name)
+            if not 0 <= v >> width < 1:
+                raise ValueError(f"header field {name}={v} does not fit {width} bits")
+            w |= v << shift
+        return w
+
+    @classmethod
+    def from_word(cls, w: int) -> "Header":
+        return cls(**{name: (w >> shift) & ((1 << width) - 1) for name, shift, width in FIELDS})
+
+
+def body_bytes(ptype: int, op: int, length: int) -> int:
+    if ptype == PT_MEM:
+        return MEM_PREFIX_BYTES + (length if op == MEM_WR else 0)
+    if ptype == PT_MSG:
+        return MSG_PREFIX_BYTES + length
+    if ptype == PT_ACK:
+        return length
+    return 0
+
+
+@dataclass
+class Frame:
+    header: Header
+    op: int = MEM_RD  # mem
+    addr: int = 0  # mem, 36 bits
+    msg_class: int = 0  # msg
+    msg_tag: int = 0  # msg
+    data: bytes = b""
+
+    @property
+    def size(self) -> int:
+        h = self.header
+        return (HEADER_BYTES + body_bytes(h.type, self.op, h.length)
+                + (CRC32_BYTES if h.flags & FLAG_PAY_CRC else 0))
+
+    def encode(self) -> bytes:
+        buf = bytearray(self.size)
+        encode_into(buf, 0, self)
+        return bytes(buf)
+
+
+def encode_into(buf: Union[bytearray, memoryview], offset: int, frame: Frame) -> int:
+    """Write `frame` at `offset`; returns the offset after it."""
+    h = frame.header
+    word = h.word()
+    _HDR.pack_into(buf, offset, word, crc16(word.to_bytes(WORD_BYTES, "big")))
+    pos = body = offset + HEADER_BYTES
+    if h.type == PT_MEM:
+        if not 0 <= frame.addr <= ADDR_MASK or frame.op not in (MEM_RD, MEM_WR):
+            raise ValueError(f"bad mem op {frame.op} / address {frame.addr:#x}")
+        _MEM.pack_into(buf, pos, frame.op << 14 | frame.addr >> 32, frame.addr & 0xFFFFFFFF)
+        pos += MEM_PREFIX_BYTES
+    elif h.type == PT_MSG:
+        buf[pos] = frame.msg_class
+        buf[pos + 1] = frame.msg_tag
+        pos += MSG_PREFIX_BYTES
+    n = body_bytes(h.type, frame.op, h.length) - (pos - body)
+    if len(frame.data) != n:
+        raise ValueError(f"{TYPE_NAMES[h.type] if h.type < 4 else h.type} frame carries {len(frame.data)} "
+                         f"data bytes, header says {n}")
+    buf[pos:pos + n] = frame.data
+    pos += n
+    if h.flags & FLAG_PAY_CRC:
+        _U32.pack_into(buf, pos, crc32(memoryview(buf)[body:pos]))
+        pos += CRC32_BYTES
+    return pos
+
+
+def encode_many(frames: Sequence[Frame]) -> bytearray:
+    """All `frames` back to back in one buffer."""
+    buf = bytearray(sum(f.size for f in frames))
+    pos = 0
+    for f in frames:
+        pos = encode_into(buf, pos, f)
+    return buf
+
+
+def _word_field(shift: int, width: int) -> property:
+    mask = (1 << width) - 1
+    return property(lambda self: (self.word >> shift) & mask)
+
+
+class FrameView:
+    """A frame parsed in place; payload accessors are memoryview slices."""
+
+    __slots__ = ("buf", "offset", "word", "hdr_crc", "size")
+
+    def __init__(self, buf: memoryview, offset: int = 0) -> None:
+        if offset + HEADER_BYTES > len(buf):
+            raise ValueError(f"truncated header at offset {offset}")
+        self.buf = buf
+        self.offset = offset
+        self.word, self.hdr_crc = _HDR.unpack_from(buf, offset)
+        w = self.word
+        ptype, length = (w >> 56) & 0xF, (w >> 20) & 0xFFFF
+        op = buf[offset + HEADER_BYTES] >> 6 if ptype == PT_MEM and offset + HEADER_BYTES < len(buf) else MEM_RD
+        self.size = (HEADER_BYTES + body_bytes(ptype, op, length)
+                     + (CRC32_BYTES if (w >> 48) & FLAG_PAY_CRC else 0))
+        if offset + self.size > len(buf):
+            raise ValueError(f"truncated frame at offset {offset}: {self.size} bytes, "
+                             f"{len(buf) - offset} left")
+
+    ver, type, vc, flags, dest_mod, dest_sub, src_mod, src_sub, length, seq = (
+        _word_field(shift, width) for _, shift, width in FIELDS)
+
+    @property
+    def header(self) -> Header:
+        return Header.from_word(self.word)
+
+    @property
+    def body(self) -> memoryview:
+        end = self.offset + self.size - (CRC32_BYTES if self.flags & FLAG_PAY_CRC else 0)
+        return self.buf[self.offset + HEADER_BYTES:end]
+
+    @property
+    def data(self) -> memoryview:
+        skip = {PT_MEM: MEM_PREFIX_BYTES, PT_MSG: MSG_PREFIX_BYTES}.get(self.type, 0)
+        return self.body[skip:]
+
+    @property
+    def op(self) -> int:
+        return self.buf[self.offset + HEADER_BYTES] >> 6
+
+    @property
+    def addr(self) -> int:
+        hi, lo = _MEM.unpack_from(self.buf, self.offset + HEADER_BYTES)
+        return (hi & 0xF) << 32 | lo
+
+    @property
+    def msg_class(self) -> int:
+        return self.buf[self.offset + HEADER_BYTES]
+
+    @property
+    def msg_tag(self) -> int:
+        return self.buf[self.offset + HEADER_BYTES + 1]
+
+    @property
+    def hdr_ok(self) -> bool:
+        return crc16(self.buf[self.offset:self.offset + WORD_BYTES]) == self.hdr_crc
+
+    @property
+    def pay_ok(self) -> Optional[bool]:
+        """Payload CRC check, None if the frame has none."""
+        if not self.flags & FLAG_PAY_CRC:
+            return None
+        end = self.offset + self.size
+        return crc32(self.body) == _U32.unpack_from(self.buf, end - CRC32_BYTES)[0]
+
+    def frame(self) -> Frame:
+        """A copy as a `Frame`."""
+        t = self.type
+        return Frame(self.header, op=self.op if t == PT_MEM else MEM_RD, addr=self.addr if t == PT_MEM else 0,
+                     msg_class=self.msg_class if t == PT_MSG else 0, msg_tag=self.msg_tag if t == PT_MSG else 0,
+                     data=bytes(self.data))
+
+
+def decode(buf: Buffer, offset: int = 0) -> FrameView:
+    return FrameView(memoryview(buf), offset)
+
+
+def iter_frames(buf: Buffer) -> Iterator[FrameView]:
+    """Frames stored back to back in `buf`, without copying."""
+    mv = memoryview(buf)
+    pos, end = 0, len(mv)
+    while pos < end:
+        f = FrameView(mv, pos)
+        yield f
+        pos += f.size
+
+
+def frame_offsets(buf: Buffer) -> List[int]:
+    """Start offsets of the frames in `buf` (header fields only, no CRC checks)."""
+    mv = memoryview(buf)
+    offsets = []
+    pos, end = 0, len(mv)
+    unpack = _HDR.unpack_from
+    while pos < end:
+        if pos + HEADER_BYTES > end:
+            raise ValueError(f"truncated header at offset {pos}")
+        w = unpack(mv, pos)[0]
+        ptype, length = (w >> 56) & 0xF, (w >> 20) & 0xFFFF
+        op = mv[pos + HEADER_BYTES] >> 6 if ptype == PT_MEM and pos + HEADER_BYTES < end else MEM_RD
+        offsets.append(pos)
+        pos += (HEADER_BYTES + body_bytes(ptype, op, length)
+                + (CRC32_BYTES if (w >> 48) & FLAG_PAY_CRC else 0))
+    if pos != end:
+        raise ValueError(f"truncated frame at offset {offsets[-1]}")
+    return offsets
+
+
+# --- Batch paths (NumPy) ----------------------------------------------------------
+def decode_headers_np(buf: Buffer, offsets: Sequence[int]) -> Dict[str, object]:
+    """Header fields of the frames at `offsets` as arrays, plus `hdr_ok`."""
+    if np is None:
+        raise ImportError("decode_headers_np needs NumPy")
+    raw = np.frombuffer(buf, dtype=np.uint8)
+    hb = raw[np.asarray(offsets, dtype=np.intp)[:, None] + np.arange(HEADER_BYTES)]
+    words = np.ascontiguousarray(hb[:, :WORD_BYTES]).view(">u8").ravel().astype(np.uint64)
+    crc = (hb[:, WORD_BYTES].astype(np.uint16) << np.uint16(8)) | hb[:, WORD_BYTES + 1]
+    out: Dict[str, object] = {name: ((words >> np.uint64(shift)) & np.uint64((1 << width) - 1)).astype(np.int64)
+                              for name, shift, width in FIELDS}
+    out["hdr_ok"] = crc16_words_np(words) == crc
+    return out
+
+
+def encode_headers_np(fields: Dict[str, object]):
+    """(N, HEADER_BYTES) uint8 headers with CRCs from arrays of field values."""
+    if np is None:
+        raise ImportError("encode_headers_np needs NumPy")
+    n = len(next(iter(fields.values())))
+    words = np.zeros(n, dtype=np.uint64)
+    for name, shift, width in FIELDS:
+        v = np.asarray(fields.get(name, VERSION if name == "ver" else 0), dtype=np.uint64)
+        if (v >> np.uint64(width)).any():
+            raise ValueError(f"header field {name} does not fit {width} bits")
+        words |= v << np.uint64(shift)
+    out = np.empty((n, HEADER_BYTES), dtype=np.uint8)
+    out[:, :WORD_BYTES] = words.astype(">u8").view(np.uint8).reshape(n, WORD_BYTES)
+    crc = crc16_words_np(words)
+    out[:, WORD_BYTES] = crc >> np.uint16(8)
+    out[:, WORD_BYTES + 1] = crc & np.uint16(0xFF)
+    return out
+
+
+# --- Test traffic ------------------------------------------------------------------
+def random_frames(count: int, seed: int = 0, pay_crc: bool = False, max_len: int = 256) -> List[Frame]:
+    """A mix of mem RD/WR, msg and ack/nack frames between random modules."""
+    rng = random.Random(seed)
+    flags = FLAG_PAY_CRC if pay_crc else 0
+    frames = []
+    for i in range(count):
+        ptype = rng.choice((PT_MEM, PT_MEM, PT_MSG, PT_ACK, PT_NACK))
+        length = rng.randrange(max_len + 1) if ptype in (PT_MEM, PT_MSG) else 0
+        op = rng.choice((MEM_RD, MEM_WR))
+        vc = 0 if ptype in (PT_ACK, PT_NACK) else 1
+        h = Header(ptype, rng.randrange(16), rng.randrange(4), rng.randrange(16), rng.randrange(4),
+                   length, i & 0xFF, vc, flags)
+        if ptype == PT_MEM:
+            data = rng.randbytes(length) if op == MEM_WR else b""
+            frames.append(Frame(h, op=op, addr=rng.getrandbits(36), data=data))
+        elif ptype == PT_MSG:
+            frames.append(Frame(h, msg_class=rng.randrange(256), msg_tag=rng.randrange(256),
+                                data=rng.randbytes(length)))
+        else:
+            frames.append(Frame(h))
+    return frames
+
+
+def write_flits(buf: Buffer, fp: TextIO, link_w: int = 16) -> int:
+    """Frames of `buf` as `$readmemh` LINK words: {sof, eof, flit[link_w-1:0]} per line.
+
+    Each frame is cut into `link_w`-bit flits, most significant first, the
+    last one zero-padded. Returns the number of flits.
+    """
+    if link_w % 8:
+        raise ValueError("LINK_W must be a multiple of 8 for byte frames")
+    step = link_w // 8
+    digits = (link_w + 2 + 3) // 4
+    n = 0
+    for i, f in enumerate(iter_frames(buf)):
+        raw = bytes(f.buf[f.offset:f.offset + f.size])
+        fp.write(f"// frame {i}: {TYPE_NAMES[f.type] if f.type < 4 else f.type} "
+                 f"{f.src_mod}.{f.src_sub}->{f.dest_mod}.{f.dest_sub} seq {f.seq} len {f.length}\n")
+        chunks = [raw[k:k + step].ljust(step, b"\0") for k in range(0, len(raw), step)]
+        for k, chunk in enumerate(chunks):
+            word = (k == 0) << (link_w + 1) | (k == len(chunks) - 1) << link_w | int.from_bytes(chunk, "big")
+            fp.write(f"{word:0{digits}X}\n")
+        n += len(chunks)
+    return n
@@ -0,0 +1,27 @@
+; enid endpoint CSR window of the co-simulation (interfaces/enid/sim/system.py)
+;
+; The RTL has no enid CSRs yet; these indices are the stand-in window the
+; system model hooks on every module's core.
+
+    .equ ENID_DEST,    0x050   ; W [3:0] dest_mod, [5:4] dest_sub
+    .equ ENID_ADDR_LO, 0x051   ; W addr[23:0]
+    .equ ENID_ADDR_HI, 0x052   ; W addr[35:24]
+    .equ ENID_TAG,     0x053   ; W msg_class[7:0], msg_tag[15:8]
+    .equ ENID_WDATA,   0x054   ; W queue a data word
+    .equ ENID_REQ,     0x055   ; W send; stalls while a request is open
+    .equ ENID_RSP,     0x056   ; R [1:0] status, [23:8] words; stalls until answered
+    .equ ENID_RDATA,   0x057   ; R next read data word
+    .equ ENID_RX,      0x058   ; R take a message: class, source << 8, words << 14; stalls until one is queued
+    .equ ENID_RX_DATA, 0x059   ; R next word of that message
+    .equ ENID_STATUS,  0x05A   ; R [0] request open, [1] message queued, [23:8] queued
+    .equ ENID_ID,      0x05B   ; R this module (mod << 2)
+    .equ ENID_RX_TAG,  0x05C   ; R msg_tag of the taken message
+
+    ; ENID_REQ values: type | op << 2 | words << 4
+    .equ ENID_REQ_RD,  0x000   ; mem RD (plus words << 4, e.g. 0x30)
+    .equ ENID_REQ_WR,  0x004   ; mem WR of the queued words
+    .equ ENID_REQ_MSG, 0x001   ; message of the queued words
+
+    .equ ENID_RSP_OK,    0
+    .equ ENID_RSP_ERR,   1
+    .equ ENID_RSP_RETRY, 2
@@ -0,0 +1,6 @@
+; A module whose core does nothing; its EP still serves remote requests
+
+    .org 0
+
+start:
+    HLT
@@ -0,0 +1,40 @@
+; Module 0: send four messages to module 1 and collect its echoes
+;
+;   python -m interfaces.enid.sim system interfaces/enid/sim/examples/ping.asm \
+;       interfaces/enid/sim/examples/pong.asm
+;
+; Straight-line code: every handshake is a CSR access the core stalls on.
+
+    .include "enid_csr.asm"
+    .org 0
+
+.macro PING word
+    MOVsi #{word}, DR1
+    CSRWR ENID_WDATA, DR1
+    CSRWR ENID_REQ, DR3        ; stalls while the previous request is open
+    CSRRD ENID_RSP, DR2        ; stalls until module 1 acknowledges
+.endm
+
+.macro ECHO
+    CSRRD ENID_RX, DR4         ; stalls until the echo arrives
+    CSRRD ENID_RX_DATA, DR5
+    ADDur DR5, DR6             ; DR6 := sum of the echoed words
+.endm
+
+start:
+    MOVsi #4, DR1              ; module 1, sub 0
+    CSRWR ENID_DEST, DR1
+    MOVsi #7, DR1              ; class 7
+    CSRWR ENID_TAG, DR1
+    MOVsi #ENID_REQ_MSG + 0x10, DR3  ; one word
+    MOVsi #0, DR6
+
+    PING 11
+    PING 22
+    PING 33
+    PING 44
+    ECHO
+    ECHO
+    ECHO
+    ECHO
+    HLT
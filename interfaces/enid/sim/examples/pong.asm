@@ -0,0 +1,25 @@
+; Module 1: echo four messages from module 0 back to it (see ping.asm)
+
+    .include "enid_csr.asm"
+    .org 0
+
+.macro PONG
+    CSRRD ENID_RX, DR4         ; stalls until a message is queued
+    CSRRD ENID_RX_DATA, DR1
+    CSRWR ENID_WDATA, DR1
+    CSRWR ENID_REQ, DR3
+    CSRRD ENID_RSP, DR2        ; stalls until module 0 acknowledges
+.endm
+
+start:
+    MOVsi #0, DR1              ; module 0, sub 0
+    CSRWR ENID_DEST, DR1
+    MOVsi #7, DR1
+    CSRWR ENID_TAG, DR1
+    MOVsi #ENID_REQ_MSG + 0x10, DR3  ; one word
+
+    PONG
+    PONG
+    PONG
+    PONG
+    HLT
@@ -0,0 +1,35 @@
+; Module 0: write three words into module 1's data memory and read them back
+;
+;   python -m interfaces.enid.sim system interfaces/enid/sim/examples/remote_mem.asm \
+;       interfaces/enid/sim/examples/idle.asm
+;
+; Module 1's EP serves both requests without its core.
+
+    .include "enid_csr.asm"
+    .org 0
+
+start:
+    MOVsi #4, DR1              ; module 1
+    CSRWR ENID_DEST, DR1
+    MOVsi #0x100, DR1          ; word address 0x100
+    CSRWR ENID_ADDR_LO, DR1
+    MOVsi #0, DR1
+    CSRWR ENID_ADDR_HI, DR1
+
+    MOVsi #101, DR1
+    CSRWR ENID_WDATA, DR1
+    MOVsi #102, DR1
+    CSRWR ENID_WDATA, DR1
+    MOVsi #103, DR1
+    CSRWR ENID_WDATA, DR1
+    MOVsi #ENID_REQ_WR, DR1
+    CSRWR ENID_REQ, DR1
+    CSRRD ENID_RSP, DR2
+
+    MOVsi #ENID_REQ_RD + 0x30, DR1   ; three words
+    CSRWR ENID_REQ, DR1
+    CSRRD ENID_RSP, DR2        ; 3 << 8: three words back
+    CSRRD ENID_RDATA, DR3      ; 101
+    CSRRD ENID_RDATA, DR4      ; 102
+    CSRRD ENID_RDATA, DR5      ; 103
+    HLT
@@ -0,0 +1,696 @@
+"""Discrete-event, flit-level model of the enid fabric (`spec.md`).
+
+Endpoints connect to switches over full-duplex LINKs. Each direction of a
+link carries one flit of `link_w` bits per cycle, `link_latency` cycles
+after it is sent, and uses credit flow control per lane (a VC, or on the
+ring a VC and dateline class): the sender starts with one credit per
+receiver buffer entry (capped by its `cr_w`-bit counter), spends one per
+flit and gets it back `credit_latency` cycles after the receiver frees the
+entry.
+
+Switches are input-queued crossbars. Every ingress port buffers each lane
+in one FIFO (`ingress="fifo"`) or in virtual output queues, one per egress
+port, sharing the lane's entries (`"voq"`). Once a packet's header is in
+(`cut_through`; otherwise the whole packet) and `route_latency` cycles
+have passed, it requests its egress port. The switch allocator matches
+requests to free outputs once per cycle with the `arbiter`:
+
+- `rr`: every output grants round-robin over its requests on its own, as
+  in `spec.md`; with VOQs an input may win several outputs and then feeds
+  them in turn;
+- `islip`: iSLIP, `islip_iters` rounds of request/grant/accept in which an
+  input lane accepts one grant; pointers move on first-round accepts only;
+- `priority`: like `rr`, but packets for the route table's `prio`
+  modules win first, and outputs serve lower VCs strictly first.
+
+A grant holds for the whole packet. Outputs move one flit per cycle,
+round-robin over their granted lanes (strictly by VC under `priority`);
+an ingress port delivers at most one flit per cycle to the crossbar.
+Endpoints inject their packets in order per VC, interleaving VCs flit by
+flit, and consume arriving flits at once.
+
+`topology="star"` is board-ivy: one `n_ports` switch (`enid_switch.v`)
+with an endpoint on every port. `"ring"` uses only the ivy neighbour
+links: every module has a three-port switch (local, left, right) and
+packets take the shorter way round, ties to the right. Ring links carry
+two lanes per VC and a packet moves to the upper one when it crosses the
+link from the last module to module 0 (the dateline), which breaks the
+cyclic buffer dependency and keeps the ring deadlock free.
+
+Packets are `header_flits` of the 64-bit header, the payload and, with
+`pay_crc`, the pay_crc32 tail. Time is in flit cycles. Nothing runs per
+cycle: every flit send, arrival, credit return and allocation is an event
+on a heap, and idle ports cost nothing.
+
+A FIFO counts as head-of-line blocked while its head packet waits for its
+output and the next packet on that port and lane, in the FIFO or still
+queued at the endpoint, is for another output. VOQs are never HoL
+blocked.
+"""
+from __future__ import annotations
+
+import heapq
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass, field
+from itertools import count
+from math import ceil, log2
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Set, TextIO, Tuple
+
+HEADER_BITS = 64
+PAY_CRC_BITS = 32
+MAX_MODULES = 16  # dest_mod is 4 bits
+MAX_VCS = 4  # vc is 2 bits
+INGRESS = ("fifo", "voq")
+ARBITERS = ("rr", "islip", "priority")
+TOPOLOGIES = ("star", "ring")
+LOCAL, LEFT, RIGHT = 0, 1, 2  # ring switch ports
+
+
+@dataclass
+class FabricParams:
+    n_ports: int = 8  # enid_switch N_PORTS, one endpoint per port
+    link_w: int = 16  # LINK_W: bits per flit
+    depth: int = 8  # ingress FIFO entries per VC (credits issued)
+    cr_w: int = 5  # CR_W: width of the sender's credit counter
+    vcs: int = 2  # 0 = ctrl, 1 = data
+    link_latency: int = 2  # cycles from sending a flit to its arrival in the receiver FIFO
+    credit_latency: int = 2  # cycles from freeing a FIFO entry to the credit at the sender
+    route_latency: int = 2  # header parse, route lookup and arbitration request
+    cut_through: bool = True
+    pay_crc: bool = False  # packets carry the pay_crc32 tail
+    ingress: str = "fifo"  # fifo or voq
+    arbiter: str = "rr"  # rr, islip or priority
+    topology: str = "star"  # star (board-ivy switch) or ring (neighbour links)
+    islip_iters: int = 3
+    prio: Tuple[int, ...] = ()  # route table strict-priority modules
+
+    def __post_init__(self) -> None:
+        if not 2 <= self.n_ports <= MAX_MODULES:
+            raise ValueError(f"n_ports must be 2..{MAX_MODULES}, got {self.n_ports}")
+        if not 1 <= self.vcs <= MAX_VCS:
+            raise ValueError(f"vcs must be 1..{MAX_VCS}, got {self.vcs}")
+        for name in ("link_w", "depth", "cr_w"):
+            if getattr(self, name) < 1:
+                raise ValueError(f"{name} must be at least 1")
+        for name in ("link_latency", "credit_latency"):
+            if getattr(self, name) < 1:
+                raise ValueError(f"{name} must be at least 1 cycle")
+        if self.route_latency < 0:
+            raise ValueError("route_latency must not be negative")
+        for name, choices in (("ingress", INGRESS), ("arbiter", ARBITERS), ("topology", TOPOLOGIES)):
+            if getattr(self, name) not in choices:
+                raise ValueError(f"unknown {name} '{getattr(self, name)}' (one of {', '.join(choices)})")
+        if self.islip_iters < 1:
+            raise ValueError("islip_iters must be at least 1")
+
+    @property
+    def credits(self) -> int:
+        """Credits a sender can hold per VC: the FIFO depth, capped by the CR_W counter."""
+        return min(self.depth, (1 << self.cr_w) - 1)
+
+    @property
+    def lanes(self) -> int:
+        """Credit lanes per link: the VCs, doubled by the ring's dateline classes."""
+        return self.vcs * (2 if self.topology == "ring" else 1)
+
+    @property
+    def header_flits(self) -> int:
+        return ceil(HEADER_BITS / self.link_w)
+
+    def flits(self, nbytes: int) -> int:
+        """Flits of a packet with `nbytes` of payload."""
+        tail = ceil(PAY_CRC_BITS / self.link_w) if self.pay_crc else 0
+        return self.header_flits + ceil(8 * nbytes / self.link_w) + tail
+
+
+@dataclass(eq=False)
+class Packet:
+    src: int  # source module (= switch port)
+    dst: int  # dest_mod
+    vc: int
+    nbytes: int  # payload length
+    created: int  # cycle the packet is offered to its source endpoint
+    flits: int = 0  # set by `Fabric.offer`
+    injected: Optional[int] = None  # first flit on the source link
+    delivered: Optional[int] = None  # last flit into the destination endpoint
+    wait: int = 0  # cycles ready at a switch ingress before its output was granted
+
+    @property
+    def latency(self) -> Optional[int]:
+        return None if self.delivered is None else self.delivered - self.created
+
+
+class EventQueue:
+    """Time-ordered callbacks; ties run in scheduling order."""
+
+    def __init__(self) -> None:
+        self.now = 0
+        self.events = 0  # callbacks run
+        self._heap: List[Tuple[int, int, Callable, tuple]] = []
+        self._seq = count()
+
+    def at(self, t: int, fn: Callable, *args) -> None:
+        heapq.heappush(self._heap, (t, next(self._seq), fn, args))
+
+    def run(self, until: Optional[int] = None) -> int:
+        """Run events before `until` (all of them if None); returns the end time."""
+        heap = self._heap
+        while heap:
+            if until is not None and heap[0][0] >= until:
+                self.now = until
+                return until
+            t, _, fn, args = heapq.heappop(heap)
+            self.now = t
+            self.events += 1
+            fn(*args)
+        if until is not None:
+            self.now = max(self.now, until)
+        return self.now
+
+
+class _Waker(ABC):
+    """Schedules `_serve` at most once per requested time."""
+
+    def __init__(self, events: EventQueue) -> None:
+        self.events = events
+        self._pending: Set[int] = set()
+
+    def wake(self, t: int) -> None:
+        if t not in self._pending:
+            self._pending.add(t)
+            self.events.at(t, self._run, t)
+
+    def _run(self, t: int) -> None:
+        self._pending.discard(t)
+        self._serve()
+
+    @abstractmethod
+    def _serve(self) -> None:
+        ...
+
+    def next_packet(self, vc: int, after: Packet) -> Optional[Packet]:
+        """The packet this sender will send on `vc` after `after` (None if unknown)."""
+        return None
+
+
+class Link:
+    """One direction of a LINK: flits to a receiver, credits back to the sender."""
+
+    def __init__(self, events: EventQueue, params: FabricParams,
+                 rx: Callable[[Packet, int, int], None], lanes: int) -> None:
+        self.events = events
+        self.params = params
+        self.rx = rx
+        self.sender: Optional[_Waker] = None
+        self.credits = [params.credits] * lanes
+        self.busy_until = 0
+        self.flits = 0  # flits sent
+
+    def send(self, pkt: Packet, idx: int, lane: int) -> None:
+        now = self.events.now
+        self.credits[lane] -= 1
+        self.busy_until = now + 1
+        self.flits += 1
+        self.events.at(now + self.params.link_latency, self.rx, pkt, idx, lane)
+
+    def free(self, lane: int) -> None:
+        """The receiver freed a buffer entry of `lane`."""
+        self.events.at(self.events.now + self.params.credit_latency, self._credit, lane)
+
+    def _credit(self, lane: int) -> None:
+        self.credits[lane] += 1
+        self.sender.wake(self.events.now)
+
+
+class Endpoint(_Waker):
+    """A module's EP: injects its offered packets and sinks the ones for it."""
+
+    def __init__(self, events: EventQueue, params: FabricParams, port: int) -> None:
+        super().__init__(events)
+        self.port = port
+        self.queues: List[Deque[Packet]] = [deque() for _ in range(params.vcs)]
+        self._sending: List[Optional[List]] = [None] * params.vcs  # [packet, next flit]
+        self._rr = 0
+        self.tx: Optional[Link] = None  # to the switch
+        self.rx: Optional[Link] = None  # from the switch, for credit returns
+        self.received = 0  # flits
+        self.on_deliver: Optional[Callable[[Packet], None]] = None
+        self.on_queue: Optional[Callable[[int], None]] = None  # a VC's queue changed
+
+    def offer(self, pkt: Packet) -> None:
+        q = self.queues[pkt.vc]
+        q.append(pkt)
+        if len(q) == 1 and self.on_queue is not None:
+            self.on_queue(pkt.vc)
+        self.wake(self.events.now)
+
+    def next_packet(self, vc: int, after: Packet) -> Optional[Packet]:
+        cur = self._sending[vc]
+        if cur is not None and cur[0] is not after:
+            return cur[0]
+        q = self.queues[vc]
+        return q[0] if q else None
+
+    def _serve(self) -> None:
+        now = self.events.now
+        tx = self.tx
+        if tx.busy_until > now:
+            self.wake(tx.busy_until)
+            return
+        vcs = len(self.queues)
+        for k in range(vcs):
+            vc = (self._rr + k) % vcs
+            cur = self._sending[vc]
+            if cur is None:
+                if not self.queues[vc]:
+                    continue
+                cur = self._sending[vc] = [self.queues[vc].popleft(), 0]
+            if not tx.credits[vc]:
+                continue
+            pkt, idx = cur
+            if idx == 0:
+                pkt.injected = now
+            tx.send(pkt, idx, vc)
+            cur[1] += 1
+            if cur[1] == pkt.flits:
+                self._sending[vc] = None
+            self._rr = vc + 1
+            self.wake(now + 1)
+            return
+
+    def arrive(self, pkt: Packet, idx: int, lane: int) -> None:
+        self.rx.free(lane)
+        self.received += 1
+        if idx == pkt.flits - 1:
+            pkt.delivered = self.events.now
+            if self.on_deliver is not None:
+                self.on_deliver(pkt)
+
+
+class _Entry:
+    """A packet in an ingress queue."""
+
+    __slots__ = ("packet", "out", "lane", "arrived", "ready", "granted")
+
+    def __init__(self, packet: Packet, out: int, lane: int) -> None:
+        self.packet = packet
+        self.out = out
+        self.lane = lane  # lane on the output link
+        self.arrived = 0  # flits received
+        self.ready: Optional[int] = None  # cycle it may ask for its output
+        self.granted = False
+
+
+class _Queue:
+    """A FIFO of flits and the packets they belong to."""
+
+    __slots__ = ("flits", "entries")
+
+    def __init__(self) -> None:
+        self.flits: Deque[Tuple[Packet, int]] = deque()
+        self.entries: Deque[_Entry] = deque()
+
+
+class Ingress:
+    """One ingress buffer (port, lane): a FIFO, or a VOQ per egress port."""
+
+    def __init__(self, port: int, lane: int, n_queues: int) -> None:
+        self.port = port
+        self.lane = lane
+        self.queues = [_Queue() for _ in range(n_queues)]
+        self.tail: Optional[_Queue] = None  # queue of the packet arriving
+        self.held = 0  # flits held
+        self.grants = 0  # outputs currently fed from here
+        self.rr_out = 0  # iSLIP accept pointer
+        self.peak = 0  # most flits held
+        self.hol = 0  # cycles head-of-line blocked
+        self.hol_since: Optional[int] = None
+
+
+class Output(_Waker):
+    """An egress port: sends the flits of the packets granted to it."""
+
+    def __init__(self, events: EventQueue, switch: "Switch", port: int) -> None:
+        super().__init__(events)
+        self.switch = switch
+        self.port = port
+        self.link: Optional[Link] = None
+        self.alloc: List[Optional[Tuple[Ingress, _Queue]]] = [None] * switch.lanes  # granted per lane
+        self.rr_port = [0] * switch.lanes  # grant pointer per lane
+        self.rr_vc = 0
+
+    def _serve(self) -> None:
+        self.switch.serve(self)
+
+
+# (ingress, queue, entry) of a head packet asking for an output lane
+_Request = Tuple[Ingress, _Queue, _Entry]
+
+
+class Switch(_Waker):
+    """Input-queued crossbar; `_serve` runs the allocator."""
+
+    def __init__(self, events: EventQueue, params: FabricParams, node: int, n_ports: int,
+                 route: Callable[[int, Packet], Tuple[int, int]]) -> None:
+        super().__init__(events)
+        self.params = params
+        self.node = node
+        self.n_ports = n_ports
+        self.lanes = params.lanes
+        self.route = route  # (node, packet) -> (output port, output lane)
+        n_queues = n_ports if params.ingress == "voq" else 1
+        self.ingress = [[Ingress(p, lane, n_queues) for lane in range(self.lanes)] for p in range(n_ports)]
+        self.outputs = [Output(events, self, o) for o in range(n_ports)]
+        self.in_links: List[Optional[Link]] = [None] * n_ports
+        self.in_busy = [0] * n_ports  # an ingress port moves one flit per cycle
+        self._order = sorted(range(self.lanes), key=lambda lane: (lane % params.vcs, lane))
+
+    def buffer_bits(self) -> int:
+        """Ingress storage: flit entries plus the VOQ linked-list pointers."""
+        p = self.params
+        entries = self.n_ports * self.lanes * p.depth
+        bits = entries * p.link_w
+        if p.ingress == "voq":
+            ptr = max(1, ceil(log2(p.depth)))
+            bits += entries * ptr + self.n_ports * self.lanes * self.n_ports * 2 * ptr  # next pointers, head/tail
+        return bits
+
+    def arrive(self, port: int, pkt: Packet, idx: int, lane: int) -> None:
+        now = self.events.now
+        ing = self.ingress[port][lane]
+        if idx == 0:
+            out, out_lane = self.route(self.node, pkt)
+            q = ing.tail = ing.queues[out if len(ing.queues) > 1 else 0]
+            q.entries.append(_Entry(pkt, out, out_lane))
+        else:
+            q = ing.tail
+        q.flits.append((pkt, idx))
+        ing.held += 1
+        ing.peak = max(ing.peak, ing.held)
+        e = q.entries[-1]
+        e.arrived += 1
+        if e.arrived == (self.params.header_flits if self.params.cut_through else pkt.flits):
+            e.ready = now + self.params.route_latency
+            if e is q.entries[0]:
+                self.wake(e.ready)
+        elif e.granted:
+            self.outputs[e.out].wake(now)
+        self._hol(ing)
+
+    # --- Allocation ---
+    def _requests(self, now: int) -> Dict[Tuple[int, int], List[_Request]]:
+        """Ready, ungranted head packets by the free (output, lane) they ask for."""
+        reqs: Dict[Tuple[int, int], List[_Request]] = {}
+        for port in self.ingress:
+            for ing in port:
+                if not ing.held:
+                    continue
+                for q in ing.queues:
+                    if not q.entries:
+                        continue
+                    e = q.entries[0]
+                    if (not e.granted and e.ready is not None and e.ready <= now
+                            and self.outputs[e.out].alloc[e.lane] is None):
+                        reqs.setdefault((e.out, e.lane), []).append((ing, q, e))
+        return reqs
+
+    def _pick(self, out: Output, lane: int, reqs: List[_Request]) -> _Request:
+        n = self.n_ports
+        ptr = out.rr_port[lane]
+        if self.params.arbiter == "priority":
+            prio = self.params.prio
+            return min(reqs, key=lambda r: (r[2].packet.dst not in prio, (r[0].port - ptr) % n, r[0].lane))
+        return min(reqs, key=lambda r: ((r[0].port - ptr) % n, r[0].lane))
+
+    def _grant(self, out: Output, lane: int, req: _Request, now: int, move: bool = True) -> None:
+        ing, q, e = req
+        e.granted = True
+        e.packet.wait += now - e.ready
+        out.alloc[lane] = (ing, q)
+        if move:
+            out.rr_port[lane] = (ing.port + 1) % self.n_ports
+        ing.grants += 1
+        self._hol(ing)
+        out.wake(now)
+
+    def _serve(self) -> None:
+        now = self.events.now
+        reqs = self._requests(now)
+        if not reqs:
+            return
+        if self.params.arbiter != "islip":
+            for (o, lane), rs in reqs.items():
+                out = self.outputs[o]
+                self._grant(out, lane, self._pick(out, lane, rs), now)
+            return
+        n = self.n_ports
+        for it in range(self.params.islip_iters):
+            grants: Dict[Ingress, List[Tuple[Output, int, _Request]]] = {}
+            for (o, lane), rs in reqs.items():
+                out = self.outputs[o]
+                rs = [r for r in rs if not r[0].grants]
+                if rs:
+                    r = self._pick(out, lane, rs)
+                    grants.setdefault(r[0], []).append((out, lane, r))
+            if not grants:
+                break
+            for offers in grants.values():
+                ing = offers[0][2][0]
+                out, lane, r = min(offers, key=lambda g: ((g[0].port - ing.rr_out) % n, g[1]))
+                self._grant(out, lane, r, now, move=it == 0)
+                if it == 0:
+                    ing.rr_out = (out.port + 1) % n
+                del reqs[(out.port, lane)]
+
+    # --- Outputs ---
+    def serve(self, out: Output) -> None:
+        now = self.events.now
+        link = out.link
+        if link.busy_until > now:
+            out.wake(link.busy_until)
+            return
+        lanes = self.lanes
+        if self.params.arbiter == "priority":
+            order = self._order
+        else:
+            order = [(out.rr_vc + k) % lanes for k in range(lanes)]
+        retry = False
+        for lane in order:
+            a = out.alloc[lane]
+            if a is None:
+                continue
+            ing, q = a
+            if not q.flits or q.flits[0][0] is not q.entries[0].packet or not link.credits[lane]:
+                continue  # an arrival or a credit wakes us
+            p = ing.port
+            if self.in_busy[p] > now:
+                retry = True
+                continue
+            pkt, idx = q.flits.popleft()
+            ing.held -= 1
+            self.in_links[p].free(ing.lane)
+            self.in_busy[p] = now + 1
+            link.send(pkt, idx, lane)
+            if idx == pkt.flits - 1:
+                out.alloc[lane] = None
+                ing.grants -= 1
+                q.entries.popleft()
+                if q.entries and q.entries[0].ready is not None:
+                    self.wake(max(q.entries[0].ready, now + 1))
+                self.wake(now + 1)  # the output lane is free again
+                self._hol(ing)
+            out.rr_vc = lane + 1
+            out.wake(now + 1)
+            return
+        if retry:
+            out.wake(now + 1)
+
+    def _hol(self, ing: Ingress) -> None:
+        blocked = False
+        if len(ing.queues) == 1 and ing.queues[0].entries:
+            q = ing.queues[0]
+            e = q.entries[0]
+            if not e.granted and e.ready is not None:
+                if len(q.entries) > 1:
+                    nxt = q.entries[1].packet
+                else:
+                    nxt = self.in_links[ing.port].sender.next_packet(ing.lane, e.packet)
+                blocked = nxt is not None and self.route(self.node, nxt)[0] != e.out
+        if blocked and ing.hol_since is None:
+            ing.hol_since = self.events.now
+        elif not blocked and ing.hol_since is not None:
+            ing.hol += self.events.now - ing.hol_since
+            ing.hol_since = None
+
+
+# --- Fabric ----------------------------------------------------------------------
+def percentile(values: List[int], q: float) -> int:
+    """Nearest-rank percentile of sorted `values` (0 if empty)."""
+    if not values:
+        return 0
+    return values[max(0, ceil(q / 100 * len(values)) - 1)]
+
+
+@dataclass
+class Report:
+    params: FabricParams
+    cycles: int  # measurement window
+    offered: int  # packets created in the window
+    delivered: int  # of those, delivered by the end of the run
+    offered_load: float  # flits per cycle per port
+    throughput: float  # flits delivered per cycle per port
+    latency: List[int] = field(default_factory=list)  # sorted, created -> delivered
+    network: List[int] = field(default_factory=list)  # sorted, injected -> delivered
+    mean_wait: float = 0.0  # cycles a ready packet waited for its output
+    hol: List[float] = field(default_factory=list)  # per module: share of the window its most blocked FIFO was HoL blocked
+    utilisation: List[float] = field(default_factory=list)  # per endpoint delivery link
+    peak_fifo: List[int] = field(default_factory=list)  # per module: most flits held by one ingress buffer
+    buffer_bits: int = 0  # switch ingress storage
+    events: int = 0
+
+    def p(self, q: float, network: bool = False) -> int:
+        return percentile(self.network if network else self.latency, q)
+
+    def write(self, fp: TextIO, per_port: bool = False) -> None:
+        pr = self.params
+        fp.write(f"{pr.n_ports} ports, LINK_W={pr.link_w}, depth {pr.depth} ({pr.credits} credits, CR_W={pr.cr_w}), "
+                 f"{pr.vcs} VCs, {'cut-through' if pr.cut_through else 'store-and-forward'}\n")
+        fp.write(f"{pr.topology}, {pr.ingress} ingress ({self.buffer_bits} bits), {pr.arbiter} arbiter\n")
+        fp.write(f"{self.cycles} cycles, {self.events} events: {self.delivered}/{self.offered} packets delivered\n")
+        fp.write(f"offered {self.offered_load:.3f}  accepted {self.throughput:.3f} flits/cycle/port\n")
+        fp.write(f"latency p50 {self.p(50)}  p90 {self.p(90)}  p99 {self.p(99)}  max {self.p(100)}  "
+                 f"(network p50 {self.p(50, True)}  p99 {self.p(99, True)}), mean output wait {self.mean_wait:.1f}\n")
+        if per_port:
+            fp.write("; MODULE  UTIL   HOL%  PEAK_FIFO\n")
+            for port, (u, h, pk) in enumerate(zip(self.utilisation, self.hol, self.peak_fifo)):
+                fp.write(f"{port:8} {u:5.3f} {100 * h:6.2f} {pk:10}\n")
+
+
+class Fabric:
+    """Endpoints and switches of one topology, wired with credit-based links."""
+
+    def __init__(self, params: Optional[FabricParams] = None) -> None:
+        self.params = p = params if params is not None else FabricParams()
+        self.events = EventQueue()
+        n = p.n_ports
+        if p.topology == "star":
+            self.switches = [Switch(self.events, p, 0, n, lambda node, pkt: (pkt.dst % n, pkt.vc))]
+            attach = [(self.switches[0], port) for port in range(n)]
+        else:
+            self.switches = [Switch(self.events, p, node, 3, self._ring_route) for node in range(n)]
+            attach = [(sw, LOCAL) for sw in self.switches]
+            for node, sw in enumerate(self.switches):
+                self._connect(sw, RIGHT, self.switches[(node + 1) % n], LEFT)
+                self._connect(self.switches[(node + 1) % n], LEFT, sw, RIGHT)
+        self.endpoints = [Endpoint(self.events, p, port) for port in range(n)]
+        for ep, (sw, port) in zip(self.endpoints, attach):
+            up = Link(self.events, p, lambda pkt, idx, lane, sw=sw, port=port: sw.arrive(port, pkt, idx, lane),
+                      p.lanes)
+            up.sender = ep
+            ep.on_queue = lambda vc, sw=sw, port=port: sw._hol(sw.ingress[port][vc])
+            ep.tx = sw.in_links[port] = up
+            out = sw.outputs[port]
+            down = Link(self.events, p, ep.arrive, p.lanes)
+            down.sender = out
+            ep.rx = out.link = down
+        self._attach = attach
+        self.packets: List[Packet] = []
+        self._window = (0, 0)
+
+    def _connect(self, a: Switch, out: int, b: Switch, port: int) -> None:
+        link = Link(self.events, self.params, lambda pkt, idx, lane: b.arrive(port, pkt, idx, lane), a.lanes)
+        link.sender = a.outputs[out]
+        a.outputs[out].link = b.in_links[port] = link
+
+    def _ring_route(self, node: int, pkt: Packet) -> Tuple[int, int]:
+        """Shorter way round (ties right); the upper lane once past the dateline."""
+        n = self.params.n_ports
+        if pkt.dst == node:
+            return LOCAL, pkt.vc
+        right = (pkt.dst - node) % n <= n // 2
+        nxt = (node + 1) % n if right else (node - 1) % n
+        wrapped = nxt < pkt.src if right else nxt > pkt.src
+        return (RIGHT if right else LEFT), pkt.vc + self.params.vcs * wrapped
+
+    def _module_ingress(self) -> List[List[Ingress]]:
+        """Ingress buffers per module: its star port, or its whole ring switch."""
+        if self.params.topology == "star":
+            return [sw.ingress[port] for sw, port in self._attach]
+        return [[ing for port in sw.ingress for ing in port] for sw in self.switches]
+
+    def offer(self, pkt: Packet) -> None:
+        p = self.params
+        if not (0 <= pkt.src < p.n_ports and 0 <= pkt.dst < p.n_ports):
+            raise ValueError(f"packet {pkt.src}->{pkt.dst}: modules must be 0..{p.n_ports - 1}")
+        if not 0 <= pkt.vc < p.vcs:
+            raise ValueError(f"packet on VC {pkt.vc}, fabric has {p.vcs}")
+        pkt.flits = p.flits(pkt.nbytes)
+        if not p.cut_through and pkt.flits > p.credits:
+            raise ValueError(f"store-and-forward needs the whole packet in the FIFO: {pkt.flits} flits > "
+                             f"{p.credits} credits")
+        self.packets.append(pkt)
+        self.endpoints[pkt.src].offer(pkt)
+
+    def run(self, traffic: Iterable[Packet], cycles: Optional[int] = None, warmup: int = 0) -> Report:
+        """Offer `traffic` (in `created` order) and simulate.
+
+        With `cycles` the run stops there; otherwise it goes until every
+        packet is delivered. Statistics cover packets created from `warmup`
+        on and, for throughput, utilisation and HoL, the cycles from
+        `warmup` to the end.
+        """
+        it = iter(traffic)
+        last = [0]
+
+        def feed(pkt: Packet) -> None:
+            if pkt.created < last[0]:
+                raise ValueError(f"traffic is not in time order at cycle {pkt.created}")
+            last[0] = pkt.created
+            self.offer(pkt)
+            nxt = next(it, None)
+            if nxt is not None:
+                self.events.at(nxt.created, feed, nxt)
+
+        first = next(it, None)
+        if first is not None:
+            self.events.at(first.created, feed, first)
+        if warmup:
+            self.events.at(warmup, self._reset_counters)
+        end = self.events.run(cycles)
+        return self.report(warmup, end)
+
+    def _reset_counters(self) -> None:
+        now = self.events.now
+        for ep in self.endpoints:
+            ep.received = 0
+            ep.rx.flits = 0
+        for sw in self.switches:
+            for port in sw.ingress:
+                for q in port:
+                    q.hol = 0
+                    if q.hol_since is not None:
+                        q.hol_since = now
+
+    def report(self, start: int, end: int) -> Report:
+        p = self.params
+        window = max(1, end - start)
+        pkts = [pk for pk in self.packets if start <= pk.created < end]
+        done = [pk for pk in pkts if pk.delivered is not None]
+        hol = []
+        for port in self._module_ingress():
+            blocked = max(q.hol + (end - q.hol_since if q.hol_since is not None else 0) for q in port)
+            hol.append(blocked / window)
+        return Report(
+            params=p, cycles=window, offered=len(pkts), delivered=len(done),
+            offered_load=sum(pk.flits for pk in pkts) / window / p.n_ports,
+            throughput=sum(ep.received for ep in self.endpoints) / window / p.n_ports,
+            latency=sorted(pk.delivered - pk.created for pk in done),
+            network=sorted(pk.delivered - pk.injected for pk in done),
+            mean_wait=sum(pk.wait for pk in done) / len(done) if done else 0.0,
+            hol=hol,
+            utilisation=[ep.rx.flits / window for ep in self.endpoints],
+            peak_fifo=[max(q.peak for q in port) for port in self._module_ingress()],
+            buffer_bits=sum(sw.buffer_bits() for sw in self.switches),
+            events=self.events.events,
+        )
@@ -0,0 +1,469 @@
+"""Multi-module co-simulation: Amber firmware on every module, enid between them.
+
+Every module runs in its own process: an Amber ISS (`Machine`) with the
+unit-ada endpoint (`EnidPort`) on its CSR bus. A switch process stands in
+for board-ivy. Modules and switch talk over `transport` channels (Unix
+sockets or shared-memory rings) carrying `codec` frames.
+
+Time is in core cycles, one per ISA instruction; stalled cycles count too.
+Modules run in lock-step quanta of `quantum` cycles: a module runs a
+quantum, sends the frames it produced (stamped with their send cycle) and
+a SYNC, and waits for GO. Once every module has synced, the switch works
+out each frame's arrival cycle, `latency` plus its serialisation over an
+output of `link_w` bits per cycle (frames queue per output in send order),
+forwards the frames and sends GO. A module delivers a frame to its EP at
+that cycle. With `latency >= quantum` every frame arrives in a later
+quantum, so the run is exact and deterministic whatever the process
+scheduling; a shorter latency is rounded up to the next quantum (`late`).
+
+The EP's CSR window (0x050-0x05C; the RTL has no enid CSRs yet, see
+`examples/enid_csr.asm`) implements the `spec.md` request/response
+channels with their ready/valid handshakes as core stalls:
+
+    ENID_DEST     W  [3:0] dest_mod, [5:4] dest_sub
+    ENID_ADDR_LO  W  addr[23:0] (word address in the target's data memory)
+    ENID_ADDR_HI  W  addr[35:24]
+    ENID_TAG      W  msg_class[7:0], msg_tag[15:8]
+    ENID_WDATA    W  queue a write/message data word (3 bytes on the wire)
+    ENID_REQ      W  send: [1:0] type (0 mem, 1 msg), [3:2] op (0 RD, 1 WR),
+                     [15:4] words to read; stalls while a request is open
+    ENID_RSP      R  [1:0] status (0 OK, 1 ERR, 2 RETRY), [23:8] words;
+                     stalls until the open request is answered
+    ENID_RDATA    R  next read data word of the response
+    ENID_RX       R  take the next received message: [7:0] class,
+                     [13:8] source (mod << 2 | sub), [23:14] words;
+                     stalls until one is queued
+    ENID_RX_DATA  R  next word of that message
+    ENID_STATUS   R  [0] request open, [1] message queued, [23:8] queued
+    ENID_ID       R  this module (mod << 2)
+    ENID_RX_TAG   R  msg_tag of the taken message
+
+Remote mem requests are served by the target EP without its core, after
+`ep_latency` cycles, also once its firmware has halted. A message is
+acknowledged once the target EP queues it, or refused (RETRY) when
+`rx_depth` messages are already waiting. One request is open per module.
+
+The run ends when no frames are in flight and every core has halted or is
+stalled on its EP (`deadlock` if any is stalled), or at `max_cycles`.
+"""
+from __future__ import annotations
+
+import heapq
+import json
+import multiprocessing
+import struct
+import time
+from dataclasses import asdict, dataclass, field
+from math import ceil
+from typing import Dict, List, Optional, Sequence, TextIO, Tuple
+
+from processors.amber.sim import farm, isa
+from processors.amber.sim.iss import Machine
+
+from . import codec, transport
+from .fabric import MAX_MODULES, percentile
+from .transport import REC_FRAME, REC_GO, REC_STATS, REC_STOP, REC_SYNC, Channel
+
+# CSR window (examples/enid_csr.asm)
+ENID_DEST = 0x050
+ENID_ADDR_LO = 0x051
+ENID_ADDR_HI = 0x052
+ENID_TAG = 0x053
+ENID_WDATA = 0x054
+ENID_REQ = 0x055
+ENID_RSP = 0x056
+ENID_RDATA = 0x057
+ENID_RX = 0x058
+ENID_RX_DATA = 0x059
+ENID_STATUS = 0x05A
+ENID_ID = 0x05B
+ENID_RX_TAG = 0x05C
+
+RSP_OK, RSP_ERR, RSP_RETRY = 0, 1, 2
+VC_CTRL, VC_DATA = 0, 1
+WORD_BYTES = 3  # a 24-bit word on the wire
+
+# SYNC status bits
+SYNC_HALTED = 1
+SYNC_STALLED = 2
+SYNC_BUSY = 4  # frames waiting in the module (inbox or EP)
+
+_STAMP = struct.Struct(">Q")  # send cycle ahead of every frame record
+_CSRRD, _CSRWR = isa.OPC["CSRRD"], isa.OPC["CSRWR"]
+
+
+@dataclass
+class SystemParams:
+    quantum: int = 32  # cycles between module syncs
+    latency: int = 32  # cycles from source EP to destination EP, before serialisation
+    link_w: int = 16  # switch output bits per cycle
+    ep_latency: int = 4  # cycles for an EP to answer a remote mem request
+    rx_depth: int = 16  # messages an EP queues for its core
+    max_cycles: int = 1_000_000
+    transport: str = "socket"
+    pay_crc: bool = False
+
+    def __post_init__(self) -> None:
+        for name in ("quantum", "latency", "link_w", "rx_depth", "max_cycles"):
+            if getattr(self, name) < 1:
+                raise ValueError(f"{name} must be at least 1")
+        if self.ep_latency < 0:
+            raise ValueError("ep_latency must not be negative")
+        if self.transport not in transport.TRANSPORTS:
+            raise ValueError(f"unknown transport '{self.transport}' (one of {', '.join(transport.TRANSPORTS)})")
+
+
+def _words_to_bytes(words: Sequence[int]) -> bytes:
+    return b"".join((w & 0xFFFFFF).to_bytes(WORD_BYTES, "big") for w in words)
+
+
+def _bytes_to_words(data) -> List[int]:
+    data = bytes(data)
+    return [int.from_bytes(data[k:k + WORD_BYTES], "big") for k in range(0, len(data) - WORD_BYTES + 1, WORD_BYTES)]
+
+
+# --- Endpoint ----------------------------------------------------------------
+@dataclass
+class _Message:
+    src: int  # mod << 2 | sub
+    msg_class: int
+    tag: int
+    words: List[int]
+    sent: int
+    arrived: int
+
+
+class EnidPort:
+    """unit-ada's enid EP as the core sees it: a CSR window with stalls."""
+
+    def __init__(self, module: int, params: SystemParams, machine: Machine) -> None:
+        self.module = module
+        self.params = params
+        self.m = machine
+        self.now = 0
+        self.outbox: List[Tuple[int, bytes]] = []  # (send cycle, frame)
+        self._dest = 0
+        self._addr = 0
+        self._tag = 0
+        self._wdata: List[int] = []
+        self._seq = 0
+        self.open: Optional[Tuple[int, int, int]] = None  # (seq, issue cycle, dest_mod)
+        self._rsp = (RSP_ERR, [])  # status, read words
+        self._rdata: List[int] = []
+        self.rx: List[_Message] = []
+        self._cur: Optional[_Message] = None
+        self._cur_data: List[int] = []
+        # statistics
+        self.requests = 0
+        self.rtt: List[int] = []
+        self.msg_network: List[int] = []  # send -> EP queue
+        self.msg_core: List[int] = []  # send -> taken by the core
+        self.retries = 0
+        self.served = 0  # remote mem requests answered
+        self.stall_cycles = 0
+        w, r = machine.csr_write_hooks, machine.csr_read_hooks
+        w[ENID_DEST] = lambda v: setattr(self, "_dest", v & 0x3F)
+        w[ENID_ADDR_LO] = lambda v: setattr(self, "_addr", (self._addr & ~0xFFFFFF) | v)
+        w[ENID_ADDR_HI] = lambda v: setattr(self, "_addr", (self._addr & 0xFFFFFF) | (v & 0xFFF) << 24)
+        w[ENID_TAG] = lambda v: setattr(self, "_tag", v & 0xFFFF)
+        w[ENID_WDATA] = self._wdata.append
+        w[ENID_REQ] = self._request
+        r[ENID_RSP] = lambda: self._rsp[0] | len(self._rsp[1]) << 8
+        r[ENID_RDATA] = lambda: self._rdata.pop(0) if self._rdata else 0
+        r[ENID_RX] = self._take
+        r[ENID_RX_DATA] = lambda: self._cur_data.pop(0) if self._cur_data else 0
+        r[ENID_STATUS] = lambda: (self.open is not None) | bool(self.rx) << 1 | min(len(self.rx), 0xFFFF) << 8
+        r[ENID_ID] = lambda: module << 2
+        r[ENID_RX_TAG] = lambda: self._cur.tag if self._cur is not None else 0
+        machine.clock = lambda: self.now
+
+    # --- core side ---
+    def stalled(self) -> bool:
+        """Whether the next instruction waits on a handshake (req_ready/rsp_valid/RX)."""
+        m = self.m
+        w = m.imem[m.pc % isa.MEM_WORDS]
+        opc, idx = isa.opc_of(w), w & 0xFFF
+        if opc == _CSRWR:
+            return idx == ENID_REQ and self.open is not None
+        if opc == _CSRRD:
+            return (idx == ENID_RSP and self.open is not None) or (idx == ENID_RX and not self.rx)
+        return False
+
+    def _frame(self, ptype: int, dest: int, length: int, seq: int, vc: int, **body) -> None:
+        flags = codec.FLAG_PAY_CRC if self.params.pay_crc else 0
+        h = codec.Header(ptype, dest >> 2, dest & 3, self.module, 0, length, seq, vc, flags)
+        self.outbox.append((self.now, codec.Frame(h, **body).encode()))
+
+    def _request(self, v: int) -> None:
+        ptype, op, words = v & 3, (v >> 2) & 3, (v >> 4) & 0xFFF
+        data, self._wdata[:] = list(self._wdata), []
+        self._seq = (self._seq + 1) & 0xFF
+        if ptype == codec.PT_MEM and op == codec.MEM_RD:
+            self._frame(ptype, self._dest, words * WORD_BYTES, self._seq, VC_DATA, op=op, addr=self._addr)
+        elif ptype == codec.PT_MEM:
+            self._frame(ptype, self._dest, len(data) * WORD_BYTES, self._seq, VC_DATA, op=codec.MEM_WR,
+                        addr=self._addr, data=_words_to_bytes(data))
+        elif ptype == codec.PT_MSG:
+            self._frame(ptype, self._dest, len(data) * WORD_BYTES, self._seq, VC_DATA,
+                        msg_class=self._tag & 0xFF, msg_tag=self._tag >> 8, data=_words_to_bytes(data))
+        else:
+            self._rsp = (RSP_ERR, [])
+            return
+        self.open = (self._seq, self.now, self._dest >> 2)
+        self.requests += 1
+
+    def _take(self) -> int:
+        if not self.rx:
+            return 0
+        msg = self._cur = self.rx.pop(0)
+        self._cur_data = list(msg.words)
+        self.msg_core.append(self.now - msg.sent)
+        return msg.msg_class | msg.src << 8 | min(len(msg.words), 0x3FF) << 14
+
+    # --- fabric side ---
+    def deliver(self, frame: bytes, sent: int) -> None:
+        """Handle a frame that reached this EP at `now`."""
+        f = codec.decode(frame)
+        src = f.src_mod << 2 | f.src_sub
+        t = f.type
+        if t in (codec.PT_ACK, codec.PT_NACK):
+            if self.open is not None and f.seq == self.open[0] and f.src_mod == self.open[2]:
+                status = RSP_OK if t == codec.PT_ACK else RSP_RETRY
+                self._rsp = (status, _bytes_to_words(f.data))
+                self._rdata = list(self._rsp[1])
+                self.rtt.append(self.now - self.open[1])
+                self.retries += status == RSP_RETRY
+                self.open = None
+            return
+        reply = self.now + self.params.ep_latency
+        if t == codec.PT_MEM:
+            mem = self.m.dmem
+            if f.op == codec.MEM_RD:
+                words = [mem[(f.addr + k) % isa.MEM_WORDS] for k in range(f.length // WORD_BYTES)]
+                data = _words_to_bytes(words)
+            else:
+                for k, w in enumerate(_bytes_to_words(f.data)):
+                    mem[(f.addr + k) % isa.MEM_WORDS] = w
+                data = b""
+            self.served += 1
+            self._answer(codec.PT_ACK, src, f.seq, reply, data)
+        elif t == codec.PT_MSG:
+            if len(self.rx) >= self.params.rx_depth:
+                self._answer(codec.PT_NACK, src, f.seq, self.now)
+                return
+            self.rx.append(_Message(src, f.msg_class, f.msg_tag, _bytes_to_words(f.data), sent, self.now))
+            self.msg_network.append(self.now - sent)
+            self._answer(codec.PT_ACK, src, f.seq, self.now)
+
+    def _answer(self, ptype: int, dest: int, seq: int, at: int, data: bytes = b"") -> None:
+        flags = codec.FLAG_PAY_CRC if self.params.pay_crc else 0
+        h = codec.Header(ptype, dest >> 2, dest & 3, self.module, 0, len(data), seq, VC_CTRL, flags)
+        self.outbox.append((at, codec.Frame(h, data=data).encode()))
+
+
+# --- Module process -------------------------------------------------------------
+def _summary(values: List[int]) -> Dict[str, float]:
+    v = sorted(values)
+    return {"count": len(v), "mean": sum(v) / len(v) if v else 0.0,
+            "p50": percentile(v, 50), "p99": percentile(v, 99), "max": v[-1] if v else 0}
+
+
+def _module(index: int, program: str, segments, params: SystemParams, chan: Channel) -> None:
+    m = Machine()
+    for origin, words in segments:
+        m.load_words(words, origin)
+    ep = EnidPort(index, params, m)
+    inbox: List[Tuple[int, int, int, bytes]] = []  # (arrival, order, sent, frame)
+    order = 0
+    frames_rx = frames_tx = bytes_tx = 0
+    busy = 0.0
+    error = None
+    try:
+        while True:
+            kind, t, payload = chan.recv()
+            if kind == REC_FRAME:
+                heapq.heappush(inbox, (t, order, _STAMP.unpack_from(payload)[0], payload[_STAMP.size:]))
+                order += 1
+                continue
+            if kind == REC_STOP:
+                break
+            # REC_GO: run up to cycle t
+            start = time.perf_counter()
+            end = t
+            while ep.now < end:
+                while inbox and inbox[0][0] <= ep.now:
+                    _, _, sent, frame = heapq.heappop(inbox)
+                    frames_rx += 1
+                    ep.deliver(frame, sent)
+                if not m.halted and not ep.stalled():
+                    m.step()
+                    ep.now += 1
+                    continue
+                skip = min(end, inbox[0][0]) if inbox else end
+                if not m.halted:
+                    ep.stall_cycles += skip - ep.now
+                ep.now = skip
+            for at, frame in ep.outbox:
+                chan.send(REC_FRAME, at, _STAMP.pack(at) + frame)
+                frames_tx += 1
+                bytes_tx += len(frame)
+            ep.outbox.clear()
+            busy += time.perf_counter() - start
+            status = (SYNC_HALTED * m.halted | SYNC_STALLED * (not m.halted and ep.stalled())
+                      | SYNC_BUSY * bool(inbox))
+            chan.send(REC_SYNC, ep.now, bytes([status]))
+    except Exception as e:  # reported through the switch; the run stops
+        error = f"{type(e).__name__}: {e}"
+    stats = {
+        "module": index, "program": program, "error": error,
+        "instructions": m.steps, "cycles": ep.now, "halted": m.halted,
+        "stalled": not m.halted and ep.stalled(), "stall_cycles": ep.stall_cycles,
+        "pc": m.pc, "dr": list(m.gp), "requests": ep.requests, "retries": ep.retries,
+        "served": ep.served, "frames_tx": frames_tx, "frames_rx": frames_rx, "bytes_tx": bytes_tx,
+        "rtt": _summary(ep.rtt), "msg_network": _summary(ep.msg_network), "msg_core": _summary(ep.msg_core),
+        "cpu_seconds": busy,
+    }
+    try:
+        chan.send(REC_STATS, ep.now, json.dumps(stats).encode())
+    except OSError:
+        pass
+    chan.close()
+
+
+# --- Switch process -------------------------------------------------------------
+def _switch(params: SystemParams, chans: Sequence[Channel], results) -> None:
+    n = len(chans)
+    live = [True] * n
+    stats: List[Optional[dict]] = [None] * n
+    status = [0] * n
+    out_free = [0] * n  # cycle each switch output is done with its last frame
+    now = 0
+    frames = nbytes = late = unroutable = quanta = 0
+    state = "max_cycles"
+    start = time.perf_counter()
+    while now < params.max_cycles:
+        now = min(now + params.quantum, params.max_cycles)
+        for c in chans:
+            c.send(REC_GO, now)
+        quanta += 1
+        pending: List[Tuple[int, int, bytes]] = []  # (send cycle, source, record payload)
+        for i, c in enumerate(chans):
+            while live[i]:
+                kind, t, payload = c.recv()
+                if kind == REC_FRAME:
+                    pending.append((t, i, payload))
+                elif kind == REC_SYNC:
+                    status[i] = payload[0]
+                    break
+                elif kind == REC_STATS:  # the module failed
+                    stats[i] = json.loads(payload)
+                    live[i] = False
+        if not all(live):
+            state = "error"
+            break
+        pending.sort(key=lambda p: (p[0], p[1]))
+        for t, src, payload in pending:
+            frame = payload[_STAMP.size:]
+            f = codec.decode(frame)
+            dest = f.dest_mod
+            if dest >= n:  # nobody in that slot: refuse in its place
+                unroutable += 1
+                h = codec.Header(codec.PT_NACK, f.src_mod, f.src_sub, dest, f.dest_sub, 0, f.seq, VC_CTRL)
+                frame = codec.Frame(h).encode()
+                payload = _STAMP.pack(t) + frame
+                dest = src
+            arrival = max(t + params.latency, out_free[dest]) + ceil(8 * len(frame) / params.link_w)
+            out_free[dest] = arrival
+            if arrival < now:
+                late += 1
+                arrival = now
+            chans[dest].send(REC_FRAME, arrival, payload)
+            frames += 1
+            nbytes += len(frame)
+        if not pending and all(s & (SYNC_HALTED | SYNC_STALLED) and not s & SYNC_BUSY for s in status):
+            state = "deadlock" if any(s & SYNC_STALLED for s in status) else "halted"
+            break
+    wall = time.perf_counter() - start
+    for i, c in enumerate(chans):
+        if live[i]:
+            c.send(REC_STOP, now)
+    for i, c in enumerate(chans):
+        while stats[i] is None:
+            kind, _, payload = c.recv()
+            if kind == REC_STATS:
+                stats[i] = json.loads(payload)
+        c.close()
+    results.put({"state": state, "cycles": now, "quanta": quanta, "frames": frames, "bytes": nbytes,
+                 "late": late, "unroutable": unroutable, "wall_seconds": wall, "modules": stats})
+
+
+# --- System ----------------------------------------------------------------------
+@dataclass
+class SystemReport:
+    params: SystemParams
+    state: str  # halted, deadlock, max_cycles or error
+    cycles: int
+    quanta: int
+    frames: int  # through the switch
+    bytes: int
+    late: int  # frames delivered later than modelled (latency < quantum)
+    unroutable: int
+    wall_seconds: float
+    modules: List[dict] = field(default_factory=list)
+
+    @property
+    def instructions(self) -> int:
+        return sum(mod["instructions"] for mod in self.modules)
+
+    def to_json(self) -> Dict[str, object]:
+        return asdict(self)
+
+    def write(self, fp: TextIO) -> None:
+        p = self.params
+        fp.write(f"{len(self.modules)} modules over {p.transport}, quantum {p.quantum}, latency {p.latency}, "
+                 f"LINK_W={p.link_w}: {self.state} at cycle {self.cycles} ({self.quanta} quanta)\n")
+        rate = self.instructions / self.wall_seconds if self.wall_seconds else 0.0
+        fp.write(f"{self.instructions} instructions in {self.wall_seconds:.3f} s ({rate:,.0f} instr/s), "
+                 f"{self.frames} frames / {self.bytes} bytes switched, {self.late} late, "
+                 f"{self.unroutable} unroutable\n")
+        fp.write("; MOD  INSTR    CYCLES  STALL  STATE    REQ  RTT_P50 RTT_P99  MSG_RX NET_P50 CORE_P50  "
+                 "SERVED  PROGRAM\n")
+        for mod in self.modules:
+            state = ("error" if mod["error"] else "halted" if mod["halted"]
+                     else "stalled" if mod["stalled"] else "running")
+            rtt, net, core = mod["rtt"], mod["msg_network"], mod["msg_core"]
+            fp.write(f"{mod['module']:5} {mod['instructions']:6} {mod['cycles']:9} {mod['stall_cycles']:6}  "
+                     f"{state:8} {mod['requests']:4} {rtt['p50']:8} {rtt['p99']:7} {net['count']:7} "
+                     f"{net['p50']:7} {core['p50']:8} {mod['served']:7}  {mod['program']}\n")
+            if mod["error"]:
+                fp.write(f"      error: {mod['error']}\n")
+
+
+def run(programs: Sequence[str], params: Optional[SystemParams] = None) -> SystemReport:
+    """Run `programs[i]` on module i (`.asm`, `.skald`, `.hex`) until the system settles."""
+    params = params if params is not None else SystemParams()
+    if not 1 <= len(programs) <= MAX_MODULES:
+        raise ValueError(f"a system has 1 to {MAX_MODULES} modules, got {len(programs)}")
+    images = [farm.build(p) for p in programs]
+    ctx = multiprocessing.get_context()
+    pairs = [transport.channel_pair(params.transport) for _ in programs]
+    results = ctx.SimpleQueue()
+    procs = [ctx.Process(target=_module, args=(i, prog, img, params, a), daemon=True)
+             for i, (prog, img, (a, _, _)) in enumerate(zip(programs, images, pairs))]
+    procs.append(ctx.Process(target=_switch, args=(params, [b for _, b, _ in pairs], results), daemon=True))
+    try:
+        for proc in procs:
+            proc.start()
+        for a, b, _ in pairs:  # the children hold their own ends
+            a.close()
+            b.close()
+        rep = results.get()
+        for proc in procs:
+            proc.join()
+    finally:
+        for proc in procs:
+            if proc.is_alive():
+                proc.terminate()
+        for _, _, cleanup in pairs:
+            cleanup()
+    return SystemReport(params=params, **rep)
@@ -0,0 +1,111 @@
+"""Traffic for the fabric model: synthetic patterns and recorded traces.
+
+`synthetic` draws packets per source with geometric gaps, so each source
+offers `load` flits per cycle on average, and merges the sources in time
+order. Destinations follow a pattern:
+
+- `uniform`: any other module;
+- `neighbour`: the next module up (wrapping);
+- `permutation`: a fixed derangement drawn from the seed;
+- `hotspot`: `hot_frac` of the packets to module `hot`, the rest uniform.
+
+Recorded traces are text, one packet per line, in cycle order:
+
+    ; CYCLE SRC DST [VC [BYTES]]
+    0     0   3   1   64
+    12    2   3
+
+VC defaults to 1 (data) and BYTES to 32; `;` starts a comment.
+"""
+from __future__ import annotations
+
+import heapq
+import random
+from math import log1p
+from typing import Iterable, Iterator, List, Sequence, TextIO
+
+from .fabric import FabricParams, Packet
+
+PATTERNS = ("uniform", "neighbour", "permutation", "hotspot")
+
+
+def _derangement(n: int, rng: random.Random) -> List[int]:
+    while True:
+        perm = list(range(n))
+        rng.shuffle(perm)
+        if all(i != d for i, d in enumerate(perm)):
+            return perm
+
+
+def _source(params: FabricParams, src: int, pattern: str, load: float, sizes: Sequence[int],
+            cycles: int, rng: random.Random, perm: List[int], ctrl: float, hot: int,
+            hot_frac: float) -> Iterator[Packet]:
+    n = params.n_ports
+    mean_flits = sum(params.flits(b) for b in sizes) / len(sizes)
+    rate = load / mean_flits  # packets per cycle
+    scale = -1.0 / log1p(-rate) if rate < 1 else 0.0
+    t = 0
+    while True:
+        t += 1 + int(rng.expovariate(1.0) * scale)  # geometric gap: a Bernoulli(rate) trial per cycle
+        if t >= cycles:
+            return
+        if pattern == "neighbour":
+            dst = (src + 1) % n
+        elif pattern == "permutation":
+            dst = perm[src]
+        elif pattern == "hotspot" and src != hot and rng.random() < hot_frac:
+            dst = hot
+        else:
+            dst = rng.randrange(n - 1)
+            dst += dst >= src
+        vc = 0 if params.vcs == 1 or rng.random() < ctrl else 1 + rng.randrange(params.vcs - 1)
+        yield Packet(src, dst, vc, rng.choice(sizes), t)
+
+
+def synthetic(params: FabricParams, pattern: str = "uniform", load: float = 0.5,
+              sizes: Sequence[int] = (32,), cycles: int = 10_000, seed: int = 0, ctrl: float = 0.1,
+              hot: int = 0, hot_frac: float = 0.5) -> Iterator[Packet]:
+    """Packets created before `cycles`, offering `load` flits/cycle per source.
+
+    `ctrl` is the share of packets on VC 0; the rest spread over the data VCs.
+    """
+    if pattern not in PATTERNS:
+        raise ValueError(f"unknown traffic pattern '{pattern}' (one of {', '.join(PATTERNS)})")
+    if not 0 < load <= 1:
+        raise ValueError(f"load must be in (0, 1] flits per cycle, got {load}")
+    if not sizes:
+        raise ValueError("no packet sizes")
+    rng = random.Random(seed)
+    perm = _derangement(params.n_ports, rng)
+    sources = [_source(params, src, pattern, load, sizes, cycles, random.Random(rng.random()), perm,
+                       ctrl, hot % params.n_ports, hot_frac)
+               for src in range(params.n_ports)]
+    return heapq.merge(*sources, key=lambda pk: pk.created)
+
+
+def read_trace(lines: Iterable[str]) -> Iterator[Packet]:
+    """Packets of a recorded trace."""
+    for lineno, raw in enumerate(lines, start=1):
+        line = raw.split(";", 1)[0].strip()
+        if not line:
+            continue
+        try:
+            fields = [int(tok, 0) for tok in line.split()]
+            if not 3 <= len(fields) <= 5:
+                raise ValueError
+        except ValueError:
+            raise ValueError(f"bad trace line {lineno}: '{line}'") from None
+        cycle, src, dst, *rest = fields
+        vc = rest[0] if rest else 1
+        nbytes = rest[1] if len(rest) > 1 else 32
+        yield Packet(src, dst, vc, nbytes, cycle)
+
+
+def write_trace(packets: Iterable[Packet], fp: TextIO) -> int:
+    """Write `packets` in trace format; returns how many."""
+    fp.write("; CYCLE SRC DST VC BYTES\n")
+    n = 0
+    for pk in packets:
+        fp.write(f"{pk.created} {pk.src} {pk.dst} {pk.vc} {pk.nbytes}\n")
+        n += 1
+    return n
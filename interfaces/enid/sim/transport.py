@@ -0,0 +1,188 @@
+"""Record channels between co-simulation processes.
+
+A `Channel` is one end of a duplex, in-order stream of records:
+
+    kind u8 | time u64 | length u32 | payload (length bytes)
+
+`kind` is a `REC_*` code, `time` a cycle stamp and the payload usually an
+encoded frame (`codec`). Two implementations:
+
+- `socket_pair`: a Unix domain socket pair; blocking reads and writes.
+- `shm_pair`: two single-producer/single-consumer rings in one
+  `multiprocessing.shared_memory` block. Each ring has a read and a write
+  counter (8 bytes each, only ever advanced by their owner) followed by the
+  data area; records wrap around its end. A full or empty ring is waited
+  on by spinning with `sleep(0)` and then short sleeps, so idle processes
+  give the CPU up.
+
+Both kinds pass to child processes as `multiprocessing.Process` arguments;
+a shared-memory end re-attaches by name when pickled (spawn/forkserver).
+"""
+from __future__ import annotations
+
+import socket
+import struct
+import time
+from abc import ABC, abstractmethod
+from multiprocessing import resource_tracker, shared_memory
+from typing import Tuple
+
+TRANSPORTS = ("socket", "shm")
+
+REC_FRAME = 0  # payload: an encoded frame
+REC_SYNC = 1  # module -> switch: quantum done; payload: `SYNC` status
+REC_GO = 2  # switch -> module: run the next quantum
+REC_STOP = 3  # switch -> module: the system is done
+REC_STATS = 4  # module -> switch: final statistics (JSON)
+
+_REC = struct.Struct(">BQI")
+Record = Tuple[int, int, bytes]
+
+RING_BYTES = 1 << 20
+_SPIN = 200  # sleep(0) rounds before sleeping for real
+_NAP = 20e-6
+
+
+class Channel(ABC):
+    @abstractmethod
+    def send(self, kind: int, t: int, payload: bytes = b"") -> None:
+        ...
+
+    @abstractmethod
+    def recv(self) -> Record:
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+# --- Unix domain sockets -----------------------------------------------------
+class SocketChannel(Channel):
+    def __init__(self, sock: socket.socket) -> None:
+        self.sock = sock
+        self._rx = sock.makefile("rb")
+
+    def __getstate__(self):
+        return {"sock": self.sock}
+
+    def __setstate__(self, state) -> None:
+        self.__init__(state["sock"])
+
+    def send(self, kind: int, t: int, payload: bytes = b"") -> None:
+        self.sock.sendall(_REC.pack(kind, t, len(payload)) + payload)
+
+    def recv(self) -> Record:
+        head = self._rx.read(_REC.size)
+        if len(head) < _REC.size:
+            raise EOFError("channel closed")
+        kind, t, n = _REC.unpack(head)
+        payload = self._rx.read(n) if n else b""
+        if len(payload) < n:
+            raise EOFError("channel closed")
+        return kind, t, payload
+
+    def close(self) -> None:
+        self._rx.close()
+        self.sock.close()
+
+
+def socket_pair() -> Tuple[SocketChannel, SocketChannel]:
+    a, b = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+    return SocketChannel(a), SocketChannel(b)
+
+
+# --- Shared-memory rings ---------------------------------------------------------
+_U64 = struct.Struct("<Q")
+_RING_HDR = 16  # read counter, write counter
+
+
+def _wait(ready) -> None:
+    n = 0
+    while not ready():
+        time.sleep(0 if n < _SPIN else _NAP)
+        n += 1
+
+
+class _Ring:
+    """One SPSC byte ring at `base` in `buf`."""
+
+    def __init__(self, buf: memoryview, base: int, size: int) -> None:
+        self.buf = buf
+        self.rd = base
+        self.wr = base + 8
+        self.data = base + _RING_HDR
+        self.size = size
+
+    def _get(self, off: int) -> int:
+        return _U64.unpack_from(self.buf, off)[0]
+
+    def write(self, data: bytes) -> None:
+        n = len(data)
+        if n > self.size:
+            raise ValueError(f"record of {n} bytes does not fit a {self.size}-byte ring")
+        w = self._get(self.wr)
+        _wait(lambda: self.size - (w - self._get(self.rd)) >= n)
+        pos = w % self.size
+        first = min(n, self.size - pos)
+        self.buf[self.data + pos:self.data + pos + first] = data[:first]
+        if first < n:
+            self.buf[self.data:self.data + n - first] = data[first:]
+        _U64.pack_into(self.buf, self.wr, w + n)  # publish after the data
+
+    def read(self, n: int) -> bytes:
+        r = self._get(self.rd)
+        _wait(lambda: self._get(self.wr) - r >= n)
+        pos = r % self.size
+        first = min(n, self.size - pos)
+        out = bytes(self.buf[self.data + pos:self.data + pos + first])
+        if first < n:
+            out += bytes(self.buf[self.data:self.data + n - first])
+        _U64.pack_into(self.buf, self.rd, r + n)
+        return out
+
+
+class ShmChannel(Channel):
+    def __init__(self, name: str, size: int, side: int, shm=None) -> None:
+        if shm is None:
+            shm = shared_memory.SharedMemory(name)
+            # the creator owns the block; keep this process's tracker from unlinking it
+            resource_tracker.unregister(shm._name, "shared_memory")
+        self.shm = shm
+        self.name, self.size, self.side = name, size, side
+        rings = [_Ring(shm.buf, k * (_RING_HDR + size), size) for k in (0, 1)]
+        self._tx, self._rx = rings[side], rings[1 - side]
+
+    def __getstate__(self):
+        return {"name": self.name, "size": self.size, "side": self.side}
+
+    def __setstate__(self, state) -> None:
+        self.__init__(state["name"], state["size"], state["side"])
+
+    def send(self, kind: int, t: int, payload: bytes = b"") -> None:
+        self._tx.write(_REC.pack(kind, t, len(payload)) + payload)
+
+    def recv(self) -> Record:
+        kind, t, n = _REC.unpack(self._rx.read(_REC.size))
+        return kind, t, self._rx.read(n) if n else b""
+
+    def close(self) -> None:
+        self._tx = self._rx = None
+        self.shm.close()
+
+
+def shm_pair(size: int = RING_BYTES) -> Tuple[ShmChannel, ShmChannel, shared_memory.SharedMemory]:
+    """Both ends of a ring pair and the block, which the caller unlinks when done."""
+    shm = shared_memory.SharedMemory(create=True, size=2 * (_RING_HDR + size))
+    shm.buf[:] = bytes(len(shm.buf))
+    return ShmChannel(shm.name, size, 0, shm), ShmChannel(shm.name, size, 1, shm), shm
+
+
+def channel_pair(kind: str, ring_bytes: int = RING_BYTES):
+    """(end A, end B, cleanup) for a `kind` transport."""
+    if kind == "socket":
+        a, b = socket_pair()
+        return a, b, lambda: None
+    if kind == "shm":
+        a, b, shm = shm_pair(ring_bytes)
+        return a, b, shm.unlink
+    raise ValueError(f"unknown transport '{kind}' (one of {', '.join(TRANSPORTS)})")
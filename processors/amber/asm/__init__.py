@@ -3,11 +3,28 @@ Amber Assembler (2-pass) - package entry
 
 Two-pass assembler for the Amber ISA with includes, macros, and full ISA
 coverage (excluding internal micro-ops). See `processors/amber/asm/README.md`.
+
+Exports load on first use, so importing one submodule (e.g. `server` as a
+client, `image`, `stats`) does not pull in the whole assembler.
 """
 
-from .assembler import Assembler, assemble_file
+from importlib import import_module
+
+_EXPORTS = {
+    "Assembler": ".assembler",
+    "Segment": ".assembler",
+    "assemble_file": ".assembler",
+    "LineTable": ".debuginfo",
+    "SourceLoc": ".debuginfo",
+    "PreprocessCache": ".preproc",
+}
+
+__all__ = list(_EXPORTS)
+
 
-__all__ = [
-    "Assembler",
-    "assemble_file",
-]
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
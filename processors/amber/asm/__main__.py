@@ -1,9 +1,12 @@
 import argparse
 from pathlib import Path
+from . import image
 from .assembler import Assembler
+from .preproc import PreprocessCache
+from .stats import PassStats, timed
 
 
-def main():
+def main(argv=None) -> None:
     p = argparse.ArgumentParser(description="Amber assembler")
     p.add_argument("input", type=Path, help="Input assembly file (.asm/.s)")
     p.add_argument("-o", "--output", type=Path, help="Output file path")
@@ -19,23 +22,63 @@ def main():
         default=0,
         help="Origin (word address, default 0). PC counts 24-bit words.",
     )
-    args = p.parse_args()
-
-    asm = Assembler(origin=args.origin)
-    words = asm.assemble_path(args.input)
+    p.add_argument(
+        "--cache",
+        type=Path,
+        help="Persist the include/macro preprocessor cache in this file between runs",
+    )
+    p.add_argument(
+        "--sparse",
+        action="store_true",
+        help="hex only: write populated ranges as @addr records instead of zero-filling .org gaps",
+    )
+    p.add_argument("--listing", type=Path, help="Write a listing (address, word, cycle estimate, source) to this file")
+    p.add_argument("--map", type=Path, help="Write a map (segments, symbols, per-label/macro cycle totals) to this file")
+    p.add_argument("--lines", type=Path, help="Write the address -> source line table from .loc directives to this file")
+    p.add_argument("--time-passes", action="store_true",
+                   help="Print wall time, peak memory and counters per phase to stderr")
+    p.add_argument("--stats", type=Path, help="Write the per-phase report as JSON to this file")
+    args = p.parse_args(argv)
+    if args.sparse and args.format != "hex":
+        p.error("--sparse requires --format hex")
 
-    if args.format == "bin":
-        data = asm.pack_words_bin(words)
+    cache = PreprocessCache.load(args.cache) if args.cache else None
+    stats = PassStats() if args.time_passes or args.stats else None
+    asm = Assembler(origin=args.origin, cache=cache, stats=stats)
+    if args.sparse:
+        segments = asm.assemble_path_segments(args.input)
     else:
-        data = asm.pack_words_hex(words).encode("utf-8")
+        words = asm.assemble_path(args.input)
+    if cache is not None:
+        cache.save(args.cache)
 
     out = args.output
     if out is None:
         suffix = ".bin" if args.format == "bin" else ".hex"
         out = args.input.with_suffix(suffix)
-    out.write_bytes(data)
+    # Stream straight to the file (bin is packed into a memory-mapped file)
+    with timed(stats, "write") as ph:
+        if args.sparse:
+            with open(out, "wb") as fp:
+                nwords = image.write_segments_hex(segments, fp)
+        else:
+            nwords = image.write_image(out, words, args.format)
+        ph.counts["words"] = nwords
+    if args.listing or args.map or args.lines:
+        from . import listing  # with the cycle model: only when a listing/map/line table is wanted
+    if args.listing:
+        with open(args.listing, "w", encoding="utf-8") as fp:
+            listing.write_listing(asm, fp)
+    if args.map:
+        with open(args.map, "w", encoding="utf-8") as fp:
+            listing.write_map(asm, fp)
+    if args.lines:
+        with open(args.lines, "w", encoding="utf-8") as fp:
+            listing.write_lines(asm, fp)
 
-    print(f"Assembled {args.input} -> {out} ({len(words)} words)")
+    print(f"Assembled {args.input} -> {out} ({nwords} words)")
+    if stats is not None:
+        stats.report(args.time_passes, args.stats)
 
 
 if __name__ == "__main__":
@@ -1,11 +1,21 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from array import array
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Tuple
 import re
 
+from . import image
+from .builtins import BUILTIN_SYMBOLS
+from .debuginfo import LineTable
+from .macro import MacroTemplate, compile_macro
+from .preproc import DEFAULT_CACHE, IncludeRef, MacroDef, PreprocessCache, SourceUnit, digest_bytes
 from .spec import InstructionSpec, get_spec
+from .stats import PassStats, timed
+
+if TYPE_CHECKING:  # items.py loads with the first structured assembly; text-only runs skip it
+    from .items import Item
 
 
 class AsmError(Exception):
@@ -37,65 +47,171 @@ class IRMacro:
     operands: List[str]
     src_line: str
     lineno: int
+    # (mnemonic, operands) per emitted word, filled in by pass2 for listings
+    expansion: List[Tuple[str, List[str]]] = field(default_factory=list)
+
+
+# Items path: (word address, item, spec for instructions, `.loc` (file, line, col) in effect)
+_Placed = Tuple[int, "Item", Optional[InstructionSpec], Optional[Tuple[int, int, int]]]
+
+
+@dataclass
+class Segment:
+    addr: int  # word address of words[0]
+    words: "array[int]"  # see image.WORD_TYPECODE
 
 
 class Assembler:
-    def __init__(self, origin: int = 0) -> None:
+    def __init__(self, origin: int = 0, cache: Optional[PreprocessCache] = None,
+                 stats: Optional[PassStats] = None) -> None:
         # PC counts 24-bit words
         self.origin = origin
         self.symbols: Dict[str, int] = {}
         self._ir: List[IRInstruction | IRDirective | IRMacro] = []
         self._pending_equ: List[tuple[str, str, int]] = []  # (name, expr, lineno)
         # Macro system (user-defined)
-        self._macros: Dict[str, tuple[List[str], List[str]]] = {}  # NAME -> (params, body_lines)
+        self._macros: Dict[str, MacroTemplate] = {}  # NAME -> pre-tokenized body
         self._macro_expansion_id: int = 0
+        # Per line of the macro-expanded source: chain of user macros it came from
+        self._line_macros: List[Tuple[str, ...]] = []
+        # Label names in definition order (the rest of `symbols` is .equ/builtins)
+        self._labels: List[str] = []
+        # Populated ranges of the last assembly; `.org` gaps are not materialized
+        self.segments: List[Segment] = []
+        # Highest `.org` target seen (flat images are zero-padded up to it)
+        self._org_end: int = origin
+        # Address -> source position from .file/.func/.loc (compiler output)
+        self.line_table = LineTable()
+        # Include/macro preprocessor cache (shared across instances by default)
+        self.cache = cache if cache is not None else DEFAULT_CACHE
+        # Per-phase timing and counters (includes, macros, pass1, pass2), if wanted
+        self.stats = stats
 
     # Public API
-    def assemble_path(self, path: Path) -> List[int]:
+    def assemble_path(self, path: Path) -> "array[int]":
         """Assemble a single file with support for .include.
 
         Relative includes are resolved against the including file's directory.
         """
-        text = path.read_text(encoding="utf-8")
-        pre = self._expand_includes(text, base_stack=[path.parent])
-        return self._assemble_after_preprocess(pre)
+        self.assemble_path_segments(path)
+        return self.flatten_segments(self.segments, self.origin, end=self._org_end)
+
+    def assemble_path_segments(self, path: Path) -> List[Segment]:
+        """Like `assemble_path`, but return only the populated address ranges."""
+        path = Path(path).resolve()
+        self._reset()
+        with timed(self.stats, "includes") as ph:
+            unit = self._load_unit(path, {})
+            pre, macros = self._expand_includes(unit, path.parent, seen_once={str(path)} if unit.once else set())
+            ph.counts.update(lines=pre.count("\n") + 1, macro_defs=len(macros))
+        return self._assemble_after_preprocess(pre, macros)
 
     # assemble_paths removed: prefer .include within a single entry file
 
-    def assemble(self, source: str) -> List[int]:
+    def assemble(self, source: str) -> "array[int]":
+        self.assemble_segments(source)
+        return self.flatten_segments(self.segments, self.origin, end=self._org_end)
+
+    def assemble_segments(self, source: str) -> List[Segment]:
+        """Like `assemble`, but return only the populated address ranges."""
+        self._reset()
+        # When assembling from a raw string, resolve includes relative to CWD.
+        with timed(self.stats, "includes") as ph:
+            unit = self._scan_unit(source, digest="")
+            pre, macros = self._expand_includes(unit, Path.cwd(), seen_once=set())
+            ph.counts.update(lines=pre.count("\n") + 1, macro_defs=len(macros))
+        return self._assemble_after_preprocess(pre, macros)
+
+    def assemble_items(self, items: Sequence[Item]) -> "array[int]":
+        """Assemble structured assembly (`items.py`), e.g. from the Skald compiler.
+
+        Gives the words (and symbols/line table) `assemble(render_lines(items))`
+        would, without the text round trip. There is no listing for it.
+        """
+        self.assemble_items_segments(items)
+        return self.flatten_segments(self.segments, self.origin, end=self._org_end)
+
+    def assemble_items_segments(self, items: Sequence[Item]) -> List[Segment]:
+        """Like `assemble_items`, but return only the populated address ranges."""
+        self._reset()
+        with timed(self.stats, "pass1") as ph:
+            placed = self._items_pass1(items)
+            ph.counts.update(ir_items=len(placed), labels=len(self._labels), symbols=len(self.symbols))
+        with timed(self.stats, "pass2") as ph:
+            self.segments = self._items_pass2(placed)
+            ph.counts.update(words=sum(len(sg.words) for sg in self.segments), segments=len(self.segments))
+        return self.segments
+
+    # Read-only views of the last text assembly (listings, maps)
+    @property
+    def ir(self) -> Tuple[IRInstruction | IRDirective | IRMacro, ...]:
+        """Instructions, built-in macros and directives in source order."""
+        return tuple(self._ir)
+
+    @property
+    def labels(self) -> Tuple[str, ...]:
+        """Label names in definition order (the rest of `symbols` is .equ/builtins)."""
+        return tuple(self._labels)
+
+    def macro_chain(self, item: IRInstruction | IRDirective | IRMacro) -> Tuple[str, ...]:
+        """User macros `item`'s line was expanded from, outermost first."""
+        i = item.lineno - 1
+        return self._line_macros[i] if i < len(self._line_macros) else ()
+
+    def _reset(self) -> None:
+        """Start a new assembly: built-in symbols only (CSR indices, math constants), no IR."""
         self.symbols.clear()
-        # Preload built-in symbols (CSR indices, math constants)
-        try:
-            from .builtins import BUILTIN_SYMBOLS  # local import to avoid import cycles during tooling
-            self.symbols.update(BUILTIN_SYMBOLS)
-        except Exception:
-            # Builtins are optional; continue if unavailable
-            pass
+        self.symbols.update(BUILTIN_SYMBOLS)
         self._ir.clear()
         self._pending_equ.clear()
-        # When assembling from a raw string, resolve includes relative to CWD.
-        pre = self._expand_includes(source, base_stack=[Path.cwd()])
-        return self._assemble_after_preprocess(pre)
 
     # Common path after include expansion
-    def _assemble_after_preprocess(self, preprocessed: str) -> List[int]:
-        expanded = self._expand_macros(preprocessed)
-        self._pass1(expanded)
-        self._resolve_pending_equ()
-        return self._pass2()
+    def _assemble_after_preprocess(self, preprocessed: str, macros: Optional[List[MacroDef]] = None) -> List[Segment]:
+        with timed(self.stats, "macros") as ph:
+            first = self._macro_expansion_id
+            expanded = self._expand_macros(preprocessed, predefined=macros)
+            ph.counts.update(expansions=self._macro_expansion_id - first, lines=expanded.count("\n") + 1)
+        with timed(self.stats, "pass1") as ph:
+            self._pass1(expanded)
+            self._resolve_pending_equ()
+            ph.counts.update(ir_items=len(self._ir), labels=len(self._labels), symbols=len(self.symbols))
+        with timed(self.stats, "pass2") as ph:
+            self.segments = self._pass2()
+            ph.counts.update(words=sum(len(sg.words) for sg in self.segments), segments=len(self.segments))
+            if self.stats is not None:
+                # Built-in macros (JSRui, DIVU24, ...) expand here, not in the `macros` phase
+                ph.counts["builtin_expansions"] = sum(1 for it in self._ir if isinstance(it, IRMacro))
+        return self.segments
 
     # ---- Include preprocessor ----------------------------------------------
-    def _expand_includes(self, source: str, base_stack: List[Path], depth: int = 0) -> str:
-        if depth > 100:
-            raise AsmError("Include depth too deep (possible recursion loop)")
+    def _scan_unit(self, source: str, digest: str) -> SourceUnit:
+        """Split one file into plain lines and include references.
+
+        Self-contained `.macro` blocks are parsed here so cached units carry
+        their definitions; blocks that contain `.include` or lack `.endm` stay
+        in the text and are handled by `_expand_macros` as before.
+        """
         # Be tolerant of UTF-8 BOM at start of files (common on Windows)
         source = source.lstrip('\ufeff')
-        out: List[str] = []
-        for raw in source.splitlines():
+        lines = source.splitlines()
+        items: List[str | IncludeRef] = []
+        macros: List[MacroDef] = []
+        once = False
+        i = 0
+        while i < len(lines):
+            raw = lines[i]
             s = self._strip_comment(raw)
             if not s:
-                out.append(raw)
+                items.append(raw)
+                i += 1
                 continue
+            if s.lower().startswith('.macro'):
+                end = self._find_macro_end(lines, i)
+                if end is not None:
+                    name, params = self._parse_macro_head(s, i + 1)
+                    macros.append(MacroDef(name, params, lines[i + 1:end], i + 1))
+                    i = end + 1
+                    continue
             label, rest = self._split_label(s)
             probe = rest if rest is not None else s
             if probe.lower().startswith('.include'):
@@ -103,25 +219,127 @@ class Assembler:
                 arg = probe[len('.include'):].strip()
                 if not arg:
                     raise AsmError(".include requires a path argument")
-                inc_spec = self._parse_include_arg(arg)
-                inc_path = self._resolve_include_path(inc_spec, base_stack)
-                try:
-                    inc_text = inc_path.read_text(encoding='utf-8')
-                except Exception as e:
-                    raise AsmError(f"Failed to read include '{inc_path}': {e}")
-                # Emit optional call-site label before included content
-                if label:
-                    out.append(f"{label}:")
-                # Delimit include region with comments for clarity
-                out.append(f"; ---- begin include: {inc_path} ----")
-                out.append(
-                    self._expand_includes(inc_text, base_stack=base_stack + [inc_path.parent], depth=depth + 1)
-                )
-                out.append(f"; ---- end include: {inc_path} ----")
+                items.append(IncludeRef(self._parse_include_arg(arg), label))
+                i += 1
+                continue
+            if probe.lower() == '.once':
+                # Include guard: later includes of this file expand to nothing
+                once = True
+                items.append(f"{label}:" if label else "")
+                i += 1
                 continue
             # Not an include: keep original raw line to preserve formatting
-            out.append(raw)
-        return "\n".join(out) + ("\n" if not source.endswith("\n") else "")
+            items.append(raw)
+            i += 1
+        return SourceUnit(digest, once, not source.endswith("\n"), items, macros)
+
+    def _find_macro_end(self, lines: List[str], start: int) -> Optional[int]:
+        # Index of the matching .endm, or None if the block must stay textual
+        for j in range(start + 1, len(lines)):
+            s = self._strip_comment(lines[j]).lower()
+            if s.startswith('.endm') or s.startswith('.endmacro'):
+                return j
+            _, rest = self._split_label(s)
+            if (rest if rest is not None else s).startswith('.include'):
+                return None
+        return None
+
+    def _load_unit(self, path: Path, checked: Dict[str, SourceUnit]) -> SourceUnit:
+        # Validate each file at most once per assembly, rescanning only on change
+        key = str(path)
+        unit = checked.get(key)
+        if unit is not None:
+            return unit
+        unit, data = self.cache.lookup(path)
+        if unit is None:
+            assert data is not None
+            unit = self._scan_unit(data.decode('utf-8'), digest_bytes(data))
+            self.cache.store(path, unit)
+        checked[key] = unit
+        return unit
+
+    def _expand_includes(
+        self,
+        unit: SourceUnit,
+        base_dir: Path,
+        seen_once: set[str],
+        checked: Optional[Dict[str, SourceUnit]] = None,
+        depth: int = 0,
+    ) -> tuple[str, List[MacroDef]]:
+        text, macros, _, _ = self._expand_unit(unit, base_dir, seen_once, {} if checked is None else checked, depth)
+        return text, macros
+
+    def _expand_unit(
+        self,
+        unit: SourceUnit,
+        base_dir: Path,
+        seen_once: set[str],
+        checked: Dict[str, SourceUnit],
+        depth: int,
+    ) -> tuple[str, List[MacroDef], List[tuple[str, str]], bool]:
+        """Flatten `unit`; returns (text, macros, deps, pure).
+
+        `pure` is False when a `.once` file was pulled in below this unit, in
+        which case the result depends on what was included earlier and is not
+        memoized.
+        """
+        if depth > 100:
+            raise AsmError("Include depth too deep (possible recursion loop)")
+        cwd = str(Path.cwd())
+        if unit.expanded is not None and unit.expanded_deps is not None and self._deps_current(unit, cwd, checked):
+            return unit.expanded, list(unit.expanded_macros or []), unit.expanded_deps[1:], True
+        out: List[str] = []
+        macros: List[MacroDef] = list(unit.macros)
+        deps: List[tuple[str, str]] = []
+        pure = True
+        for it in unit.items:
+            if isinstance(it, str):
+                out.append(it)
+                continue
+            inc_path = self._resolve_include_path(it.spec, [base_dir])
+            try:
+                child = self._load_unit(inc_path, checked)
+            except (OSError, UnicodeDecodeError) as e:
+                raise AsmError(f"Failed to read include '{inc_path}': {e}")
+            # Emit optional call-site label before included content
+            if it.label:
+                out.append(f"{it.label}:")
+            deps.append((str(inc_path), child.digest))
+            if child.once:
+                pure = False
+                if str(inc_path) in seen_once:
+                    out.append(f"; ---- skipped include (.once): {inc_path} ----")
+                    continue
+                seen_once.add(str(inc_path))
+            # Delimit include region with comments for clarity
+            out.append(f"; ---- begin include: {inc_path} ----")
+            text, sub_macros, sub_deps, sub_pure = self._expand_unit(
+                child, inc_path.parent, seen_once, checked, depth + 1
+            )
+            out.append(text)
+            out.append(f"; ---- end include: {inc_path} ----")
+            macros.extend(sub_macros)
+            deps.extend(sub_deps)
+            pure = pure and sub_pure
+        text = "\n".join(out) + ("\n" if unit.missing_final_nl else "")
+        if pure:
+            unit.expanded = text
+            unit.expanded_macros = macros
+            # First entry records the CWD used for fallback include resolution
+            unit.expanded_deps = [(cwd, "")] + deps
+        return text, macros, deps, pure
+
+    def _deps_current(self, unit: SourceUnit, cwd: str, checked: Dict[str, SourceUnit]) -> bool:
+        assert unit.expanded_deps is not None
+        if unit.expanded_deps[0][0] != cwd:
+            return False
+        for p, digest in unit.expanded_deps[1:]:
+            try:
+                if self._load_unit(Path(p), checked).digest != digest:
+                    return False
+            except (OSError, UnicodeDecodeError):
+                return False
+        return True
 
     @staticmethod
     def _parse_include_arg(arg: str) -> str:
@@ -161,24 +379,50 @@ class Assembler:
 
     # Output helpers
     @staticmethod
-    def pack_words_bin(words: List[int]) -> bytes:
+    def flatten_segments(segments: List[Segment], origin: int = 0, end: Optional[int] = None) -> "array[int]":
+        """Zero-fill the gaps between segments into one image starting at `origin`.
+
+        `end` (word address) extends the image with zeros, as a trailing
+        `.org` does.
+        """
+        words = image.new_words()
+        for sg in segments:
+            if sg.addr < origin:
+                raise AsmError(f"Segment at 0x{sg.addr:X} lies below origin 0x{origin:X}")
+            gap = sg.addr - origin - len(words)
+            if gap > 0:
+                words.frombytes(bytes(gap * words.itemsize))
+            words.extend(image.as_words(sg.words))
+        if end is not None and end - origin > len(words):
+            words.frombytes(bytes((end - origin - len(words)) * words.itemsize))
+        return words
+
+    @staticmethod
+    def pack_segments_hex(segments: List[Segment]) -> str:
+        # $readmemh with `@addr` records: only populated ranges are written
+        out: List[str] = []
+        for sg in segments:
+            out.append(f"@{sg.addr:X}\n")
+            out.append(image.pack_hex(sg.words))
+        return "".join(out) if out else "\n"
+
+    @staticmethod
+    def pack_words_bin(words: Iterable[int]) -> bytes:
         # Little-endian per word: [low, mid, high]
-        out = bytearray()
-        for w in words:
-            w &= 0xFFFFFF
-            out.append(w & 0xFF)
-            out.append((w >> 8) & 0xFF)
-            out.append((w >> 16) & 0xFF)
-        return bytes(out)
+        return image.pack_bin(words)
 
     @staticmethod
-    def pack_words_hex(words: List[int]) -> str:
+    def pack_words_hex(words: Iterable[int]) -> str:
         # One 6-hex-digit word per line, uppercase
-        return "\n".join(f"{(w & 0xFFFFFF):06X}" for w in words) + "\n"
+        return image.pack_hex(words)
 
     # Internals
     def _pass1(self, source: str) -> None:
         pc = int(self.origin)
+        self._labels.clear()
+        self.line_table = LineTable()
+        loc: Optional[Tuple[int, int, int]] = None  # (file, line, col) from .loc
+        func = -1
         for lineno, raw in enumerate(source.splitlines(), start=1):
             line = self._strip_comment(raw)
             if not line:
@@ -187,8 +431,9 @@ class Assembler:
             label, rest = self._split_label(line)
             if label is not None:
                 if label in self.symbols:
-                    raise AsmError(f"Duplicate label '{label}' at line {lineno}")
+                    raise AsmError(self._redefinition("Label", label, f" at line {lineno}"))
                 self.symbols[label] = pc
+                self._labels.append(label)
                 line = rest
                 if not line:
                     # Label-only line
@@ -215,7 +460,7 @@ class Assembler:
                     if not re.match(r"^[A-Za-z_][A-Za-z0-9_]*$", name):
                         raise AsmError(f"Invalid symbol name in .equ at line {lineno}: '{name}'")
                     if name in self.symbols:
-                        raise AsmError(f"Redefinition of symbol '{name}' in .equ at line {lineno}")
+                        raise AsmError(self._redefinition(".equ", name, f" at line {lineno}"))
                     # Try to evaluate now; if fails (forward ref), queue for later
                     try:
                         val = self._resolve_expr(expr, width=48, is_signed=False, pc=pc)
@@ -225,11 +470,35 @@ class Assembler:
                 elif dname in ('dw24', 'diad'):
                     self._ir.append(IRDirective(pc, dname, dargs, raw, lineno))
                     pc += len(dargs)
+                elif dname == 'file':
+                    # .file N, "path"
+                    if len(dargs) != 2:
+                        raise AsmError(f".file requires NUMBER, \"PATH\" at line {lineno}")
+                    try:
+                        self.line_table.files[self._parse_num(dargs[0])] = dargs[1].strip('"')
+                    except ValueError as e:
+                        raise AsmError(f".file parse error at line {lineno}: {e}")
+                elif dname == 'func':
+                    if len(dargs) != 1:
+                        raise AsmError(f".func requires a name at line {lineno}")
+                    func = self.line_table.func_index(dargs[0])
+                elif dname == 'loc':
+                    # .loc FILE, LINE[, COL]
+                    if len(dargs) not in (2, 3):
+                        raise AsmError(f".loc requires FILE, LINE[, COL] at line {lineno}")
+                    try:
+                        file, ln, col = (self._parse_num(a) for a in (*dargs, "0")[:3])
+                    except ValueError as e:
+                        raise AsmError(f".loc parse error at line {lineno}: {e}")
+                    if file not in self.line_table.files:
+                        raise AsmError(f".loc refers to undeclared file {file} at line {lineno}")
+                    loc = (file, ln, col)
                 else:
                     raise AsmError(f"Unknown directive '.{dname}' at line {lineno}")
                 continue
 
             # Instruction
+            start = pc
             mnem, ops = self._parse_instruction(line)
             if mnem in ("JCCUI", "JSRUI", "SWIUI"):
                 # Macro placeholder; expands to 4 instructions in pass2
@@ -288,19 +557,27 @@ class Assembler:
             else:
                 self._ir.append(IRInstruction(pc, mnem, ops, raw, lineno))
                 pc += 1
+            if loc is not None:
+                self.line_table.add(start, pc - start, *loc, func)
 
-    def _pass2(self) -> List[int]:
-        words: List[int] = []
+    def _pass2(self) -> List[Segment]:
+        segments: List[Segment] = []
+        seg_addr = self.origin
+        words = image.new_words()
+        self._org_end = self.origin
         for item in self._ir:
             if isinstance(item, IRDirective):
                 if item.name == 'org':
-                    # Emit padding if there is a gap
-                    gap = item.addr - len(words) - self.origin
-                    if gap > 0:
-                        words.extend([0] * gap)
+                    # Start a new segment unless already at the target address
+                    self._org_end = max(self._org_end, item.addr)
+                    if item.addr != seg_addr + len(words):
+                        if words:
+                            segments.append(Segment(seg_addr, words))
+                        seg_addr = item.addr
+                        words = image.new_words()
                 elif item.name in ('dw24','diad'):
                     for a in item.args:
-                        val = self._resolve_expr(a, width=24, is_signed=False, pc=len(words) + self.origin)
+                        val = self._resolve_expr(a, width=24, is_signed=False, pc=seg_addr + len(words))
                         if val < 0 or val > 0xFFFFFF:
                             raise AsmError(
                                 f".dw24 value out of range at line {item.lineno}: {val}"
@@ -326,8 +603,10 @@ class Assembler:
                     for x, imm12 in parts:
                         w = lui.encode([str(x), f"#{imm12}"], resolve_expr=self._resolve_expr, pc=item.addr)
                         words.append(w & 0xFFFFFF)
+                        item.expansion.append((lui.mnemonic, [str(x), f"#{imm12}"]))
                     w = jccui.encode([cc_tok, f"#{imm48 & 0xFFF}"], resolve_expr=self._resolve_expr, pc=item.addr)
                     words.append(w & 0xFFFFFF)
+                    item.expansion.append((jccui.mnemonic, [cc_tok, f"#{imm48 & 0xFFF}"]))
                 elif item.kind == "JSRUI":
                     if len(item.operands) != 1:
                         raise AsmError(f"JSRui requires 1 operand at line {item.lineno}")
@@ -344,8 +623,10 @@ class Assembler:
                     for x, imm12 in parts:
                         w = lui.encode([str(x), f"#{imm12}"], resolve_expr=self._resolve_expr, pc=item.addr)
                         words.append(w & 0xFFFFFF)
+                        item.expansion.append((lui.mnemonic, [str(x), f"#{imm12}"]))
                     w = jsrui.encode([f"#{imm48 & 0xFFF}"], resolve_expr=self._resolve_expr, pc=item.addr)
                     words.append(w & 0xFFFFFF)
+                    item.expansion.append((jsrui.mnemonic, [f"#{imm48 & 0xFFF}"]))
                 elif item.kind == "SWIUI":
                     if len(item.operands) != 1:
                         raise AsmError(f"SWIui requires 1 operand at line {item.lineno}")
@@ -362,8 +643,10 @@ class Assembler:
                     for x, imm12 in parts:
                         w = lui.encode([str(x), f"#{imm12}"], resolve_expr=self._resolve_expr, pc=item.addr)
                         words.append(w & 0xFFFFFF)
+                        item.expansion.append((lui.mnemonic, [str(x), f"#{imm12}"]))
                     w = sysc.encode([f"#{imm48 & 0xFFF}"], resolve_expr=self._resolve_expr, pc=item.addr)
                     words.append(w & 0xFFFFFF)
+                    item.expansion.append((sysc.mnemonic, [f"#{imm48 & 0xFFF}"]))
                 elif item.kind in (
                     "MULU24", "MULS24",
                     "DIVU24", "DIVS24",
@@ -395,6 +678,7 @@ class Assembler:
                             raise AsmError(f"Missing spec for '{mn}' (expanding {k})")
                         w = spec.encode(operands, resolve_expr=self._resolve_expr, pc=pc_here)
                         words.append(w & 0xFFFFFF)
+                        item.expansion.append((spec.mnemonic, operands))
                         pc_here += 1
 
                     # Validate operands per macro
@@ -680,7 +964,148 @@ class Assembler:
                     f"Encoding error at line {item.lineno} ({item.src_line.strip()}): {e}"
                 )
             words.append(w & 0xFFFFFF)
-        return words
+        if words:
+            segments.append(Segment(seg_addr, words))
+        return self._sorted_segments(segments)
+
+    @staticmethod
+    def _sorted_segments(segments: List[Segment]) -> List[Segment]:
+        segments.sort(key=lambda sg: sg.addr)
+        for prev, cur in zip(segments, segments[1:]):
+            if cur.addr < prev.addr + len(prev.words):
+                raise AsmError(
+                    f"Overlapping output at word address 0x{cur.addr:X} "
+                    f"(segment at 0x{prev.addr:X} has {len(prev.words)} words)"
+                )
+        return segments
+
+    # ---- Structured input (items.py) ---------------------------------------
+    def _items_pass1(self, items: Sequence[Item]) -> List[_Placed]:
+        # Addresses and labels; keeps the items that produce words (and .org) with their spec and .loc
+        from .items import Comment, Data, File, Func, Instr, Label, Loc, Org, render
+
+        pc = int(self.origin)
+        self._labels.clear()
+        self.line_table = LineTable()
+        loc: Optional[Tuple[int, int, int]] = None
+        func = -1
+        placed: List[_Placed] = []
+        for item in items:
+            cls = item.__class__
+            if cls is Instr:
+                spec = get_spec(item.mnemonic)
+                if spec is None:
+                    raise AsmError(f"Unknown or unsupported mnemonic '{item.mnemonic}'"
+                                   f"{self._loc_text(loc)} ({render(item).strip()})")
+                placed.append((pc, item, spec, loc))
+                if loc is not None:
+                    self.line_table.add(pc, 1, *loc, func)
+                pc += 1
+            elif cls is Label:
+                if item.name in self.symbols:
+                    raise AsmError(self._redefinition("Label", item.name, self._loc_text(loc)))
+                self.symbols[item.name] = pc
+                self._labels.append(item.name)
+            elif cls is Data:
+                placed.append((pc, item, None, loc))
+                pc += len(item.values)
+            elif cls is Org:
+                pc = item.addr
+                placed.append((pc, item, None, loc))
+            elif cls is Loc:
+                if item.file not in self.line_table.files:
+                    raise AsmError(f".loc refers to undeclared file {item.file}")
+                loc = (item.file, item.line, item.col)
+            elif cls is Func:
+                func = self.line_table.func_index(item.name)
+            elif cls is File:
+                self.line_table.files[item.index] = item.path
+            elif cls is not Comment:
+                raise AsmError(f"Not an assembly item: {item!r}")
+        return placed
+
+    def _items_pass2(self, placed: List[_Placed]) -> List[Segment]:
+        from .items import Cond, Half, Org, Reg, render, render_operand
+
+        segments: List[Segment] = []
+        seg_addr = self.origin
+        words = image.new_words()
+        self._org_end = self.origin
+        indices: Dict[Tuple[object, str], int] = {}  # (parser, register/condition name) -> field value
+        for addr, item, spec, loc in placed:
+            if spec is None:
+                if item.__class__ is Org:
+                    self._org_end = max(self._org_end, addr)
+                    if addr != seg_addr + len(words):
+                        if words:
+                            segments.append(Segment(seg_addr, words))
+                        seg_addr = addr
+                        words = image.new_words()
+                    continue
+                for op in item.values:
+                    try:
+                        val = self._item_value(op)
+                    except AsmError as e:
+                        raise AsmError(f".dw24 at word 0x{addr:X}{self._loc_text(loc)} ({render(item).strip()}): {e}")
+                    if val < 0 or val > 0xFFFFFF:
+                        raise AsmError(f".dw24 value out of range at word 0x{addr:X}{self._loc_text(loc)} "
+                                       f"({render(item).strip()}): {val}")
+                    words.append(val)
+                continue
+            try:
+                if len(item.operands) != len(spec.plan):
+                    raise ValueError(f"expected {len(spec.plan)} operands, got {len(item.operands)}")
+                vals = []
+                for (kind, parse, _, _, _), op in zip(spec.plan, item.operands):
+                    if parse is None:
+                        val = self._item_value(op)
+                        if spec.pc_relative:
+                            val -= addr
+                    elif isinstance(op, (Reg, Cond, Half)):
+                        val = indices.get((parse, op.name))
+                        if val is None:
+                            val = indices[(parse, op.name)] = parse(op.name)
+                    else:
+                        raise ValueError(f"expected {kind}, got '{render_operand(op)}'")
+                    vals.append(val)
+                words.append(spec.encode_fields(vals))
+            except (ValueError, AsmError) as e:
+                raise AsmError(f"Encoding error at word 0x{addr:X}{self._loc_text(loc)} ({render(item).strip()}): {e}")
+        if words:
+            segments.append(Segment(seg_addr, words))
+        return self._sorted_segments(segments)
+
+    @staticmethod
+    def _redefinition(kind: str, name: str, where: str) -> str:
+        # Message for a label/.equ name already in `symbols`; `where` is " at line N" or similar.
+        # Built-in symbols are predefined for every assembly, so they cannot be reused.
+        if name in BUILTIN_SYMBOLS:
+            return (f"{kind} '{name}'{where} clashes with the built-in symbol of that name "
+                    f"(0x{BUILTIN_SYMBOLS[name]:X}); rename it")
+        if kind == "Label":
+            return f"Duplicate label '{name}'{where}"
+        return f"Redefinition of symbol '{name}' in .equ{where}"
+
+    def _loc_text(self, loc: Optional[Tuple[int, int, int]]) -> str:
+        # ", FILE:LINE" of the `.loc` in effect, for errors on the items path (as the text path gives its line)
+        if loc is None:
+            return ""
+        return f", {self.line_table.files.get(loc[0], f'<file {loc[0]}>')}:{loc[1]}"
+
+    def _item_value(self, op: object) -> int:
+        # Immediate or symbol operand -> integer (absolute; PC-relative is the caller's business)
+        from .items import Imm, Sym, render_operand
+
+        if isinstance(op, Imm):
+            op = op.value
+            if isinstance(op, int):
+                return op
+        if isinstance(op, Sym):
+            val = self.symbols.get(op.name)
+            if val is None:
+                raise AsmError(f"Unknown symbol '{op.name}'")
+            return val + op.addend
+        raise AsmError(f"expected an immediate or symbol, got '{render_operand(op)}'")
 
     @staticmethod
     def _strip_comment(s: str) -> str:
@@ -880,14 +1305,21 @@ class Assembler:
             raise AsmError(f"Unresolved .equ forward references: {msgs}")
 
     # ---- Macro preprocessor -------------------------------------------------
-    def _expand_macros(self, source: str) -> str:
+    def _expand_macros(self, source: str, predefined: Optional[List[MacroDef]] = None) -> str:
         """Implements a lightweight macro preprocessor with:
         - .macro NAME [arg1[,arg2..]] ... .endm: define a macro
         - parameter references inside body using {arg} placeholders
         - .local name[,name..]: mark labels or symbols as local-per-expansion
         Macros may be used anywhere after definition. Expansion is recursive.
+
+        `predefined` carries definitions already parsed from cached include
+        units; they are registered before scanning `source` for more.
         """
         self._macros.clear()
+        for m in predefined or []:
+            if m.template is None:
+                m.template = compile_macro(m.name, m.params, m.body)
+            self._register_macro(m.name, m.template)
 
         lines = source.splitlines()
 
@@ -899,23 +1331,7 @@ class Assembler:
             line = self._strip_comment(raw)
             if line.lower().startswith('.macro'):
                 # Parse: .macro NAME [args...]
-                head = line[len('.macro'):].strip()
-                if not head:
-                    raise AsmError(f".macro missing name at line {i+1}")
-                parts = head.split(None, 1)
-                name = parts[0].strip()
-                rest = parts[1] if len(parts) > 1 else ''
-                # Args may be comma or whitespace separated; normalize by comma first
-                params: List[str] = []
-                if rest:
-                    # If whitespace separated, allow both. Split by comma then by whitespace.
-                    tmp = []
-                    for seg in rest.split(','):
-                        seg = seg.strip()
-                        if not seg:
-                            continue
-                        tmp.extend([t for t in seg.split() if t])
-                    params = [p.strip() for p in tmp if p.strip()]
+                name, params = self._parse_macro_head(line, i + 1)
                 body: List[str] = []
                 i += 1
                 found_end = False
@@ -929,13 +1345,7 @@ class Assembler:
                     i += 1
                 if not found_end:
                     raise AsmError(f".macro '{name}' missing .endm at EOF")
-                # Register macro (uppercase name for case-insensitive match)
-                key = name.strip().upper()
-                if not re.match(r"^[A-Za-z_][A-Za-z0-9_]*$", key):
-                    raise AsmError(f"Invalid macro name '{name}' at line {i+1}")
-                if key in self._macros:
-                    raise AsmError(f"Redefinition of macro '{name}'")
-                self._macros[key] = (params, body)
+                self._register_macro(name, compile_macro(name, params, body))
                 # Skip the .endm line
                 i += 1
                 continue
@@ -947,100 +1357,95 @@ class Assembler:
         expanded_lines = self._expand_lines_recursive(kept_lines)
         return "\n".join(expanded_lines)
 
+    @staticmethod
+    def _parse_macro_head(line: str, lineno: int) -> tuple[str, List[str]]:
+        # .macro NAME [arg1[, arg2 ...]] -> (NAME, params)
+        head = line[len('.macro'):].strip()
+        if not head:
+            raise AsmError(f".macro missing name at line {lineno}")
+        parts = head.split(None, 1)
+        name = parts[0].strip()
+        rest = parts[1] if len(parts) > 1 else ''
+        # Args may be comma or whitespace separated; normalize by comma first
+        params: List[str] = []
+        if rest:
+            # If whitespace separated, allow both. Split by comma then by whitespace.
+            tmp = []
+            for seg in rest.split(','):
+                seg = seg.strip()
+                if not seg:
+                    continue
+                tmp.extend([t for t in seg.split() if t])
+            params = [p.strip() for p in tmp if p.strip()]
+        if not re.match(r"^[A-Za-z_][A-Za-z0-9_]*$", name):
+            raise AsmError(f"Invalid macro name '{name}' at line {lineno}")
+        return name, params
+
+    def _register_macro(self, name: str, tpl: MacroTemplate) -> None:
+        # Macro names match case-insensitively (templates carry the uppercase name)
+        if tpl.name in self._macros:
+            raise AsmError(f"Redefinition of macro '{name}'")
+        self._macros[tpl.name] = tpl
+
     def _expand_lines_recursive(self, lines: List[str], depth: int = 0) -> List[str]:
-        if depth > 100:
-            raise AsmError("Macro expansion too deep (possible recursion)")
+        # Nested expansions are handled with an explicit stack of line
+        # iterators, so each expanded line is copied into `out` exactly once.
+        # `origins` runs parallel to `out` with the macro chain of each line.
         out: List[str] = []
-        i = 0
-        while i < len(lines):
-            raw = lines[i]
+        origins = self._line_macros
+        origins.clear()
+        stack = [(iter(lines), depth, ())]
+        while stack:
+            it, d, chain = stack[-1]
+            raw = next(it, None)
+            if raw is None:
+                stack.pop()
+                continue
             s = self._strip_comment(raw)
             if not s:
                 out.append(raw)
-                i += 1
+                origins.append(chain)
                 continue
             label, rest = self._split_label(s)
             probe = rest if rest is not None else s
             if probe.startswith('.'):
                 # Directives pass through unchanged
                 out.append(raw)
-                i += 1
+                origins.append(chain)
                 continue
             # Determine mnemonic token
             parts = probe.split(None, 1)
             if not parts:
                 out.append(raw)
-                i += 1
+                origins.append(chain)
                 continue
             mnem = parts[0].strip().upper()
             if mnem in self._macros:
+                if d + 1 > 100:
+                    raise AsmError("Macro expansion too deep (possible recursion)")
                 arg_str = parts[1] if len(parts) > 1 else ''
                 args = [a.strip() for a in arg_str.split(',')] if arg_str else []
-                # Expand and replace this line with expansion
-                exp_lines = self._expand_one_macro(mnem, args, call_label=label)
-                # Process recursively to allow nested macros
-                exp_lines = self._expand_lines_recursive(exp_lines, depth + 1)
-                out.extend(exp_lines)
-                i += 1
+                # Replace this line with the expansion; nested macros are
+                # expanded as the new frame is consumed
+                stack.append((iter(self._expand_one_macro(mnem, args, call_label=label)), d + 1, chain + (mnem,)))
                 continue
             # Not a macro: keep original raw (preserve comments/spacing)
             out.append(raw)
-            i += 1
+            origins.append(chain)
         return out
 
     def _expand_one_macro(self, name: str, args: List[str], call_label: Optional[str]) -> List[str]:
-        params, body = self._macros[name]
-        if len(args) != len(params):
+        tpl = self._macros[name]
+        if len(args) != len(tpl.params):
             raise AsmError(
-                f"Macro {name} expects {len(params)} arg(s), got {len(args)}"
+                f"Macro {name} expects {len(tpl.params)} arg(s), got {len(args)}"
             )
-        # Build param map (case-insensitive keys)
-        pmap: Dict[str, str] = {p.strip().upper(): a for p, a in zip(params, args)}
-        # Prepare local label mapping for this expansion
+        # Unique suffix for this expansion's .local names
         self._macro_expansion_id += 1
-        uid = f"__{name}_{self._macro_expansion_id}"
-        local_map: Dict[str, str] = {}
-
-        # First pass body scan to collect .local and filter them out
-        filtered_body: List[str] = []
-        for raw in body:
-            line = self._strip_comment(raw)
-            if line.lower().startswith('.local'):
-                rest = line[len('.local'):].strip()
-                # Accept comma or space separated
-                items: List[str] = []
-                for seg in rest.split(','):
-                    seg = seg.strip()
-                    if not seg:
-                        continue
-                    items.extend([t for t in seg.split() if t])
-                for nm in items:
-                    nm_u = nm.strip()
-                    if not nm_u:
-                        continue
-                    local_map[nm_u] = f"{nm_u}{uid}"
-                continue  # do not keep .local in output
-            filtered_body.append(raw)
-
-        # Now perform substitution on filtered body
-        out: List[str] = []
-        for raw in filtered_body:
-            line = raw
-            # Param substitution: {param}
-            def sub_param(m: re.Match[str]) -> str:
-                key = m.group(1).strip().upper()
-                if key not in pmap:
-                    raise AsmError(f"Unknown macro parameter '{{{m.group(1)}}}' in {name}")
-                return pmap[key]
-
-            line = re.sub(r"\{\s*([A-Za-z_][A-Za-z0-9_]*)\s*\}", sub_param, line)
-
-            # Local symbol substitution as whole words
-            for k, v in local_map.items():
-                line = re.sub(rf"\b{re.escape(k)}\b", v, line)
-
-            out.append(line)
-
+        try:
+            out = tpl.instantiate(args, f"__{name}_{self._macro_expansion_id}")
+        except ValueError as e:
+            raise AsmError(str(e))
         # Attach call-site label by prefixing a separate label line
         if call_label:
             out.insert(0, f"{call_label}:")
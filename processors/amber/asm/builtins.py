@@ -17,10 +17,11 @@ BUILTIN_SYMBOLS = {
     "CAUSE":       0x01,
     "EPC_LO":      0x02,
     "EPC_HI":      0x03,
-    "CYCLE_L":     0x04,
-    "CYCLE_H":     0x05,
-    "INSTRET_L":   0x06,
-    "INSTRET_H":   0x07,
+    # Read-only performance counters (src/csr.vh CSR_IDX_CYCLE_LO..INSTRET_HI)
+    "CYCLE_L":     0x0A,
+    "CYCLE_H":     0x0B,
+    "INSTRET_L":   0x0C,
+    "INSTRET_H":   0x0D,
 
     # Async 24-bit math CSRs
     "MATH_CTRL":     0x10,
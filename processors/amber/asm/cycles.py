@@ -0,0 +1,152 @@
+"""Static cycle estimates for Amber instructions (assembler view).
+
+A small pipeline model of the 8-stage core (IA, IF, XT, ID, EX, MA, MO, WB)
+derived from the RTL in `processors/amber/src`:
+
+- Every micro-op issues in one cycle. XT expands some ISA ops into fixed
+  micro-op sequences (`stg2xt.v`): calls, returns, PUSH/POP and the 48-bit
+  capability load/store sequences.
+- Each data-memory micro-op (load or store) holds the front of the pipeline
+  for `MEM_STALL` extra cycles (`hazard.v`; there is no memory forwarding).
+- Branches resolve out of EX; a taken branch flushes IA, IF, XT, ID and EX,
+  so the target issues `BRANCH_PENALTY` cycles later than a fall-through.
+- The async math unit (`math24_async.v`) raises READY a fixed number of
+  cycles after the CTRL write retires; built-in math macros spin on STATUS
+  with a CSRRD/ANDui/BCCso loop until then.
+
+Estimates assume no cache, TLB or MMU stalls. Mnemonics are the assembler's
+(uppercase, as in `spec.SPECS`).
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple
+
+
+# Extra cycles per load/store micro-op (hazard.v stall counter)
+MEM_STALL = 3
+# Wrong-path slots flushed by a taken branch (IA, IF, XT, ID, EX)
+BRANCH_PENALTY = 5
+# CTRL write in EX -> READY visible in STATUS: MA/MO/WB, CSR write edge, start
+# latch, 5 writeback steps (per-op table in `sim/math24.py`)
+MATH_READY = 3 + 1 + 1 + 5
+
+# Condition codes that always branch
+_ALWAYS_CC = ("AL", "RA", "0", "#0", "0X0", "#0X0")
+
+# mnemonic -> (micro-ops issued, data-memory micro-ops, branch kind)
+# Branch kind: None (never), "cond" (condition code operand) or "always".
+_TABLE: Dict[str, Tuple[int, int, Optional[str]]] = {
+    # Single-word loads/stores
+    "LDUR": (1, 1, None),
+    "STUR": (1, 1, None),
+    "STUI": (1, 1, None),
+    "STSI": (1, 1, None),
+    "LDSO": (1, 1, None),
+    "STSO": (1, 1, None),
+    # 48-bit address/capability moves: XT CLD/CST sequence (6 memory µops)
+    "LDASO": (54, 6, None),
+    "STASO": (54, 6, None),
+    # Stack helpers: CINCi, 4 NOPs, then the load/store
+    "PUSHUR": (6, 1, None),
+    "POPUR": (6, 1, None),
+    "PUSHAUR": (59, 6, None),
+    "POPAUR": (59, 6, None),
+    # Control flow
+    "BTP": (1, 0, None),
+    "JCCUR": (1, 0, "cond"),
+    "JCCUI": (1, 0, "cond"),
+    "BCCSR": (1, 0, "cond"),
+    "BCCSO": (1, 0, "cond"),
+    "BALSO": (1, 0, "always"),
+    # Calls: SSP -= 2, push LR, LR = PC, jump
+    "JSRUR": (4, 1, "always"),
+    "JSRUI": (4, 1, "always"),
+    "BSRSR": (4, 1, "always"),
+    "BSRSO": (4, 1, "always"),
+    # Returns: SSP += 2, pop LR, jump LR+1
+    "RET": (3, 1, "always"),
+    "KRET": (3, 1, "always"),
+    # Trap entry redirects fetch like a taken branch
+    "SYSCALL": (1, 0, "always"),
+}
+
+# Built-in math macros spin on STATUS with this sequence (`BCCso EQ, .-2`)
+_MATH_POLL = ("CSRRD", "ANDUI", "BCCSO")
+
+
+@dataclass(frozen=True)
+class Cost:
+    uops: int  # micro-ops issued
+    cycles: int  # cycles when not taken (or for non-branches)
+    taken: Optional[int] = None  # cycles when the branch is taken, if it can branch
+
+    def __str__(self) -> str:
+        if self.taken is None:
+            return str(self.cycles)
+        if self.taken == self.cycles:
+            return str(self.cycles)
+        return f"{self.cycles}/{self.taken}"
+
+    @property
+    def worst(self) -> int:
+        return self.cycles if self.taken is None else max(self.cycles, self.taken)
+
+
+def estimate(mnemonic: str, operands: Sequence[str] = ()) -> Cost:
+    """Estimate the cost of one ISA instruction.
+
+    `operands` is only consulted for the condition code of conditional
+    branches, so that always-true conditions are reported as taken.
+    """
+    uops, mem, kind = _TABLE.get(mnemonic.upper(), (1, 0, None))
+    base = uops + mem * MEM_STALL
+    if kind is None:
+        return Cost(uops, base)
+    taken = base + BRANCH_PENALTY
+    if kind == "cond" and not (operands and operands[0].strip().upper() in _ALWAYS_CC):
+        return Cost(uops, base, taken)
+    return Cost(uops, taken, taken)
+
+
+def poll_iterations(ready: int = MATH_READY) -> int:
+    """Number of STATUS reads a math macro makes before it sees READY.
+
+    The first CSRRD issues right after the CTRL write; every not-ready pass
+    costs three instructions plus a taken-branch flush.
+    """
+    loop = len(_MATH_POLL) + BRANCH_PENALTY
+    wait = max(0, ready - 1)
+    return 1 + (wait + loop - 1) // loop
+
+
+def macro_cost(expansion: Sequence[Tuple[str, Sequence[str]]]) -> Cost:
+    """Estimated cost of one built-in macro expansion.
+
+    `expansion` lists the emitted (mnemonic, operands) pairs. Straight-line
+    code is summed; an async-math poll loop is costed as `poll_iterations()`
+    passes, all but the last taken. A final conditional jump (JCCui) keeps
+    its taken/not-taken split.
+    """
+    mnems = [m for m, _ in expansion]
+    uops = 0
+    cycles = 0
+    taken: Optional[int] = None
+    i = 0
+    while i < len(expansion):
+        if tuple(mnems[i:i + 3]) == _MATH_POLL:
+            iters = poll_iterations()
+            uops += iters * len(_MATH_POLL)
+            cycles += iters * len(_MATH_POLL) + (iters - 1) * BRANCH_PENALTY
+            i += len(_MATH_POLL)
+            continue
+        c = estimate(*expansion[i])
+        uops += c.uops
+        if c.taken is not None and c.taken != c.cycles:
+            taken = cycles + c.taken
+        cycles += c.cycles
+        i += 1
+    if taken is not None:
+        # Only the last word of a built-in macro can branch
+        return Cost(uops, cycles, taken)
+    return Cost(uops, cycles)
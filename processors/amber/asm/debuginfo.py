@@ -0,0 +1,133 @@
+"""Source-line debug info: line-mapping directives and the line table.
+
+Compilers that target the assembler (Skald) mark where their code comes from:
+
+    .file 1, "calls.skald"   ; file number -> source path
+    .func add                ; function of the code that follows
+    .loc 1, 3, 5             ; file, line, column of the code that follows
+
+`Assembler` resolves them into a `LineTable`: address ranges with the
+(file, line, column, function) in effect when their words were emitted.
+Built-in macros are covered as a whole; data directives and code before
+the first `.loc` are not.
+
+The side file written by `LineTable.write` is text, one range per line:
+
+    ; amber lines v1
+    file 1 calls.skald
+    func 0 add
+    ; START COUNT FILE LINE COL FUNC
+    000000 3 1 2 1 0
+
+START is the hex word address, COUNT the number of words and FUNC an index
+into the `func` records (-1 for none).
+"""
+from __future__ import annotations
+
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, TextIO
+
+HEADER = "; amber lines v1"
+
+
+@dataclass
+class LineRange:
+    start: int  # word address of the first word
+    count: int
+    file: int
+    line: int
+    col: int
+    func: int  # index into LineTable.funcs, -1 if none
+
+
+@dataclass(frozen=True)
+class SourceLoc:
+    file: str
+    line: int
+    col: int
+    function: Optional[str]
+
+    def __str__(self) -> str:
+        return f"{self.file}:{self.line}"
+
+
+class LineTable:
+    """Address ranges -> source positions."""
+
+    def __init__(self) -> None:
+        self.files: Dict[int, str] = {}
+        self.funcs: List[str] = []
+        self.ranges: List[LineRange] = []
+        self._func_index: Dict[str, int] = {}
+        self._starts: Optional[List[int]] = None
+
+    def __len__(self) -> int:
+        return len(self.ranges)
+
+    def func_index(self, name: str) -> int:
+        i = self._func_index.get(name)
+        if i is None:
+            i = self._func_index[name] = len(self.funcs)
+            self.funcs.append(name)
+        return i
+
+    def add(self, start: int, count: int, file: int, line: int, col: int, func: int = -1) -> None:
+        """Map `count` words at `start`; extends the last range when contiguous and equal."""
+        if count <= 0:
+            return
+        last = self.ranges[-1] if self.ranges else None
+        if (last is not None and last.start + last.count == start
+                and (last.file, last.line, last.col, last.func) == (file, line, col, func)):
+            last.count += count
+        else:
+            self.ranges.append(LineRange(start, count, file, line, col, func))
+        self._starts = None
+
+    def lookup(self, addr: int) -> Optional[SourceLoc]:
+        if self._starts is None:
+            self.ranges.sort(key=lambda r: r.start)
+            self._starts = [r.start for r in self.ranges]
+        i = bisect_right(self._starts, addr) - 1
+        if i < 0 or addr >= self.ranges[i].start + self.ranges[i].count:
+            return None
+        r = self.ranges[i]
+        return SourceLoc(self.files.get(r.file, f"<file {r.file}>"), r.line, r.col,
+                         self.funcs[r.func] if r.func >= 0 else None)
+
+    # --- Side file ---------------------------------------------------------------
+    def write(self, fp: TextIO) -> int:
+        """Write the table; returns the number of ranges."""
+        fp.write(HEADER + "\n")
+        for n, path in sorted(self.files.items()):
+            fp.write(f"file {n} {path}\n")
+        for i, name in enumerate(self.funcs):
+            fp.write(f"func {i} {name}\n")
+        fp.write("; START COUNT FILE LINE COL FUNC\n")
+        for r in self.ranges:
+            fp.write(f"{r.start:06X} {r.count} {r.file} {r.line} {r.col} {r.func}\n")
+        return len(self.ranges)
+
+    @classmethod
+    def read(cls, lines: Iterable[str]) -> "LineTable":
+        table = cls()
+        for lineno, raw in enumerate(lines, start=1):
+            line = raw.strip()
+            if lineno == 1 and line != HEADER:
+                raise ValueError("not an Amber line table")
+            if not line or line.startswith(";"):
+                continue
+            try:
+                if line.startswith("file "):
+                    _, n, path = line.split(None, 2)
+                    table.files[int(n)] = path
+                elif line.startswith("func "):
+                    _, i, name = line.split(None, 2)
+                    if int(i) != table.func_index(name):
+                        raise ValueError
+                else:
+                    start, count, file, ln, col, func = line.split()
+                    table.ranges.append(LineRange(int(start, 16), int(count), int(file), int(ln), int(col), int(func)))
+            except ValueError:
+                raise ValueError(f"bad line table record at line {lineno}: '{line}'") from None
+        return table
@@ -41,8 +41,8 @@ next:
     MOVDur AR2, DR3, H
 
     ; CSR access (24-bit CSR file with 8-bit index)
-    CSRRD #0x04, DR0      ; read CYCLE_L into DR0
-    CSRWR DR0, #0x04      ; write it back (no-op demonstration)
+    CSRRD #CYCLE_L, DR0   ; read the cycle counter (bits 23:0) into DR0
+    CSRWR DR0, #CYCLE_L   ; write it back (ignored: the counters are read-only)
 
     ; Software interrupt to absolute handler using macro
     SWIui handler
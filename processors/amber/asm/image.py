@@ -0,0 +1,141 @@
+"""Word-image packing and writers for assembler output.
+
+Images are held as `array('I')` (one machine word per 24-bit BAU). Packing
+works on whole arrays with C-level slicing instead of per-word Python code:
+the array's little-endian 32-bit bytes are strided down to 3 bytes per word
+for `bin`, and to big-endian byte triples rendered by `bytes.hex` for `hex`.
+Writers stream fixed-size chunks to a file object, or pack straight into a
+writable buffer such as an `mmap`, so large images are never held twice.
+"""
+from __future__ import annotations
+
+from array import array
+from pathlib import Path
+from typing import BinaryIO, Iterable, List
+import mmap
+import sys
+
+
+# Typecode with 4-byte items (array 'I' is 4 bytes on all mainstream targets)
+WORD_TYPECODE = 'I' if array('I').itemsize == 4 else 'L'
+# Words per chunk for streaming writers (192 KiB of bin output)
+CHUNK_WORDS = 1 << 16
+
+
+def new_words() -> "array[int]":
+    return array(WORD_TYPECODE)
+
+
+def as_words(words: Iterable[int]) -> "array[int]":
+    """Return `words` as a word array, masking to 24 bits only when needed."""
+    if isinstance(words, array) and words.typecode == WORD_TYPECODE:
+        return words
+    try:
+        return array(WORD_TYPECODE, words)
+    except (OverflowError, TypeError):
+        return array(WORD_TYPECODE, (w & 0xFFFFFF for w in words))
+
+
+def _le32(words: "array[int]") -> bytes:
+    if sys.byteorder == 'little':
+        return words.tobytes()
+    w = array(WORD_TYPECODE, words)
+    w.byteswap()
+    return w.tobytes()
+
+
+def pack_into(words: Iterable[int], buf, offset: int = 0) -> int:
+    """Pack words little-endian, 3 bytes each, into `buf` at byte `offset`.
+
+    `buf` is any writable byte buffer (bytearray, mmap, memoryview). Returns
+    the number of bytes written.
+    """
+    w = as_words(words)
+    n = len(w)
+    raw = _le32(w)
+    mv = memoryview(buf)
+    try:
+        view = mv.cast('B') if mv.format != 'B' or mv.ndim != 1 else mv
+        try:
+            end = offset + 3 * n
+            if end > len(view):
+                raise ValueError(f"buffer too small: need {end} bytes, have {len(view)}")
+            view[offset:end:3] = raw[0::4]
+            view[offset + 1:end:3] = raw[1::4]
+            view[offset + 2:end:3] = raw[2::4]
+        finally:
+            if view is not mv:
+                view.release()
+    finally:
+        mv.release()
+    return 3 * n
+
+
+def pack_bin(words: Iterable[int]) -> bytes:
+    # Little-endian per word: [low, mid, high]
+    w = as_words(words)
+    out = bytearray(3 * len(w))
+    pack_into(w, out)
+    return bytes(out)
+
+
+def pack_hex(words: Iterable[int]) -> str:
+    # One 6-hex-digit word per line, uppercase
+    w = as_words(words)
+    raw = _le32(w)
+    be = bytearray(3 * len(w))
+    be[0::3] = raw[2::4]
+    be[1::3] = raw[1::4]
+    be[2::3] = raw[0::4]
+    return be.hex('\n', 3).upper() + "\n"
+
+
+def write_bin(words: Iterable[int], fp: BinaryIO) -> int:
+    """Stream a flat binary image to `fp` in chunks; returns words written."""
+    w = as_words(words)
+    for i in range(0, len(w), CHUNK_WORDS):
+        fp.write(pack_bin(w[i:i + CHUNK_WORDS]))
+    return len(w)
+
+
+def write_hex(words: Iterable[int], fp: BinaryIO) -> int:
+    """Stream a `$readmemh` hex image (one word per line) to `fp`."""
+    w = as_words(words)
+    if not w:
+        fp.write(b"\n")
+    for i in range(0, len(w), CHUNK_WORDS):
+        fp.write(pack_hex(w[i:i + CHUNK_WORDS]).encode("ascii"))
+    return len(w)
+
+
+def write_segments_hex(segments: List, fp: BinaryIO) -> int:
+    """Stream sparse hex: `@ADDR` then the segment's words, per segment."""
+    if not segments:
+        fp.write(b"\n")
+    total = 0
+    for sg in segments:
+        fp.write(f"@{sg.addr:X}\n".encode("ascii"))
+        total += write_hex(sg.words, fp)
+    return total
+
+
+def write_bin_mmap(words: Iterable[int], path: Path) -> int:
+    """Write a flat binary image by packing directly into a mapped file."""
+    w = as_words(words)
+    size = 3 * len(w)
+    with open(path, "w+b") as fp:
+        if size == 0:
+            return 0
+        fp.truncate(size)
+        with mmap.mmap(fp.fileno(), size) as mm:
+            pack_into(w, mm)
+    return len(w)
+
+
+def write_image(path: Path, words: Iterable[int], fmt: str) -> int:
+    """Write `words` to `path` as `bin` (memory-mapped) or `hex` (streamed)."""
+    if fmt == "bin":
+        return write_bin_mmap(words, path)
+    with open(path, "wb") as fp:
+        return write_hex(words, fp)
+
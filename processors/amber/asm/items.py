@@ -0,0 +1,140 @@
+"""Structured assembly: instructions with typed operands, for code generators.
+
+A compiler builds a list of items instead of assembly text:
+
+    [Func("main"), Label("main"), Instr("MOVui", (Imm(5), Reg("DR1"))),
+     Instr("BCCso", (Cond("EQ"), Sym("done"))), ...]
+
+and `Assembler.assemble_items` encodes them through `InstructionSpec`
+without splitting, comment stripping, include/macro expansion or operand
+parsing. Operands follow the assembly operand order. `render` gives the
+assembly line of an item, so the same list can still be dumped as `.asm`
+(and assembled from that text to the same words).
+
+Built-in macros (`JSRui`, `DIVU24`, ...) and `.equ` are text-only; items
+cover what a code generator emits.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Iterable, List, Tuple, Union
+
+
+# --- Operands ----------------------------------------------------------------------
+@dataclass(frozen=True)
+class Reg:
+    name: str  # DR0..DR15, AR0..AR3, SR0..SR3 or LR/SSP/FL/PC
+
+
+@dataclass(frozen=True)
+class Sym:
+    """A label (or built-in symbol) address, plus `addend`."""
+
+    name: str
+    addend: int = 0
+
+
+@dataclass(frozen=True)
+class Imm:
+    value: Union[int, Sym]  # `#5`, or `#label` (a symbol used as an immediate)
+
+
+@dataclass(frozen=True)
+class Cond:
+    name: str  # EQ, NE, ... (spec.CC_MAP)
+
+
+@dataclass(frozen=True)
+class Half:
+    name: str  # H or L
+
+
+HIGH, LOW = Half("H"), Half("L")
+
+Operand = Union[Reg, Imm, Sym, Cond, Half]
+
+
+# --- Items -------------------------------------------------------------------------
+@dataclass
+class Instr:
+    mnemonic: str  # as written, e.g. "MOVui"; looked up case-insensitively
+    operands: Tuple[Operand, ...] = ()
+
+
+@dataclass
+class Label:
+    name: str
+
+
+@dataclass
+class Data:
+    values: Tuple[Union[Imm, Sym], ...]  # one 24-bit word each (.dw24)
+
+
+@dataclass
+class Org:
+    addr: int
+
+
+@dataclass
+class File:
+    index: int
+    path: str
+
+
+@dataclass
+class Func:
+    name: str
+
+
+@dataclass
+class Loc:
+    file: int
+    line: int
+    col: int = 0
+
+
+@dataclass
+class Comment:
+    text: str
+
+
+Item = Union[Instr, Label, Data, Org, File, Func, Loc, Comment]
+
+
+# --- Text --------------------------------------------------------------------------
+def render_operand(op: Operand) -> str:
+    if isinstance(op, Imm):
+        return f"#{op.value}" if isinstance(op.value, int) else f"#{render_operand(op.value)}"
+    if isinstance(op, Sym):
+        if op.addend:
+            return f"{op.name}{op.addend:+d}"
+        return op.name
+    return op.name
+
+
+def render(item: Item) -> str:
+    """The assembly line for `item`."""
+    if isinstance(item, Instr):
+        if not item.operands:
+            return f"    {item.mnemonic}"
+        return f"    {item.mnemonic} " + ", ".join(map(render_operand, item.operands))
+    if isinstance(item, Label):
+        return f"{item.name}:"
+    if isinstance(item, Data):
+        return "    .dw24 " + ", ".join(map(render_operand, item.values))
+    if isinstance(item, Org):
+        return f"    .org {item.addr}"
+    if isinstance(item, File):
+        return f'    .file {item.index}, "{item.path}"'
+    if isinstance(item, Func):
+        return f"    .func {item.name}"
+    if isinstance(item, Loc):
+        return f"    .loc {item.file}, {item.line}, {item.col}"
+    if isinstance(item, Comment):
+        return f"    ; {item.text}"
+    raise TypeError(f"not an assembly item: {item!r}")
+
+
+def render_lines(items: Iterable[Item]) -> List[str]:
+    return [render(item) for item in items]
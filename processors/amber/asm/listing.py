@@ -0,0 +1,178 @@
+"""Listing and map output for the Amber assembler.
+
+Both are built from the assembler's IR after a successful assembly: each
+instruction, built-in macro and data directive keeps its word address and
+source text, user macro expansions keep the chain of macros they came from,
+and built-in macros record the words they emitted. Instructions are
+annotated with static cycle estimates from `cycles.py`.
+
+The listing shows one row per emitted source line (built-in macros also list
+their expanded words); the map lists segments, labels with the size and
+straight-line cycle cost of the code up to the next label, `.equ` constants
+and per-macro totals.
+"""
+from __future__ import annotations
+
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, TextIO, Tuple
+
+from . import cycles
+from .assembler import Assembler, IRDirective, IRInstruction, IRMacro
+from .builtins import BUILTIN_SYMBOLS
+
+
+@dataclass
+class ListingRow:
+    addr: int  # word address of the first word (or the .org target)
+    words: List[int]  # encoded words, empty for non-emitting directives
+    text: str  # source line as assembled (after macro expansion)
+    macros: Tuple[str, ...] = ()  # user macros this line was expanded from
+    cost: Optional[cycles.Cost] = None
+    builtin: Optional[str] = None  # built-in macro kind, e.g. 'JSRUI', 'DIVU24'
+    # Built-in macros: (mnemonic + operands, cost) per emitted word
+    expansion: List[Tuple[str, cycles.Cost]] = field(default_factory=list)
+
+
+class _WordReader:
+    """Random access to the words of a segment list by word address."""
+
+    def __init__(self, asm: Assembler) -> None:
+        self._segs = asm.segments
+        self._starts = [sg.addr for sg in self._segs]
+
+    def read(self, addr: int, n: int) -> List[int]:
+        i = bisect_right(self._starts, addr) - 1
+        if i < 0 or n <= 0:
+            return []
+        sg = self._segs[i]
+        off = addr - sg.addr
+        return list(sg.words[off:off + n])
+
+
+def build_listing(asm: Assembler) -> List[ListingRow]:
+    """Return listing rows for the last assembly done by `asm`."""
+    reader = _WordReader(asm)
+    rows: List[ListingRow] = []
+    for item in asm.ir:
+        chain = asm.macro_chain(item)
+        if isinstance(item, IRInstruction):
+            rows.append(ListingRow(
+                item.addr, reader.read(item.addr, 1), item.src_line, chain,
+                cycles.estimate(item.mnemonic, item.operands),
+            ))
+        elif isinstance(item, IRMacro):
+            exp = [
+                (f"{mn} {', '.join(ops)}".rstrip(), cycles.estimate(mn, ops))
+                for mn, ops in item.expansion
+            ]
+            rows.append(ListingRow(
+                item.addr, reader.read(item.addr, len(item.expansion)), item.src_line,
+                chain, cycles.macro_cost(item.expansion), item.kind, exp,
+            ))
+        elif isinstance(item, IRDirective):
+            n = len(item.args) if item.name in ('dw24', 'diad') else 0
+            rows.append(ListingRow(item.addr, reader.read(item.addr, n), item.src_line, chain))
+    return rows
+
+
+def _labels_by_addr(asm: Assembler) -> Dict[int, List[str]]:
+    out: Dict[int, List[str]] = {}
+    for name in asm.labels:
+        out.setdefault(asm.symbols[name], []).append(name)
+    return out
+
+
+def write_listing(asm: Assembler, fp: TextIO) -> None:
+    """Write a human-readable listing of the last assembly to `fp`."""
+    rows = build_listing(asm)
+    labels = _labels_by_addr(asm)
+    fp.write("; ADDR   WORD    CYCLES  SOURCE\n")
+    fp.write(f"; cycles: static estimate, a/b = not taken/taken; "
+             f"load/store +{cycles.MEM_STALL}, taken branch +{cycles.BRANCH_PENALTY}\n")
+    shown = set()
+    for r in rows:
+        names = labels.get(r.addr)
+        if names and r.addr not in shown and (r.words or r.cost is not None):
+            shown.add(r.addr)
+            for nm in names:
+                fp.write(f"{'':24}{nm}:\n")
+        src = r.text.strip()
+        if r.macros:
+            src = f"{src:<40} ; in {' > '.join(r.macros)}"
+        cyc = "" if r.cost is None else str(r.cost)
+        # Built-in macros list their words on the expansion lines below
+        first = f"{r.words[0]:06X}" if r.words and not r.expansion else ""
+        fp.write(f"{r.addr:06X}  {first:6}  {cyc:>6}  {src}\n")
+        if r.expansion:
+            for k, (text, c) in enumerate(r.expansion):
+                w = f"{r.words[k]:06X}" if k < len(r.words) else ""
+                fp.write(f"{r.addr + k:06X}  {w:6}  {str(c):>6}  + {text}\n")
+        elif len(r.words) > 1:
+            for k in range(1, len(r.words)):
+                fp.write(f"{r.addr + k:06X}  {r.words[k]:06X}\n")
+    for addr in sorted(set(labels) - shown):
+        for nm in labels[addr]:
+            fp.write(f"{addr:06X}{'':18}{nm}:\n")
+
+
+def write_map(asm: Assembler, fp: TextIO) -> None:
+    """Write segments, symbols and per-label/per-macro cost totals to `fp`."""
+    rows = build_listing(asm)
+    labels = _labels_by_addr(asm)
+    label_set = set(asm.labels)
+
+    fp.write("; Segments\n")
+    for sg in asm.segments:
+        end = sg.addr + len(sg.words) - 1
+        fp.write(f"{sg.addr:06X}-{end:06X}  {len(sg.words):7} words\n")
+
+    # Code regions: from each label to the next label, in address order
+    code = sorted((r for r in rows if r.cost is not None), key=lambda r: r.addr)
+    starts = sorted(labels)
+    region: Dict[int, List[int]] = {a: [0, 0, 0] for a in starts}  # words, cycles, worst
+    for r in code:
+        i = bisect_right(starts, r.addr) - 1
+        if i < 0:
+            continue
+        acc = region[starts[i]]
+        acc[0] += len(r.words)
+        acc[1] += r.cost.cycles
+        acc[2] += r.cost.worst
+    fp.write("\n; Labels: ADDR  NAME  WORDS  CYCLES (fall-through / worst, straight line to next label)\n")
+    for a in starts:
+        words, cyc, worst = region[a]
+        for nm in labels[a]:
+            fp.write(f"{a:06X}  {nm:<32} {words:6}  {cyc:6} / {worst}\n")
+
+    consts = sorted(
+        (n, v) for n, v in asm.symbols.items()
+        if n not in label_set and BUILTIN_SYMBOLS.get(n) != v
+    )
+    if consts:
+        fp.write("\n; Constants (.equ)\n")
+        for n, v in consts:
+            fp.write(f"{n:<32} = 0x{v:X}\n")
+
+    # User macros (inclusive of nested calls) and built-in macros
+    per_macro: Dict[str, List[int]] = {}
+    for r in rows:
+        if r.cost is None:
+            continue
+        keys = list(dict.fromkeys(r.macros))
+        if r.builtin is not None:
+            keys.append(r.builtin)
+        for k in keys:
+            acc = per_macro.setdefault(k, [0, 0])
+            acc[0] += len(r.words)
+            acc[1] += r.cost.cycles
+    if per_macro:
+        fp.write("\n; Macros: NAME  WORDS  CYCLES (all expansions)\n")
+        for k in sorted(per_macro):
+            words, cyc = per_macro[k]
+            fp.write(f"{k:<32} {words:6}  {cyc:6}\n")
+
+
+def write_lines(asm: Assembler, fp: TextIO) -> None:
+    """Write the address -> source line table (`debuginfo`) from `.loc` directives."""
+    asm.line_table.write(fp)
@@ -0,0 +1,98 @@
+"""Pre-tokenized user macro templates for the Amber assembler.
+
+A macro body is tokenized once, when the macro is defined: `.local` lines are
+removed, and every `{param}` placeholder and every whole-word use of a local
+name becomes a slot. Expanding the macro then only joins literal text with the
+call's arguments and the per-expansion local names, instead of running one
+regex substitution per local per line.
+
+Errors are raised as ValueError; the assembler wraps them into AsmError.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import List, Optional, Pattern, Union
+import re
+
+
+PARAM_RE = re.compile(r"\{\s*([A-Za-z_][A-Za-z0-9_]*)\s*\}")
+
+# One template line: literal strings and integer slots. Slot i < nparams is
+# argument i; slot nparams + j is local j.
+Part = Union[str, int]
+
+
+@dataclass
+class MacroTemplate:
+    name: str  # uppercase
+    params: List[str]  # uppercase
+    locals: List[str]
+    lines: List[List[Part]]
+    # First `{name}` in the body that is not a parameter (reported on use)
+    unknown_param: Optional[str] = None
+    # Matches local names as whole words (applied to arguments, see below)
+    local_re: Optional[Pattern[str]] = None
+
+    def instantiate(self, args: List[str], uid: str) -> List[str]:
+        """Return the body lines for one expansion; `uid` suffixes locals."""
+        if self.unknown_param is not None:
+            raise ValueError(f"Unknown macro parameter '{{{self.unknown_param}}}' in {self.name}")
+        if self.local_re is not None:
+            # Locals are renamed after parameter substitution, so a local name
+            # passed in as an argument is renamed as well
+            args = [self.local_re.sub(lambda m: m.group(0) + uid, a) for a in args]
+        vals = args + [nm + uid for nm in self.locals]
+        return ["".join(p if p.__class__ is str else vals[p] for p in parts) for parts in self.lines]
+
+
+def compile_macro(name: str, params: List[str], body: List[str]) -> MacroTemplate:
+    pkeys = [p.strip().upper() for p in params]
+    pindex = {k: i for i, k in enumerate(pkeys)}
+
+    # Collect .local names and drop those lines from the body
+    local_names: List[str] = []
+    kept: List[str] = []
+    for raw in body:
+        line = raw.split(';', 1)[0].strip()
+        if line.lower().startswith('.local'):
+            rest = line[len('.local'):].strip()
+            # Accept comma or space separated
+            for seg in rest.split(','):
+                for nm in seg.split():
+                    if nm not in local_names:
+                        local_names.append(nm)
+            continue  # do not keep .local in output
+        kept.append(raw)
+
+    local_re: Optional[Pattern[str]] = None
+    if local_names:
+        alts = "|".join(re.escape(n) for n in sorted(local_names, key=len, reverse=True))
+        local_re = re.compile(rf"\b(?:{alts})\b")
+        token_re = re.compile(rf"{PARAM_RE.pattern}|\b({alts})\b")
+    else:
+        token_re = PARAM_RE
+    lindex = {n: len(pkeys) + j for j, n in enumerate(local_names)}
+
+    unknown: Optional[str] = None
+    lines: List[List[Part]] = []
+    for raw in kept:
+        parts: List[Part] = []
+        pos = 0
+        for m in token_re.finditer(raw):
+            if m.start() > pos:
+                parts.append(raw[pos:m.start()])
+            if m.group(1) is not None:
+                key = m.group(1).upper()
+                if key in pindex:
+                    parts.append(pindex[key])
+                else:
+                    if unknown is None:
+                        unknown = m.group(1)
+                    parts.append(m.group(0))
+            else:
+                parts.append(lindex[m.group(2)])
+            pos = m.end()
+        if pos < len(raw):
+            parts.append(raw[pos:])
+        lines.append(parts)
+    return MacroTemplate(name.upper(), pkeys, local_names, lines, unknown, local_re)
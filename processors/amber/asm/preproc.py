@@ -0,0 +1,142 @@
+"""Preprocessor cache for the Amber assembler.
+
+Each source file reachable through `.include` is scanned once into a
+`SourceUnit`: its lines with `.include` directives split out as references and
+its `.macro` definitions already parsed. Units are keyed by resolved path and
+validated by (mtime, size), falling back to a content hash, so touching a file
+without changing it does not force a rescan. Fully expanded include bodies are
+memoized per unit together with the digests of every file they pulled in; a
+change in one leaf only rescans that leaf and re-joins its ancestors.
+
+The cache can be persisted as JSON between runs (see `load`/`save`).
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from hashlib import sha1
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+import json
+
+from .macro import MacroTemplate
+
+
+CACHE_VERSION = 1
+
+
+@dataclass
+class IncludeRef:
+    spec: str  # include argument as written (quotes/brackets removed)
+    label: Optional[str]  # call-site label on the .include line, if any
+
+
+@dataclass
+class MacroDef:
+    name: str  # as written; registered case-insensitively
+    params: List[str]
+    body: List[str]
+    lineno: int  # line of the .macro directive within its file
+    template: Optional[MacroTemplate] = None  # compiled on first use, not persisted
+
+
+@dataclass
+class SourceUnit:
+    digest: str
+    once: bool  # file contains `.once`
+    missing_final_nl: bool  # text lacked a final newline (expansion adds one, as before)
+    items: List[Union[str, IncludeRef]]
+    macros: List[MacroDef] = field(default_factory=list)
+    # Memoized expansion: text plus (path, digest) for every file pulled in
+    expanded: Optional[str] = None
+    expanded_macros: Optional[List[MacroDef]] = None
+    expanded_deps: Optional[List[Tuple[str, str]]] = None
+
+
+def digest_bytes(data: bytes) -> str:
+    return sha1(data).hexdigest()
+
+
+class PreprocessCache:
+    """Path-keyed store of scanned source units."""
+
+    def __init__(self) -> None:
+        self._units: Dict[str, Tuple[Tuple[int, int], SourceUnit]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._units)
+
+    def clear(self) -> None:
+        self._units.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, path: Path) -> Tuple[Optional[SourceUnit], Optional[bytes]]:
+        """Return (unit, None) if the cached unit for `path` is current.
+
+        Otherwise return (None, data) with the file contents already read, so
+        the caller can rescan without a second read. Raises OSError if the
+        file cannot be read.
+        """
+        key = str(path)
+        st = path.stat()
+        stamp = (st.st_mtime_ns, st.st_size)
+        ent = self._units.get(key)
+        if ent is not None and ent[0] == stamp:
+            self.hits += 1
+            return ent[1], None
+        data = path.read_bytes()
+        if ent is not None and ent[1].digest == digest_bytes(data):
+            # Touched but unchanged: refresh the stamp and keep the unit
+            self._units[key] = (stamp, ent[1])
+            self.hits += 1
+            return ent[1], None
+        self.misses += 1
+        return None, data
+
+    def store(self, path: Path, unit: SourceUnit) -> None:
+        st = path.stat()
+        self._units[str(path)] = ((st.st_mtime_ns, st.st_size), unit)
+
+    # ---- Persistence ----------------------------------------------------------
+    def save(self, path: Path) -> None:
+        units = {}
+        for key, (stamp, u) in self._units.items():
+            units[key] = {
+                "stamp": list(stamp),
+                "digest": u.digest,
+                "once": u.once,
+                "missing_final_nl": u.missing_final_nl,
+                "items": [
+                    it if isinstance(it, str) else {"spec": it.spec, "label": it.label}
+                    for it in u.items
+                ],
+                "macros": [[m.name, m.params, m.body, m.lineno] for m in u.macros],
+            }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({"version": CACHE_VERSION, "units": units}), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: Path) -> "PreprocessCache":
+        """Load a cache saved by `save`; a missing or stale file yields an empty cache."""
+        cache = cls()
+        try:
+            doc = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return cache
+        if not isinstance(doc, dict) or doc.get("version") != CACHE_VERSION:
+            return cache
+        for key, u in doc.get("units", {}).items():
+            items: List[Union[str, IncludeRef]] = [
+                it if isinstance(it, str) else IncludeRef(it["spec"], it["label"])
+                for it in u["items"]
+            ]
+            macros = [MacroDef(n, p, b, ln) for n, p, b, ln in u["macros"]]
+            unit = SourceUnit(u["digest"], u["once"], u["missing_final_nl"], items, macros)
+            cache._units[key] = ((u["stamp"][0], u["stamp"][1]), unit)
+        return cache
+
+
+# Shared by all Assembler instances unless one is passed explicitly
+DEFAULT_CACHE = PreprocessCache()
@@ -0,0 +1,347 @@
+"""Warm assembler/compiler server for build systems.
+
+Starting Python and importing the assembler costs more than assembling a
+small file. `serve` keeps one process warm (assembler, spec table and Skald
+compiler imported, preprocessor cache filled) and runs CLI invocations sent
+over a Unix domain socket; `request` is the client side. A request is one
+JSON line
+
+    {"tool": "asm" | "skald" | "amber_asm", "argv": [...], "cwd": "/abs/dir"}
+
+and the reply one JSON line `{"code": N, "stdout": "...", "stderr": "..."}`:
+what `python -m processors.amber.asm ARGV` (`skald`, or
+`tools/amber_asm.py`) would exit with and print when run in `cwd`.
+Requests run one at a time, since they chdir and redirect stdout/stderr.
+`{"tool": "stop"}` shuts the server down.
+
+    python -m processors.amber.asm.server serve &
+    python -m processors.amber.asm.server asm prog.asm -o prog.hex
+    AMBER_SERVER=/tmp/amber-asm-1000.sock python tools/amber_asm.py prog.asm
+    python -m processors.amber.asm.server bench prog.asm
+
+`tools/amber_asm.py` forwards to `$AMBER_SERVER` and runs in-process when
+nothing listens there. `bench` compares cold CLI runs with served ones and
+lists the slowest imports (`python -X importtime`).
+
+Until it serves, this module imports only the standard library, so clients
+start as fast as Python does.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Server and benchmark modules are imported where used: a client needs none of them
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+# Tool name -> module (dotted) or script (relative to ROOT) whose main(argv) runs it
+TOOLS = {
+    "asm": "processors.amber.asm.__main__",
+    "skald": "processors.amber.skald.__main__",
+    "amber_asm": "tools/amber_asm.py",
+}
+ENV = "AMBER_SERVER"
+_MODULE = "processors.amber.asm.server"  # for `python -m`, also when run as __main__
+
+_mains: Dict[str, Callable] = {}
+
+
+def default_socket() -> str:
+    """`$AMBER_SERVER`, else a per-user socket in the temp directory."""
+    if os.environ.get(ENV):
+        return os.environ[ENV]
+    import getpass
+    import tempfile
+
+    return os.path.join(tempfile.gettempdir(), f"amber-asm-{getpass.getuser()}.sock")
+
+
+# --- Client ----------------------------------------------------------------------
+def request(path: str, tool: str, argv: List[str], cwd: Optional[str] = None) -> Tuple[int, str, str]:
+    """Run `tool argv` on the server at `path`: (exit code, stdout, stderr).
+
+    Raises OSError when no server listens there.
+    """
+    msg = {"tool": tool, "argv": list(argv), "cwd": cwd or os.getcwd()}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.connect(path)
+        s.sendall(json.dumps(msg).encode() + b"\n")
+        with s.makefile("rb") as fp:
+            line = fp.readline()
+    if not line:
+        raise ConnectionError(f"{path}: server closed the connection")
+    rep = json.loads(line)
+    return rep["code"], rep["stdout"], rep["stderr"]
+
+
+def forward(path: str, tool: str, argv: List[str]) -> Optional[int]:
+    """Run `tool` on the server and print its output; None when it is not running."""
+    try:
+        code, out, err = request(path, tool, argv)
+    except (FileNotFoundError, ConnectionRefusedError):
+        return None
+    sys.stdout.write(out)
+    sys.stderr.write(err)
+    return code
+
+
+def stop(path: str) -> bool:
+    """Ask the server at `path` to exit; False when none is running."""
+    try:
+        request(path, "stop", [])
+    except (FileNotFoundError, ConnectionRefusedError):
+        return False
+    return True
+
+
+# --- Server ----------------------------------------------------------------------
+def _main(tool: str) -> Callable:
+    from importlib import import_module, util
+
+    main = _mains.get(tool)
+    if main is None:
+        target = TOOLS[tool]
+        if target.endswith(".py"):
+            spec = util.spec_from_file_location(f"_amber_tool_{tool}", os.path.join(ROOT, target))
+            mod = util.module_from_spec(spec)
+            spec.loader.exec_module(mod)
+        else:
+            mod = import_module(target)
+        main = _mains[tool] = mod.main
+    return main
+
+
+def run_tool(tool: str, argv: List[str], cwd: str) -> Dict[str, object]:
+    """One request, as the reply dict; the tool's failures end up in `code`/`stderr`."""
+    import io
+    import traceback
+    from contextlib import redirect_stderr, redirect_stdout
+
+    out, err = io.StringIO(), io.StringIO()
+    code = 0
+    old = os.getcwd()
+    try:
+        with redirect_stdout(out), redirect_stderr(err):
+            try:
+                os.chdir(cwd)
+                code = _main(tool)(list(argv)) or 0
+            except SystemExit as e:  # argparse errors, raise SystemExit(main())
+                if isinstance(e.code, int) or e.code is None:
+                    code = e.code or 0
+                else:
+                    print(e.code, file=sys.stderr)
+                    code = 1
+            except Exception:  # as the interpreter would report it
+                traceback.print_exc()
+                code = 1
+    finally:
+        os.chdir(old)
+    return {"code": code, "stdout": out.getvalue(), "stderr": err.getvalue()}
+
+
+def _warm() -> None:
+    for tool in TOOLS:
+        _main(tool)
+    from .assembler import Assembler
+
+    Assembler().assemble("    NOP\n")
+
+
+def _handle(conn: socket.socket, verbose: bool) -> Optional[str]:
+    """Answer the one request on `conn`: its tool, None when the client sent nothing.
+
+    Raises ValueError for a malformed request, OSError when the client went away.
+    """
+    with conn.makefile("rb") as rx:
+        line = rx.readline()
+    if not line:
+        return None
+    req = json.loads(line)
+    if not isinstance(req, dict):
+        raise ValueError(f"expected a JSON object, got {type(req).__name__}")
+    tool = req.get("tool")
+    if not isinstance(tool, str):
+        raise ValueError(f"'tool' must be a string, got {tool!r}")
+    if tool in TOOLS:
+        argv = req.get("argv", [])
+        start = time.perf_counter()
+        rep = run_tool(tool, argv, req.get("cwd") or os.getcwd())
+        if verbose:
+            print(f"{tool} {' '.join(map(str, argv))}: exit {rep['code']} "
+                  f"in {(time.perf_counter() - start) * 1e3:.1f} ms", file=sys.stderr)
+    elif tool in ("ping", "stop"):
+        rep = {"code": 0, "stdout": "", "stderr": ""}
+    else:
+        rep = {"code": 2, "stdout": "", "stderr": f"error: unknown tool '{tool}'\n"}
+    conn.sendall(json.dumps(rep).encode() + b"\n")
+    return tool
+
+
+def serve(path: str, verbose: bool = False) -> None:
+    """Serve requests on the Unix socket `path` until a stop request."""
+    if os.path.exists(path):
+        try:
+            request(path, "ping", [])
+        except (ConnectionRefusedError, ConnectionError):
+            os.unlink(path)  # stale socket of a server that died
+        else:
+            raise OSError(f"{path}: a server is already running")
+    os.environ.pop(ENV, None)  # the tools must not forward to ourselves
+    _warm()
+    srv = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        srv.bind(path)
+        os.chmod(path, 0o600)
+        srv.listen()
+        if verbose:
+            print(f"serving on {path}", file=sys.stderr)
+        served = 0
+        while True:
+            conn, _ = srv.accept()
+            tool = None
+            with conn:
+                try:
+                    tool = _handle(conn, verbose)
+                except (ValueError, OSError) as e:  # one bad or vanished client must not end the server
+                    print(f"error: request dropped: {e}", file=sys.stderr)
+                    try:
+                        conn.sendall(json.dumps({"code": 2, "stdout": "",
+                                                 "stderr": f"error: bad request: {e}\n"}).encode() + b"\n")
+                    except OSError:
+                        pass
+            if tool in TOOLS:
+                served += 1
+            elif tool == "stop":
+                break
+        if verbose:
+            print(f"served {served} requests", file=sys.stderr)
+    finally:
+        srv.close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+# --- Benchmark -------------------------------------------------------------------
+def import_times(module: str, top: int = 8) -> Tuple[int, List[Tuple[int, str]]]:
+    """Import `module` in a fresh interpreter: (total us, slowest `top` (self us, module))."""
+    import subprocess
+
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    res = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                         capture_output=True, text=True, env=env, cwd=ROOT, check=True)
+    rows = []
+    for line in res.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(own), int(cumulative), name.strip()))
+    total = sum(own for own, _, _ in rows)
+    return total, sorted(((own, name) for own, _, name in rows), reverse=True)[:top]
+
+
+def bench(tool: str, argv: List[str], n: int) -> None:
+    import subprocess
+    import tempfile
+
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    env.pop(ENV, None)
+    module = TOOLS[tool]
+    total, slow = import_times(module)
+    print(f"import {module}: {total / 1e3:.1f} ms; slowest:")
+    for own, name in slow:
+        print(f"  {own / 1e3:7.2f} ms  {name}")
+
+    cold = []
+    cmd = [sys.executable, "-m", module.rsplit(".", 1)[0]] + argv
+    for _ in range(n):
+        start = time.perf_counter()
+        subprocess.run(cmd, env=env, check=True, stdout=subprocess.DEVNULL)
+        cold.append(time.perf_counter() - start)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.sock")
+        proc = subprocess.Popen([sys.executable, "-m", _MODULE, "--socket", path, "serve"], env=env, cwd=ROOT)
+        try:
+            while not os.path.exists(path):
+                if proc.poll() is not None:
+                    raise RuntimeError("server did not start")
+                time.sleep(0.01)
+            warm = []
+            for _ in range(n):
+                start = time.perf_counter()
+                code, _, err = request(path, tool, argv)
+                warm.append(time.perf_counter() - start)
+                if code:
+                    raise RuntimeError(f"served run failed ({code}): {err.strip()}")
+            # a thin client process, as a build system would start it
+            client = []
+            cmd = [sys.executable, "-m", _MODULE, "--socket", path, tool] + argv
+            for _ in range(n):
+                start = time.perf_counter()
+                subprocess.run(cmd, env=env, check=True, stdout=subprocess.DEVNULL)
+                client.append(time.perf_counter() - start)
+        finally:
+            stop(path)
+            proc.wait()
+    for label, ts in (("cold CLI", cold), ("served, client process", client), ("served, in-process client", warm)):
+        print(f"{label:26} mean {sum(ts) / len(ts) * 1e3:7.2f} ms  min {min(ts) * 1e3:7.2f} ms  ({n} runs)")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="Warm Amber assembler/Skald compiler server and client")
+    p.add_argument("--socket", default=None, help="Unix socket (default $AMBER_SERVER or a per-user temp path)")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    sp = sub.add_parser("serve", help="Serve requests until stopped")
+    sp.add_argument("-v", "--verbose", action="store_true", help="Log every request to stderr")
+    sub.add_parser("stop", help="Stop the server")
+    for tool in TOOLS:
+        sub.add_parser(tool, help=f"Run {TOOLS[tool]} on the server with the arguments that follow")
+    sp = sub.add_parser("bench", help="Import times and cold vs served run times of one invocation")
+    sp.add_argument("--tool", choices=list(TOOLS)[:2], default="asm", help="CLI to measure")
+    sp.add_argument("-n", type=int, default=20, help="Runs of each kind")
+    sp.add_argument("args", nargs=argparse.REMAINDER, help="CLI arguments (e.g. prog.asm -o /tmp/prog.bin)")
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # everything after the tool name is the tool's (argparse would take leading options as ours)
+    at = next((i for i, tok in enumerate(argv) if tok in TOOLS and (i == 0 or argv[i - 1] != "--tool")), None)
+    args = p.parse_args(argv if at is None else argv[:at + 1])
+    if at is not None:
+        args.args = argv[at + 1:]
+    path = args.socket or default_socket()
+
+    if args.cmd == "serve":
+        try:
+            serve(path, args.verbose)
+        except KeyboardInterrupt:
+            pass
+        except OSError as e:
+            print(f"error: {e}", file=sys.stderr)
+            return 2
+        return 0
+    if args.cmd == "stop":
+        if not stop(path):
+            print(f"no server on {path}", file=sys.stderr)
+            return 1
+        return 0
+    if args.cmd == "bench":
+        import subprocess
+
+        try:
+            bench(args.tool, args.args, args.n)
+        except (OSError, RuntimeError, subprocess.CalledProcessError) as e:
+            print(f"error: {e}", file=sys.stderr)
+            return 2
+        return 0
+    code = forward(path, args.cmd, args.args)
+    if code is None:
+        print(f"error: no server on {path} (start one with `serve`)", file=sys.stderr)
+        return 2
+    return code
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
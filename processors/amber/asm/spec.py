@@ -5,8 +5,9 @@ assembler. Covers the full architectural ISA (excluding internal micro-ops in
 OPCLASS_F)."""
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Callable, Dict, List, Tuple, Optional
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Callable, Dict, List, Sequence, Tuple, Optional
 
 
 # Bit utility
@@ -106,15 +107,44 @@ def parse_imm(token: str) -> int:
         raise ValueError(f"Invalid immediate '{token}': {e}")
 
 
-@dataclass
+# Operand kind -> register/condition parser; immediates (SIMM*/IMM*/UIMM*) resolve as expressions
+_PARSERS: Dict[str, Callable[[str], int]] = {
+    "DRS": parse_dr, "DRT": parse_dr,
+    "ARS": parse_ar, "ART": parse_ar,
+    "SRS": parse_sr, "SRT": parse_sr,
+    "CC": parse_cc,
+    "HL": parse_hl,
+}
+_PC_RELATIVE = frozenset({"BCCSO", "BALSO", "BSRSR", "BSRSO", "ADRASO"})
+
+
+@dataclass(frozen=True)
 class InstructionSpec:
     mnemonic: str
     opclass: int
     subop: int
     # Ordered operand kinds as they appear in assembly text
-    operands: List[str]
+    operands: Tuple[str, ...]
     # Map of field name -> (hi, lo) bit positions in the 24-bit word
     fields: Dict[str, Tuple[int, int]]
+    # Precomputed from the above: opclass/subop bits and one step per operand
+    base: int = field(init=False, repr=False, compare=False)
+    plan: Tuple[tuple, ...] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        set_ = object.__setattr__
+        set_(self, "operands", tuple(self.operands))
+        set_(self, "base", (self.opclass & 0xF) << 20 | (self.subop & 0xF) << 16)
+        plan = []
+        for kind in self.operands:
+            # (kind, parser or None for an immediate, hi, lo, signed); errors are raised by encode
+            if kind not in self.fields:
+                plan.append((kind, None, -1, -1, False))
+                continue
+            hi, lo = self.fields[kind]
+            k = kind.upper()
+            plan.append((kind, _PARSERS.get(k), hi, lo, k.startswith("SIMM")))
+        set_(self, "plan", tuple(plan))
 
     def encode(
         self,
@@ -127,57 +157,75 @@ class InstructionSpec:
             raise ValueError(
                 f"{self.mnemonic}: expected {len(self.operands)} operands, got {len(ops)}"
             )
-        w = 0
-        w = setbits(w, self.opclass, 23, 20)
-        w = setbits(w, self.subop, 19, 16)
+        w = self.base
+        for (kind, parse, hi, lo, is_signed), tok in zip(self.plan, ops):
+            if hi < 0:
+                raise ValueError(f"Spec for {self.mnemonic} missing field '{kind}'")
+            if parse is not None:
+                val = parse(tok)
+            elif kind.upper().startswith(("SIMM", "IMM", "UIMM")):
+                val = self._imm(tok, hi - lo + 1, is_signed, resolve_expr, pc)
+            else:
+                raise ValueError(f"Unknown operand kind '{kind}'")
+            w = setbits(w, val, hi, lo)
 
-        def enc_val(kind: str, tok: str, hi: int, lo: int) -> int:
-            k = kind.upper()
-            if k in ("DRS", "DRT"):
-                return parse_dr(tok)
-            if k in ("ARS", "ART"):
-                return parse_ar(tok)
-            if k in ("SRS", "SRT"):
-                return parse_sr(tok)
-            if k == "CC":
-                return parse_cc(tok)
-            if k == "HL":
-                return parse_hl(tok)
-            if k.startswith("SIMM") or k.startswith("IMM") or k.startswith("UIMM"):
+        # Mask down to 24 bits, reserved bits implicitly zero
+        return w & 0xFFFFFF
+
+    def encode_fields(self, values: Sequence[int]) -> int:
+        """Encode operands already resolved to field values.
+
+        Registers/conditions are their indices (as the kind's parser returns
+        them); immediates are final integers (PC-relative ones already made
+        relative), range-checked against their field here.
+        """
+        if len(values) != len(self.operands):
+            raise ValueError(
+                f"{self.mnemonic}: expected {len(self.operands)} operands, got {len(values)}"
+            )
+        w = self.base
+        for (kind, parse, hi, lo, is_signed), val in zip(self.plan, values):
+            if hi < 0:
+                raise ValueError(f"Spec for {self.mnemonic} missing field '{kind}'")
+            if parse is None:
+                if not kind.upper().startswith(("SIMM", "IMM", "UIMM")):
+                    raise ValueError(f"Unknown operand kind '{kind}'")
                 width = hi - lo + 1
-                is_signed = k.startswith("SIMM")
-                if resolve_expr is not None:
-                    pc_rel = self.mnemonic in {"BCCSO", "BALSO", "BSRSR", "BSRSO", "ADRASO"}
-                    return resolve_expr(tok, width, is_signed, pc, pc_rel)
-                # Fallback: numeric only
-                v = parse_imm(tok)
                 if is_signed:
                     minv = -(1 << (width - 1))
                     maxv = (1 << (width - 1)) - 1
-                    if v < minv or v > maxv:
-                        raise ValueError(
-                            f"signed immediate out of range {minv}..{maxv}: {v}"
-                        )
-                    v &= (1 << width) - 1
-                    return v
-                else:
-                    maxv = (1 << width) - 1
-                    if v < 0 or v > maxv:
-                        raise ValueError(f"immediate out of range 0..{maxv}: {v}")
-                    return v
-            raise ValueError(f"Unknown operand kind '{kind}'")
-
-        for kind, tok in zip(self.operands, ops):
-            fld = kind  # field name matches kind in this simple scheme
-            if fld not in self.fields:
-                raise ValueError(f"Spec for {self.mnemonic} missing field '{fld}'")
-            hi, lo = self.fields[fld]
-            val = enc_val(kind, tok, hi, lo)
+                    if val < minv or val > maxv:
+                        raise ValueError(f"signed immediate out of range {minv}..{maxv}: {val}")
+                    val &= (1 << width) - 1
+                elif val < 0 or val > (1 << width) - 1:
+                    raise ValueError(f"immediate out of range 0..{(1 << width) - 1}: {val}")
             w = setbits(w, val, hi, lo)
-
-        # Mask down to 24 bits, reserved bits implicitly zero
         return w & 0xFFFFFF
 
+    @property
+    def pc_relative(self) -> bool:
+        """Immediates are encoded relative to the instruction's address."""
+        return self.mnemonic in _PC_RELATIVE
+
+    def _imm(self, tok: str, width: int, is_signed: bool,
+             resolve_expr: Optional[Callable[[str, int, bool, int, bool], int]], pc: int) -> int:
+        if resolve_expr is not None:
+            return resolve_expr(tok, width, is_signed, pc, self.mnemonic in _PC_RELATIVE)
+        # Fallback: numeric only
+        v = parse_imm(tok)
+        if is_signed:
+            minv = -(1 << (width - 1))
+            maxv = (1 << (width - 1)) - 1
+            if v < minv or v > maxv:
+                raise ValueError(
+                    f"signed immediate out of range {minv}..{maxv}: {v}"
+                )
+            return v & ((1 << width) - 1)
+        maxv = (1 << width) - 1
+        if v < 0 or v > maxv:
+            raise ValueError(f"immediate out of range 0..{maxv}: {v}")
+        return v
+
 
 # Minimal subset of instruction specs to demonstrate the path.
 SPECS: Dict[str, InstructionSpec] = {
@@ -488,5 +536,9 @@ SPECS.update({
 })
 
 
+# The table is built once at import and read-only from here on
+SPECS = MappingProxyType(SPECS)
+
+
 def get_spec(mnemonic: str) -> InstructionSpec | None:
     return SPECS.get(mnemonic.upper())
@@ -0,0 +1,104 @@
+"""Per-phase wall time, peak memory and counters for the Skald/asm pipelines.
+
+`PassStats.phase(name)` times one phase and yields its `Phase`, whose
+`counts` the caller fills in (tokens, AST nodes, IR items, words...).
+Peak memory is the high-water mark of Python allocations made during the
+phase (`tracemalloc`), so tracing slows phases down somewhat; times are
+comparable between runs with the same setting. Phases are flat: one at a
+time, in pipeline order.
+
+`write` prints a table and `to_json` gives the machine-readable report
+(`--time-passes` / `--stats FILE` on the CLIs).
+"""
+from __future__ import annotations
+
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import ContextManager, Dict, Iterator, List, Optional, TextIO
+
+STATS_VERSION = 1
+
+
+@dataclass
+class Phase:
+    name: str
+    seconds: float = 0.0
+    peak_bytes: int = 0  # Python allocations above the phase's start, 0 when not traced
+    counts: Dict[str, int] = field(default_factory=dict)
+
+
+class PassStats:
+    def __init__(self, memory: bool = True) -> None:
+        self.memory = memory
+        self.phases: List[Phase] = []
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[Phase]:
+        import tracemalloc  # here, so `timed(None, ...)` users never load it
+
+        ph = Phase(name)
+        traced = self.memory and tracemalloc.is_tracing()  # somebody else's trace: keep it running
+        if self.memory and not traced:
+            tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0] if self.memory else 0
+        if traced:
+            tracemalloc.reset_peak()
+        t0 = time.perf_counter()
+        try:
+            yield ph
+        finally:
+            ph.seconds = time.perf_counter() - t0
+            if self.memory:
+                ph.peak_bytes = max(0, tracemalloc.get_traced_memory()[1] - base)
+                if not traced:
+                    tracemalloc.stop()
+            self.phases.append(ph)
+
+    @property
+    def seconds(self) -> float:
+        return sum(ph.seconds for ph in self.phases)
+
+    def to_json(self) -> Dict[str, object]:
+        return {
+            "version": STATS_VERSION,
+            "phases": [asdict(ph) for ph in self.phases],
+            "total_seconds": self.seconds,
+            "peak_bytes": max((ph.peak_bytes for ph in self.phases), default=0),
+            "max_rss_kib": max_rss_kib(),
+        }
+
+    def write(self, fp: TextIO) -> None:
+        fp.write("; PHASE       WALL_MS  PEAK_KIB  COUNTS\n")
+        for ph in self.phases:
+            counts = " ".join(f"{k}={v}" for k, v in ph.counts.items())
+            fp.write(f"{ph.name:12} {ph.seconds * 1e3:8.3f} {ph.peak_bytes / 1024:9.1f}  {counts}\n")
+        rss = max_rss_kib()
+        fp.write(f"{'total':12} {self.seconds * 1e3:8.3f}"
+                 + (f"  (max RSS {rss} KiB)\n" if rss is not None else "\n"))
+
+    def report(self, time_passes: bool, path: Optional[Path]) -> None:
+        """CLI output: the table on stderr and/or the JSON report in `path`."""
+        if time_passes:
+            self.write(sys.stderr)
+        if path is not None:
+            import json
+
+            path.write_text(json.dumps(self.to_json(), indent=2) + "\n", encoding="utf-8")
+
+
+def timed(stats: Optional[PassStats], name: str) -> ContextManager[Phase]:
+    """`stats.phase(name)`, or a throwaway `Phase` when not collecting."""
+    return stats.phase(name) if stats is not None else nullcontext(Phase(name))
+
+
+def max_rss_kib() -> Optional[int]:
+    """Peak resident set of this process so far (KiB), where the OS reports it."""
+    try:
+        import resource
+    except ImportError:  # not on Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss  # bytes on macOS
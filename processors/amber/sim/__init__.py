@@ -0,0 +1,76 @@
+"""
+Amber simulator - package entry
+
+Instruction-set simulator with the RTL's micro-op expansion, a
+cycle-approximate timing model calibrated against the RTL CYCLE/INSTRET
+counters, a trace-driven cache model with a DDR refill model, an MMU/TLB
+model with a page-table image builder, a model of the async math unit,
+checkpoint/restore with parallel forks, a lock-step differential check
+against the RTL with a constrained-random program fuzzer, a PC profiler,
+a parallel batch runner for program manifests, and readers for RTL retire traces.
+See `processors/amber/sim/README.md`.
+"""
+
+from .cache import Cache, CacheConfig, CacheStats, sweep
+from .checkpoint import Snapshot, restore, run_forks, take
+from .cheri import Capability
+from .farm import FarmResult, Job, Summary, read_manifest
+from .fuzz import Coverage, Program, generate
+from .iss import Machine
+from .lockstep import Divergence, LockstepResult, run_batch
+from .math24 import LATENCY, Math24, evaluate, evaluate_np
+from .mmu import Mmu, PageTableBuilder, Tlb
+from .pagetables import Mapping, PageTableImage, parse_mappings
+from .profile import Profiler, Symbols
+from .refill import DdrTiming, RefillModel, RefillPolicy
+from .timing import Calibration, PipelineParams, Sample, TimingModel, calibrate
+from .trace import Commit, Retired, read_commits, read_counters, read_map_labels, read_rtl_trace
+
+__all__ = [
+    "Cache",
+    "CacheConfig",
+    "CacheStats",
+    "sweep",
+    "Snapshot",
+    "restore",
+    "run_forks",
+    "take",
+    "Capability",
+    "FarmResult",
+    "Job",
+    "Summary",
+    "read_manifest",
+    "Coverage",
+    "Program",
+    "generate",
+    "Machine",
+    "Divergence",
+    "LockstepResult",
+    "run_batch",
+    "LATENCY",
+    "Math24",
+    "evaluate",
+    "evaluate_np",
+    "Mmu",
+    "PageTableBuilder",
+    "Tlb",
+    "Mapping",
+    "PageTableImage",
+    "parse_mappings",
+    "Profiler",
+    "Symbols",
+    "DdrTiming",
+    "RefillModel",
+    "RefillPolicy",
+    "Calibration",
+    "PipelineParams",
+    "Sample",
+    "TimingModel",
+    "calibrate",
+    "Commit",
+    "Retired",
+    "read_commits",
+    "read_counters",
+    "read_map_labels",
+    "read_rtl_trace",
+]
@@ -0,0 +1,608 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import replace
+from itertools import product
+from pathlib import Path
+
+from . import checkpoint, trace
+from .cache import DCACHE, ICACHE, Cache, CacheConfig, attach, data_stream, pc_stream, run_stream, sweep
+from .iss import Machine
+from . import farm, fuzz, lockstep, math24
+from .mmu import TLB_POLICIES, Mmu, Tlb, WalkParams, identity_tables, read_address_trace, run_trace
+from . import pagetables
+from .profile import Profiler
+from .refill import POLICIES, DdrTiming, RefillModel
+from .timing import PipelineParams, Sample, TimingModel, calibrate, labels_from_assembler
+
+from ..asm.assembler import Assembler
+from ..asm.debuginfo import LineTable
+from ..skald.compiler import compile_items
+
+
+def _labels(path):
+    if path is None:
+        return None
+    with open(path, encoding="utf-8") as fp:
+        return trace.read_map_labels(fp)
+
+
+def _params(args) -> PipelineParams:
+    p = PipelineParams()
+    for name in ("mem_stall", "branch_penalty", "fill"):
+        value = getattr(args, name)
+        if value is not None:
+            setattr(p, name, value)
+    return p
+
+
+def _image(path):
+    if path is None:
+        return None
+    m = Machine()
+    m.load_hex(path)
+    return m.imem
+
+
+def _machine(args):
+    """Machine from `--resume` (then `input` is optional) or a fresh one with `input` loaded.
+
+    Returns the machine and the CYCLE value it resumes from.
+    """
+    if args.resume is not None:
+        snap = checkpoint.load(args.resume)
+        m = checkpoint.restore(snap)
+        if args.input is not None:
+            m.load_hex(args.input)
+        return m, snap.cycle
+    if args.input is None:
+        raise SystemExit("error: a program image or --resume is needed")
+    m = Machine()
+    m.load_hex(args.input)
+    return m, 0
+
+
+def cmd_run(args) -> int:
+    m, base = _machine(args)
+    model = TimingModel(_params(args), _labels(args.map))
+    model.attach(m)
+    if base:
+        m.clock = lambda: base + model.cycles
+    if args.caches:
+        attach(model, Cache(ICACHE), Cache(DCACHE))
+    unit = None
+    if args.math:
+        unit = math24.Math24()
+        unit.attach(m)
+    for r in m.run(args.max_steps):
+        model.account(r)
+        if args.trace:
+            flag = " taken" if r.taken else ""
+            trap = f" trap={r.trap:#x}" if r.trap is not None else ""
+            print(f"{r.pc:06X}  {r.word:06X}  {r.mnemonic:<8} uops={len(r.uops)}{flag}{trap}")
+    model.report(sys.stdout)
+    state = "hung (PCC)" if m.hung else "halted" if m.halted else f"stopped after {args.max_steps} steps"
+    regs = " ".join(f"DR{i}={v:06X}" for i, v in enumerate(m.gp))
+    print(f"{state} at PC={m.pc:06X}  FLAGS={m.flags:04b}\n{regs}")
+    if unit is not None:
+        st = unit.stats
+        ops = " ".join(f"{name}={n}" for name, n in sorted(st.ops.items()))
+        print(f"math: {st.starts} ops ({ops or 'none'}), {st.div0} DIV0, "
+              f"{st.dropped_starts} dropped STARTs, {st.stale_reads} stale READY reads")
+    if args.save is not None:
+        size = checkpoint.save(checkpoint.take(m), args.save)
+        print(f"snapshot at step {m.steps} -> {args.save} ({size} bytes)")
+    return 0
+
+
+def cmd_replay(args) -> int:
+    text = Path(args.log).read_text().splitlines()
+    model = TimingModel(_params(args), _labels(args.map))
+    for _ in model.feed(trace.read_rtl_trace(text, _image(args.image))):
+        pass
+    model.report(sys.stdout)
+    measured = trace.read_counters(text)
+    if measured is not None:
+        cyc, instret = measured
+        print(f"RTL: CYCLE={cyc} INSTRET={instret}  model: cycles={model.cycles} "
+              f"({model.cycles - cyc:+d}) instret={model.instret} ({model.instret - instret:+d})")
+    return 0
+
+
+def _profile_program(args):
+    """Machine with `input` loaded, its labels and line table.
+
+    .asm/.skald input is assembled here; a .hex takes labels from `--map`.
+    `--lines` overrides the line table from `.loc` directives.
+    """
+    m = Machine()
+    suffix = args.input.suffix.lower()
+    lines = None
+    if args.lines is not None:
+        with open(args.lines, encoding="utf-8") as fp:
+            lines = LineTable.read(fp)
+    if suffix == ".hex":
+        m.load_hex(args.input)
+        return m, _labels(args.map) or {}, lines
+    asm = Assembler(origin=0)
+    if suffix == ".skald":
+        items = compile_items(args.input.read_text(encoding="utf-8"), args.input.name)
+        segments = asm.assemble_items_segments(items)
+    else:
+        segments = asm.assemble_path_segments(args.input)
+    for sg in segments:
+        m.load_words(sg.words, sg.addr)
+    labels = labels_from_assembler(asm)
+    labels.update(_labels(args.map) or {})
+    return m, labels, lines or (asm.line_table if len(asm.line_table) else None)
+
+
+def cmd_profile(args) -> int:
+    m, labels, lines = _profile_program(args)
+    prof = Profiler(labels, args.period, lines)
+    model = TimingModel(_params(args))
+    if args.rtl is not None:
+        records = trace.read_rtl_trace(args.rtl.read_text().splitlines(), m.imem)
+    else:
+        model.attach(m)
+        records = m.run(args.max_steps)
+    for r in records:
+        prof.account(r, model.account(r))
+    prof.report(sys.stdout, args.top)
+    if lines is not None:
+        prof.report_lines(sys.stdout, args.top)
+    if args.pcs:
+        prof.report_pcs(sys.stdout, args.pcs)
+    if args.callgraph:
+        prof.report_callgraph(sys.stdout)
+    if args.collapsed is not None:
+        with open(args.collapsed, "w", encoding="utf-8") as fp:
+            n = prof.collapsed(fp)
+        print(f"{n} stacks -> {args.collapsed}")
+    return 0
+
+
+def cmd_cache(args) -> int:
+    m = Machine()
+    m.load_hex(args.input)
+    records = list(m.run(args.max_steps))
+    streams = []
+    if args.side in ("i", "both"):
+        streams.append(("I", pc_stream(records)))
+    if args.side in ("d", "both"):
+        streams.append(("D", data_stream(records)))
+    configs = [CacheConfig(sets=s, ways=w, line_words=lw, refill_overhead=args.refill_overhead,
+                           beat_cycles=args.beat_cycles, write_through=not args.write_back,
+                           store_miss=args.store_miss)
+               for s, w, lw in product(args.sets, args.ways, args.line_words)]
+    print(f"{len(records)} instructions")
+    for side, stream in streams:
+        print(f"; {side}-cache: {len(stream)} accesses\n"
+              f"; SETSxWAYSxLINE  WORDS  ACCESSES  MISSES  MISS%  REFILLS  REFILL_CYC  STALL_CYC")
+        for res in sweep(configs, stream, args.jobs):
+            st = res.stats
+            print(f"{res.config.label:<16} {res.config.words:6} {st.accesses:9} {st.misses:7} "
+                  f"{100.0 * st.miss_rate:6.2f} {st.refills:8} {st.refill_cycles:11} {res.stall_cycles:10}")
+    return 0
+
+
+def cmd_refill(args) -> int:
+    m = Machine()
+    m.load_hex(args.input)
+    records = list(m.run(args.max_steps))
+    ddr = DdrTiming.bram() if args.bram else DdrTiming()
+    for name in ("read_latency", "row_miss"):
+        value = getattr(args, name)
+        if value is not None:
+            ddr = replace(ddr, **{name: value})
+    streams = []
+    if args.side in ("i", "both"):
+        streams.append(("I", ICACHE, pc_stream(records)))
+    if args.side in ("d", "both"):
+        streams.append(("D", DCACHE, data_stream(records)))
+    print(f"{len(records)} instructions  read_latency={ddr.read_latency} row_miss={ddr.row_miss} "
+          f"data_bits={ddr.data_bits}")
+    for side, config, stream in streams:
+        print(f"; {side}-cache: {len(stream)} accesses\n"
+              f"; POLICY      REFILLS  AVG_LINE  AVG_CRIT  CMDS  ROW_MISS  EFFIC  BUS_UTIL  STALL_CYC")
+        for name in args.policy:
+            model = RefillModel(POLICIES[name], ddr, config.line_words, config.refill_overhead)
+            stall = run_stream(Cache(config, model), stream)
+            st = model.stats
+            print(f"{name:<12} {st.refills:8} {st.avg_line:9.1f} {st.avg_critical:9.1f} {st.commands:5} "
+                  f"{st.row_misses:9} {st.efficiency:6.2f} {st.utilisation:9.2f} {stall:10}")
+    return 0
+
+
+def cmd_snapshot(args) -> int:
+    m = _machine(args)[0]
+    ran = checkpoint.fast_forward(m, args.steps)
+    snap = checkpoint.take(m)
+    size = checkpoint.save(snap, args.output)
+    state = "halted" if m.halted else "running"
+    print(f"{ran} instructions, step {m.steps} ({state}) at PC={m.pc:06X} -> {args.output} "
+          f"({size} bytes, {snap.unique_pages} distinct pages)")
+    return 0
+
+
+def cmd_fork(args) -> int:
+    snap = checkpoint.load(args.snapshot)
+    try:
+        forks = [checkpoint.parse_pokes(text) for text in args.set] if args.set else [[]]
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    keep = args.save_dir is not None
+    results = checkpoint.run_forks(snap, forks, args.max_steps, args.jobs, keep)
+    if keep:
+        args.save_dir.mkdir(parents=True, exist_ok=True)
+    print(f"{len(results)} forks of step {snap.steps}\n; FORK  STEPS  CYCLES  INSTRET  STATE    PC      DR0-DR3  OVERRIDES")
+    for i, (text, res) in enumerate(zip(args.set or [""], results)):
+        state = "halted" if res.halted else "stopped"
+        regs = " ".join(f"{v:06X}" for v in res.gp[:4])
+        print(f"{i:6} {res.steps:6} {res.cycles:7} {res.instret:8}  {state:<8} {res.pc:06X}  {regs}  {text}")
+        if keep:
+            (args.save_dir / f"fork{i}.ambs").write_bytes(res.final)
+    return 0
+
+
+def cmd_math(args) -> int:
+    ops = [math24.OPS[name.upper()] for name in args.op] if args.op else None
+    if args.vectors is not None:
+        vecs = math24.vectors(args.count, args.seed, ops)
+        with open(args.vectors, "w", encoding="utf-8") as fp:
+            math24.write_vectors(vecs, fp)
+        print(f"{len(vecs)} vectors ({sum(v.status & math24.STATUS_DIV0 != 0 for v in vecs)} DIV0) "
+              f"-> {args.vectors}")
+        return 0
+    print("; cycles from the CTRL write in EX until a CSRRD in EX sees the value\n"
+          "; OP  NAME        RES0  RES1  READY  DIV0_READY  INTERVAL")
+    for name, code in sorted(math24.OPS.items(), key=lambda kv: kv[1]):
+        if ops is not None and code not in ops:
+            continue
+        lat = math24.LATENCY[name]
+        div0 = "-" if lat.div0_ready is None else str(lat.div0_ready)
+        print(f"{code:02X}    {name:<10} {lat.res0:5} {lat.res1:5} {lat.ready:6} {div0:>11} {lat.interval:9}")
+    return 0
+
+
+def _testbench(args, tmp):
+    """`--image` if it exists, else the DEBUGCOMMIT testbench built there (or in `tmp`)."""
+    if args.image is not None and args.image.exists():
+        return args.image
+    try:
+        return lockstep.compile_testbench(args.image or Path(tmp) / "lockstep.vvp", args.ticks, args.iverilog)
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"error: could not build the testbench: {e}", file=sys.stderr)
+        return None
+
+
+def cmd_lockstep(args) -> int:
+    programs = []
+    for path in args.programs:
+        programs.extend(sorted(path.glob("*.hex")) if path.is_dir() else [path])
+    with tempfile.TemporaryDirectory(prefix="amber_lockstep_") as tmp:
+        image = _testbench(args, tmp)
+        if image is None:
+            return 2
+        failed = 0
+        for res in lockstep.run_batch(programs, image, args.max_steps, args.jobs, args.vvp, args.caps):
+            if not res.ok or not args.quiet:
+                print(res, flush=True)
+            failed += not res.ok
+    print(f"{len(programs) - failed}/{len(programs)} programs match")
+    return 1 if failed else 0
+
+
+def cmd_fuzz(args) -> int:
+    cov = fuzz.Coverage.load(args.coverage) if args.coverage and args.coverage.exists() else fuzz.Coverage()
+    failed = 0
+    with tempfile.TemporaryDirectory(prefix="amber_fuzz_") as tmp:
+        out = args.out or Path(tmp)
+        if args.generate_only:
+            out.mkdir(parents=True, exist_ok=True)
+            for i in range(args.count):
+                fuzz.generate(args.seed + i, args.length, cov).write(out / f"fuzz_{args.seed + i}")
+        else:
+            image = _testbench(args, tmp)
+            if image is None:
+                return 2
+            for path, res in fuzz.run(args.count, args.seed, out, image, args.length, cov,
+                                      args.jobs, args.vvp, args.max_steps):
+                if not res.ok or not args.quiet:
+                    print(res, flush=True)
+                if not res.ok:
+                    failed += 1
+                    if args.out is None:
+                        print(path.with_suffix(".asm").read_text(), end="")
+            print(f"{args.count - failed}/{args.count} programs match")
+    if args.coverage:
+        cov.save(args.coverage)
+    print(f"coverage {cov.covered}/{cov.total} ({100 * cov.covered / cov.total:.1f}%)")
+    for mnemonic, missing in list(cov.gaps().items())[:args.gaps]:
+        print(f"  {mnemonic:<12} {missing} untested")
+    return 1 if failed else 0
+
+
+def cmd_farm(args) -> int:
+    jobs = []
+    try:
+        for path in args.inputs:
+            if path.is_dir() or path.suffix.lower() in farm.PROGRAM_SUFFIXES:
+                jobs.extend(farm.Job(p, args.max_steps, args.state) for p in farm.expand(str(path)))
+            else:
+                jobs.extend(farm.read_manifest(path, args.max_steps))
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    workers = 1 if args.jobs == 1 or len(jobs) <= 1 else args.jobs or os.cpu_count() or 1
+    summary = farm.Summary()
+    results = []
+    start = time.perf_counter()
+    for res in farm.run(jobs, workers, args.timing):
+        if not res.ok or not args.quiet:
+            print(res, flush=True)
+        summary.add(res)
+        results.append(res)
+    wall = time.perf_counter() - start
+    rate = summary.instructions / wall if wall else 0.0
+    print(f"{summary.passed}/{summary.programs} programs pass ({summary.failed} failed, {summary.errors} errors); "
+          f"{summary.instructions} instructions in {wall:.2f} s, {workers} jobs "
+          f"({summary.cpu_seconds:.2f} s in workers, {rate:.0f} instructions/s)")
+    if args.json is not None:
+        with open(args.json, "w", encoding="utf-8") as fp:
+            json.dump(farm.report_json(results, summary, wall, workers), fp, indent=1)
+    return 0 if summary.passed == summary.programs else 1
+
+
+def _mmu_trace(path, max_steps):
+    """Trace operations from a text trace, or the ISS streams of a .hex image."""
+    if path.suffix.lower() != ".hex":
+        with open(path, encoding="utf-8") as fp:
+            return list(read_address_trace(fp))
+    m = Machine()
+    m.load_hex(path)
+    ops = []
+    for r in m.run(max_steps):
+        ops.append(("x", r.pc, False))
+        ops.extend(("w" if st else "r", a, False) for a, _, st in r.mem if a is not None)
+    return ops
+
+
+def cmd_tlb(args) -> int:
+    ops = _mmu_trace(args.input, args.max_steps)
+    tables = identity_tables(ops, args.table_base, args.superpages)
+    walk = WalkParams(args.walk_overhead, args.level_cycles)
+    print(f"{sum(1 for op in ops if op[0] in 'rwx')} translations, "
+          f"{(tables.end - args.table_base) // 8192} page tables{' (superpages)' if args.superpages else ''}")
+    print("; ENTRIES  POLICY  SIDE  LOOKUPS    HITS   HIT%   WALKS  WALK_CYC  FAULTS")
+    for entries, policy in product(args.entries, args.policy):
+        mmu = Mmu(tables.read, tables.root, itlb=Tlb(entries, policy), dtlb=Tlb(entries, policy), walk=walk)
+        run_trace(mmu, ops)
+        faults = sum(mmu.stats.faults.values())
+        for side, tlb in (("I", mmu.itlb), ("D", mmu.dtlb)):
+            st = tlb.stats
+            print(f"{entries:9} {policy:>7} {side:>5} {st.lookups:8} {st.hits:7} {100.0 * st.hit_rate:6.2f}"
+                  f" {st.misses:7}" + (f" {mmu.stats.walk_cycles:9} {faults:7}" if side == "D" else ""))
+    return 0
+
+
+def cmd_pagetables(args) -> int:
+    with open(args.input, encoding="utf-8") as fp:
+        spaces = pagetables.parse_mappings(fp)
+    img = pagetables.PageTableImage(args.base, args.superpages)
+    for name, mappings in spaces.items():
+        img.add_space(name, mappings)
+    img.build()
+    segments = img.segments
+    if args.merge is not None:
+        segments = pagetables.merge_segments(segments, pagetables.read_hex_segments(args.merge.read_text().splitlines()))
+    with open(args.output, "wb") as fp:
+        pagetables.write_image(segments, fp)
+    for name, root in img.roots.items():
+        print(f"{name:<16} root 0x{root:X}")
+    print(f"{img.unique} tables ({img.tables - img.unique} shared), {img.words} PTE words in "
+          f"{len(img.segments)} segments, tables end at 0x{img.end:X}")
+    if args.equ is not None:
+        with open(args.equ, "w", encoding="utf-8") as fp:
+            for name, root in img.roots.items():
+                fp.write(f".equ PT_ROOT_{name.upper()}, 0x{root:X}\n")
+    if args.check:
+        errors = pagetables.check(img, spaces)
+        for e in errors:
+            print(f"error: {e}", file=sys.stderr)
+        return 1 if errors else 0
+    return 0
+
+
+def cmd_calibrate(args) -> int:
+    samples = []
+    for log in args.logs:
+        text = Path(log).read_text().splitlines()
+        measured = trace.read_counters(text)
+        if measured is None:
+            print(f"error: no 'Final: ... CYCLE=' line in {log}", file=sys.stderr)
+            return 2
+        samples.append(Sample(list(trace.read_rtl_trace(text)), *measured))
+    cal = calibrate(samples, _params(args))
+    p = cal.params
+    print(f"mem_stall={p.mem_stall} branch_penalty={p.branch_penalty} fill={p.fill}  "
+          f"(fit {cal.fitted[0]:.2f}, {cal.fitted[1]:.2f}, {cal.fitted[2]:.2f})")
+    for log, res in zip(args.logs, cal.residuals):
+        print(f"  {log}: CYCLE residual {res:+d}")
+    if cal.instret_errors:
+        bad = [e for e in cal.instret_errors if e]
+        print(f"  INSTRET: {len(cal.instret_errors) - len(bad)}/{len(cal.instret_errors)} runs match")
+    return 0
+
+
+def main():
+    p = argparse.ArgumentParser(description="Amber ISS and cycle-approximate timing model")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    def timing_opts(sp):
+        sp.add_argument("--map", type=Path, help="Assembler --map file for per-function statistics")
+        sp.add_argument("--mem-stall", type=int, help="Override cycles stalled after a load/store micro-op")
+        sp.add_argument("--branch-penalty", type=int, help="Override cycles lost to a taken branch")
+        sp.add_argument("--fill", type=int, help="Override pipeline fill/drain cycles")
+
+    sp = sub.add_parser("run", help="Execute a hex image on the ISS with timing")
+    sp.add_argument("input", type=Path, nargs="?", help="Program image (.hex, optional @addr records)")
+    sp.add_argument("--resume", type=Path, help="Start from a snapshot (an image, if given, is loaded over it)")
+    sp.add_argument("--save", type=Path, help="Write a snapshot of the final state")
+    sp.add_argument("--max-steps", type=int, default=1_000_000, help="Stop after this many instructions")
+    sp.add_argument("--trace", action="store_true", help="Print every retired instruction")
+    sp.add_argument("--caches", action="store_true", help="Charge I/D-cache misses (cache.v geometry)")
+    sp.add_argument("--math", action="store_true", help="Run the async math unit model behind its CSRs")
+    timing_opts(sp)
+    sp.set_defaults(func=cmd_run)
+
+    sp = sub.add_parser("snapshot", help="Fast-forward without timing and save a snapshot")
+    sp.add_argument("input", type=Path, nargs="?", help="Program image (.hex, optional @addr records)")
+    sp.add_argument("--resume", type=Path, help="Start from a snapshot instead")
+    sp.add_argument("--steps", type=int, required=True, help="Instructions to run before the snapshot")
+    sp.add_argument("-o", "--output", type=Path, required=True, help="Snapshot file to write")
+    sp.set_defaults(func=cmd_snapshot)
+
+    sp = sub.add_parser("fork", help="Resume many forks of one snapshot in parallel")
+    sp.add_argument("snapshot", type=Path, help="Snapshot file")
+    sp.add_argument("--set", action="append",
+                    help="One fork's overrides, e.g. 'DR1=5,M[0x100]=7,PC=0x20' (repeat per fork)")
+    sp.add_argument("--max-steps", type=int, default=1_000_000, help="Stop each fork after this many instructions")
+    sp.add_argument("--jobs", type=int, help="Worker processes (default: CPU count)")
+    sp.add_argument("--save-dir", type=Path, help="Write each fork's final snapshot as forkN.ambs here")
+    sp.set_defaults(func=cmd_fork)
+
+    sp = sub.add_parser("replay", help="Apply the timing model to an RTL trace (amber_run.py --trace)")
+    sp.add_argument("log", type=Path, help="Captured simulator output")
+    sp.add_argument("--image", type=Path, help="Program image, to report ISA words instead of micro-ops")
+    timing_opts(sp)
+    sp.set_defaults(func=cmd_replay)
+
+    sp = sub.add_parser("profile", help="Flat, call-graph and flame-graph profiles of where the cycles go")
+    sp.add_argument("input", type=Path, help="Program: .hex (labels from --map), .asm or .skald")
+    sp.add_argument("--lines", type=Path, help="Source line table (asm --lines) for per-line profiles")
+    sp.add_argument("--rtl", type=Path, help="Profile an RTL trace (amber_run.py --trace) instead of running the ISS")
+    sp.add_argument("--period", type=int, default=1, help="Cycles between samples (1: count every cycle)")
+    sp.add_argument("--max-steps", type=int, default=1_000_000, help="Stop after this many instructions")
+    sp.add_argument("--top", type=int, default=20, help="Labels in the flat profile")
+    sp.add_argument("--pcs", type=int, default=0, help="Also list the N hottest instructions")
+    sp.add_argument("--callgraph", action="store_true", help="Print callers and callees per label")
+    sp.add_argument("--collapsed", type=Path, help="Write collapsed stacks (flamegraph.pl, speedscope)")
+    timing_opts(sp)
+    sp.set_defaults(func=cmd_profile)
+
+    sp = sub.add_parser("cache", help="Cache miss rates for a program, sweeping geometries")
+    sp.add_argument("input", type=Path, help="Program image (.hex, optional @addr records)")
+    sp.add_argument("--max-steps", type=int, default=1_000_000, help="Stop after this many instructions")
+    sp.add_argument("--side", choices=("i", "d", "both"), default="both", help="Which cache to simulate")
+    sp.add_argument("--sets", type=int, nargs="+", default=[16], help="Set counts to sweep")
+    sp.add_argument("--ways", type=int, nargs="+", default=[1], help="Associativities to sweep")
+    sp.add_argument("--line-words", type=int, nargs="+", default=[16], help="Line sizes (words) to sweep")
+    sp.add_argument("--refill-overhead", type=int, default=CacheConfig.refill_overhead,
+                    help="Cycles from miss to first backing request")
+    sp.add_argument("--beat-cycles", type=int, default=CacheConfig.beat_cycles, help="Cycles per refilled word")
+    sp.add_argument("--store-miss", choices=("mark", "refill", "bypass"), default="mark",
+                    help="Store miss policy (cache.v marks the line valid without refilling)")
+    sp.add_argument("--write-back", action="store_true", help="Write-back instead of write-through")
+    sp.add_argument("--jobs", type=int, help="Worker processes (default: CPU count)")
+    sp.set_defaults(func=cmd_cache)
+
+    sp = sub.add_parser("refill", help="Refill latency and bus use per DDR refill policy")
+    sp.add_argument("input", type=Path, help="Program image (.hex, optional @addr records)")
+    sp.add_argument("--max-steps", type=int, default=1_000_000, help="Stop after this many instructions")
+    sp.add_argument("--side", choices=("i", "d", "both"), default="both", help="Which cache's refills to time")
+    sp.add_argument("--policy", nargs="+", choices=sorted(POLICIES), default=list(POLICIES),
+                    help="Refill policies to compare")
+    sp.add_argument("--read-latency", type=int, help="Command to first data beat, in cycles")
+    sp.add_argument("--row-miss", type=int, help="Extra cycles when a bank has another row open")
+    sp.add_argument("--bram", action="store_true", help="Time against the testbench BRAM instead of DDR")
+    sp.set_defaults(func=cmd_refill)
+
+    sp = sub.add_parser("math", help="Async math unit latencies, or test vectors for math24_vectors_tb")
+    sp.add_argument("--op", nargs="+", choices=sorted(math24.OPS), type=str.upper, help="Ops (default: all)")
+    sp.add_argument("--vectors", type=Path, help="Write test vectors ($readmemh) instead of the latency table")
+    sp.add_argument("--count", type=int, default=64, help="Vectors per op")
+    sp.add_argument("--seed", type=int, default=0, help="Operand generator seed")
+    sp.set_defaults(func=cmd_math)
+
+    sp = sub.add_parser("lockstep", help="Compare programs on the ISS and the RTL, instruction by instruction")
+    sp.add_argument("programs", type=Path, nargs="+", help="Hex images, or directories of them")
+    sp.add_argument("--ticks", type=int, default=100_000, help="RTL cycles per program (compiled into the testbench)")
+    sp.add_argument("--max-steps", type=int, help="Stop comparing after this many instructions")
+    sp.add_argument("--jobs", type=int, help="Worker processes (default: CPU count)")
+    sp.add_argument("--image", type=Path, help="Compiled testbench to reuse (built here if missing)")
+    sp.add_argument("--iverilog", default="iverilog", help="iverilog executable")
+    sp.add_argument("--vvp", default="vvp", help="vvp executable")
+    sp.add_argument("--caps", action="store_true", help="Start with the BOOT_CAPS data capabilities in CR0-CR3")
+    sp.add_argument("-q", "--quiet", action="store_true", help="Only print divergences and errors")
+    sp.set_defaults(func=cmd_lockstep)
+
+    sp = sub.add_parser("fuzz", help="Generate constrained-random programs and check them in lock-step")
+    sp.add_argument("--count", type=int, default=100, help="Programs to generate")
+    sp.add_argument("--seed", type=int, default=0, help="Seed of the first program (the next ones count up)")
+    sp.add_argument("--length", type=int, default=64, help="Instructions per program, before HLT")
+    sp.add_argument("--out", type=Path, help="Keep the .asm/.hex programs here (default: a temporary directory)")
+    sp.add_argument("--coverage", type=Path, help="Coverage JSON to resume from and update")
+    sp.add_argument("--gaps", type=int, default=10, help="Mnemonics with untested combinations to list")
+    sp.add_argument("--generate-only", action="store_true", help="Write programs without running them")
+    sp.add_argument("--ticks", type=int, default=100_000, help="RTL cycles per program (compiled into the testbench)")
+    sp.add_argument("--max-steps", type=int, help="Stop comparing after this many instructions")
+    sp.add_argument("--jobs", type=int, help="Worker processes (default: CPU count)")
+    sp.add_argument("--image", type=Path, help="Compiled testbench to reuse (built here if missing)")
+    sp.add_argument("--iverilog", default="iverilog", help="iverilog executable")
+    sp.add_argument("--vvp", default="vvp", help="vvp executable")
+    sp.add_argument("-q", "--quiet", action="store_true", help="Only print divergences and errors")
+    sp.set_defaults(func=cmd_fuzz)
+
+    sp = sub.add_parser("farm", help="Build and run a manifest of programs on the ISS in parallel, checking results")
+    sp.add_argument("inputs", type=Path, nargs="+",
+                    help="Manifests, or .asm/.skald/.hex programs and directories of them")
+    sp.add_argument("--max-steps", type=int, default=farm.DEFAULT_STEPS,
+                    help="Instruction limit of programs without steps=")
+    sp.add_argument("--state", choices=farm.STATES, default="halted",
+                    help="End state required of programs given directly")
+    sp.add_argument("--timing", action="store_true", help="Run the timing model and report cycles")
+    sp.add_argument("--jobs", type=int, help="Worker processes (default: CPU count)")
+    sp.add_argument("--json", type=Path, help="Write per-program results and totals as JSON")
+    sp.add_argument("-q", "--quiet", action="store_true", help="Only print failures and errors")
+    sp.set_defaults(func=cmd_farm)
+
+    sp = sub.add_parser("tlb", help="TLB hit rates and page walks for an address trace")
+    sp.add_argument("input", type=Path, help="Address trace (r/w/x <va> lines) or a .hex image to run on the ISS")
+    sp.add_argument("--max-steps", type=int, default=1_000_000, help="Stop the ISS after this many instructions")
+    sp.add_argument("--entries", type=int, nargs="+", default=[32], help="TLB sizes to sweep")
+    sp.add_argument("--policy", nargs="+", choices=TLB_POLICIES, default=["lru"], help="Replacement policies")
+    sp.add_argument("--superpages", action="store_true", help="Map touched 4096-page regions with L1 superpages")
+    sp.add_argument("--table-base", type=lambda v: int(v, 0), default=1 << 40,
+                    help="Physical word address of the generated identity page tables")
+    sp.add_argument("--walk-overhead", type=int, default=WalkParams.overhead, help="TLB miss to first table read")
+    sp.add_argument("--level-cycles", type=int, default=WalkParams.level_cycles, help="Cycles per table read")
+    sp.set_defaults(func=cmd_tlb)
+
+    sp = sub.add_parser("pagetables", help="Build a deduplicated page-table image from a mapping description")
+    sp.add_argument("input", type=Path, help="Mapping description (space/use/<va> <pages> <port>:<ppn> lines)")
+    sp.add_argument("-o", "--output", type=Path, required=True, help="Output .hex (@addr records)")
+    sp.add_argument("--base", type=lambda v: int(v, 0), required=True,
+                    help="Physical word address of the first table (8192-word aligned)")
+    sp.add_argument("--superpages", action="store_true", help="Use L1/L2 superpages for aligned runs")
+    sp.add_argument("--merge", type=Path, help="Firmware .hex to merge into the output")
+    sp.add_argument("--equ", type=Path, help="Write '.equ PT_ROOT_<SPACE>, addr' lines for the assembler")
+    sp.add_argument("--check", action="store_true", help="Walk every mapping's first and last page")
+    sp.set_defaults(func=cmd_pagetables)
+
+    sp = sub.add_parser("calibrate", help="Fit timing parameters to RTL CYCLE counts")
+    sp.add_argument("logs", type=Path, nargs="+", help="Captured simulator outputs with traces")
+    timing_opts(sp)
+    sp.set_defaults(func=cmd_calibrate)
+
+    args = p.parse_args()
+    raise SystemExit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
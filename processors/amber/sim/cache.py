@@ -0,0 +1,278 @@
+"""Trace-driven I/D cache model.
+
+Mirrors `src/cache.v` by default: 16 lines of 16 words, direct-mapped,
+refilled one word at a time over the backing handshake. The D-cache is
+write-through and allocates on a store without refilling (the store sets
+the line's tag and valid bit; the backing write is queued and does not
+stall). A 48-bit access at the last word of a line needs the next line
+too, so it may take two refills.
+
+Geometry, associativity (LRU), refill cost and write policy are
+configurable, so other layouts can be compared on the same address
+streams before spending BRAM on them. `sweep` simulates a list of
+configurations over one stream on all cores.
+
+A refill costs `refill_overhead + line_words * beat_cycles` cycles unless
+the cache has a `refill` callable (e.g. a backing-memory model), which
+gets the line's first word address and the word that missed and returns
+the cycles.
+"""
+from __future__ import annotations
+
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .trace import Retired
+
+
+STORE_MISS_POLICIES = ("mark", "refill", "bypass")
+
+
+@dataclass(frozen=True)
+class CacheConfig:
+    sets: int = 16
+    ways: int = 1
+    line_words: int = 16
+    # Miss detection to first backing request, then one request/valid pair
+    # per word: the BRAM handshake in amber.v answers a request a cycle later.
+    refill_overhead: int = 2
+    beat_cycles: int = 2
+    write_through: bool = True
+    # Store that misses: "mark" sets tag/valid without a refill (cache.v),
+    # "refill" fetches the line first, "bypass" leaves the cache untouched
+    store_miss: str = "mark"
+    name: str = ""
+
+    def __post_init__(self) -> None:
+        for what in ("sets", "ways", "line_words"):
+            v = getattr(self, what)
+            if v <= 0 or v & (v - 1):
+                raise ValueError(f"{what} must be a power of two, got {v}")
+        if self.store_miss not in STORE_MISS_POLICIES:
+            raise ValueError(f"store_miss must be one of {', '.join(STORE_MISS_POLICIES)}")
+
+    @property
+    def words(self) -> int:
+        return self.sets * self.ways * self.line_words
+
+    @property
+    def refill_cycles(self) -> int:
+        return self.refill_overhead + self.line_words * self.beat_cycles
+
+    @property
+    def label(self) -> str:
+        return self.name or f"{self.sets}x{self.ways}x{self.line_words}"
+
+
+ICACHE = CacheConfig(name="icache_16x16_24")
+DCACHE = CacheConfig(name="dcache_16x16_24")
+
+
+@dataclass
+class CacheStats:
+    reads: int = 0
+    writes: int = 0
+    read_misses: int = 0
+    write_misses: int = 0
+    refills: int = 0
+    refill_cycles: int = 0
+    writebacks: int = 0  # dirty lines written back (write-back caches)
+    backing_writes: int = 0  # words written through to backing memory
+
+    @property
+    def accesses(self) -> int:
+        return self.reads + self.writes
+
+    @property
+    def misses(self) -> int:
+        return self.read_misses + self.write_misses
+
+    @property
+    def miss_rate(self) -> float:
+        return self.misses / self.accesses if self.accesses else 0.0
+
+    @property
+    def read_miss_rate(self) -> float:
+        return self.read_misses / self.reads if self.reads else 0.0
+
+
+RefillCost = Callable[[int, int], int]
+
+
+class Cache:
+    """One cache; `read`/`write` return the stall cycles of the access."""
+
+    def __init__(self, config: CacheConfig = CacheConfig(), refill: Optional[RefillCost] = None) -> None:
+        self.config = config
+        self.refill = refill
+        self._off_bits = config.line_words.bit_length() - 1
+        self._set_mask = config.sets - 1
+        self.reset()
+
+    def reset(self) -> None:
+        self.stats = CacheStats()
+        # Per set: resident line numbers, most recently used first
+        self._sets: List[List[int]] = [[] for _ in range(self.config.sets)]
+        self._dirty: set = set()
+
+    def _find(self, line: int) -> Tuple[List[int], bool]:
+        ways = self._sets[line & self._set_mask]
+        if line in ways:
+            if ways[0] != line:
+                ways.remove(line)
+                ways.insert(0, line)
+            return ways, True
+        return ways, False
+
+    def _install(self, ways: List[int], line: int) -> int:
+        """Place `line` in its set; returns cycles spent writing back a victim."""
+        ways.insert(0, line)
+        if len(ways) <= self.config.ways:
+            return 0
+        victim = ways.pop()
+        if victim in self._dirty:
+            self._dirty.discard(victim)
+            self.stats.writebacks += 1
+            return self.config.refill_cycles
+        return 0
+
+    def _fill(self, ways: List[int], line: int, addr: int) -> int:
+        cost = self._install(ways, line)
+        first = line << self._off_bits
+        refill = self.refill(first, addr - first) if self.refill else self.config.refill_cycles
+        self.stats.refills += 1
+        self.stats.refill_cycles += refill
+        return cost + refill
+
+    def _lines(self, addr: int, words: int) -> Iterator[Tuple[int, int]]:
+        line = addr >> self._off_bits
+        last = (addr + max(words, 1) - 1) >> self._off_bits
+        yield line, addr
+        while line < last:
+            line += 1
+            yield line, line << self._off_bits
+
+    def read(self, addr: int, words: int = 1) -> int:
+        self.stats.reads += 1
+        stall = 0
+        missed = False
+        for line, a in self._lines(addr, words):
+            ways, hit = self._find(line)
+            if not hit:
+                missed = True
+                stall += self._fill(ways, line, a)
+        if missed:
+            self.stats.read_misses += 1
+        return stall
+
+    def write(self, addr: int, words: int = 1) -> int:
+        cfg = self.config
+        self.stats.writes += 1
+        stall = 0
+        missed = False
+        for line, a in self._lines(addr, words):
+            ways, hit = self._find(line)
+            if not hit:
+                missed = True
+                if cfg.store_miss == "bypass":
+                    if not cfg.write_through:
+                        self.stats.backing_writes += 1
+                    continue
+                if cfg.store_miss == "refill":
+                    stall += self._fill(ways, line, a)
+                else:
+                    stall += self._install(ways, line)
+            if not cfg.write_through:
+                self._dirty.add(line)
+        if missed:
+            self.stats.write_misses += 1
+        if cfg.write_through:
+            self.stats.backing_writes += max(words, 1)
+        return stall
+
+    def access(self, addr: int, words: int = 1, is_store: bool = False) -> int:
+        return self.write(addr, words) if is_store else self.read(addr, words)
+
+    # --- Timing model hooks ---------------------------------------------------
+    def fetch_stall(self, r: Retired) -> int:
+        """Stall source for an I-cache: one fetch per ISA word."""
+        return self.read(r.pc)
+
+    def data_stall(self, r: Retired) -> int:
+        """Stall source for a D-cache: the record's data accesses."""
+        stall = 0
+        for addr, words, is_store in r.mem:
+            if addr is not None:
+                stall += self.access(addr, words, is_store)
+        return stall
+
+
+def attach(model, icache: Optional[Cache] = None, dcache: Optional[Cache] = None) -> None:
+    """Register caches as `icache`/`dcache` stall sources of a `TimingModel`."""
+    if icache is not None:
+        model.stall_sources["icache"] = icache.fetch_stall
+    if dcache is not None:
+        model.stall_sources["dcache"] = dcache.data_stall
+
+
+# --- Address streams ---------------------------------------------------------
+# Packed entries: addr << 4 | words << 1 | is_store (words up to 7)
+
+def _pack(addr: int, words: int, is_store: bool) -> int:
+    return addr << 4 | (words & 7) << 1 | int(is_store)
+
+
+def pc_stream(records: Iterable[Retired]) -> array:
+    """Instruction fetch addresses of retired records, packed for `sweep`."""
+    return array("Q", (_pack(r.pc, 1, False) for r in records))
+
+
+def data_stream(records: Iterable[Retired]) -> array:
+    """Data accesses of retired records with a known address, packed for `sweep`."""
+    return array("Q", (_pack(a, w, s) for r in records for a, w, s in r.mem if a is not None))
+
+
+def run_stream(cache: Cache, stream: Iterable[int]) -> int:
+    """Feed a packed stream through `cache`; returns the total stall cycles."""
+    access = cache.access
+    stall = 0
+    for e in stream:
+        stall += access(e >> 4, (e >> 1) & 7, bool(e & 1))
+    return stall
+
+
+@dataclass
+class SweepResult:
+    config: CacheConfig
+    stats: CacheStats
+    stall_cycles: int
+
+
+_stream: Sequence[int] = ()
+
+
+def _init_worker(stream: Sequence[int]) -> None:
+    global _stream
+    _stream = stream
+
+
+def _simulate(config: CacheConfig) -> SweepResult:
+    cache = Cache(config)
+    stall = run_stream(cache, _stream)
+    return SweepResult(config, cache.stats, stall)
+
+
+def sweep(configs: Sequence[CacheConfig], stream: Sequence[int],
+          workers: Optional[int] = None) -> List[SweepResult]:
+    """Simulate every configuration over one packed stream, in parallel.
+
+    `workers` defaults to the CPU count; 1 (or a single configuration)
+    runs in-process. Results keep the order of `configs`.
+    """
+    if workers == 1 or len(configs) <= 1:
+        _init_worker(stream)
+        return [_simulate(c) for c in configs]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(stream,)) as pool:
+        return list(pool.map(_simulate, configs, chunksize=max(1, len(configs) // 32)))
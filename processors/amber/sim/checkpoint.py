@@ -0,0 +1,279 @@
+"""Checkpoint, restore and fork for the ISS.
+
+A `Snapshot` holds the architectural state of a `Machine`: DR/SR, the CR
+file and PCC, the uimm banks, kernel mode, the CSR file (PSTATE and the
+PCC window are in it) and the instruction/data memories, plus the
+counters (micro-ops, INSTRET, steps, CYCLE source). Memories and CSRs are
+kept as fixed-size pages of immutable bytes. `take(machine, base)` reuses
+`base`'s page objects wherever the contents did not change, so a chain of
+snapshots over a long run shares every untouched page, and a restore
+copies pages into the machine's own arrays. Forks never see each other's
+writes.
+
+Snapshot files are compact: a JSON header (registers, page tables) and
+the distinct pages, zlib-compressed.
+
+`run_forks` resumes many machines from one snapshot in worker processes,
+each with its own register/memory overrides (`parse_pokes`).
+
+Hooked models (`math24.Math24`, timing, caches) are not part of a
+snapshot; attach fresh ones after `restore`.
+"""
+from __future__ import annotations
+
+import json
+import struct
+import sys
+import zlib
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from . import isa
+from .cheri import Capability
+from .isa import MASK24, MASK48
+from .iss import Machine
+from .timing import TimingModel
+
+from ..asm.image import WORD_TYPECODE
+
+
+MAGIC = b"AMBSNAP1"
+PAGE_WORDS = 256
+MEMORIES = ("imem", "dmem", "csr")
+
+_CAP_FIELDS = ("base", "length", "cursor", "perms", "attr", "tag")
+_SR_NAMES = {name: i for i, name in enumerate(isa.SR_NAMES)}
+
+
+@dataclass
+class Snapshot:
+    state: Dict[str, object]  # registers and counters, JSON-ready
+    pages: Dict[str, List[bytes]]  # memory name -> pages (native byte order)
+
+    @property
+    def steps(self) -> int:
+        return int(self.state["steps"])
+
+    @property
+    def cycle(self) -> int:
+        """Value of the CYCLE source when the snapshot was taken."""
+        return int(self.state["cycle"])
+
+    @property
+    def unique_pages(self) -> int:
+        return len({id(p) for pages in self.pages.values() for p in pages})
+
+
+def _cap(c: Capability) -> List[int]:
+    return [int(getattr(c, f)) for f in _CAP_FIELDS]
+
+
+def _uncap(v: Sequence[int]) -> Capability:
+    base, length, cursor, perms, attr, tag = v
+    return Capability(base, length, cursor, perms, attr, bool(tag))
+
+
+def take(machine: Machine, base: Optional[Snapshot] = None) -> Snapshot:
+    """Snapshot `machine`; unchanged pages are shared with `base`."""
+    m = machine
+    state = {
+        "pc": m.pc, "gp": list(m.gp), "sr": list(m.sr), "cr": [_cap(c) for c in m.cr],
+        "pcc": _cap(m.pcc), "banks": list(m.banks), "bank_valid": list(m.bank_valid),
+        "kernel": m.kernel, "halted": m.halted, "hung": m.hung,
+        "uops": m.uops, "instret": m.instret, "steps": m.steps,
+        "cycle": m.clock() if m.clock is not None else m.uops,
+    }
+    pages: Dict[str, List[bytes]] = {}
+    step = PAGE_WORDS * array(WORD_TYPECODE).itemsize
+    seen: Dict[bytes, bytes] = {}  # identical pages (zero pages above all) share one object
+    for name in MEMORIES:
+        raw = getattr(m, name).tobytes()
+        prev = base.pages.get(name) if base is not None else None
+        out = []
+        for i, off in enumerate(range(0, len(raw), step)):
+            page = raw[off:off + step]
+            if prev is not None and i < len(prev) and prev[i] == page:
+                page = prev[i]
+            out.append(seen.setdefault(page, page))
+        pages[name] = out
+    return Snapshot(state, pages)
+
+
+def restore(snap: Snapshot, machine: Optional[Machine] = None) -> Machine:
+    """Load `snap` into `machine` (hooks and clock are kept) or a new one."""
+    m = machine if machine is not None else Machine()
+    s = snap.state
+    m.pc = s["pc"]
+    m.gp = list(s["gp"])
+    m.sr = list(s["sr"])
+    m.cr = [_uncap(c) for c in s["cr"]]
+    m.pcc = _uncap(s["pcc"])
+    m.banks = list(s["banks"])
+    m.bank_valid = list(s["bank_valid"])
+    m.kernel, m.halted, m.hung = s["kernel"], s["halted"], s["hung"]
+    m.uops, m.instret, m.steps = s["uops"], s["instret"], s["steps"]
+    for name in MEMORIES:
+        setattr(m, name, array(WORD_TYPECODE, b"".join(snap.pages[name])))
+    return m
+
+
+# --- Files -------------------------------------------------------------------
+def _le(data: bytes) -> bytes:
+    if sys.byteorder == "little":
+        return data
+    w = array(WORD_TYPECODE, data)
+    w.byteswap()
+    return w.tobytes()
+
+
+def dumps(snap: Snapshot) -> bytes:
+    index: Dict[int, int] = {}
+    distinct: List[bytes] = []
+    tables: Dict[str, List[int]] = {}
+    by_content: Dict[bytes, int] = {}
+    for name, pages in snap.pages.items():
+        ids = []
+        for p in pages:
+            i = index.get(id(p))
+            if i is None:
+                i = by_content.get(p)
+                if i is None:
+                    i = by_content[p] = len(distinct)
+                    distinct.append(p)
+                index[id(p)] = i
+            ids.append(i)
+        tables[name] = ids
+    header = json.dumps({"state": snap.state, "page_words": PAGE_WORDS, "memories": tables},
+                        separators=(",", ":")).encode()
+    body = struct.pack("<II", len(header), len(distinct)) + header + b"".join(_le(p) for p in distinct)
+    return MAGIC + zlib.compress(body, 6)
+
+
+def loads(data: bytes) -> Snapshot:
+    if not data.startswith(MAGIC):
+        raise ValueError("not an Amber snapshot")
+    body = zlib.decompress(data[len(MAGIC):])
+    hlen, count = struct.unpack_from("<II", body)
+    header = json.loads(body[8:8 + hlen])
+    if header["page_words"] != PAGE_WORDS:
+        raise ValueError(f"snapshot uses {header['page_words']}-word pages, expected {PAGE_WORDS}")
+    size = PAGE_WORDS * array(WORD_TYPECODE).itemsize
+    off = 8 + hlen
+    distinct = [_le(body[off + i * size:off + (i + 1) * size]) for i in range(count)]
+    pages = {name: [distinct[i] for i in ids] for name, ids in header["memories"].items()}
+    return Snapshot(header["state"], pages)
+
+
+def save(snap: Snapshot, path: Union[str, Path]) -> int:
+    data = dumps(snap)
+    Path(path).write_bytes(data)
+    return len(data)
+
+
+def load(path: Union[str, Path]) -> Snapshot:
+    return loads(Path(path).read_bytes())
+
+
+def fast_forward(machine: Machine, steps: int) -> int:
+    """Run up to `steps` instructions without timing or records; returns how many ran."""
+    n = 0
+    step = machine.step
+    while n < steps and not machine.halted:
+        step()
+        n += 1
+    return n
+
+
+# --- Forks -------------------------------------------------------------------
+Poke = Tuple[str, int, int]  # (target kind, index, value)
+
+
+def parse_pokes(text: str) -> List[Poke]:
+    """Overrides like `DR1=5,PC=0x20,LR=3,M[0x100]=7,I[4]=0x123456,CSR[0x12]=9`."""
+    pokes: List[Poke] = []
+    for item in filter(None, (t.strip() for t in text.split(","))):
+        try:
+            lhs, rhs = item.split("=")
+            lhs = lhs.strip().upper()
+            value = int(rhs.strip(), 0)
+            if lhs == "PC":
+                pokes.append(("pc", 0, value & MASK48))
+            elif lhs.startswith("DR") and lhs[2:].isdigit() and int(lhs[2:]) < 16:
+                pokes.append(("gp", int(lhs[2:]), value & MASK24))
+            elif lhs in _SR_NAMES:
+                pokes.append(("sr", _SR_NAMES[lhs], value & MASK48))
+            elif lhs.endswith("]") and "[" in lhs:
+                kind, idx = lhs[:-1].split("[")
+                mem = {"M": "dmem", "I": "imem", "CSR": "csr"}[kind]
+                pokes.append((mem, int(idx, 0), value & MASK24))
+            else:
+                raise ValueError
+        except (KeyError, ValueError):
+            raise ValueError(f"bad override '{item}'") from None
+    return pokes
+
+
+def apply_pokes(machine: Machine, pokes: Sequence[Poke]) -> None:
+    for kind, idx, value in pokes:
+        if kind == "pc":
+            machine.pc = value
+        elif kind in ("gp", "sr"):
+            getattr(machine, kind)[idx] = value
+        else:
+            mem = getattr(machine, kind)
+            mem[idx % len(mem)] = value
+
+
+@dataclass
+class ForkResult:
+    pokes: List[Poke]
+    steps: int  # instructions run after the snapshot
+    halted: bool
+    pc: int
+    gp: List[int]
+    cycles: int  # timing model cycles after the snapshot
+    instret: int  # INSTRET after the snapshot, so cycles/instret is the fork's own IPC
+    final: Optional[bytes] = field(default=None, repr=False)  # dumps() of the end state
+
+
+_snapshot: Optional[Snapshot] = None
+
+
+def _init_worker(data: bytes) -> None:
+    global _snapshot
+    _snapshot = loads(data)
+
+
+def _run_fork(job: Tuple[List[Poke], int, bool]) -> ForkResult:
+    pokes, max_steps, keep = job
+    m = restore(_snapshot)
+    apply_pokes(m, pokes)
+    model = TimingModel()
+    base = _snapshot.cycle
+    m.clock = lambda: base + model.cycles
+    steps = 0
+    for r in m.run(max_steps):
+        model.account(r)
+        steps += 1
+    return ForkResult(pokes, steps, m.halted, m.pc, list(m.gp), model.cycles, model.instret,
+                      dumps(take(m, _snapshot)) if keep else None)
+
+
+def run_forks(snap: Snapshot, forks: Sequence[List[Poke]], max_steps: int,
+              workers: Optional[int] = None, keep: bool = False) -> List[ForkResult]:
+    """Resume every fork of `snap` for up to `max_steps` instructions, in parallel.
+
+    `workers` defaults to the CPU count; 1 (or a single fork) runs
+    in-process. `keep` returns each fork's end state. Results keep the
+    order of `forks`.
+    """
+    data = dumps(snap)
+    jobs = [(list(p), max_steps, keep) for p in forks]
+    if workers == 1 or len(jobs) <= 1:
+        _init_worker(data)
+        return [_run_fork(j) for j in jobs]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(data,)) as pool:
+        return list(pool.map(_run_fork, jobs))
@@ -0,0 +1,126 @@
+"""Capability registers with precomputed checks (`design/cheri.md`).
+
+A `Capability` keeps its architectural fields plus a derived view that
+memory accesses test against: the `[lo, hi)` bounds and the permission
+mask that survives the tag and seal checks (all zero for an untagged or
+sealed capability). The view is recomputed only when `base`, `length`,
+`perms`, `attr` or `tag` are written (CSETB, CANDP, CCLRT, SR2CR, the
+PCC CSR window); cursor moves (CINC, PUSH/POP) and copies (CMOV builds a
+new register) leave it alone. A passing access is then one mask test and
+two compares; the individual checks only run to name a fault.
+
+Faults are the PSTATE causes from `design/csr.md`, checked in the RTL
+order: CAP_TAG, CAP_SEAL, CAP_PERM, then CAP_OOB.
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+from . import isa
+from .isa import MASK24, MASK48
+
+
+CAP_OOB = isa.CAUSE["CAP_OOB"]
+CAP_TAG = isa.CAUSE["CAP_TAG"]
+CAP_PERM = isa.CAUSE["CAP_PERM"]
+CAP_SEAL = isa.CAUSE["CAP_SEAL"]
+
+_FIELDS = ("base", "length", "cursor", "perms", "attr", "tag")
+
+
+def _view_field(slot: str) -> property:
+    """Field whose writes recompute the derived bounds/permission view."""
+
+    def get(self):
+        return getattr(self, slot)
+
+    def put(self, value) -> None:
+        setattr(self, slot, value)
+        self._refresh()
+
+    return property(get, put)
+
+
+class Capability:
+    __slots__ = ("_base", "_length", "cursor", "_perms", "_attr", "_tag", "_lo", "_hi", "_allow")
+
+    base = _view_field("_base")
+    length = _view_field("_length")
+    perms = _view_field("_perms")
+    attr = _view_field("_attr")
+    tag = _view_field("_tag")
+
+    def __init__(self, base: int = 0, length: int = 0, cursor: int = 0, perms: int = 0,
+                 attr: int = 0, tag: bool = False) -> None:
+        self._base = base
+        self._length = length
+        self.cursor = cursor
+        self._perms = perms
+        self._attr = attr
+        self._tag = tag
+        self._refresh()
+
+    def _refresh(self) -> None:
+        self._lo = self._base
+        self._hi = self._base + self._length
+        self._allow = self._perms if self._tag and not self._attr & isa.ATTR_SEALED else 0
+
+    def __repr__(self) -> str:
+        return "Capability(" + ", ".join(f"{f}={getattr(self, f)!r}" for f in _FIELDS) + ")"
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Capability):
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in _FIELDS)
+
+    def field(self, fld: int) -> int:
+        if fld == isa.CR_FLD_BASE:
+            return self.base
+        if fld == isa.CR_FLD_LEN:
+            return self.length
+        if fld == isa.CR_FLD_CUR:
+            return self.cursor
+        if fld == isa.CR_FLD_PERMS:
+            return self.perms
+        if fld == isa.CR_FLD_ATTR:
+            return self.attr
+        if fld == isa.CR_FLD_TAG:
+            return int(self.tag)
+        return 0
+
+    def set_field(self, fld: int, value: int) -> None:
+        if fld == isa.CR_FLD_BASE:
+            self.base = value & MASK48
+        elif fld == isa.CR_FLD_LEN:
+            self.length = value & MASK48
+        elif fld == isa.CR_FLD_CUR:
+            self.cursor = value & MASK48
+        elif fld == isa.CR_FLD_PERMS:
+            self.perms = value & MASK24
+        elif fld == isa.CR_FLD_ATTR:
+            self.attr = value & MASK24
+        elif fld == isa.CR_FLD_TAG:
+            self.tag = bool(value & 1)
+
+    def in_bounds(self, addr: int, span: int = 1) -> bool:
+        """`addr .. addr+span-1` lies inside [base, base+len)."""
+        return self._lo <= addr and addr + span <= self._hi
+
+    def check(self, perm: int) -> Optional[int]:
+        """PSTATE cause for the tag/seal/permission checks, None when they pass."""
+        if self._allow & perm:
+            return None
+        if not self.tag:
+            return CAP_TAG
+        if self.attr & isa.ATTR_SEALED:
+            return CAP_SEAL
+        return CAP_PERM
+
+    def access(self, addr: int, span: int, perm: int) -> Optional[int]:
+        """PSTATE cause for a `span`-word access at `addr` needing `perm`."""
+        if self._allow & perm and self._lo <= addr and addr + span <= self._hi:
+            return None
+        cause = self.check(perm)
+        if cause is None and not self.in_bounds(addr, span):
+            cause = CAP_OOB
+        return cause
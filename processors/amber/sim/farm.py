@@ -0,0 +1,282 @@
+"""Batch execution farm: build and run many programs on the ISS in parallel.
+
+A manifest lists the programs, one entry per line:
+
+    ; PROGRAM [steps=N] [state=halted|running|any] [length=N] [ASSERTIONS]
+    ../asm/examples/*.asm             state=any steps=2000
+    ../skald/examples/calls.skald     DR0=3,M[0x100]=7
+    boot.hex                          PC=0x40,LR=0x12 steps=100000
+    fuzz:1000-1099                    length=32
+
+PROGRAM is an `.asm` file (assembled with `.include`s), a `.skald` file
+(compiled, then assembled), a `.hex` image, a glob of them (relative to the
+manifest) or `fuzz:SEED[-LAST]` for `fuzz.generate` programs, which start
+with the `+CAPS` capability registers. Assertions use the override syntax
+of `checkpoint.parse_pokes` (`DRn`, `LR`/`SSP`/`PSTATE`, `PC`, `M[addr]`,
+`I[addr]`, `CSR[idx]`) and are checked against the final state; `state`
+is what the run must end in (default `halted`, within `steps`).
+
+`run` builds and executes the jobs in worker processes that stay warm for
+the whole batch: the assembler spec tables, the Skald compiler and the
+fuzzer tables are loaded once per worker by the pool initializer, and each
+worker keeps the images it built, so a program listed with several
+assertion sets is built once per worker. Jobs are independent and handed
+out in small chunks, so throughput grows with the worker count until the
+jobs run out. Results keep manifest order; `Summary` totals them.
+"""
+from __future__ import annotations
+
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from . import checkpoint, fuzz, isa, lockstep
+from .isa import MASK24
+from .iss import Machine
+from .timing import TimingModel
+
+from ..asm.assembler import AsmError, Assembler
+from ..skald.codegen import CodegenError
+from ..skald.compiler import compile_items
+from ..skald.lexer import LexError
+from ..skald.parser import ParseError
+
+
+PROGRAM_SUFFIXES = (".asm", ".skald", ".hex")
+STATES = ("halted", "running", "any")
+DEFAULT_STEPS = 1_000_000
+
+
+@dataclass
+class Job:
+    program: str  # path, or `fuzz:SEED`
+    steps: int = DEFAULT_STEPS
+    state: str = "halted"
+    length: int = 64  # fuzz programs only
+    expect: List[checkpoint.Poke] = field(default_factory=list)
+
+
+def expand(program: str, base: Union[str, Path] = ".") -> List[str]:
+    """Paths a manifest PROGRAM stands for (`fuzz:` ranges become one entry per seed)."""
+    if program.startswith("fuzz:"):
+        first, _, last = program[5:].partition("-")
+        lo = int(first, 0)
+        return [f"fuzz:{seed}" for seed in range(lo, int(last, 0) + 1 if last else lo + 1)]
+    path = Path(program)
+    if not path.is_absolute():
+        path = Path(base) / path
+    if glob.has_magic(str(path)):
+        return sorted(p for p in glob.glob(str(path)) if p.lower().endswith(PROGRAM_SUFFIXES))
+    if path.is_dir():
+        return sorted(str(p) for p in path.iterdir() if p.suffix.lower() in PROGRAM_SUFFIXES)
+    return [str(path)]
+
+
+def parse_manifest(lines: Iterable[str], base: Union[str, Path] = ".", steps: int = DEFAULT_STEPS) -> List[Job]:
+    """Jobs of a manifest; relative paths and globs are taken from `base`.
+
+    `steps` is the limit of entries that do not give one.
+    """
+    jobs: List[Job] = []
+    for lineno, raw in enumerate(lines, start=1):
+        line = raw.split(";", 1)[0].strip()
+        if not line:
+            continue
+        program, *items = line.split()
+        opts: Dict[str, int] = {"steps": steps}
+        state = "halted"
+        expect: List[checkpoint.Poke] = []
+        try:
+            for item in items:
+                key, _, value = item.partition("=")
+                if key in ("steps", "length"):
+                    opts[key] = int(value, 0)
+                elif key == "state":
+                    if value not in STATES:
+                        raise ValueError(f"state must be one of {', '.join(STATES)}")
+                    state = value
+                else:
+                    expect.extend(checkpoint.parse_pokes(item))
+            programs = expand(program, base)
+        except ValueError as e:
+            raise ValueError(f"manifest line {lineno}: {e}") from None
+        if not programs:
+            raise ValueError(f"manifest line {lineno}: no programs match '{program}'")
+        jobs.extend(Job(p, state=state, expect=list(expect), **opts) for p in programs)
+    return jobs
+
+
+def read_manifest(path: Union[str, Path], steps: int = DEFAULT_STEPS) -> List[Job]:
+    path = Path(path)
+    with open(path, encoding="utf-8") as fp:
+        return parse_manifest(fp, path.parent, steps)
+
+
+# --- Results -----------------------------------------------------------------
+@dataclass
+class FarmResult:
+    program: str
+    steps: int = 0  # ISA instructions executed
+    instret: int = 0
+    cycles: int = 0  # timing model cycles (0 unless timed)
+    halted: bool = False
+    pc: int = 0
+    failures: List[str] = field(default_factory=list)  # unmet assertions
+    error: Optional[str] = None  # the program could not be built or loaded
+    seconds: float = 0.0  # build and run time in the worker
+
+    @property
+    def ok(self) -> bool:
+        return not self.failures and self.error is None
+
+    def __str__(self) -> str:
+        if self.error is not None:
+            return f"ERROR    {self.program}: {self.error}"
+        state = "halted" if self.halted else "running"
+        cycles = f", {self.cycles} cycles" if self.cycles else ""
+        if self.failures:
+            return f"FAIL     {self.program}: {'; '.join(self.failures)} ({state} at PC={self.pc:06X})"
+        return f"PASS     {self.program}: {self.steps} instructions{cycles}, {state} at PC={self.pc:06X}"
+
+
+@dataclass
+class Summary:
+    programs: int = 0
+    passed: int = 0
+    failed: int = 0
+    errors: int = 0
+    instructions: int = 0
+    cpu_seconds: float = 0.0  # sum of the workers' per-program times
+
+    def add(self, res: FarmResult) -> None:
+        self.programs += 1
+        self.passed += res.ok
+        self.failed += bool(res.failures) and res.error is None
+        self.errors += res.error is not None
+        self.instructions += res.steps
+        self.cpu_seconds += res.seconds
+
+
+def report_json(results: Sequence[FarmResult], summary: Summary, wall: float, workers: int) -> Dict[str, object]:
+    return {"summary": {**asdict(summary), "wall_seconds": wall, "workers": workers},
+            "results": [{**asdict(r), "ok": r.ok} for r in results]}
+
+
+# --- Workers -----------------------------------------------------------------
+def _name(kind: str, idx: int) -> str:
+    if kind == "pc":
+        return "PC"
+    if kind == "gp":
+        return f"DR{idx}"
+    if kind == "sr":
+        return isa.SR_NAMES[idx]
+    return f"{ {'dmem': 'M', 'imem': 'I', 'csr': 'CSR'}[kind]}[{idx:#x}]"
+
+
+def check(machine: Machine, expect: Sequence[checkpoint.Poke]) -> List[str]:
+    """Assertions `machine` does not meet, as `NAME=actual expected value` texts."""
+    failures = []
+    for kind, idx, want in expect:
+        if kind == "pc":
+            got = machine.pc
+        elif kind in ("gp", "sr"):
+            got = getattr(machine, kind)[idx]
+        else:
+            mem = getattr(machine, kind)
+            got = mem[idx % len(mem)] & MASK24
+        if got != want:
+            width = 6 if kind in ("gp", "dmem", "imem", "csr") else 12
+            failures.append(f"{_name(kind, idx)}={got:0{width}X} expected {want:0{width}X}")
+    return failures
+
+
+_images: Dict[Tuple[str, int, int], List[Tuple[int, Sequence[int]]]] = {}  # per worker
+_timed = False
+
+
+def _init_worker(timed: bool) -> None:
+    """Load the spec tables and compiler once, before the first job."""
+    global _timed
+    _timed = timed
+    compile_items("fn main() -> u24 out DR0 { return 0; }")
+    Assembler(origin=0).assemble("    NOP\n    HLT\n")
+
+
+def build(program: str, length: int = 64) -> List[Tuple[int, Sequence[int]]]:
+    """(origin, words) segments of a manifest PROGRAM (`length` is for `fuzz:`)."""
+    path = Path(program)
+    suffix = path.suffix.lower()
+    if program.startswith("fuzz:"):
+        return [(0, fuzz.generate(int(program[5:]), length).words)]
+    if suffix == ".hex":
+        m = Machine()
+        m.load_hex(path)
+        return [(0, m.imem)]
+    asm = Assembler(origin=0)
+    if suffix == ".skald":
+        sgs = asm.assemble_items_segments(compile_items(path.read_text(encoding="utf-8"), path.name))
+    else:
+        sgs = asm.assemble_path_segments(path)
+    return [(sg.addr, sg.words) for sg in sgs]
+
+
+def _image(job: Job) -> List[Tuple[int, Sequence[int]]]:
+    """`build(job)`, at most once per worker."""
+    if job.program.startswith("fuzz:"):
+        key = (job.program, job.length, 0)
+    else:
+        key = (job.program, job.length, os.stat(job.program).st_mtime_ns)
+    segments = _images.get(key)
+    if segments is None:
+        segments = _images[key] = build(job.program, job.length)
+    return segments
+
+
+def _run(job: Job) -> FarmResult:
+    start = time.perf_counter()
+    res = FarmResult(job.program)
+    try:
+        segments = _image(job)
+    except (OSError, ValueError, AsmError, LexError, ParseError, CodegenError) as e:
+        res.error = f"{type(e).__name__}: {e}"
+        res.seconds = time.perf_counter() - start
+        return res
+    m = Machine()
+    if job.program.startswith("fuzz:"):
+        lockstep.boot_caps(m)
+    for origin, words in segments:
+        m.load_words(words, origin)
+    if _timed:
+        model = TimingModel()
+        model.attach(m)
+        for r in m.run(job.steps):
+            model.account(r)
+        res.cycles = model.cycles
+    else:
+        checkpoint.fast_forward(m, job.steps)
+    res.steps, res.instret, res.halted, res.pc = m.steps, m.instret, m.halted, m.pc
+    if job.state != "any" and res.halted != (job.state == "halted"):
+        res.failures.append("still running" if job.state == "halted" else "halted")
+    res.failures.extend(check(m, job.expect))
+    res.seconds = time.perf_counter() - start
+    return res
+
+
+def run(jobs: Sequence[Job], workers: Optional[int] = None, timed: bool = False) -> Iterator[FarmResult]:
+    """Build and run every job; results keep the order of `jobs`.
+
+    `workers` defaults to the CPU count; 1 (or a single job) runs
+    in-process. `timed` attaches a `TimingModel` to count cycles.
+    """
+    if workers == 1 or len(jobs) <= 1:
+        _init_worker(timed)
+        yield from map(_run, jobs)
+        return
+    workers = workers or os.cpu_count() or 1
+    chunk = max(1, len(jobs) // (workers * 8))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(timed,)) as pool:
+        yield from pool.map(_run, jobs, chunksize=chunk)
@@ -0,0 +1,348 @@
+"""Constrained-random Amber programs for differential runs.
+
+Programs are straight-line sequences of the `asm.spec.SPECS` instructions
+whose encoding the RTL decodes as the same operation (`FUZZ_SPECS`; see
+"Encoding" in the README), closed by HLT. They are written as assembly and
+built with `Assembler`. Constraints:
+
+- DR15 is reserved (`design/cheri.md`) and never used;
+- AR0 is the stack: loads and stores go through AR1-AR3 and SETSSP is
+  not generated;
+- ops that take upper immediate bits from uimm bank 0 are preceded by
+  `LUIui #0` while the bank is empty;
+- loads and stores use the `lockstep.BOOT_CAPS` capabilities (`+CAPS`);
+- CSR accesses stay on registers whose value does not depend on timing;
+- each candidate runs on the ISS as it is placed and one that traps is
+  replaced, so every program reaches its HLT.
+
+`Coverage` counts (mnemonic, operand class, hazard) combinations. The
+operand class names immediate buckets (zero, max, negative, ...), CSR and
+uimm bank choices and DRs == DRt; the hazard is the distance to the last
+writer of a register, the flags or a capability's memory word that the
+instruction reads. Each slot draws several candidates and keeps the least
+covered, so effort moves to combinations not yet tested.
+"""
+from __future__ import annotations
+
+import json
+import random
+from array import array
+from collections import Counter
+from dataclasses import dataclass, field
+from itertools import product
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from . import checkpoint, isa, lockstep
+from .iss import Machine
+
+from ..asm import image
+from ..asm.assembler import Assembler, Segment
+from ..asm.spec import CC_MAP, SPECS, InstructionSpec
+
+
+# SPECS mnemonics the RTL spells differently for the same operation
+_RTL_NAME = {"LDUR": "LDcso", "STUR": "STcso"}
+# HLT ends every program; SYSCALL/KRET transfer control; SSP belongs to calls
+_EXCLUDED = {"HLT", "SYSCALL", "KRET", "SETSSP"}
+
+
+def _agrees(mnemonic: str, spec: InstructionSpec) -> bool:
+    rtl = isa.OPC_NAMES.get(spec.opclass << 4 | spec.subop, "")
+    return rtl.upper() == _RTL_NAME.get(mnemonic, mnemonic).upper()
+
+
+FUZZ_SPECS: Dict[str, InstructionSpec] = {
+    mn: spec for mn, spec in SPECS.items() if mn not in _EXCLUDED and _agrees(mn, spec)
+}
+
+DATA_REGS = range(15)  # DR15 is reserved
+DATA_CAPS = (1, 2, 3)  # AR0 is the stack
+CSR_READS = {"PSTATE_LO": isa.CSR_PSTATE_LO, "PSTATE_HI": isa.CSR_PSTATE_HI, "MATH_OPA": isa.CSR_MATH_OPA,
+             "MATH_OPB": isa.CSR_MATH_OPB, "MATH_OPC": isa.CSR_MATH_OPC}
+CSR_WRITES = {"MATH_OPA": isa.CSR_MATH_OPA, "MATH_OPB": isa.CSR_MATH_OPB, "MATH_OPC": isa.CSR_MATH_OPC}
+HAZARDS = ("raw1", "raw2", "raw3", "none")
+_CCS = sorted({v: k for k, v in CC_MAP.items() if k != "RA"}.values())
+_SRS = ("LR", "SSP", "FL", "PC")
+
+_OP = isa.OPC
+_BANK0_OPS = {mn for mn, s in FUZZ_SPECS.items() if s.opclass == 1 and mn != "LUIUI"} | {"STUI"}
+# Ops with a GP target that do not read it
+_WRITE_ONLY = {_OP[n] for n in ("MOVur", "MOVui", "MOVsi", "CSRRD", "LDcso")}
+_STORES = {_OP[n] for n in ("STcso", "STui", "STsi")}
+
+Key = Tuple[str, str, str]  # (mnemonic, operand class, hazard)
+
+
+# --- Operands ------------------------------------------------------------------
+def _width(spec: InstructionSpec, kind: str) -> int:
+    hi, lo = spec.fields[kind]
+    return hi - lo + 1
+
+
+def _imm_buckets(kind: str, width: int) -> Tuple[str, ...]:
+    if kind.upper().startswith("SIMM"):
+        return ("0", "pos", "max", "neg", "min")
+    return ("0", "pos", "max")
+
+
+def _imm_value(bucket: str, kind: str, width: int, rng: random.Random) -> int:
+    signed = kind.upper().startswith("SIMM")
+    top = (1 << (width - 1)) - 1 if signed else (1 << width) - 1
+    if bucket == "0":
+        return 0
+    if bucket == "max":
+        return top
+    if bucket == "min":
+        return -top - 1
+    if bucket == "neg":
+        return -rng.randint(1, top)
+    return rng.randint(1, max(1, top - 1))
+
+
+def _operand_options(mnemonic: str, spec: InstructionSpec, kind: str) -> Tuple[Optional[str], ...]:
+    """Operand-class features one operand can contribute."""
+    k = kind.upper()
+    if k == "UIMM2":
+        return ("bank0", "bank1", "bank2")
+    if k == "IMM12" and mnemonic == "CSRRD":
+        return tuple(CSR_READS)
+    if k == "IMM12" and mnemonic == "CSRWR":
+        return tuple(CSR_WRITES)
+    if k.startswith(("IMM", "SIMM", "UIMM")):
+        return _imm_buckets(kind, _width(spec, kind))
+    return (None,)
+
+
+def operand_classes(mnemonic: str) -> List[str]:
+    """Every operand class `mnemonic` can be generated with."""
+    spec = FUZZ_SPECS[mnemonic]
+    opts = [_operand_options(mnemonic, spec, kind) for kind in spec.operands]
+    if sum(kind.upper().startswith("DR") for kind in spec.operands) > 1:
+        opts.append(("alias", None))
+    return sorted({",".join(f for f in combo if f) or "-" for combo in product(*opts)})
+
+
+@dataclass
+class _Candidate:
+    mnemonic: str
+    tokens: List[str]
+    oclass: str
+
+    @property
+    def text(self) -> str:
+        return f"{self.mnemonic} {', '.join(self.tokens)}".rstrip()
+
+
+def _candidate(mnemonic: str, rng: random.Random, recent: List[Optional[int]],
+               bank: Optional[str] = None) -> _Candidate:
+    spec = FUZZ_SPECS[mnemonic]
+    tokens: List[str] = []
+    feats: List[str] = []
+    regs: List[int] = []
+    # Aim the first DR operand at a recent writer to exercise forwarding
+    dist = rng.randint(1, 4)
+    steer = recent[-dist] if dist <= len(recent) else None
+    for kind in spec.operands:
+        k = kind.upper()
+        if k in ("DRS", "DRT"):
+            r = steer if steer is not None and not regs else rng.choice(DATA_REGS)
+            if regs and rng.random() < 0.2:
+                r = regs[0]
+            regs.append(r)
+            tokens.append(f"DR{r}")
+        elif k in ("ARS", "ART"):
+            tokens.append(f"AR{rng.choice(DATA_CAPS)}")
+        elif k in ("SRS", "SRT"):
+            tokens.append(rng.choice(_SRS))
+        elif k == "CC":
+            tokens.append(rng.choice(_CCS))
+        elif k == "HL":
+            tokens.append(rng.choice("HL"))
+        else:
+            opt = bank if k == "UIMM2" and bank else rng.choice(_operand_options(mnemonic, spec, kind))
+            feats.append(opt)
+            if k == "UIMM2":
+                tokens.append(f"#{opt[-1]}")
+            elif opt in CSR_READS or opt in CSR_WRITES:
+                tokens.append(f"#{CSR_READS.get(opt, CSR_WRITES.get(opt))}")
+            else:
+                tokens.append(f"#{_imm_value(opt, kind, _width(spec, kind), rng)}")
+    if len(regs) > 1 and regs[0] == regs[1]:
+        feats.append("alias")
+    return _Candidate(mnemonic, tokens, ",".join(feats) or "-")
+
+
+# --- Hazards -------------------------------------------------------------------
+def effects(word: int) -> Tuple[Set[str], Set[str]]:
+    """Resources (`DRn`, `FL`, `Mn` for CRn's memory word) `word` reads and writes, per the RTL decode."""
+    opc = isa.opc_of(word)
+    reads: Set[str] = set()
+    writes: Set[str] = set()
+    if opc in isa.HAS_SRC_GP_OPS:
+        if opc == _OP["CSRWR"]:
+            reads.add(f"DR{(word >> 12) & 0xF}")
+        elif opc in isa.SRC_GP_13_10_OPS:
+            reads.add(f"DR{(word >> 10) & 0xF}")
+        else:
+            reads.add(f"DR{(word >> 8) & 0xF}")
+    if opc in isa.HAS_TGT_GP_OPS and opc not in _WRITE_ONLY:
+        reads.add(f"DR{(word >> 12) & 0xF}")
+    if opc in isa.GP_WE_OPS:
+        writes.add(f"DR{(word >> 12) & 0xF}")
+    if opc in isa.USES_FLAGS_OPS:
+        reads.add("FL")
+    if opc >> 4 <= 3 and opc not in (0, _OP["LUIui"]):
+        writes.add("FL")
+    if opc == _OP["LDcso"]:
+        reads.add(f"M{(word >> 10) & 3}")
+    elif opc in _STORES:
+        writes.add(f"M{(word >> 14) & 3}")
+    return reads, writes
+
+
+def _hazard(reads: Iterable[str], last: Dict[str, int], index: int) -> str:
+    dist = min((index - last[r] for r in reads if r in last), default=None)
+    return f"raw{dist}" if dist is not None and dist <= 3 else "none"
+
+
+# --- Coverage ------------------------------------------------------------------
+class Coverage:
+    """Hits per (mnemonic, operand class, hazard)."""
+
+    def __init__(self) -> None:
+        self.counts: Counter = Counter()
+        self._universe: Optional[List[Key]] = None
+
+    def hit(self, key: Key) -> None:
+        self.counts[key] += 1
+
+    def universe(self) -> List[Key]:
+        """Every combination the generator can produce."""
+        if self._universe is None:
+            keys = []
+            for mn in FUZZ_SPECS:
+                reads = bool(effects(_encode(mn, _candidate(mn, random.Random(0), []).tokens))[0])
+                for oc in operand_classes(mn):
+                    keys.extend((mn, oc, h) for h in (HAZARDS if reads else ("none",)))
+            self._universe = keys
+        return self._universe
+
+    @property
+    def covered(self) -> int:
+        return sum(1 for k in self.universe() if self.counts[k])
+
+    @property
+    def total(self) -> int:
+        return len(self.universe())
+
+    def gaps(self) -> Dict[str, int]:
+        """Untested combinations per mnemonic, largest first."""
+        missing = Counter(k[0] for k in self.universe() if not self.counts[k])
+        return dict(missing.most_common())
+
+    def save(self, path: Union[str, Path]) -> None:
+        rows = [[*k, n] for k, n in sorted(self.counts.items())]
+        Path(path).write_text(json.dumps(rows, separators=(",", ":")) + "\n")
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "Coverage":
+        cov = cls()
+        for mn, oc, hz, n in json.loads(Path(path).read_text()):
+            cov.counts[(mn, oc, hz)] = n
+        return cov
+
+
+# --- Programs ------------------------------------------------------------------
+def _encode(mnemonic: str, tokens: List[str]) -> int:
+    return FUZZ_SPECS[mnemonic].encode(tokens)
+
+
+@dataclass
+class Program:
+    seed: int
+    source: str
+    words: "array[int]"
+    keys: List[Key] = field(default_factory=list)
+
+    def write(self, stem: Union[str, Path]) -> Path:
+        """Write `<stem>.asm` and `<stem>.hex`; returns the hex path."""
+        stem = Path(stem)
+        stem.with_suffix(".asm").write_text(self.source)
+        hex_path = stem.with_suffix(".hex")
+        with open(hex_path, "wb") as fp:
+            image.write_segments_hex([Segment(0, self.words)], fp)
+        return hex_path
+
+
+def generate(seed: int, length: int = 64, coverage: Optional[Coverage] = None, tries: int = 8) -> Program:
+    """A program of about `length` instructions plus HLT; `coverage` steers and records it."""
+    rng = random.Random(seed)
+    cov = coverage if coverage is not None else Coverage()
+    mnemonics = sorted(FUZZ_SPECS)
+    m = Machine()
+    lockstep.boot_caps(m)
+    lines: List[str] = []
+    encoded: List[int] = []
+    keys: List[Key] = []
+    recent: List[Optional[int]] = []  # DR written by each placed instruction
+    last: Dict[str, int] = {}  # resource -> index of its last writer
+
+    def place(cand: _Candidate) -> bool:
+        word = _encode(cand.mnemonic, cand.tokens)
+        snap = checkpoint.take(m)
+        m.imem[m.pc] = word
+        r = m.step()
+        if r.taken or m.halted:
+            checkpoint.restore(snap, m)
+            return False
+        reads, writes = effects(word)
+        key = (cand.mnemonic, cand.oclass, _hazard(reads, last, len(lines)))
+        for res in writes:
+            last[res] = len(lines)
+        recent.append(next((int(w[2:]) for w in writes if w.startswith("DR")), None))
+        lines.append(cand.text)
+        encoded.append(word)
+        keys.append(key)
+        cov.hit(key)
+        return True
+
+    while len(lines) < length:
+        best: Optional[Tuple[int, float, _Candidate]] = None
+        for _ in range(tries):
+            cand = _candidate(rng.choice(mnemonics), rng, recent)
+            reads = effects(_encode(cand.mnemonic, cand.tokens))[0]
+            score = (cov.counts[(cand.mnemonic, cand.oclass, _hazard(reads, last, len(lines)))], rng.random(), cand)
+            if best is None or score[:2] < best[:2]:
+                best = score
+        cand = best[2]
+        if cand.mnemonic in _BANK0_OPS and not m.bank_valid[0]:
+            if not place(_candidate("LUIUI", rng, recent, bank="bank0")):
+                continue
+        place(cand)
+    lines.append("HLT")
+    encoded.append(SPECS["HLT"].encode([]))
+    source = f"; fuzz seed {seed}\n" + "".join(f"    {line}\n" for line in lines)
+    words = Assembler(origin=0).assemble(source)
+    if list(words) != encoded:
+        raise ValueError(f"seed {seed}: assembler output differs from the spec encodings")
+    return Program(seed, source, words, keys)
+
+
+# --- Differential runs -------------------------------------------------------------
+def run(count: int, seed: int, out_dir: Union[str, Path], image_path: Union[str, Path],
+        length: int = 64, coverage: Optional[Coverage] = None, workers: Optional[int] = None,
+        vvp: str = "vvp", max_steps: Optional[int] = None,
+        ) -> Iterator[Tuple[Path, lockstep.LockstepResult]]:
+    """Generate `count` programs (seeds `seed`..) into `out_dir` and check each in lock-step.
+
+    Every program retires micro-ops before its HLT, so an RTL side that
+    committed none (a broken vvp setup) is reported as an error.
+    """
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    paths = [generate(seed + i, length, coverage).write(out / f"fuzz_{seed + i}") for i in range(count)]
+    for path, res in zip(paths, lockstep.run_batch(paths, image_path, max_steps, workers, vvp, caps=True)):
+        if res.error is None and res.commits == 0 and max_steps != 0:
+            res.error = "the RTL produced no commits (is the testbench built with DEBUGCOMMIT?)"
+        yield path, res
@@ -0,0 +1,352 @@
+"""Amber core encoding as implemented by the RTL.
+
+Opcode numbers mirror `src/opcodes.vh` (opcode = {class, subop} in bits
+[23:16]); register fields, condition codes, PSTATE layout and CSR indices
+mirror `sr.vh`, `cc.vh`, `cr.vh`, `pstate.vh` and `csr.vh`.
+
+`xt_expand` reproduces the XT stage (`stg2xt.v`): the micro-op words an
+ISA word is translated into, in issue order. Every micro-op carries the PC of
+the ISA word it came from.
+
+Note: the assembler's `spec.SPECS` still uses an older numbering for
+opclasses 4-7 (control flow in class 7, PUSH/POP in class 8, ...). Words
+from those classes decode here as the RTL would decode them.
+"""
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Dict, Tuple
+
+
+MASK24 = 0xFFFFFF
+MASK48 = 0xFFFFFFFFFFFF
+# Instruction and data BRAMs (mem.v) hold 4096 words each
+MEM_WORDS = 4096
+
+# --- Opcodes (opcodes.vh) ---------------------------------------------------
+OPC_NAMES: Dict[int, str] = {
+    # OPCLASS_0
+    0x00: "NOP", 0x01: "MOVur", 0x02: "MCCur", 0x03: "ADDur", 0x04: "SUBur",
+    0x05: "NOTur", 0x06: "ANDur", 0x07: "ORur", 0x08: "XORur", 0x09: "SHLur",
+    0x0A: "ROLur", 0x0B: "SHRur", 0x0C: "RORur", 0x0D: "CMPur", 0x0E: "TSTur",
+    # OPCLASS_1
+    0x10: "LUIui", 0x11: "MOVui", 0x13: "ADDui", 0x14: "SUBui", 0x16: "ANDui",
+    0x17: "ORui", 0x18: "XORui", 0x19: "SHLui", 0x1A: "ROLui", 0x1B: "SHRui",
+    0x1C: "RORui", 0x1D: "CMPui", 0x1E: "SHLuiv", 0x1F: "SHRuiv",
+    # OPCLASS_2
+    0x23: "ADDsr", 0x24: "SUBsr", 0x25: "NEGsr", 0x26: "NEGsv", 0x27: "ADDsv",
+    0x28: "SUBsv", 0x2A: "SHRsrv", 0x2B: "SHRsr", 0x2D: "CMPsr", 0x2E: "TSTsr",
+    # OPCLASS_3
+    0x31: "MOVsi", 0x32: "MCCsi", 0x33: "ADDsi", 0x34: "SUBsi", 0x36: "ADDsiv",
+    0x37: "SUBsiv", 0x3B: "SHRsi", 0x3C: "SHRsiv", 0x3D: "CMPsi",
+    # OPCLASS_4 (CHERI loads/stores)
+    0x40: "LDcso", 0x41: "STcso", 0x42: "STui", 0x43: "STsi", 0x44: "CLDcso",
+    0x45: "CSTcso",
+    # OPCLASS_5 (CHERI capability ops)
+    0x51: "CMOV", 0x52: "CINC", 0x53: "CINCi", 0x54: "CSETB", 0x55: "CSETBi",
+    0x56: "CGETP", 0x57: "CANDP", 0x58: "CGETT", 0x59: "CCLRT", 0x5A: "CINCv",
+    0x5B: "CINCiv", 0x5C: "CSETBv", 0x5D: "CSETBiv",
+    # OPCLASS_6 (control flow)
+    0x60: "BTP", 0x62: "JCCui", 0x63: "BCCsr", 0x64: "BCCso", 0x65: "BALso",
+    0x67: "JSRui", 0x68: "BSRsr", 0x69: "BSRso", 0x6A: "RET",
+    # OPCLASS_7 (stack helpers)
+    0x70: "PUSHur", 0x71: "PUSHAur", 0x72: "POPur", 0x73: "POPAur",
+    # OPCLASS_8 (CSR)
+    0x80: "CSRRD", 0x81: "CSRWR",
+    # OPCLASS_9 (privileged)
+    0x90: "HLT", 0x91: "SETSSP", 0x92: "SYSCALL", 0x93: "KRET",
+    0x94: "TLBINV_ALL", 0x95: "TLBINV_ASID", 0x96: "TLBINV_PAGE",
+    # OPCLASS_F (micro-ops)
+    0xF0: "SRMOVur", 0xF1: "SRMOVAur", 0xF2: "SRJCCso", 0xF3: "SRADDsi",
+    0xF4: "SRSUBsi", 0xF5: "SRSTso", 0xF6: "SRLDso", 0xF7: "CR2SR", 0xF8: "SR2CR",
+}
+OPC: Dict[str, int] = {name: opc for opc, name in OPC_NAMES.items()}
+
+# Data-memory micro-ops; each holds the front of the pipeline (hazard.v)
+MEM_UOPS = frozenset(OPC[n] for n in ("SRLDso", "LDcso", "STui", "STsi", "STcso", "SRSTso"))
+STORE_UOPS = frozenset(OPC[n] for n in ("STui", "STsi", "STcso", "SRSTso"))
+# 48-bit accesses ({mem[a+1], mem[a]})
+WIDE_UOPS = frozenset(OPC[n] for n in ("SRLDso", "SRSTso"))
+
+# Immediate fields ID latches per opcode (stg3id.v); other opcodes see 0.
+# SHLuiv/SHRuiv/CMPui/ADDsiv/SUBsiv/SHRsiv are not listed there, so EX sees
+# a zero low immediate for them.
+IMM12_OPS = frozenset(OPC[n] for n in (
+    "LUIui", "MOVui", "ADDui", "SUBui", "ANDui", "ORui", "XORui", "SHLui", "SHRui",
+    "ROLui", "RORui", "MOVsi", "ADDsi", "SUBsi", "SHRsi", "CMPsi", "JCCui", "BCCso",
+    "STui", "SRSTso", "SRLDso", "SYSCALL", "CSTcso",
+))
+IMM14_OPS = frozenset(OPC[n] for n in (
+    "STsi", "SRADDsi", "SRSUBsi", "CSETBi", "CSETBiv", "CINCi", "CINCiv",
+))
+IMM10_OPS = frozenset(OPC[n] for n in ("SRJCCso", "LDcso", "STcso", "CLDcso"))
+
+
+def _ops(*names: str) -> frozenset:
+    return frozenset(OPC[n] for n in names)
+
+
+# Register-field tables (stg3id.v). An opcode outside HAS_TGT_GP/HAS_SRC_GP
+# reads DR0 for that operand: CMPsi, for one, compares DR0 rather than DRt.
+GP_WE_OPS = _ops(
+    "MOVur", "ADDur", "SUBur", "NOTur", "ANDur", "ORur", "XORur", "SHLur", "SHRur",
+    "ROLur", "RORur", "ADDsr", "SUBsr", "SHRsr", "NEGsr", "ADDsv", "SUBsv", "NEGsv",
+    "SHRsrv", "MOVui", "ADDui", "SUBui", "ANDui", "ORui", "XORui", "SHLui", "SHRui",
+    "ROLui", "RORui", "MOVsi", "ADDsi", "SUBsi", "ADDsiv", "SUBsiv", "SHRsiv", "SHRsi",
+    "MCCur", "MCCsi", "CSRRD", "LDcso", "CGETP", "CGETT",
+)
+HAS_TGT_GP_OPS = GP_WE_OPS | _ops("CMPur", "CMPsr", "CMPui", "TSTur", "TSTsr", "BCCsr")
+HAS_SRC_GP_OPS = _ops(
+    "MOVur", "ADDur", "SUBur", "ANDur", "ORur", "XORur", "SHLur", "SHRur", "ROLur",
+    "RORur", "CMPur", "ADDsr", "SUBsr", "SHRsr", "CMPsr", "ADDsv", "SUBsv", "SHRsrv",
+    "MCCur", "CSRWR", "STcso", "CINC", "CINCv", "CSETB", "CSETBv", "CANDP",
+    "TLBINV_ASID", "TLBINV_PAGE",
+)
+# DRs at [13:10] instead of [11:8] (CSRWR uses [15:12])
+SRC_GP_13_10_OPS = _ops("STcso", "CINC", "CINCv", "CSETB", "CSETBv", "CANDP")
+BRANCH_OPS = _ops("JCCui", "BCCsr", "BCCso", "BALso", "SRJCCso")
+# Flag consumers read PSTATE as their SR source
+USES_FLAGS_OPS = BRANCH_OPS | _ops("MCCur", "MCCsi")
+SR_WE_OPS = _ops("SRMOVur", "SRADDsi", "SRSUBsi", "SRLDso", "SRMOVAur", "CR2SR", "SYSCALL")
+HAS_TGT_SR_OPS = SR_WE_OPS | _ops("SRSTso", "SRJCCso")
+HAS_SRC_SR_OPS = USES_FLAGS_OPS | _ops("SRMOVur", "SRLDso", "SRSTso", "TLBINV_PAGE", "SR2CR")
+# Capability register fields: opcode -> (CRs bit offset or None, CRt bit offset or None)
+CR_FIELDS: Dict[int, Tuple] = {
+    OPC["STui"]: (None, 14), OPC["STsi"]: (None, 14), OPC["LDcso"]: (10, None),
+    OPC["STcso"]: (None, 14), OPC["CLDcso"]: (12, None), OPC["CSTcso"]: (None, 14),
+    OPC["CINC"]: (None, 14), OPC["CINCv"]: (None, 14), OPC["CINCi"]: (None, 14),
+    OPC["CINCiv"]: (None, 14), OPC["CMOV"]: (12, 14), OPC["CSETB"]: (10, 14),
+    OPC["CSETBi"]: (10, 14), OPC["CSETBv"]: (10, 14), OPC["CSETBiv"]: (10, 14),
+    OPC["CANDP"]: (None, 14), OPC["CCLRT"]: (None, 14), OPC["CGETP"]: (10, None),
+    OPC["CGETT"]: (10, None), OPC["SRMOVAur"]: (12, None), OPC["CR2SR"]: (12, None),
+    OPC["SR2CR"]: (None, 14),
+}
+# Condition-code field offset per opcode
+CC_SHIFT: Dict[int, int] = {
+    OPC["JCCui"]: 12, OPC["BCCsr"]: 8, OPC["BCCso"]: 12, OPC["SRJCCso"]: 10,
+    OPC["MCCur"]: 4, OPC["MCCsi"]: 8,
+}
+
+# --- Condition codes (cc.vh) -----------------------------------------------
+CC_AL, CC_EQ, CC_NE, CC_LT, CC_GT, CC_LE, CC_GE, CC_BT, CC_AT, CC_BE, CC_AE = range(11)
+CC_NAMES = ("AL", "EQ", "NE", "LT", "GT", "LE", "GE", "BT", "AT", "BE", "AE")
+
+# --- Flags / PSTATE (flags.vh, pstate.vh) -----------------------------------
+FLAG_Z, FLAG_N, FLAG_C, FLAG_V = 1, 2, 4, 8
+PSTATE_BIT_TPE = 5
+PSTATE_BIT_MODE = 8
+PSTATE_CAUSE_LO = 16
+PSTATE_INFO_LO = 24
+
+CAUSE_NAMES: Dict[int, str] = {
+    0x00: "NONE", 0x01: "ARITH_OVF", 0x02: "ARITH_RANGE", 0x03: "DIV_ZERO",
+    0x10: "CAP_OOB", 0x11: "CAP_TAG", 0x12: "CAP_PERM", 0x13: "CAP_SEAL",
+    0x14: "CAP_ALIGN", 0x15: "EXEC_PERM", 0x20: "UIMM_STATE", 0x30: "CAP_CFG",
+    0x40: "MMU_VINV", 0x41: "MMU_PERM", 0x42: "MMU_PORT", 0x43: "MMU_PTAB",
+}
+CAUSE: Dict[str, int] = {name: code for code, name in CAUSE_NAMES.items()}
+
+# --- Special registers (sr.vh) ---------------------------------------------
+SR_LR, SR_SSP, SR_PSTATE, SR_PC = 0, 1, 2, 3
+SR_NAMES = ("LR", "SSP", "PSTATE", "PC")
+# regsr.v reset value of SSP
+SSP_RESET = 0xFFF
+
+# --- Capabilities (cr.vh) ---------------------------------------------------
+PERM_R, PERM_W, PERM_X, PERM_LC, PERM_SC, PERM_SB = (1 << i for i in range(6))
+ATTR_SEALED = 1
+CR_FLD_BASE, CR_FLD_LEN, CR_FLD_CUR, CR_FLD_PERMS, CR_FLD_ATTR, CR_FLD_TAG = range(6)
+
+# --- CSR indices (csr.vh) ---------------------------------------------------
+CSR_PSTATE_LO = 0x000
+CSR_PSTATE_HI = 0x001
+CSR_CYCLE_LO = 0x00A
+CSR_CYCLE_HI = 0x00B
+CSR_INSTRET_LO = 0x00C
+CSR_INSTRET_HI = 0x00D
+CSR_MATH_CTRL = 0x010
+CSR_MATH_STATUS = 0x011
+CSR_MATH_OPA = 0x012
+CSR_MATH_OPB = 0x013
+CSR_MATH_RES0 = 0x014
+CSR_MATH_RES1 = 0x015
+CSR_MATH_OPC = 0x016
+CSR_PCC_BASE_LO = 0x030
+CSR_PCC_CUR_LO = 0x034
+CSR_PCC_CUR_HI = 0x035
+CSR_PCC_TAG = 0x038
+CSR_MMU_FIRST = 0x100
+CSR_MMU_LAST = 0x113
+
+
+def opc_of(word: int) -> int:
+    return (word >> 16) & 0xFF
+
+
+def opc_name(opc: int) -> str:
+    return OPC_NAMES.get(opc, "UNKNOWN")
+
+
+def sext(value: int, bits: int) -> int:
+    """Sign-extend the low `bits` of `value` to a Python int."""
+    value &= (1 << bits) - 1
+    return value - (1 << bits) if value >> (bits - 1) else value
+
+
+def cond_true(cc: int, flags: int) -> bool:
+    """Evaluate condition code `cc` against PSTATE flag bits (ZNCV)."""
+    z = bool(flags & FLAG_Z)
+    n = bool(flags & FLAG_N)
+    c = bool(flags & FLAG_C)
+    v = bool(flags & FLAG_V)
+    if cc == CC_AL:
+        return True
+    if cc == CC_EQ:
+        return z
+    if cc == CC_NE:
+        return not z
+    if cc == CC_LT:
+        return n != v
+    if cc == CC_GT:
+        return not z and n == v
+    if cc == CC_LE:
+        return z or n != v
+    if cc == CC_GE:
+        return n == v
+    if cc == CC_BT:
+        return c
+    if cc == CC_AT:
+        return not z and not c
+    if cc == CC_BE:
+        return c or z
+    if cc == CC_AE:
+        return not c
+    return False
+
+
+# --- XT translation (stg2xt.v) ----------------------------------------------
+_NOP = 0
+
+
+def _pack(opc: int, low16: int) -> int:
+    return (opc << 16) | (low16 & 0xFFFF)
+
+
+def _sr_imm14(opc: int, sr: int, imm14: int) -> int:
+    return _pack(opc, (sr << 14) | (imm14 & 0x3FFF))
+
+
+def _sr_sr_imm12(opc: int, tgt: int, src: int, imm12: int) -> int:
+    return _pack(opc, (tgt << 14) | (src << 12) | (imm12 & 0xFFF))
+
+
+def _cr2sr(sr: int, cr: int, fld: int) -> int:
+    return _pack(OPC["CR2SR"], (sr << 14) | (cr << 12) | (fld << 8))
+
+
+def _sr2cr(cr: int, sr: int, fld: int) -> int:
+    return _pack(OPC["SR2CR"], (cr << 14) | (sr << 12) | (fld << 8))
+
+
+def _cinci(cr: int, imm14: int) -> int:
+    return _sr_imm14(OPC["CINCi"], cr, imm14)
+
+
+def _cap_load(cr_src: int, cr_dst: int, offset: int) -> Tuple[int, ...]:
+    # LR = CRs.cursor + offset; each field is read into SSP and moved into CRd
+    srld = OPC["SRLDso"]
+    seq = [_cr2sr(SR_LR, cr_src, CR_FLD_CUR), _sr_imm14(OPC["SRADDsi"], SR_LR, offset)]
+    fields = ((0, CR_FLD_BASE, 8), (2, CR_FLD_LEN, 8), (4, CR_FLD_CUR, 8),
+              (6, CR_FLD_PERMS, 8), (8, CR_FLD_ATTR, 6), (10, CR_FLD_TAG, 2))
+    for off, fld, pad in fields:
+        seq.append(_sr_sr_imm12(srld, SR_SSP, SR_LR, off))
+        seq.extend([_NOP] * pad)
+        seq.append(_sr2cr(cr_dst, SR_SSP, fld))
+    return tuple(seq)
+
+
+def _cap_store(cr_src: int, cr_dst: int, offset: int) -> Tuple[int, ...]:
+    # LR = CRd.cursor + offset; each field of CRs goes through SSP to memory
+    srst = OPC["SRSTso"]
+    seq = [_cr2sr(SR_LR, cr_dst, CR_FLD_CUR), _sr_imm14(OPC["SRADDsi"], SR_LR, offset)]
+    fields = ((CR_FLD_BASE, 0, 8), (CR_FLD_LEN, 2, 8), (CR_FLD_CUR, 4, 8),
+              (CR_FLD_PERMS, 6, 8), (CR_FLD_ATTR, 8, 6), (CR_FLD_TAG, 10, 2))
+    for fld, off, pad in fields:
+        seq.append(_cr2sr(SR_SSP, cr_src, fld))
+        seq.extend([_NOP] * pad)
+        seq.append(_sr_sr_imm12(srst, SR_LR, SR_SSP, off))
+    return tuple(seq)
+
+
+def _call(jump: int) -> Tuple[int, ...]:
+    return (
+        _sr_imm14(OPC["SRSUBsi"], SR_SSP, 2),
+        _sr_sr_imm12(OPC["SRSTso"], SR_SSP, SR_LR, 0),
+        _sr_sr_imm12(OPC["SRMOVur"], SR_LR, SR_PC, 0),
+        jump,
+    )
+
+
+_RETURN = (
+    _sr_imm14(OPC["SRADDsi"], SR_SSP, 2),
+    _sr_sr_imm12(OPC["SRLDso"], SR_LR, SR_SSP, -2),
+    _pack(OPC["SRJCCso"], (SR_LR << 14) | (CC_AL << 10) | 1),
+)
+
+
+@lru_cache(maxsize=4096)
+def xt_expand(word: int) -> Tuple[int, ...]:
+    """Micro-op words XT emits for the ISA word `word`, in issue order."""
+    word &= MASK24
+    opc = opc_of(word)
+    cls, sub = opc >> 4, opc & 0xF
+    f15_14 = (word >> 14) & 3
+    f13_12 = (word >> 12) & 3
+    if cls <= 4:
+        if opc == OPC["CLDcso"]:
+            return _cap_load(f13_12, f15_14, sext(word, 10))
+        if opc == OPC["CSTcso"]:
+            return _cap_store(f13_12, f15_14, sext(word, 10))
+        return (word,)
+    if cls in (5, 8, 0xF):
+        return (word,)
+    if cls == 6:
+        if sub == 0x0:  # BTP
+            return (_NOP,)
+        if sub in (0x2, 0x3, 0x4, 0x5):
+            return (word,)
+        if sub == 0x7:  # JSRui: jump is JCCui AL, imm12
+            return _call(_pack(OPC["JCCui"], (CC_AL << 12) | (word & 0xFFF)))
+        if sub == 0x8:  # BSRsr: BCCsr DRt, AL
+            return _call(_pack(OPC["BCCsr"], ((word >> 12) & 0xF) << 12))
+        if sub == 0x9:  # BSRso: BALso imm16
+            return _call(_pack(OPC["BALso"], word))
+        if sub == 0xA:
+            return _RETURN
+        return (_NOP,)
+    if cls == 7:
+        if sub == 0x0:  # PUSHur DRs, CRt
+            store = _pack(OPC["STcso"], (f15_14 << 14) | (((word >> 10) & 0xF) << 10))
+            return (_cinci(f15_14, -1),) + (_NOP,) * 4 + (store,)
+        if sub == 0x1:  # PUSHAur CRs, CRt
+            return (_cinci(f15_14, -12),) + (_NOP,) * 4 + _cap_store(f13_12, f15_14, 0)
+        if sub == 0x2:  # POPur DRt, CRs
+            cr = (word >> 10) & 3
+            load = _pack(OPC["LDcso"], (((word >> 12) & 0xF) << 12) | (cr << 10) | (-1 & 0x3FF))
+            return (_cinci(cr, 1),) + (_NOP,) * 4 + (load,)
+        if sub == 0x3:  # POPAur CRs, CRt
+            return (_cinci(f13_12, 12),) + (_NOP,) * 4 + _cap_load(f13_12, f15_14, -12)
+        return (_NOP,)
+    if cls == 9:
+        if sub == 0x1:  # SETSSP CRs -> SRMOVAur SSP, CRs
+            return (_pack(OPC["SRMOVAur"], (SR_SSP << 14) | (f15_14 << 12)),)
+        if sub == 0x3:  # KRET
+            return _RETURN
+        return (word,)
+    return (_NOP,)
+
+
+def disasm(word: int) -> str:
+    """Short textual form of a word: mnemonic and raw operand field."""
+    opc = opc_of(word)
+    return f"{opc_name(opc)} {word & 0xFFFF:04X}"
@@ -0,0 +1,570 @@
+"""Instruction-set simulator for the Amber core.
+
+`Machine` executes ISA words the way the RTL does: each word is expanded by
+`isa.xt_expand` into the micro-ops XT issues, and each micro-op is executed
+with the semantics of `stg4ex.v`, using the operand fields and immediates
+`stg3id.v` would hand to EX (including its quirks, see `README.md`).
+Micro-ops execute in order with fully forwarded operands; the first micro-op
+that branches or traps ends the instruction, as the pipeline flush would.
+
+The model is functional only. Cycle counts come from `timing.TimingModel`,
+which can be attached so CYCLE CSR reads see modelled time.
+
+Approximations:
+
+- Instruction and data memory are the two 4096-word BRAMs; addresses are
+  taken modulo 4096. Caches and the data MMU are not modelled (no
+  translation, no MMU faults).
+- PCC_CUR reads return the PC of the reading instruction (the RTL returns the
+  fetch PC, a few words ahead).
+- The async math unit only stores its CSRs unless `math24.Math24` is
+  attached through `csr_read_hooks`/`csr_write_hooks`.
+"""
+from __future__ import annotations
+
+from array import array
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from . import isa
+from .cheri import CAP_OOB, Capability
+from .isa import MASK24, MASK48, OPC, sext
+from .trace import Retired
+
+from ..asm.image import WORD_TYPECODE
+
+
+# PCC window CSR -> Capability attribute (amber.v fetch mirror)
+_PCC_CSR = {
+    0x030: ("base", 0), 0x031: ("base", 24), 0x032: ("length", 0), 0x033: ("length", 24),
+    0x034: ("cursor", 0), 0x035: ("cursor", 24), 0x036: ("perms", 0), 0x037: ("attr", 0),
+}
+
+_OP = OPC  # short alias for the dispatch below
+
+
+class Machine:
+    """Architectural state of one core plus its instruction and data memories."""
+
+    def __init__(self) -> None:
+        self.imem = array(WORD_TYPECODE, bytes(4 * isa.MEM_WORDS))
+        self.dmem = array(WORD_TYPECODE, bytes(4 * isa.MEM_WORDS))
+        # CSR index -> callable returning the value read / taking the value written
+        self.csr_read_hooks: Dict[int, Callable[[], int]] = {}
+        self.csr_write_hooks: Dict[int, Callable[[int], None]] = {}
+        # Source for CYCLE reads; defaults to micro-ops issued so far
+        self.clock: Optional[Callable[[], int]] = None
+        self.reset()
+
+    def reset(self) -> None:
+        """Reset state as after `iw_rst` (memories are kept)."""
+        self.pc = 0
+        self.gp: List[int] = [0] * 16
+        self.sr: List[int] = [0, isa.SSP_RESET, 0, 0]
+        self.cr: List[Capability] = [Capability() for _ in range(4)]
+        self.csr = array(WORD_TYPECODE, bytes(4 * 4096))
+        self.banks = [0, 0, 0]
+        self.bank_valid = [False, False, False]
+        self.kernel = True
+        self.halted = False
+        self.hung = False  # fetch blocked by PCC: the RTL stalls forever
+        self.pcc = Capability(0, isa.MEM_WORDS, 0, isa.PERM_X, 0, True)
+        self.uops = 0  # micro-ops issued, NOPs included
+        self.instret = 0  # INSTRET: non-NOP micro-ops completed
+        self.steps = 0
+
+    # --- Loading -----------------------------------------------------------
+    def load_words(self, words: Iterable[int], origin: int = 0) -> None:
+        for i, w in enumerate(words):
+            self.imem[(origin + i) % isa.MEM_WORDS] = w & MASK24
+
+    def load_hex(self, path: Union[str, Path]) -> None:
+        """Load a `$readmemh` image (one word per line, optional `@addr` records)."""
+        addr = 0
+        for line in Path(path).read_text().splitlines():
+            text = line.split("//", 1)[0].strip()
+            if not text:
+                continue
+            for tok in text.split():
+                if tok.startswith("@"):
+                    addr = int(tok[1:], 16)
+                else:
+                    self.imem[addr % isa.MEM_WORDS] = int(tok, 16) & MASK24
+                    addr += 1
+
+    # --- Helpers -----------------------------------------------------------
+    @property
+    def flags(self) -> int:
+        return self.sr[isa.SR_PSTATE] & 0xF
+
+    def read_mem(self, addr: int) -> int:
+        return self.dmem[addr % isa.MEM_WORDS]
+
+    def write_mem(self, addr: int, value: int) -> None:
+        self.dmem[addr % isa.MEM_WORDS] = value & MASK24
+
+    def _trap_base(self) -> int:
+        b = self.banks
+        return (b[2] << 36) | (b[1] << 24) | (b[0] << 12)
+
+    def _fetch_ok(self) -> bool:
+        return self.pcc.access(self.pc, 1, isa.PERM_X) is None
+
+    def csr_read(self, idx: int, pc: int) -> int:
+        hook = self.csr_read_hooks.get(idx)
+        if hook is not None:
+            return hook() & MASK24
+        if idx == isa.CSR_PSTATE_LO:
+            return self.sr[isa.SR_PSTATE] & MASK24
+        if idx == isa.CSR_PSTATE_HI:
+            return self.sr[isa.SR_PSTATE] >> 24
+        if idx == isa.CSR_PCC_CUR_LO:
+            return pc & MASK24
+        if idx == isa.CSR_PCC_CUR_HI:
+            return (pc >> 24) & MASK24
+        if idx in (isa.CSR_CYCLE_LO, isa.CSR_CYCLE_HI):
+            cyc = self.clock() if self.clock is not None else self.uops
+            return (cyc if idx == isa.CSR_CYCLE_LO else cyc >> 24) & MASK24
+        if idx == isa.CSR_INSTRET_LO:
+            return self.instret & MASK24
+        if idx == isa.CSR_INSTRET_HI:
+            return (self.instret >> 24) & MASK24
+        return self.csr[idx]
+
+    def csr_write(self, idx: int, value: int) -> None:
+        value &= MASK24
+        self.csr[idx] = value
+        if self.kernel:
+            if idx == isa.CSR_PSTATE_LO:
+                self.kernel = bool(value >> isa.PSTATE_BIT_MODE & 1)
+            elif idx in _PCC_CSR:
+                name, shift = _PCC_CSR[idx]
+                old = getattr(self.pcc, name)
+                keep = ~(MASK24 << shift) & MASK48
+                setattr(self.pcc, name, (old & keep) | (value << shift))
+            elif idx == isa.CSR_PCC_TAG:
+                self.pcc.tag = bool(value & 1)
+        hook = self.csr_write_hooks.get(idx)
+        if hook is not None:
+            hook(value)
+
+    # --- Execution ---------------------------------------------------------
+    def step(self) -> Retired:
+        """Fetch, expand and execute one ISA word."""
+        if self.halted:
+            raise RuntimeError("machine is halted")
+        pc = self.pc
+        if not self._fetch_ok():
+            self.halted = self.hung = True
+            return Retired(pc, 0, (), next_pc=pc, halted=True)
+        word = self.imem[pc % isa.MEM_WORDS]
+        root = isa.opc_of(word)
+        uops = isa.xt_expand(word)
+        issued: List[int] = []
+        mem: List[Tuple[Optional[int], int, bool]] = []
+        taken = False
+        target = (pc + 1) & MASK48
+        trap: Optional[int] = None
+        for u in uops:
+            issued.append(u)
+            self.uops += 1
+            br, dest, cause, access = self._execute(u, pc, root)
+            if u >> 16:
+                self.instret += 1
+            if access is not None:
+                mem.append(access)
+            if self.halted:
+                break
+            if br:
+                taken, target, trap = True, dest & MASK48, cause
+                break
+        if taken:
+            # Flush: uimm banks are cleared; mode follows trap/SYSCALL/KRET
+            self.banks = [0, 0, 0]
+            self.bank_valid = [False, False, False]
+            if trap is not None and trap > 0 or root == _OP["SYSCALL"]:
+                self.kernel = True
+            elif root == _OP["KRET"]:
+                self.kernel = False
+        self.pc = target
+        self.steps += 1
+        return Retired(pc, word, tuple(issued), taken, target, trap, tuple(mem), self.halted)
+
+    def run(self, max_steps: Optional[int] = None) -> Iterator[Retired]:
+        """Step until HLT (or `max_steps`), yielding each retired instruction."""
+        n = 0
+        while not self.halted and (max_steps is None or n < max_steps):
+            yield self.step()
+            n += 1
+
+    def _execute(self, w: int, pc: int, root: int) -> Tuple[bool, int, Optional[int], Optional[tuple]]:
+        """Execute one micro-op.
+
+        Returns (branch taken, target, trap, memory access). `trap` is the
+        PSTATE cause of a pending trap, 0 for the two traps that only
+        redirect (JCCui/CMPui with empty uimm banks), None otherwise.
+        """
+        opc = (w >> 16) & 0xFF
+        gp, sr, cr = self.gp, self.sr, self.cr
+        pstate = sr[isa.SR_PSTATE]
+        flags = pstate & 0xF
+
+        # --- ID: fields and immediates -----------------------------------
+        imm12 = w & 0xFFF if opc in isa.IMM12_OPS else 0
+        imm14 = w & 0x3FFF if opc in isa.IMM14_OPS else 0
+        imm10 = w & 0x3FF if opc in isa.IMM10_OPS else 0
+        tgt_gp = (w >> 12) & 0xF if opc in isa.HAS_TGT_GP_OPS else 0
+        if opc not in isa.HAS_SRC_GP_OPS:
+            src_gp = 0
+        elif opc == _OP["CSRWR"]:
+            src_gp = (w >> 12) & 0xF
+        elif opc in isa.SRC_GP_13_10_OPS:
+            src_gp = (w >> 10) & 0xF
+        else:
+            src_gp = (w >> 8) & 0xF
+        t, s = gp[tgt_gp], gp[src_gp]
+        if opc in (_OP["KRET"], _OP["SYSCALL"]):
+            tgt_sr = isa.SR_LR
+        elif opc in isa.HAS_TGT_SR_OPS:
+            tgt_sr = (w >> 14) & 3
+        else:
+            tgt_sr = 0
+        if opc in isa.USES_FLAGS_OPS:
+            src_sr = isa.SR_PSTATE
+        elif opc in isa.HAS_SRC_SR_OPS:
+            src_sr = (w >> 12) & 3
+        else:
+            src_sr = 0
+        src_ar = tgt_ar = 0
+        fields = isa.CR_FIELDS.get(opc)
+        if fields is not None:
+            if fields[0] is not None:
+                src_ar = (w >> fields[0]) & 3
+            if fields[1] is not None:
+                tgt_ar = (w >> fields[1]) & 3
+        crs, crt = cr[src_ar], cr[tgt_ar]
+        ir = (self.banks[0] << 12) | imm12
+        se12 = sext(imm12, 12)
+
+        # --- EX ----------------------------------------------------------
+        result: Optional[int] = None  # GP result (written when opc is in GP_WE_OPS)
+        fl: Optional[int] = None  # new ZNCV
+        sr_val: Optional[int] = None  # SR target value
+        taken = False
+        target = 0
+        trap: Optional[int] = None
+        lr: Optional[int] = None
+        kill = False
+        access = None
+
+        if opc in isa.CC_SHIFT:
+            cc_ok = isa.cond_true((w >> isa.CC_SHIFT[opc]) & 0xF, flags)
+        else:
+            cc_ok = False
+
+        def z(v: int) -> int:
+            return isa.FLAG_Z if v & MASK24 == 0 else 0
+
+        def n(v: int) -> int:
+            return isa.FLAG_N if v & 0x800000 else 0
+
+        def fault(cause: Optional[int]) -> None:
+            nonlocal taken, target, trap, lr, kill
+            taken, target, lr, kill = True, self._trap_base(), pc + 1, True
+            trap = cause
+
+        if opc == 0:
+            pass
+        # Class 0: unsigned register ops
+        elif opc == _OP["MOVur"]:
+            result = s
+            fl = z(s)
+        elif opc == _OP["MCCur"] or opc == _OP["MCCsi"]:
+            val = s if opc == _OP["MCCur"] else sext(w & 0xFF, 8) & MASK24
+            if cc_ok:
+                result = val
+                fl = z(val)
+            else:
+                result = t
+        elif opc == _OP["ADDur"]:
+            result = (s + t) & MASK24
+            fl = z(result) | (isa.FLAG_C if result < s else 0)
+        elif opc == _OP["SUBur"]:
+            result = (t - s) & MASK24
+            fl = z(result) | (isa.FLAG_C if t < s else 0)
+        elif opc == _OP["NOTur"]:
+            result = ~t & MASK24
+            fl = z(result)
+        elif opc in (_OP["ANDur"], _OP["ORur"], _OP["XORur"]):
+            result = s & t if opc == _OP["ANDur"] else s | t if opc == _OP["ORur"] else s ^ t
+            fl = z(result)
+        elif opc in (_OP["ROLur"], _OP["RORur"], _OP["ROLui"], _OP["RORui"]):
+            ui = opc in (_OP["ROLui"], _OP["RORui"])
+            if ui and not self.bank_valid[0]:
+                fault(isa.CAUSE["UIMM_STATE"])
+            else:
+                m = ((ir if ui else s) & 31) % 24
+                result = t
+                if m:
+                    if opc in (_OP["ROLur"], _OP["ROLui"]):
+                        result = ((t << m) | (t >> (24 - m))) & MASK24
+                        c = (t >> (24 - m)) & 1
+                    else:
+                        result = ((t >> m) | (t << (24 - m))) & MASK24
+                        c = (t >> (m - 1)) & 1
+                    fl = z(result) | (isa.FLAG_C if c else 0)
+        elif opc in (_OP["SHLur"], _OP["SHRur"]):
+            k = s & 31
+            result = t
+            if k >= 24:
+                fault(isa.CAUSE["ARITH_RANGE"])
+            elif k:
+                result, c = self._shift_u(opc == _OP["SHLur"], t, k)
+                fl = z(result) | c
+        elif opc == _OP["CMPur"]:
+            fl = (isa.FLAG_Z if s == t else 0) | (isa.FLAG_C if s < t else 0)
+        elif opc == _OP["TSTur"]:
+            fl = z(t)
+        # Class 1: unsigned immediates (upper 12 bits from uimm bank 0)
+        elif opc == _OP["LUIui"]:
+            k = (w >> 14) & 3
+            k = 0 if k == 3 else k
+            self.banks[k] = imm12
+            self.bank_valid[k] = True
+        elif opc in (_OP["MOVui"], _OP["ADDui"], _OP["SUBui"], _OP["ANDui"], _OP["ORui"], _OP["XORui"]):
+            if not self.bank_valid[0]:
+                fault(isa.CAUSE["UIMM_STATE"])
+            elif opc == _OP["MOVui"]:
+                result = ir
+                fl = z(ir)
+            elif opc == _OP["ADDui"]:
+                result = (t + ir) & MASK24
+                fl = z(result) | (isa.FLAG_C if result < t else 0)
+            elif opc == _OP["SUBui"]:
+                result = (t - ir) & MASK24
+                fl = z(result) | (isa.FLAG_C if t < ir else 0)
+            else:
+                result = t & ir if opc == _OP["ANDui"] else t | ir if opc == _OP["ORui"] else t ^ ir
+                fl = z(result)
+        elif opc in (_OP["SHLui"], _OP["SHRui"]):
+            if not self.bank_valid[0]:
+                fault(isa.CAUSE["UIMM_STATE"])
+            else:
+                k = ir & 31
+                result = t
+                if k >= 24:
+                    result, fl = 0, isa.FLAG_Z
+                elif k:
+                    result, c = self._shift_u(opc == _OP["SHLui"], t, k)
+                    fl = z(result) | c
+        elif opc in (_OP["SHLuiv"], _OP["SHRuiv"]):
+            k = ir & 31
+            result = t
+            if k >= 24:
+                fault(isa.CAUSE["ARITH_RANGE"])
+            elif k:
+                result, c = self._shift_u(opc == _OP["SHLuiv"], t, k)
+                fl = z(result) | c
+        elif opc == _OP["CMPui"]:
+            if not self.bank_valid[0]:
+                fault(0)
+            else:
+                fl = (isa.FLAG_Z if t == ir else 0) | (isa.FLAG_C if t < ir else 0)
+        # Classes 2/3: signed register and immediate ops
+        elif opc in (_OP["ADDsr"], _OP["ADDsv"], _OP["ADDsi"], _OP["ADDsiv"]):
+            b = s if opc in (_OP["ADDsr"], _OP["ADDsv"]) else se12 & MASK24
+            result = (t + b) & MASK24
+            v = ~(b ^ t) & (b ^ result) & 0x800000
+            fl = z(result) | n(result) | (isa.FLAG_V if v else 0)
+            if v and opc in (_OP["ADDsv"], _OP["ADDsiv"]):
+                fl = None
+                fault(isa.CAUSE["ARITH_OVF"])
+        elif opc in (_OP["SUBsr"], _OP["SUBsv"], _OP["SUBsi"], _OP["SUBsiv"]):
+            b = s if opc in (_OP["SUBsr"], _OP["SUBsv"]) else se12 & MASK24
+            result = (t - b) & MASK24
+            v = (b ^ t) & (t ^ result) & 0x800000
+            fl = z(result) | n(result) | (isa.FLAG_V if v else 0)
+            if v and opc in (_OP["SUBsv"], _OP["SUBsiv"]):
+                fl = None
+                fault(isa.CAUSE["ARITH_OVF"])
+        elif opc in (_OP["NEGsr"], _OP["NEGsv"]):
+            result = -t & MASK24
+            v = t == 0x800000
+            fl = z(result) | n(result) | (isa.FLAG_V if v else 0)
+            if v and opc == _OP["NEGsv"]:
+                fl = None
+                fault(isa.CAUSE["ARITH_OVF"])
+        elif opc in (_OP["SHRsr"], _OP["SHRsrv"], _OP["SHRsi"], _OP["SHRsiv"]):
+            k = (s if opc in (_OP["SHRsr"], _OP["SHRsrv"]) else imm12) & 31
+            result = t
+            if k >= 24 and opc in (_OP["SHRsrv"], _OP["SHRsiv"]):
+                fault(isa.CAUSE["ARITH_RANGE"])
+            elif k >= 24:
+                result = MASK24 if t & 0x800000 else 0
+                fl = z(result) | n(result)
+            elif k:
+                result = (sext(t, 24) >> k) & MASK24
+                fl = z(result) | n(result) | (isa.FLAG_C if (t >> (k - 1)) & 1 else 0)
+        elif opc in (_OP["CMPsr"], _OP["CMPsi"]):
+            b = s if opc == _OP["CMPsr"] else se12 & MASK24
+            d = (t - b) & MASK24
+            v = (b ^ t) & (t ^ d if opc == _OP["CMPsi"] else b ^ d) & 0x800000
+            fl = (isa.FLAG_Z if t == b else 0) | n(d) | (isa.FLAG_V if v else 0)
+        elif opc == _OP["TSTsr"]:
+            fl = z(t) | n(t)
+        elif opc == _OP["MOVsi"]:
+            result = se12 & MASK24
+            fl = z(result) | n(result)
+        # Class 4: CHERI-checked loads and stores
+        elif opc == _OP["LDcso"]:
+            a = (crs.cursor + sext(imm10, 10)) & MASK48
+            cause = crs.access(a, 1, isa.PERM_R)
+            if cause is not None:
+                fault(cause)
+            else:
+                result = self.read_mem(a)
+                access = (a, 1, False)
+        elif opc in (_OP["STcso"], _OP["STui"], _OP["STsi"]):
+            if opc == _OP["STcso"]:
+                a, val = (crt.cursor + sext(imm10, 10)) & MASK48, s
+            elif opc == _OP["STui"]:
+                a, val = crt.cursor, ir
+            else:
+                a, val = crt.cursor, sext(imm14, 14) & MASK24
+            cause = crt.access(a, 1, isa.PERM_W)
+            if cause is not None:
+                fault(cause)
+            else:
+                self.write_mem(a, val)
+                access = (a, 1, True)
+        elif opc in (_OP["CLDcso"], _OP["CSTcso"]):
+            cap, perm = (crs, isa.PERM_LC) if opc == _OP["CLDcso"] else (crt, isa.PERM_SC)
+            a = (cap.cursor + sext(imm10, 10)) & MASK48
+            cause = cap.access(a, 10, perm)
+            if cause is not None:
+                fault(cause)
+        # Class 5: capability ops
+        elif opc in (_OP["CINC"], _OP["CINCv"], _OP["CINCi"], _OP["CINCiv"]):
+            delta = sext(s, 24) if opc in (_OP["CINC"], _OP["CINCv"]) else sext(imm14, 14)
+            newc = (crt.cursor + delta) & MASK48
+            cause = None
+            if opc in (_OP["CINCv"], _OP["CINCiv"]) and not crt.in_bounds(newc):
+                cause = CAP_OOB
+            if cause is None and opc in (_OP["CINCi"], _OP["CINCiv"]):
+                if root == _OP["PUSHAur"]:
+                    cause = crt.access(newc, 12, isa.PERM_SC)
+                elif root == _OP["POPAur"]:
+                    cause = crt.access(newc - 12, 12, isa.PERM_LC)
+            if cause is not None:
+                fault(cause)
+                kill = opc in (_OP["CINCi"], _OP["CINCiv"])
+            else:
+                crt.cursor = newc
+        elif opc == _OP["CMOV"]:
+            cr[tgt_ar] = Capability(crs.base, crs.length, crs.cursor, crs.perms, crs.attr, crs.tag)
+        elif opc in (_OP["CSETB"], _OP["CSETBi"], _OP["CSETBv"], _OP["CSETBiv"]):
+            base = crs.cursor
+            length = sext(imm14, 14) if opc in (_OP["CSETBi"], _OP["CSETBiv"]) else sext(s, 24)
+            cause = None
+            if not crt.perms & isa.PERM_SB:
+                cause = isa.CAUSE["CAP_PERM"]
+            elif opc in (_OP["CSETBv"], _OP["CSETBiv"]):
+                if length <= 0:
+                    cause = isa.CAUSE["CAP_CFG"]
+                elif not base <= crt.cursor < base + length:
+                    cause = CAP_OOB
+            if cause is not None:
+                fault(cause)
+            else:
+                crt.base, crt.length = base, length & MASK48
+        elif opc == _OP["CGETP"]:
+            result = crs.perms & MASK24
+        elif opc == _OP["CANDP"]:
+            crt.perms &= s
+        elif opc == _OP["CGETT"]:
+            result = int(crs.tag)
+        elif opc == _OP["CCLRT"]:
+            crt.tag = False
+        # Class 6: control flow (calls/returns arrive as micro-ops)
+        elif opc == _OP["JCCui"]:
+            if cc_ok:
+                if not all(self.bank_valid):
+                    fault(0)
+                else:
+                    taken, target = True, self._trap_base() | imm12
+        elif opc == _OP["BCCsr"]:
+            if cc_ok:
+                taken, target = True, pc + sext(t, 24)
+        elif opc == _OP["BCCso"]:
+            if cc_ok:
+                taken, target = True, pc + se12
+        elif opc == _OP["BALso"]:
+            taken, target = True, pc + sext(w, 16)
+        # Class 8: CSRs
+        elif opc == _OP["CSRRD"]:
+            result = self.csr_read(w & 0xFFF, pc)
+            fl = z(result)
+        elif opc == _OP["CSRWR"]:
+            self.csr_write(w & 0xFFF, s)
+        # Class 9: privileged
+        elif opc == _OP["HLT"]:
+            self.halted = True
+        elif opc == _OP["SYSCALL"]:
+            lr = pc + 1
+            if not all(self.bank_valid):
+                fault(isa.CAUSE["UIMM_STATE"])
+            else:
+                taken, target = True, self._trap_base() | imm12
+        # Class F: special-register micro-ops
+        elif opc == _OP["SRMOVur"]:
+            sr_val = pc if src_sr == isa.SR_PC else sr[src_sr]
+        elif opc == _OP["SRMOVAur"]:
+            sr_val = crs.cursor
+        elif opc == _OP["SRADDsi"]:
+            sr_val = sr[tgt_sr] + sext(imm14, 14)
+        elif opc == _OP["SRSUBsi"]:
+            sr_val = sr[tgt_sr] - sext(imm14, 14)
+        elif opc == _OP["SRJCCso"]:
+            if cc_ok:
+                taken, target = True, sr[tgt_sr] + sext(imm10, 10)
+        elif opc == _OP["SRLDso"]:
+            a = (sr[src_sr] + se12) & MASK48
+            sr_val = self.read_mem(a) | (self.read_mem(a + 1) << 24)
+            access = (a, 2, False)
+        elif opc == _OP["SRSTso"]:
+            a = (sr[tgt_sr] + se12) & MASK48
+            v = sr[src_sr]
+            self.write_mem(a, v)
+            self.write_mem(a + 1, v >> 24)
+            access = (a, 2, True)
+        elif opc == _OP["CR2SR"]:
+            sr_val = crs.field((w >> 8) & 0xF)
+        elif opc == _OP["SR2CR"]:
+            cr[tgt_ar].set_field((w >> 8) & 0xF, sr[src_sr])
+        # Everything else (BTP/TLB invalidates/unknown) has no EX effect
+
+        # --- Writeback ---------------------------------------------------
+        if result is not None and opc in isa.GP_WE_OPS and not kill:
+            gp[tgt_gp] = result & MASK24
+        if lr is not None:
+            sr[isa.SR_LR] = lr & MASK48
+        elif sr_val is not None and opc in isa.SR_WE_OPS:
+            sr[tgt_sr] = sr_val & MASK48
+        ps = sr[isa.SR_PSTATE]
+        if fl is not None:
+            ps = (ps & ~0xF) | fl
+        mode = 1 << isa.PSTATE_BIT_MODE
+        ps = (ps | mode) if self.kernel else (ps & ~mode)
+        if trap:
+            ps |= (1 << isa.PSTATE_BIT_TPE) | mode
+            ps = (ps & ~(0xFF << isa.PSTATE_CAUSE_LO)) | (trap << isa.PSTATE_CAUSE_LO)
+            ps &= ~(0xFFFF << isa.PSTATE_INFO_LO)
+        sr[isa.SR_PSTATE] = ps & MASK48
+        return taken, target, trap, access
+
+    @staticmethod
+    def _shift_u(left: bool, t: int, k: int) -> Tuple[int, int]:
+        """Logical shift by 1..23; returns (result, C flag bit)."""
+        if left:
+            return (t << k) & MASK24, isa.FLAG_C if (t >> (24 - k)) & 1 else 0
+        return t >> k, isa.FLAG_C if (t >> (k - 1)) & 1 else 0
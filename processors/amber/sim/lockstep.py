@@ -0,0 +1,240 @@
+"""Lock-step differential check of the ISS against the RTL.
+
+The RTL side is `src/testbench.v` built with `DEBUGCOMMIT`: vvp prints one
+`commit` line per micro-op at writeback with the register-file writes it
+makes (`trace.read_commits`), and a shadow register file follows them. The
+ISS steps one ISA instruction at a time and takes the RTL commits for that
+instruction's non-NOP micro-ops; after every instruction the micro-op
+words, their PC, DR0-DR15, LR, SSP and PSTATE must agree. The first
+mismatch stops both sides and is returned as a `Divergence`.
+
+vvp's output is read from a pipe and compared as it arrives, so neither
+trace is kept; a divergence or HLT on the ISS terminates vvp. A vvp that
+exits with an error raises `RtlError`, and a commit stream that ends before
+the ISS reaches HLT (TICKS too small, or a testbench built without
+DEBUGCOMMIT) is a failure, not a match.
+`compile_testbench` builds the vvp image once and `run_batch` checks many
+programs against it in worker processes. With `caps`, both sides start
+with `BOOT_CAPS` in CR0-CR3 (the testbench's `+CAPS`), so programs can load
+and store without building capabilities first.
+
+Capability registers, memories and CSRs are only compared through the
+registers they feed. CYCLE reads come from the timing model and the math
+unit runs on its clock, so a program whose results depend on exact cycle
+counts can diverge where the ISS is documented to approximate.
+"""
+from __future__ import annotations
+
+import importlib.util
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from . import isa, math24
+from .cheri import Capability
+from .iss import Machine
+from .timing import TimingModel
+from .trace import Commit, Retired, read_commits
+
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+COMPARED_SR = (isa.SR_LR, isa.SR_SSP, isa.SR_PSTATE)
+
+# CR0-CR3 after reset with `+CAPS` (src/testbench.v): tagged R/W data
+# capabilities of 256 words; CR0 is the stack (cursor at its top)
+_DATA = isa.PERM_R | isa.PERM_W
+BOOT_CAPS = (
+    (0xC00, 0x100, 0xD00, _DATA),
+    (0x100, 0x100, 0x100, _DATA),
+    (0x200, 0x100, 0x280, _DATA),
+    (0x300, 0x100, 0x3FF, _DATA),
+)
+
+
+def boot_caps(machine: Machine) -> None:
+    """Give `machine` the `+CAPS` capability registers."""
+    machine.cr = [Capability(base, length, cursor, perms, 0, True) for base, length, cursor, perms in BOOT_CAPS]
+
+
+@dataclass(frozen=True)
+class Divergence:
+    step: int  # index of the diverging ISA instruction
+    pc: int
+    word: int
+    what: str  # "pc", "uop", "DRn", "LR", "SSP" or "PSTATE"
+    iss: int
+    rtl: int
+    tick: Optional[int] = None  # RTL clock of the last commit compared
+
+    def __str__(self) -> str:
+        width = 6 if self.what in ("pc", "uop") or self.what.startswith("DR") else 12
+        tick = f" (tick {self.tick})" if self.tick is not None else ""
+        return (f"step {self.step} PC={self.pc:06X} {self.word:06X} "
+                f"{isa.opc_name(isa.opc_of(self.word))}{tick}: "
+                f"{self.what} ISS={self.iss:0{width}X} RTL={self.rtl:0{width}X}")
+
+
+@dataclass
+class LockstepResult:
+    program: str
+    steps: int = 0  # ISA instructions that matched
+    commits: int = 0  # RTL micro-ops consumed
+    halted: bool = False
+    rtl_ended: bool = False  # vvp output ran out before HLT (TICKS too small, no DEBUGCOMMIT)
+    divergence: Optional[Divergence] = None
+    error: Optional[str] = None  # the run itself failed (missing file, vvp error)
+
+    @property
+    def ok(self) -> bool:
+        return self.divergence is None and self.error is None and not (self.rtl_ended and not self.halted)
+
+    def __str__(self) -> str:
+        if self.error is not None:
+            return f"ERROR    {self.program}: {self.error}"
+        if self.divergence is not None:
+            return f"DIVERGE  {self.program}: {self.divergence}"
+        if self.rtl_ended and not self.halted:
+            return (f"RTL-END  {self.program}: commits ran out after {self.steps} instructions, "
+                    f"{self.commits} micro-ops, before HLT")
+        state = "halted" if self.halted else "RTL ended" if self.rtl_ended else "stopped"
+        return f"MATCH    {self.program}: {self.steps} instructions, {self.commits} micro-ops, {state}"
+
+
+def _mismatch(machine: Machine, gp: List[int], sr: List[int]) -> Optional[Tuple[str, int, int]]:
+    if machine.gp != gp:
+        i = next(i for i, (a, b) in enumerate(zip(machine.gp, gp)) if a != b)
+        return f"DR{i}", machine.gp[i], gp[i]
+    for i in COMPARED_SR:
+        if machine.sr[i] != sr[i]:
+            return isa.SR_NAMES[i], machine.sr[i], sr[i]
+    return None
+
+
+def compare(machine: Machine, commits: Iterable[Commit], max_steps: Optional[int] = None,
+            on_step: Optional[Callable[[Retired], None]] = None, program: str = "") -> LockstepResult:
+    """Step `machine` against the RTL `commits` (both from reset) until HLT or a mismatch."""
+    res = LockstepResult(program)
+    gp = [0] * 16
+    sr = [0, isa.SSP_RESET, 0, 0]
+    rtl = iter(commits)
+    while not machine.halted and (max_steps is None or res.steps < max_steps):
+        r = machine.step()
+        if on_step is not None:
+            on_step(r)
+        tick = None
+        for u in r.uops:
+            if not u >> 16:
+                continue  # NOPs never reach the commit trace
+            c = next(rtl, None)
+            if c is None:
+                res.rtl_ended = True
+                return res
+            res.commits += 1
+            tick = c.tick
+            if c.pc != r.pc or c.uop != u:
+                what, iss, got = ("pc", r.pc, c.pc) if c.pc != r.pc else ("uop", u, c.uop)
+                res.divergence = Divergence(res.steps, r.pc, r.word, what, iss, got, tick)
+                return res
+            if c.gp is not None:
+                gp[c.gp[0] & 0xF] = c.gp[1] & isa.MASK24
+            for port in (c.sr, c.sr_aux):
+                if port is not None:
+                    sr[port[0] & 3] = port[1] & isa.MASK48
+        bad = _mismatch(machine, gp, sr)
+        if bad is not None:
+            res.divergence = Divergence(res.steps, r.pc, r.word, *bad, tick)
+            return res
+        res.steps += 1
+    res.halted = machine.halted
+    return res
+
+
+# --- RTL side ----------------------------------------------------------------
+class RtlError(RuntimeError):
+    """vvp failed (non-zero exit) while producing the commit stream."""
+
+
+def _amber_run():
+    spec = importlib.util.spec_from_file_location("amber_run", REPO_ROOT / "tools" / "amber_run.py")
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def compile_testbench(out: Union[str, Path], ticks: int, iverilog: str = "iverilog") -> Path:
+    """Build the DEBUGCOMMIT testbench into `out` (`TICKS` is fixed at compile time)."""
+    out = Path(out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    cmd = _amber_run().compile_command(iverilog, out, ticks, ["DEBUGCOMMIT"])
+    subprocess.run(cmd, cwd=REPO_ROOT, check=True)
+    return out
+
+
+@contextmanager
+def rtl_commits(image: Union[str, Path], program: Union[str, Path], vvp: str = "vvp",
+                caps: bool = False) -> Iterator[Iterator[Commit]]:
+    """Run `program` on the compiled testbench `image`, yielding its commits as vvp prints them.
+
+    When the output ends, vvp's exit status is checked: a failure raises
+    `RtlError` with the last line vvp wrote to stderr.
+    """
+    hex_path = Path(program).resolve().as_posix()
+    cmd = [vvp, str(image), f"+HEX={hex_path}"] + (["+CAPS"] if caps else [])
+    with tempfile.TemporaryFile("w+") as err:  # a file, so a chatty stderr cannot block vvp
+        proc = subprocess.Popen(cmd, cwd=REPO_ROOT, stdout=subprocess.PIPE, stderr=err, text=True)
+
+        def stream() -> Iterator[Commit]:
+            yield from read_commits(proc.stdout)
+            if proc.wait() != 0:
+                err.seek(0)
+                lines = err.read().strip().splitlines()
+                raise RtlError(f"{vvp} exited with status {proc.returncode}" + (f": {lines[-1]}" if lines else ""))
+
+        try:
+            yield stream()
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+            proc.stdout.close()
+            proc.wait()
+
+
+def lockstep(program: Union[str, Path], image: Union[str, Path], max_steps: Optional[int] = None,
+             vvp: str = "vvp", caps: bool = False) -> LockstepResult:
+    """Compare one hex image on the ISS (with timing and math unit) and the RTL."""
+    m = Machine()
+    m.load_hex(program)
+    if caps:
+        boot_caps(m)
+    model = TimingModel()
+    model.attach(m)
+    math24.Math24().attach(m)
+    with rtl_commits(image, program, vvp, caps) as commits:
+        return compare(m, commits, max_steps, model.account, str(program))
+
+
+def _check(job: Tuple[str, str, Optional[int], str, bool]) -> LockstepResult:
+    program, image, max_steps, vvp, caps = job
+    try:
+        return lockstep(program, image, max_steps, vvp, caps)
+    except (OSError, ValueError, RtlError) as e:
+        return LockstepResult(program, error=str(e))
+
+
+def run_batch(programs: Sequence[Union[str, Path]], image: Union[str, Path], max_steps: Optional[int] = None,
+              workers: Optional[int] = None, vvp: str = "vvp", caps: bool = False) -> Iterator[LockstepResult]:
+    """Check every program against `image` in parallel; results keep the order of `programs`.
+
+    `workers` defaults to the CPU count; 1 (or a single program) runs
+    in-process.
+    """
+    jobs = [(str(p), str(image), max_steps, vvp, caps) for p in programs]
+    if workers == 1 or len(jobs) <= 1:
+        yield from map(_check, jobs)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(_check, jobs)
@@ -0,0 +1,516 @@
+"""Model of the async 24-bit math unit (`src/math24_async.v`).
+
+The unit watches the CSR file: when it sees START in `MATH_CTRL` while idle
+it latches OP and the operands, computes the result in one cycle and then
+writes the CSR file through `regcsr`'s second port, one register per cycle:
+
+    cycle  L    START visible in CTRL: latch
+           L+1  CTRL  <= CTRL with START cleared (acknowledge)
+           L+2  STATUS <= BUSY, or READY|DIV0 for a zero divisor
+           L+3  RES0
+           L+4  RES1
+           L+5  STATUS <= READY (|DIV0); a new START is sampled from L+6
+
+Each write is readable the cycle after it is made. A CSRWR writes the CSR
+file in WB, so a CTRL write in EX at cycle E is seen by the unit at
+L = E + `WRITE_DELAY`. All ops take the same time; only a zero divisor
+(DIVU, MODU, DIVS, MODS and any lane of DIV12/MOD12) changes it, by raising
+READY|DIV0 at L+2, before the zeroed RES0/RES1 are written.
+
+Consequences the model reproduces:
+
+- STATUS keeps its previous value until L+3, so a poll that starts right
+  after the CTRL write sees the previous op's READY (`Math24Stats.stale_reads`).
+- A second START that reaches the CSR file before the acknowledge write of
+  the first op is cleared by it and never runs (`Math24Stats.dropped_starts`);
+  a later one waits until the unit is idle.
+
+`evaluate` is the scalar golden model of every op, `evaluate_np` the same
+over NumPy arrays (NumPy is optional and only needed there). `Math24` runs
+the timeline against a clock and plugs into `Machine.csr_read_hooks` /
+`csr_write_hooks`. `LATENCY` is the per-op table for schedulers and
+`vectors`/`write_vectors` produce test vectors for `tb/math24_vectors_tb.v`.
+"""
+from __future__ import annotations
+
+import random
+from collections import deque
+from dataclasses import dataclass, field
+from math import isqrt
+from typing import IO, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from . import isa
+from ..asm.builtins import BUILTIN_SYMBOLS
+
+try:
+    import numpy as np
+except ImportError:  # only evaluate_np needs it
+    np = None
+
+
+MASK24 = 0xFFFFFF
+MASK48 = (1 << 48) - 1
+
+CTRL = isa.CSR_MATH_CTRL
+STATUS = isa.CSR_MATH_STATUS
+OPA = isa.CSR_MATH_OPA
+OPB = isa.CSR_MATH_OPB
+OPC = isa.CSR_MATH_OPC
+RES0 = isa.CSR_MATH_RES0
+RES1 = isa.CSR_MATH_RES1
+CSRS = (CTRL, STATUS, OPA, OPB, RES0, RES1, OPC)
+
+CTRL_START = 1
+STATUS_READY = 1
+STATUS_BUSY = 2
+STATUS_DIV0 = 4
+
+# OP code per name, as the assembler's MATH_OP_* symbols (pre-shifted there)
+OPS: Dict[str, int] = {name[len("MATH_OP_"):]: v >> 1 for name, v in BUILTIN_SYMBOLS.items()
+                       if name.startswith("MATH_OP_")}
+OP_NAMES: Dict[int, str] = {code: name for name, code in OPS.items()}
+DIVIDING_OPS = frozenset(OPS[n] for n in ("DIVU", "MODU", "DIVS", "MODS", "DIV12", "MOD12"))
+
+# --- Timing ------------------------------------------------------------------
+# CSRWR in EX -> value in the CSR file (MA, MO, WB write)
+WRITE_DELAY = 4
+# Unit write visible, in cycles after L (the first cycle START is visible)
+ACK = 2
+STATUS_SET = 3
+RES0_READY = 4
+RES1_READY = 5
+READY = 6
+DIV0_READY = STATUS_SET
+# START visible at L: the next START is sampled at L + INTERVAL at the earliest
+INTERVAL = 6
+# CTRL writes this many cycles or fewer after a START are lost to its acknowledge
+START_SHADOW = 2
+
+
+@dataclass(frozen=True)
+class Latency:
+    """Cycles from a CTRL write in EX until a CSRRD in EX sees the value."""
+
+    ready: int
+    res0: int
+    res1: int
+    div0_ready: Optional[int] = None  # READY|DIV0 on a zero divisor; RES0/RES1 still land as above
+    interval: int = INTERVAL  # between back-to-back STARTs
+
+
+def latency(op: int) -> Latency:
+    div0 = WRITE_DELAY + DIV0_READY if op in DIVIDING_OPS else None
+    return Latency(WRITE_DELAY + READY, WRITE_DELAY + RES0_READY, WRITE_DELAY + RES1_READY, div0)
+
+
+LATENCY: Dict[str, Latency] = {name: latency(code) for name, code in OPS.items()}
+
+
+# --- Golden model ------------------------------------------------------------
+Result = Tuple[int, int, bool]  # RES0, RES1, DIV0
+
+
+def _s24(v: int) -> int:
+    return v - (1 << 24) if v & 0x800000 else v
+
+
+def _s12(v: int) -> int:
+    return v - (1 << 12) if v & 0x800 else v
+
+
+def _lanes(v: int) -> Tuple[int, int]:
+    return v & 0xFFF, v >> 12
+
+
+def _pack(lo: int, hi: int) -> int:
+    return (hi & 0xFFF) << 12 | (lo & 0xFFF)
+
+
+def _tdiv(a: int, b: int) -> Tuple[int, int]:
+    """Verilog signed division: quotient truncated, remainder takes a's sign."""
+    q = abs(a) // abs(b)
+    if (a < 0) != (b < 0):
+        q = -q
+    return q, a - q * b
+
+
+def _clamp(x: int, hi: int, lo: int) -> int:
+    return lo if x < lo else hi if x > hi else x
+
+
+def _div12(a: int, b: int, rem: bool) -> Result:
+    q = r = 0
+    div0 = False
+    for shift in (0, 12):
+        x, y = (a >> shift) & 0xFFF, (b >> shift) & 0xFFF
+        if y:
+            q |= (x // y) << shift
+            r |= (x % y) << shift
+        else:
+            div0 = True
+    return (r, 0, div0) if rem else (q, r, div0)
+
+
+def _lanewise(f: Callable[[int, int, int], int], a: int, b: int = 0, c: int = 0) -> int:
+    (al, ah), (bl, bh), (cl, ch) = _lanes(a), _lanes(b), _lanes(c)
+    return _pack(f(al, bl, cl), f(ah, bh, ch))
+
+
+def _signed_lanewise(f: Callable[[int, int, int], int], a: int, b: int = 0, c: int = 0) -> int:
+    return _lanewise(lambda x, y, z: f(_s12(x), _s12(y), _s12(z)), a, b, c)
+
+
+def _mul(p: int) -> Result:
+    p &= MASK48
+    return p & MASK24, p >> 24, False
+
+
+def _divu(a: int, b: int, rem: bool) -> Result:
+    if not b:
+        return 0, 0, True
+    return (a % b, 0, False) if rem else (a // b, a % b, False)
+
+
+def _divs(a: int, b: int, rem: bool) -> Result:
+    if not b:
+        return 0, 0, True
+    q, r = _tdiv(_s24(a), _s24(b))
+    return (r & MASK24, 0, False) if rem else (q & MASK24, r & MASK24, False)
+
+
+def _res0(v: int) -> Result:
+    return v & MASK24, 0, False
+
+
+_GOLDEN: Dict[int, Callable[[int, int, int], Result]] = {
+    OPS["MULU"]: lambda a, b, c: _mul(a * b),
+    OPS["DIVU"]: lambda a, b, c: _divu(a, b, False),
+    OPS["MODU"]: lambda a, b, c: _divu(a, b, True),
+    OPS["SQRTU"]: lambda a, b, c: _res0(isqrt(a)),
+    OPS["MULS"]: lambda a, b, c: _mul(_s24(a) * _s24(b)),
+    OPS["DIVS"]: lambda a, b, c: _divs(a, b, False),
+    OPS["MODS"]: lambda a, b, c: _divs(a, b, True),
+    OPS["ABS_S"]: lambda a, b, c: _res0(abs(_s24(a))),
+    OPS["MIN_U"]: lambda a, b, c: _res0(min(a, b)),
+    OPS["MAX_U"]: lambda a, b, c: _res0(max(a, b)),
+    OPS["MIN_S"]: lambda a, b, c: _res0(min(_s24(a), _s24(b))),
+    OPS["MAX_S"]: lambda a, b, c: _res0(max(_s24(a), _s24(b))),
+    OPS["CLAMP_U"]: lambda a, b, c: _res0(_clamp(a, b, c)),
+    OPS["CLAMP_S"]: lambda a, b, c: _res0(_clamp(_s24(a), _s24(b), _s24(c))),
+    OPS["ADD24"]: lambda a, b, c: _res0(a + b),
+    OPS["SUB24"]: lambda a, b, c: _res0(a - b),
+    OPS["NEG24"]: lambda a, b, c: _res0(-a),
+    OPS["ADD12"]: lambda a, b, c: _res0(_lanewise(lambda x, y, z: x + y, a, b)),
+    OPS["SUB12"]: lambda a, b, c: _res0(_lanewise(lambda x, y, z: x - y, a, b)),
+    OPS["NEG12"]: lambda a, b, c: _res0(_lanewise(lambda x, y, z: -x, a)),
+    OPS["MUL12"]: lambda a, b, c: _res0(_lanewise(lambda x, y, z: x * y, a, b)),
+    OPS["DIV12"]: lambda a, b, c: _div12(a, b, False),
+    OPS["MOD12"]: lambda a, b, c: _div12(a, b, True),
+    OPS["SQRT12"]: lambda a, b, c: _res0(_lanewise(lambda x, y, z: isqrt(x), a)),
+    OPS["ABS12"]: lambda a, b, c: _res0(_signed_lanewise(lambda x, y, z: abs(x), a)),
+    OPS["MIN12_U"]: lambda a, b, c: _res0(_lanewise(lambda x, y, z: min(x, y), a, b)),
+    OPS["MAX12_U"]: lambda a, b, c: _res0(_lanewise(lambda x, y, z: max(x, y), a, b)),
+    OPS["MIN12_S"]: lambda a, b, c: _res0(_signed_lanewise(lambda x, y, z: min(x, y), a, b)),
+    OPS["MAX12_S"]: lambda a, b, c: _res0(_signed_lanewise(lambda x, y, z: max(x, y), a, b)),
+    OPS["CLAMP12_U"]: lambda a, b, c: _res0(_lanewise(_clamp, a, b, c)),
+    OPS["CLAMP12_S"]: lambda a, b, c: _res0(_signed_lanewise(_clamp, a, b, c)),
+}
+
+
+def evaluate(op: int, a: int, b: int = 0, c: int = 0) -> Result:
+    """RES0, RES1 and DIV0 of `op` on OPA/OPB/OPC; unknown ops give zeros."""
+    f = _GOLDEN.get(op & 0x1F)
+    return f(a & MASK24, b & MASK24, c & MASK24) if f is not None else (0, 0, False)
+
+
+# --- Vectorised golden model -------------------------------------------------
+def _np_s(v, bits: int):
+    return np.where(v & (1 << (bits - 1)), v - (1 << bits), v)
+
+
+def _np_isqrt(v):
+    r = np.floor(np.sqrt(v.astype(np.float64))).astype(np.int64)
+    r -= r * r > v
+    r += (r + 1) * (r + 1) <= v
+    return r
+
+
+def _np_lanewise(f, a, b, c, signed: bool = False):
+    lanes = []
+    for shift in (0, 12):
+        x, y, z = ((v >> shift) & 0xFFF for v in (a, b, c))
+        if signed:
+            x, y, z = _np_s(x, 12), _np_s(y, 12), _np_s(z, 12)
+        lanes.append(f(x, y, z) & 0xFFF)
+    return lanes[1] << 12 | lanes[0]
+
+
+def _np_clamp(x, hi, lo):
+    return np.where(x < lo, lo, np.where(x > hi, hi, x))
+
+
+def _np_divide(x, y, signed: bool):
+    """Quotient, remainder and zero mask; zero divisors give q = r = 0."""
+    zero = y == 0
+    d = np.where(zero, 1, y)
+    if signed:
+        q = np.abs(x) // np.abs(d)
+        q = np.where((x < 0) != (d < 0), -q, q)
+        r = x - q * d
+    else:
+        q, r = x // d, x % d
+    return np.where(zero, 0, q), np.where(zero, 0, r), zero
+
+
+def _np_div12(a, b):
+    q = r = 0
+    div0 = np.zeros(a.shape, dtype=bool)
+    for shift in (0, 12):
+        lq, lr, zero = _np_divide((a >> shift) & 0xFFF, (b >> shift) & 0xFFF, False)
+        q = q | lq << shift
+        r = r | lr << shift
+        div0 = div0 | zero
+    return q, r, div0
+
+
+def _np_golden(op: int, a, b, c):
+    zeros = np.zeros(a.shape, dtype=np.int64)
+    no_div0 = np.zeros(a.shape, dtype=bool)
+    name = OP_NAMES.get(op)
+    if name in ("MULU", "MULS"):
+        p = a * b if name == "MULU" else _np_s(a, 24) * _np_s(b, 24)
+        p &= MASK48
+        return p & MASK24, p >> 24, no_div0
+    if name in ("DIVU", "MODU", "DIVS", "MODS"):
+        signed = name.endswith("S")
+        x, y = (_np_s(a, 24), _np_s(b, 24)) if signed else (a, b)
+        q, r, zero = _np_divide(x, y, signed)
+        if name.startswith("MOD"):
+            return r & MASK24, zeros, zero
+        return q & MASK24, r & MASK24, zero
+    if name in ("DIV12", "MOD12"):
+        q, r, zero = _np_div12(a, b)
+        return (q, r, zero) if name == "DIV12" else (r, zeros, zero)
+    sa, sb, sc = _np_s(a, 24), _np_s(b, 24), _np_s(c, 24)
+    res = {
+        "SQRTU": lambda: _np_isqrt(a),
+        "ABS_S": lambda: np.abs(sa),
+        "MIN_U": lambda: np.minimum(a, b),
+        "MAX_U": lambda: np.maximum(a, b),
+        "MIN_S": lambda: np.minimum(sa, sb),
+        "MAX_S": lambda: np.maximum(sa, sb),
+        "CLAMP_U": lambda: _np_clamp(a, b, c),
+        "CLAMP_S": lambda: _np_clamp(sa, sb, sc),
+        "ADD24": lambda: a + b,
+        "SUB24": lambda: a - b,
+        "NEG24": lambda: -a,
+        "ADD12": lambda: _np_lanewise(lambda x, y, z: x + y, a, b, c),
+        "SUB12": lambda: _np_lanewise(lambda x, y, z: x - y, a, b, c),
+        "NEG12": lambda: _np_lanewise(lambda x, y, z: -x, a, b, c),
+        "MUL12": lambda: _np_lanewise(lambda x, y, z: x * y, a, b, c),
+        "SQRT12": lambda: _np_lanewise(lambda x, y, z: _np_isqrt(x), a, b, c),
+        "ABS12": lambda: _np_lanewise(lambda x, y, z: np.abs(x), a, b, c, signed=True),
+        "MIN12_U": lambda: _np_lanewise(lambda x, y, z: np.minimum(x, y), a, b, c),
+        "MAX12_U": lambda: _np_lanewise(lambda x, y, z: np.maximum(x, y), a, b, c),
+        "MIN12_S": lambda: _np_lanewise(lambda x, y, z: np.minimum(x, y), a, b, c, signed=True),
+        "MAX12_S": lambda: _np_lanewise(lambda x, y, z: np.maximum(x, y), a, b, c, signed=True),
+        "CLAMP12_U": lambda: _np_lanewise(_np_clamp, a, b, c),
+        "CLAMP12_S": lambda: _np_lanewise(_np_clamp, a, b, c, signed=True),
+    }.get(name)
+    return (res() & MASK24 if res is not None else zeros), zeros, no_div0
+
+
+def evaluate_np(op: int, a, b=0, c=0):
+    """`evaluate` over arrays of operands: (RES0, RES1, DIV0) int64/bool arrays."""
+    if np is None:
+        raise ImportError("evaluate_np needs NumPy")
+    a, b, c = (np.asarray(v, dtype=np.int64) & MASK24 for v in (a, b, c))
+    a, b, c = np.broadcast_arrays(a, b, c)
+    return _np_golden(op & 0x1F, a, b, c)
+
+
+# --- Cycle model -------------------------------------------------------------
+@dataclass
+class Math24Stats:
+    starts: int = 0
+    div0: int = 0
+    dropped_starts: int = 0  # START cleared by the previous op's acknowledge
+    stale_reads: int = 0  # STATUS reads showing READY before the last START's STATUS write
+    ops: Dict[str, int] = field(default_factory=dict)
+
+
+class Math24:
+    """The unit and its CSRs, advanced lazily to the cycle of each access.
+
+    `read`/`write` take the cycle of the CSRRD/CSRWR in EX (default: the
+    `clock` callable). CPU writes land `write_delay` cycles later; when a
+    CPU write and a unit write hit one register on the same edge, the unit
+    wins (`regcsr.v` order).
+    """
+
+    def __init__(self, clock: Optional[Callable[[], int]] = None, write_delay: int = WRITE_DELAY) -> None:
+        self.clock = clock
+        self.write_delay = write_delay
+        self.reset()
+
+    def reset(self) -> None:
+        self.regs: Dict[int, int] = {idx: 0 for idx in CSRS}
+        self.t = 0
+        self.stats = Math24Stats()
+        self._pending: Deque[Tuple[int, int, int]] = deque()  # (cycle visible, index, value)
+        self._wstep = 0
+        self._result: Result = (0, 0, False)
+        self._awaiting = 0  # STARTs written whose final STATUS is not yet visible
+        self._cpu_start = False  # a CPU write with START landed on the current edge
+
+    def attach(self, machine) -> None:
+        """Serve `machine`'s math CSRs; time is its CYCLE source unless `clock` is set."""
+        if self.clock is None:
+            self.clock = lambda: machine.clock() if machine.clock is not None else machine.uops
+        for idx in CSRS:
+            self.regs[idx] = machine.csr[idx]
+            machine.csr_read_hooks[idx] = lambda idx=idx: self.read(idx)
+            machine.csr_write_hooks[idx] = lambda value, idx=idx: self.write(idx, value)
+
+    def _now(self, at: Optional[int]) -> int:
+        if at is not None:
+            return at
+        return self.clock() if self.clock is not None else self.t
+
+    def write(self, idx: int, value: int, at: Optional[int] = None) -> None:
+        t = self._now(at)
+        self.advance(t)
+        value &= MASK24
+        if idx == CTRL and value & CTRL_START:
+            self._awaiting += 1
+        self._pending.append((t + self.write_delay, idx, value))
+
+    def read(self, idx: int, at: Optional[int] = None) -> int:
+        self.advance(self._now(at))
+        value = self.regs[idx]
+        if idx == STATUS and value & STATUS_READY and self._awaiting:
+            self.stats.stale_reads += 1
+        return value
+
+    def advance(self, now: int) -> None:
+        """Run the unit up to (not including) cycle `now`; CSRs then hold cycle `now`'s values."""
+        self._land()
+        while self.t < now:
+            if not self._wstep and not self.regs[CTRL] & CTRL_START:
+                # Idle: nothing happens until the next CPU write lands
+                self.t = min(self._pending[0][0], now) if self._pending else now
+                self._land()
+                continue
+            w = self._cycle()
+            self.t += 1
+            self._land()
+            if w is not None:
+                idx, value = w
+                if idx == CTRL and self._cpu_start:
+                    self._drop()
+                self.regs[idx] = value
+        self._cpu_start = False
+
+    def _land(self) -> None:
+        self._cpu_start = False
+        pending = self._pending
+        while pending and pending[0][0] <= self.t:
+            _, idx, value = pending.popleft()
+            self.regs[idx] = value
+            if idx == CTRL and value & CTRL_START:
+                if self._wstep == 1:
+                    self._drop()  # visible before the acknowledge reads CTRL
+                else:
+                    self._cpu_start = True
+
+    def _drop(self) -> None:
+        self.stats.dropped_starts += 1
+        self._awaiting = max(0, self._awaiting - 1)
+
+    def _finish(self) -> None:
+        self._awaiting = max(0, self._awaiting - 1)
+
+    def _cycle(self) -> Optional[Tuple[int, int]]:
+        """One clock of `math24_async.v`: the CSR write it makes, if any."""
+        regs = self.regs
+        step = self._wstep
+        if not step:
+            ctrl = regs[CTRL]
+            op = (ctrl >> 1) & 0x1F
+            self._result = evaluate(op, regs[OPA], regs[OPB], regs[OPC])
+            self._wstep = 1
+            st = self.stats
+            st.starts += 1
+            st.div0 += self._result[2]
+            name = OP_NAMES.get(op, f"OP{op:02X}")
+            st.ops[name] = st.ops.get(name, 0) + 1
+            return None
+        res0, res1, div0 = self._result
+        self._wstep = 0 if step == 5 else step + 1
+        if step == 1:
+            return CTRL, regs[CTRL] & ~CTRL_START & MASK24
+        if step == 2:
+            if div0:
+                self._finish()
+                return STATUS, STATUS_READY | STATUS_DIV0
+            return STATUS, STATUS_BUSY
+        if step == 3:
+            return RES0, res0
+        if step == 4:
+            return RES1, res1
+        if not div0:
+            self._finish()
+        return STATUS, STATUS_READY | (STATUS_DIV0 if div0 else 0)
+
+
+# --- Test vectors --------------------------------------------------------------
+@dataclass(frozen=True)
+class Vector:
+    op: int
+    opa: int
+    opb: int
+    opc: int
+    res0: int
+    res1: int
+    status: int  # STATUS once the op has finished
+    latency: int  # cycles from the CTRL write landing to READY visible
+
+
+_EDGES = (0, 1, 2, 0x7FF, 0x800, 0xFFF, 0x1000, 0x7FFFFF, 0x800000, 0x800001, 0xFFF000, 0xFFFFFF)
+
+
+def _operand(rng: random.Random) -> int:
+    pick = rng.random()
+    if pick < 0.2:
+        return rng.choice(_EDGES)
+    if pick < 0.35:  # small magnitudes, either sign
+        return rng.randrange(-64, 64) & MASK24
+    if pick < 0.5:  # independent lanes, including lane edges
+        lo, hi = (rng.choice((0, 1, 0x7FF, 0x800, 0xFFF, rng.randrange(0x1000))) for _ in range(2))
+        return hi << 12 | lo
+    return rng.randrange(1 << 24)
+
+
+def vectors(count: int, seed: int = 0, ops: Optional[Sequence[int]] = None) -> List[Vector]:
+    """`count` vectors per op (all ops by default) with edge-biased operands."""
+    rng = random.Random(seed)
+    out: List[Vector] = []
+    for op in (sorted(OP_NAMES) if ops is None else ops):
+        operands = [[_operand(rng) for _ in range(count)] for _ in range(3)]
+        if np is not None:
+            r0, r1, d0 = (v.tolist() for v in evaluate_np(op, *operands))
+            results = list(zip(r0, r1, d0))
+        else:
+            results = [evaluate(op, a, b, c) for a, b, c in zip(*operands)]
+        for (a, b, c), (res0, res1, div0) in zip(zip(*operands), results):
+            status = STATUS_READY | (STATUS_DIV0 if div0 else 0)
+            out.append(Vector(op, a, b, c, res0, res1, status, DIV0_READY if div0 else READY))
+    return out
+
+
+def write_vectors(vecs: Sequence[Vector], fp: IO[str]) -> None:
+    """`$readmemh` file for `tb/math24_vectors_tb.v`: a count, then 8 words per vector."""
+    fp.write(f"{len(vecs):06X}\n")
+    for v in vecs:
+        fp.write(" ".join(f"{w:06X}" for w in (v.op, v.opa, v.opb, v.opc, v.res0, v.res1, v.status, v.latency))
+                 + f"  // {OP_NAMES.get(v.op, '?')}\n")
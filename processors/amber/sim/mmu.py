@@ -0,0 +1,473 @@
+"""MMU model: page tables, walker and TLBs for the proposed Amber MMU.
+
+Follows `design/mmu.md`: 4096-word pages, 48-bit VAs split into three
+12-bit VPN levels (L2 root, L1, L0), two-word 48-bit PTEs (low word at
+the lower address), and physical addresses `{port[5:0], PPN[29:0],
+offset[11:0]}`. TLB lookup and permission checks follow `src/mmu.v`:
+fully associative, tagged by VPN and ASID (global entries match every
+ASID), faults VINV/PERM/PORT/PTAB.
+
+`mmu.md` leaves the table-pointer format open; the model uses:
+
+- a table is 4096 PTEs (8192 words) at an 8192-word aligned address;
+- an L2/L1 entry with NR, NW and NX all set points to the next table,
+  whose address is `{port, PPN} << 12`;
+- any other valid L2/L1 entry is a superpage leaf covering 2^24 (L2) or
+  2^12 (L1) pages; its PPN must be aligned to that size.
+
+Every PTE read must lie inside `MMU_WALK_BASE/LEN` or the walk faults
+with PTAB. A walk costs `WalkParams.overhead` plus `level_cycles` per
+table read (plus D-cache stalls when a `cache.Cache` is given).
+"""
+from __future__ import annotations
+
+import random
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from . import isa
+
+
+PAGE_BITS = 12
+LEVEL_BITS = 12
+LEVELS = 3
+VPN_BITS = 36
+PPN_BITS = 30
+PTE_WORDS = 2
+TABLE_WORDS = (1 << LEVEL_BITS) * PTE_WORDS
+
+# PTE bits (mmu.md)
+PTE_V = 1 << 47
+PTE_G = 1 << 46
+PTE_PORT_LO = 40
+PTE_PPN_LO = 10
+PTE_NX = 1 << 9
+PTE_NW = 1 << 8
+PTE_NR = 1 << 7
+PTE_NS = 1 << 6
+PTE_NL = 1 << 5
+PTE_NU = 1 << 4
+PTE_SW_MASK = 0xF
+PTE_POINTER = PTE_NR | PTE_NW | PTE_NX
+
+FLAG_NAMES = {"NX": PTE_NX, "NW": PTE_NW, "NR": PTE_NR, "NS": PTE_NS, "NL": PTE_NL, "NU": PTE_NU, "G": PTE_G}
+
+# Fault kinds in mmu.v order, as PSTATE causes
+FAULT_VINV = isa.CAUSE["MMU_VINV"]
+FAULT_PERM = isa.CAUSE["MMU_PERM"]
+FAULT_PORT = isa.CAUSE["MMU_PORT"]
+FAULT_PTAB = isa.CAUSE["MMU_PTAB"]
+
+ACCESSES = ("r", "w", "x")
+
+
+def make_pte(port: int, ppn: int, flags: int = 0, sw: int = 0) -> int:
+    """A valid PTE; `flags` ORs the `PTE_*` bits (`PTE_G`, `PTE_N*`)."""
+    if not 0 <= port < 64 or not 0 <= ppn < 1 << PPN_BITS:
+        raise ValueError(f"port/PPN out of range: port={port} ppn={ppn:#x}")
+    return PTE_V | flags | port << PTE_PORT_LO | ppn << PTE_PPN_LO | (sw & PTE_SW_MASK)
+
+
+def pte_port(pte: int) -> int:
+    return (pte >> PTE_PORT_LO) & 0x3F
+
+
+def pte_ppn(pte: int) -> int:
+    return (pte >> PTE_PPN_LO) & ((1 << PPN_BITS) - 1)
+
+
+def pte_target(pte: int) -> int:
+    """Physical word address named by a PTE: `{port, PPN}` as a page base."""
+    return (pte_port(pte) << PPN_BITS | pte_ppn(pte)) << PAGE_BITS
+
+
+def pointer_pte(table: int) -> int:
+    """Entry pointing at the next-level table at physical word address `table`."""
+    if table % TABLE_WORDS:
+        raise ValueError(f"page table at {table:#x} is not {TABLE_WORDS}-word aligned")
+    page = table >> PAGE_BITS
+    return make_pte(page >> PPN_BITS, page & ((1 << PPN_BITS) - 1), PTE_POINTER)
+
+
+def vpn_index(vpn: int, level: int) -> int:
+    return (vpn >> (LEVEL_BITS * level)) & ((1 << LEVEL_BITS) - 1)
+
+
+class PageTableBuilder:
+    """Builds page tables into a sparse word memory.
+
+    Tables are allocated one after another from `base`; `read` is the
+    walker's memory port.
+    """
+
+    def __init__(self, base: int = 0) -> None:
+        if base % TABLE_WORDS:
+            raise ValueError(f"table base {base:#x} is not {TABLE_WORDS}-word aligned")
+        self.words: Dict[int, int] = {}
+        self._next = base
+        self.root = self._alloc()
+
+    def _alloc(self) -> int:
+        addr = self._next
+        self._next += TABLE_WORDS
+        return addr
+
+    @property
+    def end(self) -> int:
+        """First word after the last table."""
+        return self._next
+
+    def read(self, addr: int) -> int:
+        return self.words.get(addr, 0)
+
+    def read_pte(self, addr: int) -> int:
+        return self.read(addr + 1) << 24 | self.read(addr)
+
+    def write_pte(self, addr: int, pte: int) -> None:
+        self.words[addr] = pte & 0xFFFFFF
+        self.words[addr + 1] = pte >> 24
+
+    def map(self, vpn: int, pte: int, level: int = 0) -> None:
+        """Install `pte` for `vpn` as a leaf at `level` (1, 2: superpages)."""
+        table = self.root
+        for lvl in range(LEVELS - 1, level, -1):
+            slot = table + PTE_WORDS * vpn_index(vpn, lvl)
+            cur = self.read_pte(slot)
+            if not cur & PTE_V:
+                nxt = self._alloc()
+                self.write_pte(slot, pointer_pte(nxt))
+                table = nxt
+            elif cur & PTE_POINTER == PTE_POINTER:
+                table = pte_target(cur)
+            else:
+                raise ValueError(f"VPN {vpn:#x} already covered by a level-{lvl} superpage")
+        self.write_pte(table + PTE_WORDS * vpn_index(vpn, level), pte)
+
+    def map_range(self, vpn: int, pages: int, port: int, ppn: int, flags: int = 0,
+                  superpages: bool = False) -> None:
+        """Map `pages` pages from `vpn` to consecutive PPNs, using L1 superpages
+        for aligned 4096-page runs when `superpages` is set."""
+        end = vpn + pages
+        span = 1 << LEVEL_BITS
+        while vpn < end:
+            if superpages and vpn % span == 0 and ppn % span == 0 and end - vpn >= span:
+                self.map(vpn, make_pte(port, ppn, flags), 1)
+                vpn += span
+                ppn += span
+            else:
+                self.map(vpn, make_pte(port, ppn, flags))
+                vpn += 1
+                ppn += 1
+
+
+# --- TLB ---------------------------------------------------------------------
+@dataclass(frozen=True)
+class TlbEntry:
+    vpn: int  # first page covered
+    level: int  # 0: page, 1/2: superpage
+    asid: Optional[int]  # None: global
+    pte: int
+
+    def translate(self, va: int) -> int:
+        span = LEVEL_BITS * self.level + PAGE_BITS
+        return pte_target(self.pte) | (va & ((1 << span) - 1))
+
+
+@dataclass
+class TlbStats:
+    lookups: int = 0
+    hits: int = 0
+    fills: int = 0
+    evictions: int = 0
+
+    @property
+    def misses(self) -> int:
+        return self.lookups - self.hits
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+
+TLB_POLICIES = ("lru", "fifo", "random")
+
+
+class Tlb:
+    """Fully associative TLB with LRU, FIFO or random replacement."""
+
+    def __init__(self, entries: int = 32, policy: str = "lru", seed: int = 0) -> None:
+        if policy not in TLB_POLICIES:
+            raise ValueError(f"unknown TLB policy '{policy}'")
+        self.entries = entries
+        self.policy = policy
+        self._rng = random.Random(seed)
+        self.stats = TlbStats()
+        # (level, vpn >> level bits, asid or -1) -> entry, oldest/least recent first
+        self._map: "OrderedDict[Tuple[int, int, int], TlbEntry]" = OrderedDict()
+        self._levels: Dict[int, int] = {}
+
+    def lookup(self, vpn: int, asid: int) -> Optional[TlbEntry]:
+        self.stats.lookups += 1
+        for level in self._levels:
+            tag = vpn >> (LEVEL_BITS * level)
+            for key in ((level, tag, asid), (level, tag, -1)):
+                e = self._map.get(key)
+                if e is not None:
+                    if self.policy == "lru":
+                        self._map.move_to_end(key)
+                    self.stats.hits += 1
+                    return e
+        return None
+
+    def _drop(self, key: Tuple[int, int, int]) -> None:
+        del self._map[key]
+        level = key[0]
+        self._levels[level] -= 1
+        if not self._levels[level]:
+            del self._levels[level]
+
+    def insert(self, entry: TlbEntry) -> None:
+        key = (entry.level, entry.vpn >> (LEVEL_BITS * entry.level), -1 if entry.asid is None else entry.asid)
+        if key in self._map:
+            self._drop(key)
+        elif len(self._map) >= self.entries:
+            if self.policy == "random":
+                victim = list(self._map)[self._rng.randrange(len(self._map))]
+            else:
+                victim = next(iter(self._map))
+            self._drop(victim)
+            self.stats.evictions += 1
+        self._map[key] = entry
+        self._levels[entry.level] = self._levels.get(entry.level, 0) + 1
+        self.stats.fills += 1
+
+    def invalidate_all(self) -> None:
+        self._map.clear()
+        self._levels.clear()
+
+    def invalidate_asid(self, asid: int) -> None:
+        """TLBINV_ASID: drop non-global entries of `asid`."""
+        for key in [k for k in self._map if k[2] == asid]:
+            self._drop(key)
+
+    def invalidate_page(self, vpn: int, include_global: bool = False) -> None:
+        """TLBINV_PAGE: drop entries covering `vpn` (global ones only if asked)."""
+        for key, e in list(self._map.items()):
+            if key[1] == vpn >> (LEVEL_BITS * key[0]) and (include_global or e.asid is not None):
+                self._drop(key)
+
+    def __len__(self) -> int:
+        return len(self._map)
+
+
+# --- Walker and translation --------------------------------------------------
+@dataclass
+class WalkParams:
+    overhead: int = 2  # TLB miss to first table read
+    level_cycles: int = 4  # one 48-bit table read (load plus hazard stall)
+
+
+@dataclass
+class MmuStats:
+    walks: int = 0
+    walk_reads: int = 0
+    walk_cycles: int = 0
+    faults: Dict[int, int] = field(default_factory=dict)  # cause -> count
+
+
+@dataclass(frozen=True)
+class Translation:
+    va: int
+    pa: Optional[int]
+    fault: Optional[int] = None  # PSTATE cause (FAULT_*)
+    cycles: int = 0  # walk cycles spent
+    hit: bool = True
+
+    @property
+    def port(self) -> Optional[int]:
+        return None if self.pa is None else self.pa >> (PPN_BITS + PAGE_BITS)
+
+
+class Mmu:
+    """Translation with separate ITLB/DTLB in front of a page-table walker.
+
+    `read(addr)` returns the 24-bit word at a physical word address; the
+    walk window, root, ASID and port mask mirror the `MMU_*` CSRs.
+    """
+
+    def __init__(self, read: Callable[[int], int], root: int, *,
+                 walk_base: int = 0, walk_len: int = 1 << 48,
+                 itlb: Optional[Tlb] = None, dtlb: Optional[Tlb] = None,
+                 portmask: int = (1 << 64) - 1, walk: Optional[WalkParams] = None,
+                 cache=None) -> None:
+        self.read = read
+        self.root = root
+        self.walk_base = walk_base
+        self.walk_len = walk_len
+        self.itlb = itlb or Tlb()
+        self.dtlb = dtlb or Tlb()
+        self.portmask = portmask
+        self.asid = 0
+        self.params = walk or WalkParams()
+        self.cache = cache  # optional cache.Cache the table reads go through
+        self.stats = MmuStats()
+
+    def _fault(self, va: int, cause: int, cycles: int = 0, hit: bool = True) -> Translation:
+        self.stats.faults[cause] = self.stats.faults.get(cause, 0) + 1
+        return Translation(va, None, cause, cycles, hit)
+
+    def walk(self, vpn: int) -> Tuple[Optional[TlbEntry], Optional[int], int]:
+        """Walk the tables for `vpn`: (entry, fault cause, cycles)."""
+        p = self.params
+        st = self.stats
+        st.walks += 1
+        cycles = p.overhead
+        table = self.root
+        entry: Optional[TlbEntry] = None
+        fault: Optional[int] = None
+        if table % TABLE_WORDS:
+            fault = FAULT_PTAB
+        else:
+            for level in range(LEVELS - 1, -1, -1):
+                addr = table + PTE_WORDS * vpn_index(vpn, level)
+                if not (self.walk_base <= addr and addr + PTE_WORDS <= self.walk_base + self.walk_len):
+                    fault = FAULT_PTAB
+                    break
+                st.walk_reads += 1
+                cycles += p.level_cycles
+                if self.cache is not None:
+                    cycles += self.cache.read(addr, PTE_WORDS)
+                pte = self.read(addr + 1) << 24 | self.read(addr)
+                if not pte & PTE_V:
+                    fault = FAULT_VINV
+                    break
+                if level and pte & PTE_POINTER == PTE_POINTER:
+                    table = pte_target(pte)
+                    if table % TABLE_WORDS:
+                        fault = FAULT_PTAB
+                        break
+                    continue
+                span = LEVEL_BITS * level
+                if pte_ppn(pte) & ((1 << span) - 1):
+                    fault = FAULT_PTAB  # misaligned superpage
+                    break
+                base_vpn = vpn >> span << span
+                entry = TlbEntry(base_vpn, level, None if pte & PTE_G else self.asid, pte)
+                break
+        st.walk_cycles += cycles
+        return entry, fault, cycles
+
+    def translate(self, va: int, access: str = "r", user: bool = False) -> Translation:
+        """Translate `va` for a load ("r"), store ("w") or fetch ("x")."""
+        tlb = self.itlb if access == "x" else self.dtlb
+        vpn = (va >> PAGE_BITS) & ((1 << VPN_BITS) - 1)
+        e = tlb.lookup(vpn, self.asid)
+        cycles = 0
+        hit = e is not None
+        if e is None:
+            e, fault, cycles = self.walk(vpn)
+            if e is None:
+                return self._fault(va, fault if fault is not None else FAULT_VINV, cycles, False)
+            tlb.insert(e)
+        pte = e.pte
+        if user and pte & (PTE_NU | PTE_NS):
+            return self._fault(va, FAULT_PERM, cycles, hit)
+        deny = {"r": PTE_NR, "w": PTE_NW, "x": PTE_NX}[access]
+        if pte & deny:
+            return self._fault(va, FAULT_PERM, cycles, hit)
+        if not self.portmask >> pte_port(pte) & 1:
+            return self._fault(va, FAULT_PORT, cycles, hit)
+        return Translation(va, e.translate(va), None, cycles, hit)
+
+    # TLBINV_* operations act on both TLBs
+    def invalidate_all(self) -> None:
+        self.itlb.invalidate_all()
+        self.dtlb.invalidate_all()
+
+    def invalidate_asid(self, asid: int) -> None:
+        self.itlb.invalidate_asid(asid)
+        self.dtlb.invalidate_asid(asid)
+
+    def invalidate_page(self, va: int, include_global: bool = False) -> None:
+        vpn = (va >> PAGE_BITS) & ((1 << VPN_BITS) - 1)
+        self.itlb.invalidate_page(vpn, include_global)
+        self.dtlb.invalidate_page(vpn, include_global)
+
+
+# --- Address traces ----------------------------------------------------------
+TraceOp = Tuple[str, int, bool]
+
+
+def read_address_trace(lines: Iterable[str]) -> Iterator[TraceOp]:
+    """Parse an MMU address trace.
+
+    One operation per line, `#` starts a comment:
+
+        r|w|x <va> [u]      load, store or fetch (u: user mode)
+        asid <n>            switch address space
+        inv all | inv asid <n> | inv page <va> [g]
+                            TLBINV_ALL / _ASID / _PAGE (g: also global)
+
+    Numbers accept Python prefixes (0x...). Yields (op, value, flag)
+    with op one of r/w/x/asid/inv-all/inv-asid/inv-page.
+    """
+    for n, line in enumerate(lines, 1):
+        parts = line.split("#", 1)[0].split()
+        if not parts:
+            continue
+        try:
+            op = parts[0].lower()
+            if op in ACCESSES:
+                yield op, int(parts[1], 0), len(parts) > 2 and parts[2].lower() == "u"
+            elif op == "asid":
+                yield op, int(parts[1], 0), False
+            elif op == "inv" and parts[1].lower() == "all":
+                yield "inv-all", 0, False
+            elif op == "inv" and parts[1].lower() in ("asid", "page"):
+                yield f"inv-{parts[1].lower()}", int(parts[2], 0), len(parts) > 3 and parts[3].lower() == "g"
+            else:
+                raise ValueError(line.strip())
+        except (IndexError, ValueError):
+            raise ValueError(f"line {n}: bad trace entry '{line.strip()}'") from None
+
+
+def run_trace(mmu: Mmu, ops: Iterable[TraceOp]) -> int:
+    """Apply trace operations to `mmu`; returns the number of translations."""
+    count = 0
+    for op, value, flag in ops:
+        if op in ACCESSES:
+            mmu.translate(value, op, flag)
+            count += 1
+        elif op == "asid":
+            mmu.asid = value
+        elif op == "inv-all":
+            mmu.invalidate_all()
+        elif op == "inv-asid":
+            mmu.invalidate_asid(value)
+        else:
+            mmu.invalidate_page(value, flag)
+    return count
+
+
+def identity_tables(ops: Iterable[TraceOp], base: int, superpages: bool = False) -> PageTableBuilder:
+    """Tables mapping every page the trace touches to itself (VPN = {port, PPN}).
+
+    With `superpages`, each touched 4096-page region is mapped by one L1
+    superpage instead of individual pages.
+    """
+    b = PageTableBuilder(base)
+    done = set()
+    span = 1 << LEVEL_BITS
+    for op, value, _ in ops:
+        if op not in ACCESSES:
+            continue
+        vpn = (value >> PAGE_BITS) & ((1 << VPN_BITS) - 1)
+        key = vpn // span if superpages else vpn
+        if key in done:
+            continue
+        done.add(key)
+        first = key * span if superpages else vpn
+        pte = make_pte(first >> PPN_BITS, first & ((1 << PPN_BITS) - 1))
+        b.map(first, pte, 1 if superpages else 0)
+    return b
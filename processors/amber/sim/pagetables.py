@@ -0,0 +1,297 @@
+"""Page-table image builder for the Amber MMU.
+
+Turns a mapping description (VA page ranges -> port/PPN with permission
+bits) into the 3-level tables `mmu.py` walks, laid out with the same
+two-word PTEs and pointer convention. Building is run based rather than
+per page:
+
+- an L0 table is a list of linear runs (consecutive PTEs whose PPN
+  advances by one), so a large mapping costs one run per 4096 pages;
+- tables are hash-consed bottom up, so identical subtrees (the kernel
+  half shared by several address spaces, aliases of one region) are
+  emitted once and pointed to from every parent;
+- aligned 4096- and 2^24-page runs become L1/L2 superpages on request.
+
+The image is written as sparse `@addr` hex, only the populated PTEs, so it
+loads wherever `amber_run.py` and `Machine.load_hex` load firmware and can
+be merged with a firmware image.
+
+Mapping description, one item per line (`#` comments):
+
+    space <name>                    start an address space (own root)
+    use <name>                      include another space's mappings
+    <va> <pages> <port>:<ppn> [NX NW NR NS NL NU G SW=<n>]
+
+`<va>` is a page-aligned word address; numbers accept 0x prefixes.
+Lines before the first `space` belong to the space `default`.
+"""
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, Iterable, List, Optional, Tuple, Union
+
+from ..asm import image
+from ..asm.assembler import Segment
+from .mmu import (FLAG_NAMES, LEVEL_BITS, LEVELS, PAGE_BITS, PPN_BITS, PTE_PPN_LO, PTE_WORDS,
+                  TABLE_WORDS, Mmu, make_pte, pointer_pte, vpn_index)
+
+
+MASK24 = 0xFFFFFF
+ENTRIES = 1 << LEVEL_BITS
+PPN_STEP = 1 << PTE_PPN_LO  # PTE difference between consecutive pages
+
+
+@dataclass(frozen=True)
+class Mapping:
+    vpn: int
+    pages: int
+    port: int
+    ppn: int
+    flags: int = 0
+    sw: int = 0
+
+
+def parse_mappings(lines: Iterable[str]) -> Dict[str, List[Mapping]]:
+    """Parse a mapping description into mappings per address space."""
+    spaces: Dict[str, List[Mapping]] = {}
+    cur = "default"
+    for n, line in enumerate(lines, 1):
+        parts = line.split("#", 1)[0].split()
+        if not parts:
+            continue
+        try:
+            if parts[0] == "space" and len(parts) == 2:
+                cur = parts[1]
+                spaces.setdefault(cur, [])
+                continue
+            if parts[0] == "use" and len(parts) == 2:
+                if parts[1] not in spaces:
+                    raise ValueError(f"unknown space '{parts[1]}'")
+                spaces.setdefault(cur, []).extend(spaces[parts[1]])
+                continue
+            va, pages = int(parts[0], 0), int(parts[1], 0)
+            port_s, ppn_s = parts[2].split(":")
+            flags = sw = 0
+            for f in parts[3:]:
+                f = f.upper()
+                if f.startswith("SW="):
+                    sw = int(f[3:], 0)
+                elif f in FLAG_NAMES:
+                    flags |= FLAG_NAMES[f]
+                else:
+                    raise ValueError(f"unknown flag '{f}'")
+            if va % (1 << PAGE_BITS):
+                raise ValueError(f"VA {va:#x} is not page aligned")
+            spaces.setdefault(cur, []).append(
+                Mapping(va >> PAGE_BITS, pages, int(port_s, 0), int(ppn_s, 0), flags, sw))
+        except (IndexError, ValueError) as e:
+            raise ValueError(f"line {n}: {e}") from None
+    return spaces
+
+
+# A space's tree: L2 dict -> (leaf PTE | L1 dict -> (leaf PTE | L0 run list))
+Run = Tuple[int, int, int]  # first index, count, first PTE
+L0 = List[Run]
+L1 = Dict[int, Union[int, L0]]
+L2 = Dict[int, Union[int, L1]]
+
+
+class PageTableImage:
+    """Address spaces compiled into one deduplicated page-table image.
+
+    `add_space` records mappings; `build` lays out the unique tables from
+    `base` upwards and fills `roots`, `segments` and the statistics.
+    """
+
+    def __init__(self, base: int, superpages: bool = False) -> None:
+        if base % TABLE_WORDS:
+            raise ValueError(f"table base {base:#x} is not {TABLE_WORDS}-word aligned")
+        self.base = base
+        self.superpages = superpages
+        self._spaces: Dict[str, L2] = {}
+        self.roots: Dict[str, int] = {}
+        self.segments: List[Segment] = []
+        self.tables = 0  # tables before sharing
+        self.unique = 0  # tables emitted
+        self.end = base
+        self._starts: Optional[List[int]] = None
+
+    # --- Recording mappings --------------------------------------------------
+    def add_space(self, name: str, mappings: Iterable[Mapping]) -> None:
+        root: L2 = self._spaces.setdefault(name, {})
+        for m in mappings:
+            self._add(root, m)
+
+    def _add(self, root: L2, m: Mapping) -> None:
+        if m.ppn + m.pages > 1 << PPN_BITS or m.vpn + m.pages > 1 << (LEVEL_BITS * LEVELS):
+            raise ValueError(f"mapping at VPN {m.vpn:#x} runs past the end of the port/VA space")
+        vpn, ppn, left = m.vpn, m.ppn, m.pages
+        while left:
+            step = 0
+            for level in (2, 1):
+                span = 1 << (LEVEL_BITS * level)
+                if self.superpages and vpn % span == 0 and ppn % span == 0 and left >= span:
+                    self._place_leaf(root, vpn, level, make_pte(m.port, ppn, m.flags, m.sw))
+                    step = span
+                    break
+            if not step:
+                step = min(left, ENTRIES - vpn_index(vpn, 0))
+                l1 = self._child(root, vpn_index(vpn, 2), vpn)
+                l0 = self._child(l1, vpn_index(vpn, 1), vpn, leaf=True)
+                l0.append((vpn_index(vpn, 0), step, make_pte(m.port, ppn, m.flags, m.sw)))
+            vpn += step
+            ppn += step
+            left -= step
+
+    @staticmethod
+    def _child(table: dict, idx: int, vpn: int, leaf: bool = False):
+        cur = table.get(idx)
+        if cur is None:
+            cur = table[idx] = [] if leaf else {}
+        elif isinstance(cur, int):
+            raise ValueError(f"VPN {vpn:#x} overlaps a superpage mapping")
+        return cur
+
+    @staticmethod
+    def _place_leaf(root: L2, vpn: int, level: int, pte: int) -> None:
+        table: dict = root
+        if level == 1:
+            table = PageTableImage._child(root, vpn_index(vpn, 2), vpn)
+        idx = vpn_index(vpn, level)
+        if idx in table:
+            raise ValueError(f"superpage at VPN {vpn:#x} overlaps another mapping")
+        table[idx] = pte
+
+    # --- Layout --------------------------------------------------------------
+    def build(self) -> "PageTableImage":
+        self._interned: Dict[tuple, int] = {}
+        self._entries: List[Tuple[int, tuple]] = []  # (address, key) per unique table
+        self.tables = self.unique = 0
+        self.end = self.base
+        self.roots = {name: self._intern_l2(root) for name, root in self._spaces.items()}
+        self.segments = self._emit()
+        self._starts = None
+        return self
+
+    def _intern(self, key: tuple) -> int:
+        self.tables += 1
+        addr = self._interned.get(key)
+        if addr is None:
+            addr = self._interned[key] = self.end
+            self.end += TABLE_WORDS
+            self.unique += 1
+            self._entries.append((addr, key))
+        return addr
+
+    def _intern_l0(self, runs: L0) -> int:
+        merged: List[Run] = []
+        for idx, count, pte in sorted(runs):
+            if merged:
+                pidx, pcount, ppte = merged[-1]
+                if idx < pidx + pcount:
+                    raise ValueError(f"overlapping mappings at L0 index {idx:#x}")
+                if idx == pidx + pcount and pte == ppte + pcount * PPN_STEP:
+                    merged[-1] = (pidx, pcount + count, ppte)
+                    continue
+            merged.append((idx, count, pte))
+        return self._intern(("L0", tuple(merged)))
+
+    def _intern_l1(self, table: L1) -> int:
+        items = []
+        for idx in sorted(table):
+            sub = table[idx]
+            items.append((idx, sub if isinstance(sub, int) else pointer_pte(self._intern_l0(sub))))
+        return self._intern(("L1", tuple(items)))
+
+    def _intern_l2(self, table: L2) -> int:
+        items = []
+        for idx in sorted(table):
+            sub = table[idx]
+            items.append((idx, sub if isinstance(sub, int) else pointer_pte(self._intern_l1(sub))))
+        return self._intern(("L2", tuple(items)))
+
+    def _emit(self) -> List[Segment]:
+        segments: List[Segment] = []
+        for addr, key in sorted(self._entries):
+            kind, body = key
+            runs: List[Run] = list(body) if kind == "L0" else [(idx, 1, pte) for idx, pte in body]
+            for idx, count, pte in runs:
+                words = image.new_words()
+                words.frombytes(bytes(PTE_WORDS * count * words.itemsize))
+                stop = pte + count * PPN_STEP
+                words[0::2] = array(image.WORD_TYPECODE, (v & MASK24 for v in range(pte, stop, PPN_STEP)))
+                words[1::2] = array(image.WORD_TYPECODE, (v >> 24 for v in range(pte, stop, PPN_STEP)))
+                start = addr + PTE_WORDS * idx
+                last = segments[-1] if segments else None
+                if last is not None and last.addr + len(last.words) == start:
+                    last.words.extend(words)
+                else:
+                    segments.append(Segment(start, words))
+        return segments
+
+    # --- Access --------------------------------------------------------------
+    def read(self, addr: int) -> int:
+        """Word at physical address `addr` (zero outside the tables); `mmu.Mmu` reads."""
+        if self._starts is None:
+            self._starts = [sg.addr for sg in self.segments]
+        i = bisect_right(self._starts, addr) - 1
+        if i >= 0:
+            sg = self.segments[i]
+            if addr - sg.addr < len(sg.words):
+                return sg.words[addr - sg.addr]
+        return 0
+
+    @property
+    def words(self) -> int:
+        return sum(len(sg.words) for sg in self.segments)
+
+
+# --- Hex images --------------------------------------------------------------
+def read_hex_segments(lines: Iterable[str]) -> List[Segment]:
+    """Read a `$readmemh` image (optional `@addr` records) into segments."""
+    segments: List[Segment] = []
+    addr = 0
+    for line in lines:
+        text = line.split("//", 1)[0].strip()
+        for tok in text.split():
+            if tok.startswith("@"):
+                addr = int(tok[1:], 16)
+                continue
+            last = segments[-1] if segments else None
+            if last is None or last.addr + len(last.words) != addr:
+                last = Segment(addr, image.new_words())
+                segments.append(last)
+            last.words.append(int(tok, 16) & MASK24)
+            addr += 1
+    return segments
+
+
+def merge_segments(*groups: List[Segment]) -> List[Segment]:
+    """Combine segment lists into one sorted list; overlaps are errors."""
+    merged = sorted((sg for g in groups for sg in g), key=lambda sg: sg.addr)
+    for a, b in zip(merged, merged[1:]):
+        if a.addr + len(a.words) > b.addr:
+            raise ValueError(f"images overlap at 0x{b.addr:X}")
+    return merged
+
+
+def write_image(segments: List[Segment], fp: BinaryIO) -> int:
+    return image.write_segments_hex(segments, fp)
+
+
+def check(img: PageTableImage, spaces: Dict[str, List[Mapping]]) -> List[str]:
+    """Walk the first and last page of every mapping; returns mismatches."""
+    errors: List[str] = []
+    for name, mappings in spaces.items():
+        mmu = Mmu(img.read, img.roots[name])
+        for m in mappings:
+            for i in {0, m.pages - 1}:
+                va = (m.vpn + i) << PAGE_BITS
+                t = mmu.walk(m.vpn + i)[0]
+                want = (m.port << PPN_BITS | (m.ppn + i)) << PAGE_BITS
+                got: Optional[int] = t.translate(va) if t is not None else None
+                if got != want:
+                    errors.append(f"{name}: VA {va:#x} -> {got if got is None else hex(got)}, want {want:#x}")
+    return errors
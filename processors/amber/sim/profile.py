@@ -0,0 +1,187 @@
+"""PC profiler: flat, call-graph and collapsed-stack profiles.
+
+`Profiler.account` takes retired records (ISS or `trace.read_rtl_trace`)
+with the cycles the timing model charged them. Every `period` cycles it
+takes one sample of the PC and the call stack; a period of 1 counts every
+cycle exactly. Samples go to the label containing the PC (assembler
+labels from `Assembler.symbols` or a `--map` file). Skald's internal
+labels (`__sk_*`, `__skald_*`) are skipped, so code compiled from Skald
+is attributed to its functions. With a line table (`asm.debuginfo`,
+`.loc` directives from Skald) samples are also counted per source line.
+
+The call stack is rebuilt from the instruction stream: a taken JSRui,
+BSRsr, BSRso or SYSCALL, or a trap, pushes the label it was issued from;
+RET and KRET pop (`MAX_DEPTH` bounds the stack). A sample's stack is the
+call-site labels plus the current label, which is what `collapsed` writes
+for flame graphs (`a;b;c 42` lines, as `flamegraph.pl` and speedscope
+read them).
+"""
+from __future__ import annotations
+
+from bisect import bisect_right
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, TextIO, Tuple
+
+from . import isa
+from .trace import Retired
+
+from ..asm.debuginfo import LineTable
+
+
+# Deeper calls are charged to the deepest frame kept (a trap loop never returns)
+MAX_DEPTH = 256
+# Prefixes of labels the Skald code generator makes up for control flow and data
+INTERNAL_PREFIXES = ("__sk_", "__skald_")
+
+_CALLS = frozenset(isa.OPC[n] for n in ("JSRui", "BSRsr", "BSRso", "SYSCALL"))
+_RETURNS = frozenset(isa.OPC[n] for n in ("RET", "KRET"))
+
+
+class Symbols:
+    """Maps PCs to the nearest label at or below them."""
+
+    def __init__(self, labels: Optional[Dict[str, int]] = None) -> None:
+        by_addr: Dict[int, str] = {}
+        for name, addr in sorted((labels or {}).items(), key=lambda kv: kv[1]):
+            if not name.startswith(INTERNAL_PREFIXES):
+                by_addr.setdefault(addr, name)
+        self._starts = sorted(by_addr)
+        self._names = [by_addr[a] for a in self._starts]
+
+    def name(self, pc: int) -> str:
+        i = bisect_right(self._starts, pc) - 1
+        return self._names[i] if i >= 0 else f"{pc:06X}"
+
+
+@dataclass
+class Entry:
+    name: str
+    self_samples: int = 0
+    incl_samples: int = 0
+    calls: int = 0
+
+
+class Profiler:
+    """Samples retired PCs and their call stacks."""
+
+    def __init__(self, labels: Optional[Dict[str, int]] = None, period: int = 1,
+                 lines: Optional[LineTable] = None) -> None:
+        if period < 1:
+            raise ValueError(f"sampling period must be at least 1 cycle, got {period}")
+        self.symbols = Symbols(labels)
+        self.lines = lines
+        self.period = period
+        self.cycles = 0
+        self.samples = 0
+        self.pcs: Counter = Counter()  # pc -> samples
+        self.stacks: Counter = Counter()  # (label, ...) root first -> samples
+        self.calls: Counter = Counter()  # (caller label, callee label) -> calls
+        self.sources: Counter = Counter()  # SourceLoc (or None: no line info) -> samples
+        self._stack: List[str] = []  # call-site labels, outermost first
+        self._words: Dict[int, int] = {}  # pc -> word, for reports
+
+    def account(self, r: Retired, cycles: int = 1) -> None:
+        """Charge `r` with `cycles` and follow the calls and returns it makes."""
+        before = self.cycles // self.period
+        self.cycles += cycles
+        n = self.cycles // self.period - before
+        here = self.symbols.name(r.pc)
+        if n:
+            self.samples += n
+            self.pcs[r.pc] += n
+            self._words[r.pc] = r.word
+            self.stacks[(*self._stack, here)] += n
+            if self.lines is not None:
+                self.sources[self.lines.lookup(r.pc)] += n
+        if not r.taken:
+            return
+        opc = isa.opc_of(r.word)
+        if opc in _RETURNS:
+            if self._stack:
+                self._stack.pop()
+        elif opc in _CALLS or r.trap is not None:
+            self.calls[(here, self.symbols.name(r.next_pc))] += 1
+            if len(self._stack) < MAX_DEPTH:
+                self._stack.append(here)
+
+    def feed(self, records: Iterable[Tuple[Retired, int]]) -> "Profiler":
+        for r, cycles in records:
+            self.account(r, cycles)
+        return self
+
+    # --- Views -------------------------------------------------------------------
+    def flat(self) -> List[Entry]:
+        """Per-label self and inclusive samples, most self samples first."""
+        entries: Dict[str, Entry] = {}
+        for stack, n in self.stacks.items():
+            leaf = stack[-1]
+            entries.setdefault(leaf, Entry(leaf)).self_samples += n
+            for name in set(stack):
+                entries.setdefault(name, Entry(name)).incl_samples += n
+        for (_, callee), n in self.calls.items():
+            entries.setdefault(callee, Entry(callee)).calls += n
+        return sorted(entries.values(), key=lambda e: (-e.self_samples, -e.incl_samples, e.name))
+
+    def edges(self) -> Dict[Tuple[str, str], int]:
+        """Samples spent in each caller -> callee arc (the callee and what it called)."""
+        arcs: Counter = Counter()
+        for stack, n in self.stacks.items():
+            for arc in set(zip(stack, stack[1:])):
+                arcs[arc] += n
+        return dict(arcs)
+
+    # --- Reports -----------------------------------------------------------------
+    def _pct(self, n: int) -> float:
+        return 100.0 * n / self.samples if self.samples else 0.0
+
+    def report(self, fp: TextIO, top: Optional[int] = None) -> None:
+        if self.period == 1:  # every cycle is a sample
+            fp.write(f"{self.cycles} cycles\n")
+        else:
+            fp.write(f"{self.cycles} cycles, {self.samples} samples (1 per {self.period} cycles)\n")
+        fp.write(";  SELF%     SELF   INCL%     INCL   CALLS  NAME\n")
+        for e in self.flat()[:top]:
+            fp.write(f"{self._pct(e.self_samples):7.2f} {e.self_samples:8} {self._pct(e.incl_samples):7.2f} "
+                     f"{e.incl_samples:8} {e.calls:7}  {e.name}\n")
+
+    def report_pcs(self, fp: TextIO, top: Optional[int] = None) -> None:
+        fp.write(";  SELF%     SELF  ADDR    WORD    MNEMONIC  LABEL\n")
+        for pc, n in self.pcs.most_common(top):
+            word = self._words[pc]
+            fp.write(f"{self._pct(n):7.2f} {n:8}  {pc:06X}  {word:06X}  "
+                     f"{isa.opc_name(isa.opc_of(word)):<8}  {self.symbols.name(pc)}\n")
+
+    def report_lines(self, fp: TextIO, top: Optional[int] = None) -> None:
+        """Samples per source line, hottest first."""
+        fp.write(";  SELF%     SELF  SOURCE                    FUNCTION\n")
+        for loc, n in self.sources.most_common(top):
+            if loc is None:
+                fp.write(f"{self._pct(n):7.2f} {n:8}  (no line info)\n")
+            else:
+                fp.write(f"{self._pct(n):7.2f} {n:8}  {str(loc):<25} {loc.function or ''}\n")
+
+    def report_callgraph(self, fp: TextIO) -> None:
+        """Per label: callers and callees with call counts and the samples on each arc."""
+        arcs = self.edges()
+        callers: Dict[str, List[Tuple[str, int, int]]] = {}
+        callees: Dict[str, List[Tuple[str, int, int]]] = {}
+        for (a, b) in set(arcs) | set(self.calls):
+            row = (self.calls.get((a, b), 0), arcs.get((a, b), 0))
+            callers.setdefault(b, []).append((a, *row))
+            callees.setdefault(a, []).append((b, *row))
+        fp.write("; Call graph: callers above each label, callees below (CALLS  SAMPLES)\n")
+        for e in sorted(self.flat(), key=lambda e: (-e.incl_samples, e.name)):
+            for name, calls, n in sorted(callers.get(e.name, ()), key=lambda t: -t[2]):
+                fp.write(f"            {calls:7} {n:8}      {name}\n")
+            fp.write(f"{self._pct(e.incl_samples):7.2f}%  {e.incl_samples:8} self {e.self_samples:8}  "
+                     f"[{e.name}]\n")
+            for name, calls, n in sorted(callees.get(e.name, ()), key=lambda t: -t[2]):
+                fp.write(f"            {calls:7} {n:8}      -> {name}\n")
+            fp.write("\n")
+
+    def collapsed(self, fp: TextIO) -> int:
+        """Write `root;...;leaf samples` lines; returns the number of stacks."""
+        for stack, n in sorted(self.stacks.items()):
+            fp.write(f"{';'.join(stack)} {n}\n")
+        return len(self.stacks)
@@ -0,0 +1,183 @@
+"""Transaction-level model of the cache refill path to DDR.
+
+`src/amber_refill_gwddr.v` and `src/refill_axi24.v` turn each refill beat
+of `cache.v` into its own single-beat read and wait for the data before
+taking the next request, so a 16-word line costs 16 DDR round trips. This
+module times a line refill under alternative policies so burst support
+can be sized before it is written:
+
+- `burst`         beats per read command: with 8 (BL8) a 16-beat line is
+                  2 commands, each paying the read latency and row check
+                  once and then delivering its beats back to back; a burst
+                  stops at the end of the line (3 packed beats: 1 command)
+- `coalesce`      issue the commands of a line back to back (pipelined in
+                  the controller) instead of waiting for each one's data
+- `critical_first` start with the beat holding the missing word; a burst
+                  wraps within its aligned block (DDR burst order) and the
+                  stall ends when that word arrives (needs early restart in
+                  `cache.v`)
+- `packed`        store 24-bit words densely in the 128-bit user data
+                  beats (16 words = 3 beats) instead of one word per beat
+
+`DdrTiming` is a local stand-in for the controller and device: fixed read
+latency, one command and one user beat per cycle, per-bank open rows with
+a row-miss penalty. `DdrTiming.bram()` is the 1-cycle handshake the
+testbench uses, which makes the `single` policy cost what
+`cache.CacheConfig` charges by default. Writes (D-cache write-through) are
+not modelled.
+
+A `RefillModel` is the `refill` callable of a `cache.Cache`.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+
+WORD_BITS = 24
+
+
+@dataclass(frozen=True)
+class DdrTiming:
+    read_latency: int = 14  # command accepted to first data beat
+    cmd_cycles: int = 1  # minimum spacing between commands
+    beat_cycles: int = 1  # cycles per user data beat on the bus
+    row_miss: int = 10  # precharge + activate when the bank has another row open
+    banks: int = 8
+    row_beats: int = 128  # user beats per row (2 KiB page / 16 bytes)
+    data_bits: int = 128  # USER_DATA_W
+
+    @classmethod
+    def bram(cls) -> "DdrTiming":
+        """The BRAM behind the testbench caches: data one cycle after the request."""
+        return cls(read_latency=1, row_miss=0, banks=1, row_beats=1 << 30, data_bits=WORD_BITS)
+
+
+@dataclass(frozen=True)
+class RefillPolicy:
+    name: str
+    burst: int = 1  # beats per read command
+    coalesce: bool = False
+    critical_first: bool = False
+    packed: bool = False
+
+
+POLICIES: Dict[str, RefillPolicy] = {p.name: p for p in (
+    RefillPolicy("single"),
+    RefillPolicy("bl8", burst=8, coalesce=True),
+    RefillPolicy("cwf", burst=8, coalesce=True, critical_first=True),
+    RefillPolicy("packed", burst=8, coalesce=True, packed=True),
+    RefillPolicy("packed-cwf", burst=8, coalesce=True, critical_first=True, packed=True),
+)}
+
+
+@dataclass
+class RefillStats:
+    refills: int = 0
+    line_cycles: int = 0  # miss to last word of the line
+    critical_cycles: int = 0  # miss to the word that missed
+    stall_cycles: int = 0  # what the cache was charged
+    commands: int = 0
+    row_misses: int = 0
+    beats: int = 0
+    bus_cycles: int = 0  # data bus busy
+    payload_bits: int = 0
+    transferred_bits: int = 0
+
+    @property
+    def avg_line(self) -> float:
+        return self.line_cycles / self.refills if self.refills else 0.0
+
+    @property
+    def avg_critical(self) -> float:
+        return self.critical_cycles / self.refills if self.refills else 0.0
+
+    @property
+    def efficiency(self) -> float:
+        """Share of the transferred bits that were cache data."""
+        return self.payload_bits / self.transferred_bits if self.transferred_bits else 0.0
+
+    @property
+    def utilisation(self) -> float:
+        """Share of refill time the data bus was busy."""
+        return self.bus_cycles / self.line_cycles if self.line_cycles else 0.0
+
+
+class RefillModel:
+    """Times line refills of one cache; call it as `(line_addr, offset) -> cycles`."""
+
+    def __init__(self, policy: RefillPolicy = POLICIES["single"], ddr: DdrTiming = DdrTiming(),
+                 line_words: int = 16, overhead: int = 2) -> None:
+        self.policy = policy
+        self.ddr = ddr
+        self.line_words = line_words
+        self.overhead = overhead  # miss detection to first request (cache.v)
+        if policy.packed:
+            self.line_beats = -(-line_words * WORD_BITS // ddr.data_bits)
+        else:
+            self.line_beats = line_words
+        self.reset()
+
+    def reset(self) -> None:
+        self.stats = RefillStats()
+        self._open: Dict[int, int] = {}  # bank -> open row
+
+    def _beats_of(self, offset: int) -> Tuple[int, int]:
+        """First and last beat (within the line) holding word `offset`."""
+        if not self.policy.packed:
+            return offset, offset
+        lo = offset * WORD_BITS
+        bits = self.ddr.data_bits
+        return lo // bits, (lo + WORD_BITS - 1) // bits
+
+    def _bursts(self, offset: int) -> List[List[int]]:
+        """The line's beats per read command, in issue order."""
+        n, k = self.line_beats, self.policy.burst
+        blocks = [list(range(s, min(s + k, n))) for s in range(0, n, k)]
+        if self.policy.critical_first:
+            crit = self._beats_of(offset)[0]
+            first = crit // k
+            blocks = blocks[first:] + blocks[:first]
+            i = blocks[0].index(crit)
+            blocks[0] = blocks[0][i:] + blocks[0][:i]
+        return blocks
+
+    def _row_penalty(self, beat_addr: int) -> int:
+        ddr = self.ddr
+        row = beat_addr // ddr.row_beats
+        bank = row % ddr.banks
+        if self._open.get(bank) == row:
+            return 0
+        self._open[bank] = row
+        self.stats.row_misses += 1
+        return ddr.row_miss
+
+    def __call__(self, line_addr: int, offset: int) -> int:
+        ddr = self.ddr
+        st = self.stats
+        base = (line_addr // self.line_words) * self.line_beats
+        need = set(range(self._beats_of(offset)[0], self._beats_of(offset)[1] + 1))
+        issue = self.overhead
+        bus_free = 0
+        done: Dict[int, int] = {}
+        for beats in self._bursts(offset):
+            # Row check and read latency once per command, then one beat per beat_cycles
+            ready = issue + self._row_penalty(base + beats[0]) + ddr.read_latency
+            for b in beats:
+                bus_free = max(ready, bus_free) + ddr.beat_cycles
+                done[b] = bus_free
+            st.commands += 1
+            # The shims take the next request only once the data is back
+            issue = issue + ddr.cmd_cycles if self.policy.coalesce else bus_free
+        line = max(done.values())
+        critical = max(done[b] for b in need)
+        st.refills += 1
+        st.line_cycles += line
+        st.critical_cycles += critical
+        st.beats += self.line_beats
+        st.bus_cycles += self.line_beats * ddr.beat_cycles
+        st.payload_bits += self.line_words * WORD_BITS
+        st.transferred_bits += self.line_beats * ddr.data_bits
+        stall = critical if self.policy.critical_first else line
+        st.stall_cycles += stall
+        return stall
@@ -0,0 +1,224 @@
+"""Cycle-approximate timing for retired Amber instructions.
+
+`TimingModel` charges each `trace.Retired` record with the costs the RTL
+pipeline exhibits (see `asm/cycles.py` for the static version):
+
+- base   1 cycle for the first micro-op of every instruction
+- xt     1 cycle for every further micro-op XT issues (calls, PUSH/POP, ...)
+- mem    `mem_stall` cycles after each data-memory micro-op (`hazard.v`)
+- branch `branch_penalty` cycles after a taken branch, call, return or trap
+- fill   once per run: reset to first issue plus the drain after HLT
+
+Further stall sources (caches, TLB, ...) register in `stall_sources`; each
+maps a name to a callable returning extra cycles for a record, and its
+cycles are reported under that name.
+
+Records come from the ISS (`TimingModel.run`) or from an RTL trace
+(`trace.read_rtl_trace`), so the same model is checked against the RTL
+CYCLE/INSTRET counters by `calibrate`.
+"""
+from __future__ import annotations
+
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+from ..asm import cycles
+from .trace import Retired
+
+
+# Reset release to first issue, plus the cycles CYCLE keeps counting after HLT
+PIPELINE_FILL = 4
+
+CAUSES = ("base", "xt", "mem", "branch", "fill")
+
+
+@dataclass
+class PipelineParams:
+    mem_stall: int = cycles.MEM_STALL
+    branch_penalty: int = cycles.BRANCH_PENALTY
+    fill: int = PIPELINE_FILL
+
+
+@dataclass
+class FunctionStats:
+    name: str
+    addr: int
+    entries: int = 0  # times control arrived at the label from elsewhere
+    instructions: int = 0
+    uops: int = 0
+    cycles: int = 0
+
+    @property
+    def ipc(self) -> float:
+        return self.instructions / self.cycles if self.cycles else 0.0
+
+
+StallSource = Callable[[Retired], int]
+
+
+class TimingModel:
+    """Accumulates cycles, per-cause breakdown and per-label statistics."""
+
+    def __init__(self, params: Optional[PipelineParams] = None,
+                 labels: Optional[Dict[str, int]] = None) -> None:
+        self.params = params or PipelineParams()
+        self.stall_sources: Dict[str, StallSource] = {}
+        self.breakdown: Dict[str, int] = {c: 0 for c in CAUSES}
+        self.breakdown["fill"] = self.params.fill
+        self.cycles = self.params.fill
+        self.instructions = 0
+        self.uops = 0
+        self.instret = 0
+        self._starts: List[int] = []
+        self._funcs: List[FunctionStats] = []
+        self._cur: Optional[int] = None
+        if labels:
+            by_addr: Dict[int, str] = {}
+            for name, addr in sorted(labels.items(), key=lambda kv: kv[1]):
+                by_addr.setdefault(addr, name)
+            self._starts = sorted(by_addr)
+            self._funcs = [FunctionStats(by_addr[a], a) for a in self._starts]
+
+    def account(self, r: Retired) -> int:
+        """Charge one retired instruction; returns the cycles it cost."""
+        p = self.params
+        bd = self.breakdown
+        n = len(r.uops)
+        cost = n
+        bd["base"] += 1 if n else 0
+        bd["xt"] += max(n - 1, 0)
+        mem = r.mem_uops * p.mem_stall
+        bd["mem"] += mem
+        cost += mem
+        if r.taken:
+            bd["branch"] += p.branch_penalty
+            cost += p.branch_penalty
+        for name, source in self.stall_sources.items():
+            extra = source(r)
+            if extra:
+                bd[name] = bd.get(name, 0) + extra
+                cost += extra
+        self.cycles += cost
+        self.instructions += 1
+        self.uops += n
+        self.instret += r.instret
+        if self._funcs:
+            i = bisect_right(self._starts, r.pc) - 1
+            if i >= 0:
+                f = self._funcs[i]
+                if self._cur != i:
+                    f.entries += 1
+                f.instructions += 1
+                f.uops += n
+                f.cycles += cost
+            self._cur = i
+        return cost
+
+    def feed(self, records: Iterable[Retired]) -> Iterator[Retired]:
+        """Account each record while passing it through."""
+        for r in records:
+            self.account(r)
+            yield r
+
+    def attach(self, machine) -> None:
+        """Make CYCLE CSR reads on `machine` return modelled cycles."""
+        machine.clock = lambda: self.cycles
+
+    def run(self, machine, max_steps: Optional[int] = None) -> "TimingModel":
+        self.attach(machine)
+        for _ in self.feed(machine.run(max_steps)):
+            pass
+        return self
+
+    @property
+    def ipc(self) -> float:
+        return self.instructions / self.cycles if self.cycles else 0.0
+
+    @property
+    def functions(self) -> List[FunctionStats]:
+        return [f for f in self._funcs if f.instructions]
+
+    def report(self, fp: TextIO) -> None:
+        fp.write(f"instructions {self.instructions}  uops {self.uops}  instret {self.instret}  "
+                 f"cycles {self.cycles}  IPC {self.ipc:.3f}\n")
+        for name, value in self.breakdown.items():
+            share = 100.0 * value / self.cycles if self.cycles else 0.0
+            fp.write(f"  {name:<8} {value:10}  {share:5.1f}%\n")
+        funcs = sorted(self.functions, key=lambda f: -f.cycles)
+        if funcs:
+            fp.write("; Functions: ADDR  NAME  ENTRIES  INSTR  UOPS  CYCLES  IPC\n")
+            for f in funcs:
+                fp.write(f"{f.addr:06X}  {f.name:<32} {f.entries:7} {f.instructions:8} "
+                         f"{f.uops:8} {f.cycles:9}  {f.ipc:.3f}\n")
+
+
+def labels_from_assembler(asm) -> Dict[str, int]:
+    """Label addresses from the last assembly done by an `asm.Assembler`."""
+    return {name: asm.symbols[name] for name in asm._labels}
+
+
+# --- Calibration against RTL counters ----------------------------------------
+@dataclass
+class Sample:
+    """One RTL run: its retired instructions and the final CYCLE/INSTRET."""
+    records: Sequence[Retired]
+    cycles: int
+    instret: Optional[int] = None
+
+
+@dataclass
+class Calibration:
+    params: PipelineParams
+    fitted: Tuple[float, float, float]  # mem_stall, branch_penalty, fill before rounding
+    residuals: List[int] = field(default_factory=list)  # measured - modelled cycles per sample
+    instret_errors: List[int] = field(default_factory=list)  # measured - counted INSTRET
+
+
+def _solve3(a: List[List[float]], b: List[float]) -> Optional[List[float]]:
+    m = [row[:] + [v] for row, v in zip(a, b)]
+    for col in range(3):
+        piv = max(range(col, 3), key=lambda r: abs(m[r][col]))
+        if abs(m[piv][col]) < 1e-9:
+            return None
+        m[col], m[piv] = m[piv], m[col]
+        for r in range(3):
+            if r != col:
+                k = m[r][col] / m[col][col]
+                m[r] = [x - k * y for x, y in zip(m[r], m[col])]
+    return [m[i][3] / m[i][i] for i in range(3)]
+
+
+def calibrate(samples: Sequence[Sample], base: Optional[PipelineParams] = None) -> Calibration:
+    """Fit mem_stall, branch_penalty and fill to measured CYCLE counts.
+
+    Least squares on `cycles - uops = mem_stall*mem + branch_penalty*taken
+    + fill` over the samples. With too few independent samples only `fill`
+    is fitted and the other two keep their `base` values. Extra stall
+    sources are not part of the fit.
+    """
+    base = base or PipelineParams()
+    rows = []
+    for smp in samples:
+        uops = sum(len(r.uops) for r in smp.records)
+        mem = sum(r.mem_uops for r in smp.records)
+        taken = sum(1 for r in smp.records if r.taken)
+        rows.append((float(mem), float(taken), 1.0, float(smp.cycles - uops)))
+    sol = None
+    if len(rows) >= 3:
+        ata = [[sum(r[i] * r[j] for r in rows) for j in range(3)] for i in range(3)]
+        atb = [sum(r[i] * r[3] for r in rows) for i in range(3)]
+        sol = _solve3(ata, atb)
+    if sol is None:
+        fill = sum(r[3] - base.mem_stall * r[0] - base.branch_penalty * r[1] for r in rows) / max(len(rows), 1)
+        sol = [float(base.mem_stall), float(base.branch_penalty), fill]
+    params = PipelineParams(round(sol[0]), round(sol[1]), round(sol[2]))
+    cal = Calibration(params, (sol[0], sol[1], sol[2]))
+    for smp in samples:
+        model = TimingModel(params)
+        for r in smp.records:
+            model.account(r)
+        cal.residuals.append(smp.cycles - model.cycles)
+        if smp.instret is not None:
+            cal.instret_errors.append(smp.instret - model.instret)
+    return cal
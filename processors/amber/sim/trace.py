@@ -0,0 +1,166 @@
+"""Retired-instruction records and RTL trace readers.
+
+`Retired` is the common currency of the simulator: the ISS yields one per
+ISA instruction, and `read_rtl_trace` rebuilds the same records from an Icarus
+run of `src/testbench.v` compiled with `DEBUGRETIRE`
+(`tools/amber_run.py --trace`). The testbench prints
+
+    retire <tick> pc=<pc> instr=<uop> addr=<ea>   one per micro-op leaving ID/EX
+    taken <tick> pc=<pc> target=<pc>              one per taken branch or trap
+
+and a closing `Final: ... CYCLE=<n> INSTRET=<n>` line, read by
+`read_counters`. Built with `DEBUGCOMMIT` (`amber_run.py --commits`) it
+also prints the register-file writes at writeback, read by `read_commits`:
+
+    commit <tick> pc=<pc> instr=<uop> gp=<we>:<reg>:<data> sr=<we>:<reg>:<data> aux=<we>:<reg>:<data>
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import re
+
+from . import isa
+
+
+@dataclass(frozen=True)
+class Retired:
+    pc: int  # word address of the ISA instruction
+    word: int  # ISA word as fetched
+    uops: Tuple[int, ...]  # micro-op words issued (NOPs included), up to the one that branched
+    taken: bool = False  # the instruction redirected fetch (branch, call, return or trap)
+    next_pc: int = 0
+    trap: Optional[int] = None  # PSTATE cause of a trap (0 for traps that set no cause)
+    # Data accesses: (word address or None if unknown, words, is_store)
+    mem: Tuple[Tuple[Optional[int], int, bool], ...] = ()
+    halted: bool = False
+
+    @property
+    def mem_uops(self) -> int:
+        return sum(1 for u in self.uops if isa.opc_of(u) in isa.MEM_UOPS)
+
+    @property
+    def instret(self) -> int:
+        """Micro-ops the INSTRET counter counts (everything but NOPs)."""
+        return sum(1 for u in self.uops if isa.opc_of(u) != 0)
+
+    @property
+    def mnemonic(self) -> str:
+        return isa.opc_name(isa.opc_of(self.word))
+
+
+_RETIRE = re.compile(r"^retire\s+(\d+)\s+pc=([0-9a-fA-FxXzZ]+)\s+instr=([0-9a-fA-FxXzZ]+)(?:\s+addr=([0-9a-fA-FxXzZ]+))?")
+_TAKEN = re.compile(r"^taken\s+(\d+)\s+pc=([0-9a-fA-FxXzZ]+)\s+target=([0-9a-fA-FxXzZ]+)")
+_PORT = r"([01xXzZ]):([0-9a-fA-FxXzZ]+):([0-9a-fA-FxXzZ]+)"
+_COMMIT = re.compile(r"^commit\s+(\d+)\s+pc=([0-9a-fA-FxXzZ]+)\s+instr=([0-9a-fA-FxXzZ]+)"
+                     rf"\s+gp={_PORT}\s+sr={_PORT}\s+aux={_PORT}")
+_FINAL = re.compile(r"^Final:.*?\bCYCLE=(\d+)\s+INSTRET=(\d+)")
+
+
+def _hex(text: str) -> int:
+    # Unknown bits (x/z) from an uninitialised net read as zero
+    return int(re.sub(r"[xXzZ]", "0", text), 16)
+
+
+def read_rtl_trace(lines: Iterable[str], image: Optional[Iterable[int]] = None) -> Iterator[Retired]:
+    """Rebuild retired instructions from DEBUGRETIRE output.
+
+    Micro-ops share the PC of the ISA word they came from, so consecutive
+    `retire` lines with the same PC form one instruction unless a `taken`
+    line separates them. With the program `image` (word list indexed by
+    address), `word` is the fetched ISA word; otherwise it is the first
+    micro-op.
+    """
+    words = list(image) if image is not None else None
+    cur_pc: Optional[int] = None
+    uops: List[int] = []
+    addrs: List[Optional[int]] = []
+
+    def flush(taken: bool, target: Optional[int]) -> Retired:
+        assert cur_pc is not None
+        word = uops[0]
+        if words is not None and 0 <= (cur_pc & 0xFFF) < len(words):
+            word = words[cur_pc & 0xFFF]
+        mem = []
+        for u, a in zip(uops, addrs):
+            opc = isa.opc_of(u)
+            if opc in isa.MEM_UOPS:
+                mem.append((a, 2 if opc in isa.WIDE_UOPS else 1, opc in isa.STORE_UOPS))
+        last = isa.opc_of(uops[-1])
+        return Retired(
+            cur_pc, word, tuple(uops), taken,
+            target if taken and target is not None else (cur_pc + 1) & isa.MASK48,
+            None, tuple(mem), last == isa.OPC["HLT"],
+        )
+
+    for line in lines:
+        m = _RETIRE.match(line)
+        if m:
+            pc = _hex(m.group(2))
+            if cur_pc is not None and pc != cur_pc:
+                yield flush(False, None)
+                uops, addrs = [], []
+            cur_pc = pc
+            uops.append(_hex(m.group(3)) & isa.MASK24)
+            addrs.append(_hex(m.group(4)) if m.group(4) else None)
+            continue
+        m = _TAKEN.match(line)
+        if m and cur_pc is not None and uops:
+            yield flush(True, _hex(m.group(3)))
+            cur_pc, uops, addrs = None, [], []
+    if cur_pc is not None and uops:
+        yield flush(False, None)
+
+
+Write = Tuple[int, int]  # (register index, value)
+
+
+@dataclass(frozen=True)
+class Commit:
+    tick: int
+    pc: int
+    uop: int
+    gp: Optional[Write] = None
+    sr: Optional[Write] = None
+    sr_aux: Optional[Write] = None  # second SR port (flags, PSTATE side effects); wins over `sr`
+
+
+def read_commits(lines: Iterable[str]) -> Iterator[Commit]:
+    """Micro-ops reaching writeback, in order, from DEBUGCOMMIT output."""
+
+    def port(m: "re.Match[str]", i: int) -> Optional[Write]:
+        return (_hex(m.group(i + 1)), _hex(m.group(i + 2))) if m.group(i) == "1" else None
+
+    for line in lines:
+        m = _COMMIT.match(line)
+        if m:
+            yield Commit(int(m.group(1)), _hex(m.group(2)), _hex(m.group(3)) & isa.MASK24,
+                         port(m, 4), port(m, 7), port(m, 10))
+
+
+def read_counters(lines: Iterable[str]) -> Optional[Tuple[int, int]]:
+    """(CYCLE, INSTRET) from the testbench's `Final:` line, if present."""
+    found = None
+    for line in lines:
+        m = _FINAL.match(line.strip())
+        if m:
+            found = (int(m.group(1)), int(m.group(2)))
+    return found
+
+
+_MAP_LABEL = re.compile(r"^([0-9A-Fa-f]{6})\s+(\S+)\s+\d+\s+\d+\s*/\s*\d+\s*$")
+
+
+def read_map_labels(lines: Iterable[str]) -> Dict[str, int]:
+    """Labels from the `; Labels` section of an assembler `--map` file."""
+    labels: Dict[str, int] = {}
+    in_labels = False
+    for line in lines:
+        if line.startswith(";"):
+            in_labels = line.startswith("; Labels")
+            continue
+        if in_labels:
+            m = _MAP_LABEL.match(line.rstrip())
+            if m:
+                labels[m.group(2)] = int(m.group(1), 16)
+    return labels
@@ -9,5 +9,12 @@ __all__ = [
     "compile_file",
 ]
 
-from .compiler import compile_file  # re-export primary API
 
+def __getattr__(name):
+    # re-export primary API, loaded on first use (see processors.amber.asm)
+    if name != "compile_file":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from .compiler import compile_file
+
+    globals()[name] = compile_file
+    return compile_file
@@ -1,19 +1,34 @@
 import argparse
 from pathlib import Path
 
+from processors.amber.asm.stats import PassStats
+
 from .compiler import compile_file
 
 
-def main() -> None:
+def main(argv=None) -> None:
     p = argparse.ArgumentParser(description="Skald compiler -> Amber assembly")
     p.add_argument("input", type=Path, help="Input Skald file (.skald)")
-    p.add_argument("-o", "--output", type=Path, help="Output assembly file path (.asm)")
+    p.add_argument("-o", "--output", type=Path,
+                   help="Output assembly file path (.asm); with --assemble, written only when given")
     p.add_argument("--assemble", action="store_true", help="Assemble with Amber assembler after codegen")
+    p.add_argument("--via-text", action="store_true",
+                   help="With --assemble: assemble the rendered assembly text instead of the compiler's instructions")
     p.add_argument("--format", choices=["bin", "hex"], default="bin", help="Assembler output format when --assemble is used")
     p.add_argument("--origin", type=int, default=0, help="Assembler origin (word address)")
     p.add_argument("--out-bin", type=Path, help="Assembled output file path (.bin/.hex)")
+    p.add_argument("--lines", type=Path, help="With --assemble: write the address -> source line table here")
+    p.add_argument("--time-passes", action="store_true",
+                   help="Print wall time, peak memory and counters per phase to stderr")
+    p.add_argument("--stats", type=Path, help="Write the per-phase report as JSON to this file")
+
+    args = p.parse_args(argv)
+    if args.lines and not args.assemble:
+        p.error("--lines requires --assemble")
+    if args.via_text and not args.assemble:
+        p.error("--via-text requires --assemble")
 
-    args = p.parse_args()
+    stats = PassStats() if args.time_passes or args.stats else None
 
     res = compile_file(
         args.input,
@@ -22,12 +37,19 @@ def main() -> None:
         fmt=args.format,
         origin=args.origin,
         out_bin=args.out_bin,
+        out_lines=args.lines,
+        stats=stats,
+        via_text=args.via_text,
     )
 
-    if args.assemble and res.bin_path is not None:
+    if args.assemble and res.bin_path is not None and res.asm_path is None:
+        print(f"Compiled and assembled {args.input} -> {res.bin_path}")
+    elif args.assemble and res.bin_path is not None:
         print(f"Compiled {args.input} -> {res.asm_path}; Assembled -> {res.bin_path}")
     else:
         print(f"Compiled {args.input} -> {res.asm_path}")
+    if stats is not None:
+        stats.report(args.time_passes, args.stats)
 
 
 if __name__ == "__main__":
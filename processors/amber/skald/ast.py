@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from typing import List, Optional, Tuple
 
 from .typesys import Type
@@ -151,3 +151,14 @@ class Call(Expr):
 class Cast(Expr):
     target: Type
     expr: Expr
+
+
+def count_nodes(node: Node) -> int:
+    """Nodes in the tree under `node`, itself included."""
+    n = 1
+    for f in fields(node):
+        v = getattr(node, f.name)
+        for child in v if isinstance(v, list) else (v,):
+            if isinstance(child, Node):
+                n += count_nodes(child)
+    return n
@@ -3,6 +3,11 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Dict, List, Optional, Tuple
 
+from processors.amber.asm.items import (
+    LOW, Comment, Cond, Data, File, Func, Imm, Instr, Item, Label, Loc, Operand, Org, Sym, render_lines,
+)
+from processors.amber.asm.items import Reg as AsmReg
+
 from . import ast as A
 from .typesys import U24, S24, ADDR, Type, StructType, AddressType, ArrayType, addr_of
 
@@ -17,9 +22,15 @@ class Reg:
     is_addr: bool
 
 
+_SP = AsmReg("AR0")  # stack pointer
+
+
 class CodeGen:
-    def __init__(self) -> None:
-        self.lines: List[str] = []
+    def __init__(self, source_name: Optional[str] = None) -> None:
+        # Structured assembly (asm/items.py); `gen_lines` renders it as text
+        self.items: List[Item] = []
+        # With a source name, emit .file/.func/.loc line-mapping directives
+        self.source_name = source_name
         self.globals: List[str] = []
         self.sym_regs: Dict[str, Reg] = {}
         self.sym_types: Dict[str, Type] = {}
@@ -43,11 +54,20 @@ class CodeGen:
         # name -> (offset_words, areg)
         self._frame_locals: Dict[str, Tuple[int, Reg]] = {}
 
-    def emit(self, s: str) -> None:
-        self.lines.append(s)
+    def emit(self, item: Item) -> None:
+        self.items.append(item)
+
+    def ins(self, mnemonic: str, *operands: Reg | Operand) -> None:
+        # Instruction in assembly operand order; allocator registers become asm registers
+        self.items.append(Instr(mnemonic, tuple(AsmReg(o.name) if o.__class__ is Reg else o for o in operands)))
 
     def comment(self, s: str) -> None:
-        self.lines.append(f"    ; {s}")
+        self.items.append(Comment(s))
+
+    def loc(self, node: A.Node) -> None:
+        # Code emitted from here on comes from `node`'s source position
+        if self.source_name is not None:
+            self.items.append(Loc(1, node.line, node.col))
 
     def alloc_reg(self, ty: Type, hint: Optional[str] = None) -> Reg:
         if hint is not None:
@@ -61,11 +81,21 @@ class CodeGen:
         return Reg(f"DR{n}", False)
 
     def gen_program(self, prog: A.Program) -> str:
-        self.lines.clear()
+        return "\n".join(self.gen_lines(prog)) + "\n"
+
+    def gen_lines(self, prog: A.Program) -> List[str]:
+        """The assembly lines of `prog` (`gen_program` joins them into the text)."""
+        return render_lines(self.gen_items(prog))
+
+    def gen_items(self, prog: A.Program) -> List[Item]:
+        """`prog` as structured assembly, for `Assembler.assemble_items`."""
+        self.items = []
         self.globals.clear()
         self.fn_sigs.clear()
 
-        self.emit("    .org 0")
+        self.emit(Org(0))
+        if self.source_name is not None:
+            self.emit(File(1, self.source_name))
 
         # Globals: emit storage as .dw24 (u24/s24) or two words for addr (placeholder)
         for d in prog.decls:
@@ -87,13 +117,13 @@ class CodeGen:
                 self.gen_func(d)
 
         # Emit a small zeroed stack region for examples and initialize SP to its top in 'main'
-        self.emit("    ; --- Skald demo stack region ---")
-        self.emit("__skald_stack_area:")
+        self.comment("--- Skald demo stack region ---")
+        self.emit(Label("__skald_stack_area"))
         for _ in range(64):  # 64 words (~192 bytes)
-            self.emit("    .dw24 #0")
-        self.emit("__skald_stack_top:")
+            self.emit(Data((Imm(0),)))
+        self.emit(Label("__skald_stack_top"))
 
-        return "\n".join(self.lines) + "\n"
+        return self.items
 
     def gen_global(self, v: A.VarDecl) -> None:
         label = v.name
@@ -102,21 +132,21 @@ class CodeGen:
             raise CodegenError("global struct variables are not supported yet")
         if v.ty.is_addr:
             # Reserve two 24-bit words for a 48-bit value (low then high)
-            self.emit(f"{label}:")
+            self.emit(Label(label))
             lo = 0
             hi = 0
             if isinstance(v.init, A.IntLiteral):
                 val = v.init.value & ((1 << 48) - 1)
                 lo = val & 0xFFFFFF
                 hi = (val >> 24) & 0xFFFFFF
-            self.emit(f"    .dw24 #{lo}")
-            self.emit(f"    .dw24 #{hi}")
+            self.emit(Data((Imm(lo),)))
+            self.emit(Data((Imm(hi),)))
         else:
             val = 0
             if isinstance(v.init, A.IntLiteral):
                 val = v.init.value & 0xFFFFFF
-            self.emit(f"{label}:")
-            self.emit(f"    .dw24 #{val}")
+            self.emit(Label(label))
+            self.emit(Data((Imm(val),)))
 
     def gen_func(self, f: A.FuncDecl) -> None:
         # Reset simple allocator per function
@@ -127,9 +157,12 @@ class CodeGen:
         self._frame_words = 0
         self._frame_locals.clear()
 
-        self.emit(f"{f.name}:")
+        self.emit(Label(f.name))
+        if self.source_name is not None:
+            self.emit(Func(f.name))
+        self.loc(f)
         # Record insertion point for prologue and bases
-        self._func_start_idx = len(self.lines)
+        self._func_start_idx = len(self.items)
         self.comment("prologue (callee-saved)")
         # Initialize SP in 'main' before any pushes
         self._init_sp_in_prologue = (f.name == "main")
@@ -194,6 +227,7 @@ class CodeGen:
         prev_ret_reg, prev_ret_ty = self._cur_ret_reg, self._cur_ret_ty
         self._cur_ret_reg, self._cur_ret_ty = ret_reg, f.ret_ty
         for s in f.body:
+            self.loc(s)
             if isinstance(s, A.VarDecl):
                 self.gen_local_let(s)
             elif isinstance(s, A.Return):
@@ -215,8 +249,8 @@ class CodeGen:
 
         # If no explicit return and function returns nothing, fall-through
         if f.ret_ty is None:
-            self.emit("    RET")
-            self._ret_indices.append(len(self.lines) - 1)
+            self.ins("RET")
+            self._ret_indices.append(len(self.items) - 1)
 
         # Restore previous return context
         self._cur_ret_reg, self._cur_ret_ty = prev_ret_reg, prev_ret_ty
@@ -263,13 +297,13 @@ class CodeGen:
             scaled = idx
         else:
             scaled = self.alloc_reg(U24)
-            self.emit(f"    MOVui #0, {scaled.name}")
+            self.ins("MOVui", Imm(0), scaled)
             for _ in range(aty.elem_words):
-                self.emit(f"    ADDUR {idx.name}, {scaled.name}")
+                self.ins("ADDUR", idx, scaled)
         # Compute address: dst = base + scaled
         dst = self.alloc_reg(addr_of(aty.elem))
-        self.emit(f"    LEASO {base.name}, #0, {dst.name}")
-        self.emit(f"    ADDAUR {scaled.name}, {dst.name}")
+        self.ins("LEASO", base, Imm(0), dst)
+        self.ins("ADDAUR", scaled, dst)
         return dst
 
     def gen_local_let(self, v: A.VarDecl) -> None:
@@ -333,7 +367,7 @@ class CodeGen:
                     m = "ADDASR" if rhs_ty.is_signed else "ADDAUR"
                 else:
                     m = "SUBASR" if rhs_ty.is_signed else "SUBAUR"
-                self.emit(f"    {m} {rhs_reg.name}, {dst.name}")
+                self.ins(m, rhs_reg, dst)
                 return
             # Evaluate RHS with appropriate expected type
             if op in ("<<=", ">>=", "<<<=", ">>>="):
@@ -343,27 +377,27 @@ class CodeGen:
             # Apply op in-place to dst
             if op == "+=":
                 m = "ADDSR" if ty.is_signed else "ADDUR"
-                self.emit(f"    {m} {rhs.name}, {dst.name}")
+                self.ins(m, rhs, dst)
             elif op == "-=":
                 m = "SUBSR" if ty.is_signed else "SUBUR"
-                self.emit(f"    {m} {rhs.name}, {dst.name}")
+                self.ins(m, rhs, dst)
             elif op == "&=":
-                self.emit(f"    ANDUR {rhs.name}, {dst.name}")
+                self.ins("ANDUR", rhs, dst)
             elif op == "|=":
-                self.emit(f"    ORUR {rhs.name}, {dst.name}")
+                self.ins("ORUR", rhs, dst)
             elif op == "^=":
-                self.emit(f"    XORUR {rhs.name}, {dst.name}")
+                self.ins("XORUR", rhs, dst)
             elif op == "<<=":
-                self.emit(f"    SHLUR {rhs.name}, {dst.name}")
+                self.ins("SHLUR", rhs, dst)
             elif op == ">>=":
                 m = "SHRSR" if ty.is_signed else "SHRUR"
-                self.emit(f"    {m} {rhs.name}, {dst.name}")
+                self.ins(m, rhs, dst)
             elif op == "<<<=":
                 # rotate left
-                self.emit(f"    ROLUR {rhs.name}, {dst.name}")
+                self.ins("ROLUR", rhs, dst)
             elif op == ">>>=":
                 # rotate right
-                self.emit(f"    RORUR {rhs.name}, {dst.name}")
+                self.ins("RORUR", rhs, dst)
             else:
                 raise CodegenError(f"unsupported compound operator '{op}'")
             return
@@ -385,15 +419,15 @@ class CodeGen:
             if op == "=":
                 src = self.gen_eval_expr(a.value, elem_ty)
                 if elem_ty.is_addr:
-                    self.emit(f"    STASO {src.name}, #0, {addr.name}")
+                    self.ins("STASO", src, Imm(0), addr)
                 else:
-                    self.emit(f"    STSO {src.name}, #0, {addr.name}")
+                    self.ins("STSO", src, Imm(0), addr)
                 return
             if elem_ty.is_addr:
                 if op not in ("+=", "-="):
                     raise CodegenError("only '+=' and '-=' supported for addr elements")
                 tmp = self.alloc_reg(ADDR)
-                self.emit(f"    LDASO #0, {addr.name}, {tmp.name}")
+                self.ins("LDASO", Imm(0), addr, tmp)
                 rhs_ty: Optional[Type] = None
                 if isinstance(a.value, A.NameRef):
                     nm = a.value.ident
@@ -412,45 +446,45 @@ class CodeGen:
                     m = "ADDASR" if rhs_ty.is_signed else "ADDAUR"
                 else:
                     m = "SUBASR" if rhs_ty.is_signed else "SUBAUR"
-                self.emit(f"    {m} {rhs_reg.name}, {tmp.name}")
-                self.emit(f"    STASO {tmp.name}, #0, {addr.name}")
+                self.ins(m, rhs_reg, tmp)
+                self.ins("STASO", tmp, Imm(0), addr)
                 return
             # Data element compound ops
             cur = self.alloc_reg(elem_ty)
-            self.emit(f"    LDSO #0, {addr.name}, {cur.name}")
+            self.ins("LDSO", Imm(0), addr, cur)
             if op == "+=":
                 rhs = self.gen_eval_expr(a.value, elem_ty)
                 m = "ADDSR" if elem_ty.is_signed else "ADDUR"
-                self.emit(f"    {m} {rhs.name}, {cur.name}")
+                self.ins(m, rhs, cur)
             elif op == "-=":
                 rhs = self.gen_eval_expr(a.value, elem_ty)
                 m = "SUBSR" if elem_ty.is_signed else "SUBUR"
-                self.emit(f"    {m} {rhs.name}, {cur.name}")
+                self.ins(m, rhs, cur)
             elif op == "&=":
                 rhs = self.gen_eval_expr(a.value, elem_ty)
-                self.emit(f"    ANDUR {rhs.name}, {cur.name}")
+                self.ins("ANDUR", rhs, cur)
             elif op == "|=":
                 rhs = self.gen_eval_expr(a.value, elem_ty)
-                self.emit(f"    ORUR {rhs.name}, {cur.name}")
+                self.ins("ORUR", rhs, cur)
             elif op == "^=":
                 rhs = self.gen_eval_expr(a.value, elem_ty)
-                self.emit(f"    XORUR {rhs.name}, {cur.name}")
+                self.ins("XORUR", rhs, cur)
             elif op == "<<=":
                 rhs = self.gen_eval_data_any(a.value)
-                self.emit(f"    SHLUR {rhs.name}, {cur.name}")
+                self.ins("SHLUR", rhs, cur)
             elif op == ">>=":
                 rhs = self.gen_eval_data_any(a.value)
                 m = "SHRSR" if elem_ty.is_signed else "SHRUR"
-                self.emit(f"    {m} {rhs.name}, {cur.name}")
+                self.ins(m, rhs, cur)
             elif op == "<<<=":
                 rhs = self.gen_eval_data_any(a.value)
-                self.emit(f"    ROLUR {rhs.name}, {cur.name}")
+                self.ins("ROLUR", rhs, cur)
             elif op == ">>>=":
                 rhs = self.gen_eval_data_any(a.value)
-                self.emit(f"    RORUR {rhs.name}, {cur.name}")
+                self.ins("RORUR", rhs, cur)
             else:
                 raise CodegenError(f"unsupported compound operator '{op}' for array element")
-            self.emit(f"    STSO {cur.name}, #0, {addr.name}")
+            self.ins("STSO", cur, Imm(0), addr)
             return
         elif isinstance(a.target, A.FieldAccess):
             # Resolve base variable and struct layout
@@ -491,9 +525,9 @@ class CodeGen:
                 src = self.gen_eval_expr(a.value, field_ty)
                 if field_ty.is_addr:
                     # store AR src -> #off(AREG)
-                    self.emit(f"    STASO {src.name}, #{field_off}, {areg.name}")
+                    self.ins("STASO", src, Imm(field_off), areg)
                 else:
-                    self.emit(f"    STSO {src.name}, #{field_off}, {areg.name}")
+                    self.ins("STSO", src, Imm(field_off), areg)
                 return
             # Compound assignment: load field, apply, store back
             if field_ty.is_addr:
@@ -501,7 +535,7 @@ class CodeGen:
                     raise CodegenError("only '+=' and '-=' supported for addr fields")
                 # Load current field value into AR temp
                 tmp = self.alloc_reg(ADDR)
-                self.emit(f"    LDASO #{field_off}, {areg.name}, {tmp.name}")
+                self.ins("LDASO", Imm(field_off), areg, tmp)
                 # Determine rhs type
                 rhs_ty: Optional[Type] = None
                 if isinstance(a.value, A.NameRef):
@@ -521,47 +555,47 @@ class CodeGen:
                     m = "ADDASR" if rhs_ty.is_signed else "ADDAUR"
                 else:
                     m = "SUBASR" if rhs_ty.is_signed else "SUBAUR"
-                self.emit(f"    {m} {rhs_reg.name}, {tmp.name}")
-                self.emit(f"    STASO {tmp.name}, #{field_off}, {areg.name}")
+                self.ins(m, rhs_reg, tmp)
+                self.ins("STASO", tmp, Imm(field_off), areg)
                 return
             # Data field compound ops
             # Load field into DR temp (signedness of load doesn't matter for raw value)
             cur = self.alloc_reg(field_ty)
-            self.emit(f"    LDSO #{field_off}, {areg.name}, {cur.name}")
+            self.ins("LDSO", Imm(field_off), areg, cur)
             if op == "+=":
                 rhs = self.gen_eval_expr(a.value, field_ty)
                 m = "ADDSR" if field_ty.is_signed else "ADDUR"
-                self.emit(f"    {m} {rhs.name}, {cur.name}")
+                self.ins(m, rhs, cur)
             elif op == "-=":
                 rhs = self.gen_eval_expr(a.value, field_ty)
                 m = "SUBSR" if field_ty.is_signed else "SUBUR"
-                self.emit(f"    {m} {rhs.name}, {cur.name}")
+                self.ins(m, rhs, cur)
             elif op == "&=":
                 rhs = self.gen_eval_expr(a.value, field_ty)
-                self.emit(f"    ANDUR {rhs.name}, {cur.name}")
+                self.ins("ANDUR", rhs, cur)
             elif op == "|=":
                 rhs = self.gen_eval_expr(a.value, field_ty)
-                self.emit(f"    ORUR {rhs.name}, {cur.name}")
+                self.ins("ORUR", rhs, cur)
             elif op == "^=":
                 rhs = self.gen_eval_expr(a.value, field_ty)
-                self.emit(f"    XORUR {rhs.name}, {cur.name}")
+                self.ins("XORUR", rhs, cur)
             elif op == "<<=":
                 rhs = self.gen_eval_data_any(a.value)
-                self.emit(f"    SHLUR {rhs.name}, {cur.name}")
+                self.ins("SHLUR", rhs, cur)
             elif op == ">>=":
                 rhs = self.gen_eval_data_any(a.value)
                 m = "SHRSR" if field_ty.is_signed else "SHRUR"
-                self.emit(f"    {m} {rhs.name}, {cur.name}")
+                self.ins(m, rhs, cur)
             elif op == "<<<=":
                 rhs = self.gen_eval_data_any(a.value)
-                self.emit(f"    ROLUR {rhs.name}, {cur.name}")
+                self.ins("ROLUR", rhs, cur)
             elif op == ">>>=":
                 rhs = self.gen_eval_data_any(a.value)
-                self.emit(f"    RORUR {rhs.name}, {cur.name}")
+                self.ins("RORUR", rhs, cur)
             else:
                 raise CodegenError(f"unsupported compound operator '{op}' for field")
             # Store back updated value
-            self.emit(f"    STSO {cur.name}, #{field_off}, {areg.name}")
+            self.ins("STSO", cur, Imm(field_off), areg)
             return
         else:
             raise CodegenError("unsupported assignment target kind")
@@ -593,7 +627,7 @@ class CodeGen:
                 m = "ADDASR" if rhs_ty.is_signed else "ADDAUR"
             else:
                 m = "SUBASR" if rhs_ty.is_signed else "SUBAUR"
-            self.emit(f"    {m} {rhs_reg.name}, {dst.name}")
+            self.ins(m, rhs_reg, dst)
             return
         # Evaluate RHS with appropriate expected type
         if op in ("<<=", ">>=", "<<<=", ">>>="):
@@ -603,27 +637,27 @@ class CodeGen:
         # Apply op in-place to dst
         if op == "+=":
             m = "ADDSR" if ty.is_signed else "ADDUR"
-            self.emit(f"    {m} {rhs.name}, {dst.name}")
+            self.ins(m, rhs, dst)
         elif op == "-=":
             m = "SUBSR" if ty.is_signed else "SUBUR"
-            self.emit(f"    {m} {rhs.name}, {dst.name}")
+            self.ins(m, rhs, dst)
         elif op == "&=":
-            self.emit(f"    ANDUR {rhs.name}, {dst.name}")
+            self.ins("ANDUR", rhs, dst)
         elif op == "|=":
-            self.emit(f"    ORUR {rhs.name}, {dst.name}")
+            self.ins("ORUR", rhs, dst)
         elif op == "^=":
-            self.emit(f"    XORUR {rhs.name}, {dst.name}")
+            self.ins("XORUR", rhs, dst)
         elif op == "<<=":
-            self.emit(f"    SHLUR {rhs.name}, {dst.name}")
+            self.ins("SHLUR", rhs, dst)
         elif op == ">>=":
             m = "SHRSR" if ty.is_signed else "SHRUR"
-            self.emit(f"    {m} {rhs.name}, {dst.name}")
+            self.ins(m, rhs, dst)
         elif op == "<<<=":
             # rotate left
-            self.emit(f"    ROLUR {rhs.name}, {dst.name}")
+            self.ins("ROLUR", rhs, dst)
         elif op == ">>>=":
             # rotate right
-            self.emit(f"    RORUR {rhs.name}, {dst.name}")
+            self.ins("RORUR", rhs, dst)
         else:
             raise CodegenError(f"unsupported compound operator '{op}'")
 
@@ -642,15 +676,16 @@ class CodeGen:
         # Evaluate condition as data (u24). 'addr' not allowed.
         cond = self.gen_eval_data_any(node.cond)
         # Test condition (updates flags). Zero => EQ
-        self.emit(f"    TSTUR {cond.name}")
+        self.ins("TSTUR", cond)
         has_else = node.else_body is not None and len(node.else_body) > 0
         lbl_else = self._new_label("else") if has_else else None
         lbl_end = self._new_label("endif")
         # If zero, branch to else (or end if no else)
         target = lbl_else if has_else else lbl_end
-        self.emit(f"    BCCso EQ, {target}")
+        self.ins("BCCso", Cond("EQ"), Sym(target))
         # then block
         for s in node.then_body:
+            self.loc(s)
             if isinstance(s, A.VarDecl):
                 self.gen_local_let(s)
             elif isinstance(s, A.Return):
@@ -671,11 +706,12 @@ class CodeGen:
                 raise CodegenError("unsupported statement in if-body")
         # after then, jump to end if we have else
         if has_else:
-            self.emit(f"    BALso {lbl_end}")
+            self.ins("BALso", Sym(lbl_end))
         # else label/body
         if has_else and lbl_else is not None:
-            self.emit(f"{lbl_else}:")
+            self.emit(Label(lbl_else))
             for s in node.else_body or []:
+                self.loc(s)
                 if isinstance(s, A.VarDecl):
                     self.gen_local_let(s)
                 elif isinstance(s, A.Return):
@@ -695,22 +731,23 @@ class CodeGen:
                 else:
                     raise CodegenError("unsupported statement in else-body")
         # end label
-        self.emit(f"{lbl_end}:")
+        self.emit(Label(lbl_end))
 
     def gen_while(self, node: A.While) -> None:
         # while (cond) { body }
         lbl_begin = self._new_label("while")
         lbl_end = self._new_label("endwhile")
         # begin label
-        self.emit(f"{lbl_begin}:")
+        self.emit(Label(lbl_begin))
         # push loop context
         self._loop_stack.append((lbl_begin, lbl_end))
         # Evaluate condition as data; zero => false => branch to end
         cond = self.gen_eval_data_any(node.cond)
-        self.emit(f"    TSTUR {cond.name}")
-        self.emit(f"    BCCso EQ, {lbl_end}")
+        self.ins("TSTUR", cond)
+        self.ins("BCCso", Cond("EQ"), Sym(lbl_end))
         # body
         for s in node.body:
+            self.loc(s)
             if isinstance(s, A.VarDecl):
                 self.gen_local_let(s)
             elif isinstance(s, A.Return):
@@ -730,9 +767,10 @@ class CodeGen:
             else:
                 raise CodegenError("unsupported statement in while-body")
         # jump back to begin
-        self.emit(f"    BALso {lbl_begin}")
+        self.loc(node)
+        self.ins("BALso", Sym(lbl_begin))
         # end label
-        self.emit(f"{lbl_end}:")
+        self.emit(Label(lbl_end))
         # pop loop context
         self._loop_stack.pop()
 
@@ -740,18 +778,18 @@ class CodeGen:
         if not self._loop_stack:
             raise CodegenError("'break' used outside of loop")
         _, end_label = self._loop_stack[-1]
-        self.emit(f"    BALso {end_label}")
+        self.ins("BALso", Sym(end_label))
 
     def gen_continue(self, node: A.Continue) -> None:
         if not self._loop_stack:
             raise CodegenError("'continue' used outside of loop")
         begin_label, _ = self._loop_stack[-1]
-        self.emit(f"    BALso {begin_label}")
+        self.ins("BALso", Sym(begin_label))
 
     def gen_return(self, r: A.Return, ret_reg: Optional[Reg], ret_ty: Optional[Type]) -> None:
         if ret_ty is None:
-            self.emit("    RET")
-            self._ret_indices.append(len(self.lines) - 1)
+            self.ins("RET")
+            self._ret_indices.append(len(self.items) - 1)
             return
         if r.value is None:
             raise CodegenError("return requires a value for non-void function")
@@ -760,16 +798,16 @@ class CodeGen:
         tmp = self.gen_eval_expr(r.value, ret_ty)
         if tmp.name != ret_reg.name:
             if ret_reg.is_addr and not tmp.is_addr:
-                self.emit(f"    MOVAur {tmp.name}, {ret_reg.name}, L")
+                self.ins("MOVAur", tmp, ret_reg, LOW)
             elif (not ret_reg.is_addr) and tmp.is_addr:
-                self.emit(f"    MOVDur {tmp.name}, {ret_reg.name}, L")
+                self.ins("MOVDur", tmp, ret_reg, LOW)
             elif ret_reg.is_addr and tmp.is_addr:
-                self.emit(f"    LEASO {tmp.name}, #0, {ret_reg.name}")
+                self.ins("LEASO", tmp, Imm(0), ret_reg)
             else:
-                self.emit(f"    MOVur {tmp.name}, {ret_reg.name}")
+                self.ins("MOVur", tmp, ret_reg)
         # RET; epilogue will be inserted later
-        self.emit("    RET")
-        self._ret_indices.append(len(self.lines) - 1)
+        self.ins("RET")
+        self._ret_indices.append(len(self.items) - 1)
 
     # --- Expression helpers -------------------------------------------------
     def gen_store_expr_into(self, e: A.Expr, ty: Type, dst: Reg) -> Reg:
@@ -777,15 +815,15 @@ class CodeGen:
         if src.name == dst.name:
             return dst
         if dst.is_addr and not src.is_addr:
-            self.emit(f"    MOVAur {src.name}, {dst.name}, L")
+            self.ins("MOVAur", src, dst, LOW)
             return dst
         if (not dst.is_addr) and src.is_addr:
-            self.emit(f"    MOVDur {src.name}, {dst.name}, L")
+            self.ins("MOVDur", src, dst, LOW)
             return dst
         if dst.is_addr and src.is_addr:
-            self.emit(f"    LEASO {src.name}, #0, {dst.name}")
+            self.ins("LEASO", src, Imm(0), dst)
         else:
-            self.emit(f"    MOVur {src.name}, {dst.name}")
+            self.ins("MOVur", src, dst)
         return dst
 
     def gen_eval_expr(self, e: A.Expr, ty: Type) -> Reg:
@@ -795,7 +833,7 @@ class CodeGen:
                 raise CodegenError("integer literal not allowed in address context")
             dr = self.alloc_reg(S24 if ty.is_signed else U24)
             imm = e.value & 0xFFF  # skeleton: 12-bit immediates only for now
-            self.emit(f"    MOVui #{imm}, {dr.name}")
+            self.ins("MOVui", Imm(imm), dr)
             return dr
         if isinstance(e, A.NameRef):
             if e.ident not in self.sym_regs:
@@ -849,9 +887,9 @@ class CodeGen:
                 raise CodegenError("cannot use struct array element directly; access fields")
             dst = self.alloc_reg(elem_ty)
             if elem_ty.is_addr:
-                self.emit(f"    LDASO #0, {addr.name}, {dst.name}")
+                self.ins("LDASO", Imm(0), addr, dst)
             else:
-                self.emit(f"    LDSO #0, {addr.name}, {dst.name}")
+                self.ins("LDSO", Imm(0), addr, dst)
             return dst
         if isinstance(e, A.Unary):
             if e.op != "~":
@@ -861,8 +899,8 @@ class CodeGen:
             # If inner is not a fresh temp, clone to a new dest before in-place NOT to avoid clobbering
             dst = self.alloc_reg(ty)
             if inner.name != dst.name:
-                self.emit(f"    MOVur {inner.name}, {dst.name}")
-            self.emit(f"    NOTUR {dst.name}")
+                self.ins("MOVur", inner, dst)
+            self.ins("NOTUR", dst)
             return dst
         if isinstance(e, A.Binary):
             # Relational/equality
@@ -874,10 +912,10 @@ class CodeGen:
                 rhsr = self.gen_eval_expr(e.rhs, comp_ty)
                 cmpm = "CMPSR" if comp_ty.is_signed else "CMPUR"
                 # Compare lhs ? rhs (flags reflect lhs - rhs)
-                self.emit(f"    {cmpm} {rhsr.name}, {lhsr.name}")
+                self.ins(cmpm, rhsr, lhsr)
                 # dst := 0; if cond then dst := 1
                 dst = self.alloc_reg(ty)
-                self.emit(f"    MOVui #0, {dst.name}")
+                self.ins("MOVui", Imm(0), dst)
                 if e.op == "==":
                     cc = "EQ"
                 elif e.op == "!=":
@@ -892,12 +930,12 @@ class CodeGen:
                     cc = "GE" if comp_ty.is_signed else "AE"
                 else:
                     cc = "EQ"
-                self.emit(f"    MCCsi {cc}, #1, {dst.name}")
+                self.ins("MCCsi", Cond(cc), Imm(1), dst)
                 return dst
             lhs = self.gen_eval_expr(e.lhs, ty)
             dst = self.alloc_reg(ty)
             if lhs.name != dst.name:
-                self.emit(f"    MOVur {lhs.name}, {dst.name}")
+                self.ins("MOVur", lhs, dst)
             # Determine opcode by operator and type
             if e.op in ("+", "-"):
                 rhs = self.gen_eval_expr(e.rhs, ty)
@@ -905,21 +943,21 @@ class CodeGen:
                     op = "ADDSR" if e.op == "+" else "SUBSR"
                 else:
                     op = "ADDUR" if e.op == "+" else "SUBUR"
-                self.emit(f"    {op} {rhs.name}, {dst.name}")
+                self.ins(op, rhs, dst)
                 return dst
             if e.op in ("&", "|", "^"):
                 rhs = self.gen_eval_expr(e.rhs, ty)
                 opm = {"&": "ANDUR", "|": "ORUR", "^": "XORUR"}
-                self.emit(f"    {opm[e.op]} {rhs.name}, {dst.name}")
+                self.ins(opm[e.op], rhs, dst)
                 return dst
             if e.op in ("<<", ">>"):
                 # shift amount is data (u24/s24 ok); destination’s signedness controls SHR vs SHRs
                 rhs = self.gen_eval_data_any(e.rhs)
                 if e.op == "<<":
-                    self.emit(f"    SHLUR {rhs.name}, {dst.name}")
+                    self.ins("SHLUR", rhs, dst)
                 else:
                     m = "SHRSR" if ty.is_signed else "SHRUR"
-                    self.emit(f"    {m} {rhs.name}, {dst.name}")
+                    self.ins(m, rhs, dst)
                 return dst
             raise CodegenError("unsupported binary operator")
         if isinstance(e, A.Cast):
@@ -971,7 +1009,7 @@ class CodeGen:
                 if not isinstance(ty, AddressType) or ty.pointee != field_ty:
                     raise CodegenError("type mismatch: get_addr expected addr<field_type>")
                 dst = self.alloc_reg(ty)
-                self.emit(f"    LEASO {areg.name}, #{field_off}, {dst.name}")
+                self.ins("LEASO", areg, Imm(field_off), dst)
                 return dst
             elif isinstance(targ, A.NameRef):
                 # Disallow taking address of scalar locals (register-backed)
@@ -1037,9 +1075,9 @@ class CodeGen:
             # Now load from [ar] into reg of elem_ty
             dst = self.alloc_reg(elem_ty)
             if elem_ty.is_addr:
-                self.emit(f"    LDASO #0, {ar.name}, {dst.name}")
+                self.ins("LDASO", Imm(0), ar, dst)
             else:
-                self.emit(f"    LDSO #0, {ar.name}, {dst.name}")
+                self.ins("LDSO", Imm(0), ar, dst)
             # Enforce expected type compatibility
             if ty.is_addr != elem_ty.is_addr:
                 raise CodegenError("type mismatch in get_content result")
@@ -1091,9 +1129,9 @@ class CodeGen:
             # Load value into temp of the field's type
             dst = self.alloc_reg(field_ty)
             if field_ty.is_addr:
-                self.emit(f"    LDASO #{field_off}, {areg.name}, {dst.name}")
+                self.ins("LDASO", Imm(field_off), areg, dst)
             else:
-                self.emit(f"    LDSO #{field_off}, {areg.name}, {dst.name}")
+                self.ins("LDSO", Imm(field_off), areg, dst)
             return dst
         raise CodegenError("unsupported expression form")
 
@@ -1111,7 +1149,7 @@ class CodeGen:
         if isinstance(e, A.IntLiteral):
             dr = self.alloc_reg(U24)
             imm = e.value & 0xFFF
-            self.emit(f"    MOVui #{imm}, {dr.name}")
+            self.ins("MOVui", Imm(imm), dr)
             return dr
         if isinstance(e, A.ArrayIndex):
             if not isinstance(e.base, A.NameRef):
@@ -1329,15 +1367,15 @@ class CodeGen:
                 next_dr += 1
             # Move if needed with proper move op
             if treg.is_addr and not src.is_addr:
-                self.emit(f"    MOVAur {src.name}, {treg.name}, L")
+                self.ins("MOVAur", src, treg, LOW)
             elif (not treg.is_addr) and src.is_addr:
-                self.emit(f"    MOVDur {src.name}, {treg.name}, L")
+                self.ins("MOVDur", src, treg, LOW)
             elif treg.is_addr and src.is_addr and src.name != treg.name:
-                self.emit(f"    LEASO {src.name}, #0, {treg.name}")
+                self.ins("LEASO", src, Imm(0), treg)
             elif src.name != treg.name:
-                self.emit(f"    MOVur {src.name}, {treg.name}")
+                self.ins("MOVur", src, treg)
         # Emit call (PC-relative to label)
-        self.emit(f"    BSRso {c.callee}")
+        self.ins("BSRso", Sym(c.callee))
         # Handle return value
         if ret_ty is None:
             if expect_value:
@@ -1355,25 +1393,25 @@ class CodeGen:
     # --- Prologue/Epilogue insertion ---------------------------------------
     def _insert_prologue(self) -> None:
         # Build prologue push sequence for locals/temps
-        pro: List[str] = []
+        pro: List[Item] = []
         if self._init_sp_in_prologue:
-            pro.append("    ADRAso #__skald_stack_top, AR0")
+            pro.append(Instr("ADRAso", (Imm(Sym("__skald_stack_top")), _SP)))
         # Save address registers (AR1..)
         for idx in range(self._ar_base, self.next_ar):
-            pro.append(f"    PUSHAur AR{idx}, AR0")
+            pro.append(Instr("PUSHAur", (AsmReg(f"AR{idx}"), _SP)))
         # Save data registers (DR1..), but only those allocated for locals/temps
         for idx in range(self._dr_base, self.next_dr):
-            pro.append(f"    PUSHur DR{idx}, AR0")
+            pro.append(Instr("PUSHur", (AsmReg(f"DR{idx}"), _SP)))
         # Allocate stack frame for struct locals, then compute each base pointer
         if self._frame_words > 0:
-            pro.append(f"    SUBASI #{self._frame_words}, AR0")
+            pro.append(Instr("SUBASI", (Imm(self._frame_words), _SP)))
             # Initialize base pointers
             for name, (off, reg) in self._frame_locals.items():
-                pro.append(f"    LEASO AR0, #{off}, {reg.name}")
+                pro.append(Instr("LEASO", (_SP, Imm(off), AsmReg(reg.name))))
         # Insert after the prologue comment line (at _func_start_idx)
         insert_at = self._func_start_idx
         # Replace the comment with itself plus prologue lines for clarity
-        self.lines = self.lines[: insert_at + 1] + pro + self.lines[insert_at + 1 :]
+        self.items[insert_at + 1 : insert_at + 1] = pro
         # Adjust recorded RET indices due to insertion
         added = len(pro)
         if added > 0:
@@ -1381,17 +1419,17 @@ class CodeGen:
 
     def _insert_all_epilogues(self) -> None:
         # Build epilogue pop sequence based on final allocation
-        epi: List[str] = []
+        epi: List[Item] = []
         # Free stack frame for struct locals (before popping saved regs)
         if self._frame_words > 0:
-            epi.append(f"    ADDASI #{self._frame_words}, AR0")
+            epi.append(Instr("ADDASI", (Imm(self._frame_words), _SP)))
         for idx in range(self.next_dr - 1, self._dr_base - 1, -1):
-            epi.append(f"    POPur AR0, DR{idx}")
+            epi.append(Instr("POPur", (_SP, AsmReg(f"DR{idx}"))))
         for idx in range(self.next_ar - 1, self._ar_base - 1, -1):
-            epi.append(f"    POPAur AR0, AR{idx}")
+            epi.append(Instr("POPAur", (_SP, AsmReg(f"AR{idx}"))))
         if not epi:
             return
         # Insert before each RET, from last to first to keep indices valid
         for pos in sorted(self._ret_indices, reverse=True):
-            self.lines = self.lines[:pos] + epi + self.lines[pos:]
+            self.items[pos:pos] = epi
         # No need to track adjustments after finalization
@@ -2,47 +2,90 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
+from processors.amber.asm.items import Item, render_lines
+from processors.amber.asm.stats import PassStats, timed
+
+from .ast import count_nodes
+from .lexer import Lexer
 from .parser import parse, ParseError
 from .codegen import CodeGen, CodegenError
 
 
 @dataclass
 class CompileResult:
-    asm_text: str
+    asm_text: Optional[str]  # None when assembled directly without an .asm dump
     asm_path: Optional[Path]
     bin_path: Optional[Path]
+    lines_path: Optional[Path] = None
+
+
+def compile_items(src: str, source_name: Optional[str] = None, stats: Optional[PassStats] = None) -> List[Item]:
+    """Compile Skald source to structured assembly (`asm/items.py`) for `Assembler.assemble_items`.
+
+    `stats` records the lex, parse and codegen phases.
+    """
+    with timed(stats, "lex") as ph:
+        tokens = Lexer(src).tokens()
+        ph.counts["tokens"] = len(tokens)
+    with timed(stats, "parse") as ph:
+        prog = parse(src, tokens)
+        if stats is not None:
+            ph.counts["ast_nodes"] = count_nodes(prog)
+    with timed(stats, "codegen") as ph:
+        items = CodeGen(source_name).gen_items(prog)
+        ph.counts["ir_items"] = len(items)
+    return items
+
 
+def _render(items: List[Item], stats: Optional[PassStats]) -> str:
+    with timed(stats, "emit") as ph:
+        text = "\n".join(render_lines(items)) + "\n"
+        ph.counts["bytes"] = len(text)
+    return text
 
-def compile_text(src: str) -> str:
-    prog = parse(src)
-    cg = CodeGen()
-    return cg.gen_program(prog)
 
+def compile_text(src: str, source_name: Optional[str] = None, stats: Optional[PassStats] = None) -> str:
+    """Compile Skald source to assembly; `source_name` adds .file/.func/.loc line mapping.
 
-def compile_file(path: Path, *, out_asm: Optional[Path] = None, assemble: bool = False, fmt: str = "bin", origin: int = 0, out_bin: Optional[Path] = None) -> CompileResult:
+    `stats` records the lex, parse, codegen and emit phases.
+    """
+    return _render(compile_items(src, source_name, stats), stats)
+
+
+def compile_file(path: Path, *, out_asm: Optional[Path] = None, assemble: bool = False, fmt: str = "bin", origin: int = 0, out_bin: Optional[Path] = None, out_lines: Optional[Path] = None, stats: Optional[PassStats] = None, via_text: bool = False) -> CompileResult:
+    """Compile `path`; with `assemble`, also write the image (and `out_lines`).
+
+    Without `assemble` the assembly goes to `out_asm` (default: next to the
+    source). With it, the compiler's instructions are encoded directly and the
+    assembly is only written when `out_asm` is given; `via_text` assembles the
+    rendered text instead (same words, slower; for cross-checking).
+    """
     src = path.read_text(encoding="utf-8")
-    asm_text = compile_text(src)
-    if out_asm is None:
+    items = compile_items(src, path.name, stats)
+    asm_text: Optional[str] = None
+    if not assemble and out_asm is None:
         out_asm = path.with_suffix(".asm")
-    out_asm.write_text(asm_text, encoding="utf-8")
+    if out_asm is not None or via_text:
+        asm_text = _render(items, stats)
+        if out_asm is not None:
+            out_asm.write_text(asm_text, encoding="utf-8")
 
     bin_path: Optional[Path] = None
     if assemble:
+        from processors.amber.asm import image
         from processors.amber.asm.assembler import Assembler
 
-        asm = Assembler(origin=origin)
-        words = asm.assemble(asm_text)
-        if fmt == "bin":
-            data = asm.pack_words_bin(words)
-            suffix = ".bin"
-        else:
-            data = asm.pack_words_hex(words).encode("utf-8")
-            suffix = ".hex"
+        asm = Assembler(origin=origin, stats=stats)
+        words = asm.assemble(asm_text) if via_text else asm.assemble_items(items)
+        suffix = ".bin" if fmt == "bin" else ".hex"
         if out_bin is None:
             out_bin = path.with_suffix(suffix)
-        out_bin.write_bytes(data)
+        with timed(stats, "write") as ph:
+            ph.counts["words"] = image.write_image(out_bin, words, fmt)
         bin_path = out_bin
-    return CompileResult(asm_text=asm_text, asm_path=out_asm, bin_path=bin_path)
-
+        if out_lines is not None:
+            with open(out_lines, "w", encoding="utf-8") as fp:
+                asm.line_table.write(fp)
+    return CompileResult(asm_text=asm_text, asm_path=out_asm, bin_path=bin_path, lines_path=out_lines)
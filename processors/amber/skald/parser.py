@@ -5,7 +5,7 @@ from typing import List, Optional, Tuple
 
 from .lexer import Lexer, Token, LexError
 from . import ast as A
-from .typesys import type_from_name, Type, define_struct, addr_of, array_of
+from .typesys import type_from_name, Type, define_struct, addr_of, array_of, clear_structs
 
 
 class ParseError(Exception):
@@ -13,8 +13,8 @@ class ParseError(Exception):
 
 
 class Parser:
-    def __init__(self, src: str) -> None:
-        self.tokens = Lexer(src).tokens()
+    def __init__(self, src: str, tokens: Optional[List[Token]] = None) -> None:
+        self.tokens = tokens if tokens is not None else Lexer(src).tokens()
         self.i = 0
 
     def _peek(self) -> Token:
@@ -481,5 +481,7 @@ class Parser:
         return int(s, base)
 
 
-def parse(src: str) -> A.Program:
-    return Parser(src).parse()
+def parse(src: str, tokens: Optional[List[Token]] = None) -> A.Program:
+    """Parse `src`, or its `tokens` when already lexed."""
+    clear_structs()
+    return Parser(src, tokens).parse()
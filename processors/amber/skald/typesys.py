@@ -79,6 +79,11 @@ def get_struct(name: str) -> Optional[StructType]:
     return _STRUCTS.get(name)
 
 
+def clear_structs() -> None:
+    """Forget all struct types (each program defines its own)."""
+    _STRUCTS.clear()
+
+
 @dataclass(frozen=True)
 class AddressType(Type):
     pointee: Type = U24
@@ -669,6 +669,10 @@ module amber(
     // Privilege mode: 1 = kernel, 0 = user
     reg r_mode_kernel;
     reg r_core_halt;
+    // Performance counters: CYCLE counts clocks until HLT, INSTRET counts
+    // non-NOP micro-ops that leave ID/EX without being stalled or flushed
+    reg [`HBIT_ADDR:0] r_cycle;
+    reg [`HBIT_ADDR:0] r_instret;
     // Drive CSR read addr from current EX instruction when CSRRD
     assign w_csr_read_addr1 = (w_opc == `OPC_CSRRD) ? w_idex_instr[11:0] : {(`HBIT_TGT_CSR+1){1'b0}};
     assign w_csr_read_addr2 = {(`HBIT_TGT_CSR+1){1'b0}};
@@ -687,6 +691,14 @@ module amber(
             ? r_pcc_cur[23:0]
         : (csr_is_read && (csr_idx == `CSR_IDX_PCC_CUR_HI))
             ? r_pcc_cur[47:24]
+        : (csr_is_read && (csr_idx == `CSR_IDX_CYCLE_LO))
+            ? r_cycle[23:0]
+        : (csr_is_read && (csr_idx == `CSR_IDX_CYCLE_HI))
+            ? r_cycle[47:24]
+        : (csr_is_read && (csr_idx == `CSR_IDX_INSTRET_LO))
+            ? r_instret[23:0]
+        : (csr_is_read && (csr_idx == `CSR_IDX_INSTRET_HI))
+            ? r_instret[47:24]
         : w_csr_read_data1_mux;
     // Mux SR source value: for CSRRD feed CSR read data zero-extended
     wire [`HBIT_ADDR:0] w_src_sr_val_mux = (w_opc == `OPC_CSRRD) ? { {(`SIZE_ADDR-`SIZE_DATA){1'b0}}, w_csr_read_data1_eff } : w_src_sr_val;
@@ -832,6 +844,18 @@ module amber(
     // Global stall is OR of hazard and cache refills
     assign w_stall = w_hazard_stall | w_ic_stall | w_dc_stall |
         w_mmu_d_stall | w_mmu_i_stall | r_core_halt;
+
+    always @(posedge iw_clk or posedge iw_rst) begin
+        if (iw_rst) begin
+            r_cycle   <= {(`HBIT_ADDR+1){1'b0}};
+            r_instret <= {(`HBIT_ADDR+1){1'b0}};
+        end else begin
+            if (!r_core_halt)
+                r_cycle <= r_cycle + `SIZE_ADDR'd1;
+            if (!w_stall && !w_branch_taken && (w_opc != `OPC_NOP))
+                r_instret <= r_instret + `SIZE_ADDR'd1;
+        end
+    end
 `ifndef SYNTHESIS
     always @(posedge iw_clk) begin
         if (w_branch_taken_eff) begin
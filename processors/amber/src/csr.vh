@@ -10,6 +10,11 @@
 `define CSR_IDX_SSP_HI    12'h007
 `define CSR_IDX_PC_LO     12'h008
 `define CSR_IDX_PC_HI     12'h009
+// Performance counters (read-only, 48-bit split LO/HI)
+`define CSR_IDX_CYCLE_LO   12'h00A
+`define CSR_IDX_CYCLE_HI   12'h00B
+`define CSR_IDX_INSTRET_LO 12'h00C
+`define CSR_IDX_INSTRET_HI 12'h00D
 
 // Async 24-bit math engine CSRs
 // Control: [0] START, [5:1] OP
@@ -342,7 +342,8 @@ module stg_xt(
                         r_instr = iw_instr;
                     end
                 end
-                `OPCLASS_5: begin
+                `OPCLASS_5, `OPCLASS_8: begin
+                    // CHERI capability ops and CSR accesses pass through
                     r_instr = iw_instr;
                 end
                 // OPCLASS_6: Control flow (per updated documentation)
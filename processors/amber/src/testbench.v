@@ -11,6 +11,7 @@
 `include "src/sizes.vh"
 `include "src/sr.vh"
 `include "src/flags.vh"
+`include "src/cr.vh"
 
 module testbench;
     reg r_clk;
@@ -46,16 +47,44 @@ module testbench;
         #10;
         r_rst = 1'b0;
         repeat (`TICKS) @(posedge r_clk);
-        $display("Final: DR1=%h DR2=%h DR3=%h FLAGS=%b PC=%h",
+        $display("Final: DR1=%h DR2=%h DR3=%h FLAGS=%b PC=%h CYCLE=%0d INSTRET=%0d",
             u_amber.u_reggp.r_gp[1],
             u_amber.u_reggp.r_gp[2],
             u_amber.u_reggp.r_gp[3],
             u_amber.u_regsr.r_sr[`SR_IDX_FL][`HBIT_FLAG:0],
-            u_amber.r_ia_pc);
+            u_amber.r_ia_pc,
+            u_amber.r_cycle,
+            u_amber.r_instret);
         #9;
         $finish;
     end
+    // +CAPS: CR0-CR3 start as tagged R/W data capabilities of 256 words
+    // (BOOT_CAPS in processors/amber/sim/lockstep.py); CR0 is the stack
+    task set_cap(input integer idx, input [`HBIT_ADDR:0] base, input [`HBIT_ADDR:0] cur);
+        begin
+            u_amber.u_regcr.r_base[idx]  = base;
+            u_amber.u_regcr.r_len[idx]   = 48'h100;
+            u_amber.u_regcr.r_cur[idx]   = cur;
+            u_amber.u_regcr.r_perms[idx] = (24'd1 << `CR_PERM_R_BIT) | (24'd1 << `CR_PERM_W_BIT);
+            u_amber.u_regcr.r_attr[idx]  = 24'd0;
+            u_amber.u_regcr.r_tag[idx]   = 1'b1;
+        end
+    endtask
+    initial begin
+        if ($test$plusargs("CAPS")) begin
+            @(negedge r_rst);
+            set_cap(0, 48'hC00, 48'hD00);
+            set_cap(1, 48'h100, 48'h100);
+            set_cap(2, 48'h200, 48'h280);
+            set_cap(3, 48'h300, 48'h3FF);
+        end
+    end
     integer tick = 0;
+`ifdef DEBUGCOMMIT
+    // A stall holds the EX/MA latch, so the held micro-op reaches WB again
+    // three edges later; those copies are not listed
+    reg [2:0] r_commit_stall = 3'b0;
+`endif
     always @(posedge r_clk) begin
 `ifdef DEBUGPC
         $display("tick %03d : rst=%b PC  IA=%h IAIF=%h IFID=%h IDEX=%h     EXMA=%h     MAMO=%h     MOWB=%h     WB=%h",
@@ -205,6 +234,27 @@ module testbench;
             u_amber.u_dmem.r_mem['hffe],
             u_amber.u_dmem.r_mem['hfff]);
 `endif
+`ifdef DEBUGRETIRE
+        // One line per micro-op leaving ID/EX (the INSTRET condition, but
+        // NOPs are listed too) and per taken branch; read by processors/amber/sim
+        if (!r_rst && !u_amber.w_stall && !u_amber.w_branch_taken)
+            $display("retire %0d pc=%h instr=%h addr=%h",
+                tick, u_amber.w_idex_pc, u_amber.w_idex_instr, u_amber.u_stg_ex.r_addr);
+        if (!r_rst && u_amber.w_branch_taken)
+            $display("taken %0d pc=%h target=%h",
+                tick, u_amber.w_exma_pc, u_amber.w_branch_pc);
+`endif
+`ifdef DEBUGCOMMIT
+        // One line per non-NOP micro-op in WB with the GP, SR and SR aux
+        // writes it makes on this edge; read by processors/amber/sim/lockstep.py
+        if (!r_rst && !r_commit_stall[2] && u_amber.w_mowb_opc != `OPC_NOP)
+            $display("commit %0d pc=%h instr=%h gp=%b:%h:%h sr=%b:%h:%h aux=%b:%h:%h",
+                tick, u_amber.w_mowb_pc, u_amber.w_mowb_instr,
+                u_amber.w_gp_write_enable, u_amber.w_gp_write_addr, u_amber.w_gp_write_data,
+                u_amber.w_sr_write_enable, u_amber.w_sr_write_addr, u_amber.w_sr_write_data,
+                u_amber.w_wb_sr_aux_we, u_amber.w_wb_sr_aux_addr, u_amber.w_wb_sr_aux_result);
+        r_commit_stall <= r_rst ? 3'b0 : {r_commit_stall[1:0], u_amber.w_stall};
+`endif
 `ifdef DEBUGMEMIF
         $display("tick %03d : rst=%b MEMIF 0=%h 1=%h",
             tick, r_rst,
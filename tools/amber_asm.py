@@ -2,11 +2,21 @@
 from __future__ import annotations
 
 import argparse
+import os
 from pathlib import Path
 import sys
 
 
 def main(argv: list[str] | None = None) -> int:
+    # A warm server (processors/amber/asm/server.py) saves the interpreter's imports
+    server = os.environ.get("AMBER_SERVER")
+    if server:
+        sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+        from processors.amber.asm.server import forward
+
+        code = forward(server, "amber_asm", sys.argv[1:] if argv is None else argv)
+        if code is not None:
+            return code
     parser = argparse.ArgumentParser(
         description="Assemble Amber asm into 24-bit BAU (hex or bin)"
     )
@@ -24,29 +34,85 @@ def main(argv: list[str] | None = None) -> int:
         default=0,
         help="Origin (word address, default 0). PC counts 24-bit words.",
     )
+    parser.add_argument(
+        "--cache",
+        type=Path,
+        help="Persist the include/macro preprocessor cache in this file between runs",
+    )
+    parser.add_argument(
+        "--sparse",
+        action="store_true",
+        help="hex only: write populated ranges as @addr records instead of zero-filling .org gaps",
+    )
+    parser.add_argument(
+        "--listing",
+        type=Path,
+        help="Write a listing (address, word, cycle estimate, source) to this file",
+    )
+    parser.add_argument(
+        "--map",
+        type=Path,
+        help="Write a map (segments, symbols, per-label/macro cycle totals) to this file",
+    )
+    parser.add_argument(
+        "--lines",
+        type=Path,
+        help="Write the address -> source line table from .loc directives to this file",
+    )
+    parser.add_argument(
+        "--time-passes",
+        action="store_true",
+        help="Print wall time, peak memory and counters per phase to stderr",
+    )
+    parser.add_argument("--stats", type=Path, help="Write the per-phase report as JSON to this file")
     args = parser.parse_args(argv)
+    if args.sparse and args.format != "hex":
+        parser.error("--sparse requires --format hex")
 
     # Lazy import to avoid package path issues if tools/ is executed directly
     sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from processors.amber.asm import image
     from processors.amber.asm.assembler import Assembler
+    from processors.amber.asm.preproc import PreprocessCache
+    from processors.amber.asm.stats import PassStats, timed
 
     if not args.input.exists():
         print(f"error: input not found: {args.input}", file=sys.stderr)
         return 2
 
-    asm = Assembler(origin=args.origin)
-    words = asm.assemble_path(args.input)
-    if args.format == "hex":
-        data = asm.pack_words_hex(words).encode("utf-8")
-        suffix = ".hex"
+    cache = PreprocessCache.load(args.cache) if args.cache else None
+    stats = PassStats() if args.time_passes or args.stats else None
+    asm = Assembler(origin=args.origin, cache=cache, stats=stats)
+    if args.sparse:
+        segments = asm.assemble_path_segments(args.input)
     else:
-        data = asm.pack_words_bin(words)
-        suffix = ".bin"
+        words = asm.assemble_path(args.input)
+    if cache is not None:
+        cache.save(args.cache)
+    suffix = ".hex" if args.format == "hex" else ".bin"
 
     out = args.output or args.input.with_suffix(suffix)
     out.parent.mkdir(parents=True, exist_ok=True)
-    out.write_bytes(data)
-    print(f"Assembled {args.input} -> {out} ({len(words)} words)")
+    # Stream straight to the file (bin is packed into a memory-mapped file)
+    with timed(stats, "write") as ph:
+        if args.sparse:
+            with open(out, "wb") as fp:
+                nwords = image.write_segments_hex(segments, fp)
+        else:
+            nwords = image.write_image(out, words, args.format)
+        ph.counts["words"] = nwords
+    if args.listing or args.map or args.lines:
+        from processors.amber.asm import listing  # with the cycle model: only when a listing/map/line table is wanted
+
+        for extra, write in ((args.listing, listing.write_listing), (args.map, listing.write_map),
+                             (args.lines, listing.write_lines)):
+            if extra:
+                extra.parent.mkdir(parents=True, exist_ok=True)
+                with open(extra, "w", encoding="utf-8") as fp:
+                    write(asm, fp)
+    print(f"Assembled {args.input} -> {out} ({nwords} words)")
+    if stats is not None:
+        stats.report(args.time_passes, args.stats)
     return 0
 
 
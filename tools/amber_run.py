@@ -59,19 +59,40 @@ def assemble_if_needed(inp: Path, workdir: Path) -> Path:
         return inp
     # Treat anything else as assembly source (single entry supported; use .include for composition)
     sys.path.insert(0, str(REPO_ROOT))
+    from processors.amber.asm import image
     from processors.amber.asm.assembler import Assembler
 
     asm = Assembler(origin=0)
-    words = asm.assemble_path(inp)
+    # Sparse @addr records: memory is zero-initialized, so .org gaps need no fill
+    segments = asm.assemble_path_segments(inp)
     stem = inp.stem
     src_desc = f"{inp}"
-    hex_text = asm.pack_words_hex(words)
     out_hex = workdir / (stem + ".hex")
-    out_hex.write_text(hex_text, encoding="utf-8")
-    print(f"Assembled {src_desc} -> {out_hex} ({len(words)} words)")
+    with open(out_hex, "wb") as fp:
+        nwords = image.write_segments_hex(segments, fp)
+    print(f"Assembled {src_desc} -> {out_hex} ({nwords} words)")
     return out_hex
 
 
+def compile_command(iverilog: str, out_vvp: Path, ticks: int, defines: list[str] | None = None) -> list[str]:
+    return [
+        iverilog,
+        "-g2012",
+        # Includes support both styles: `include "src/xxx.vh"` and local includes
+        "-I",
+        str(AMBER_DIR),
+        "-I",
+        str(SRC_DIR),
+        # Disable testbench's default ROM preload when external HEX provided
+        "-DNO_ROM_INIT=1",
+        f"-DTICKS={ticks}",
+        *(f"-D{d}=1" for d in defines or []),
+        "-o",
+        str(out_vvp),
+        *build_source_list(),
+    ]
+
+
 def main(argv: list[str] | None = None) -> int:
     p = argparse.ArgumentParser(description="Run Amber core in Icarus with a program")
     p.add_argument("input", type=Path, help="Program file: .hex (preferred) or .asm/.s")
@@ -79,6 +100,16 @@ def main(argv: list[str] | None = None) -> int:
     p.add_argument("--ticks", type=int, default=200, help="Simulation cycles (default: 200)")
     p.add_argument("--iverilog", type=str, default="iverilog", help="iverilog executable name/path")
     p.add_argument("--vvp", type=str, default="vvp", help="vvp executable name/path")
+    p.add_argument(
+        "--trace",
+        action="store_true",
+        help="Print a retire/taken-branch trace (DEBUGRETIRE) for python -m processors.amber.sim",
+    )
+    p.add_argument(
+        "--commits",
+        action="store_true",
+        help="Print the register writes of each micro-op at writeback (DEBUGCOMMIT), as sim/lockstep.py reads them",
+    )
     args = p.parse_args(argv)
 
     iverilog = which_or_error(args.iverilog)
@@ -96,21 +127,8 @@ def main(argv: list[str] | None = None) -> int:
         out_vvp = args.out or default_out
         out_vvp.parent.mkdir(parents=True, exist_ok=True)
 
-        cmd = [
-            iverilog,
-            "-g2012",
-            # Includes support both styles: `include "src/xxx.vh"` and local includes
-            "-I",
-            str(AMBER_DIR),
-            "-I",
-            str(SRC_DIR),
-            # Disable testbench's default ROM preload when external HEX provided
-            "-DNO_ROM_INIT=1",
-            f"-DTICKS={args.ticks}",
-            "-o",
-            str(out_vvp),
-            *build_source_list(),
-        ]
+        defines = (["DEBUGRETIRE"] if args.trace else []) + (["DEBUGCOMMIT"] if args.commits else [])
+        cmd = compile_command(iverilog, out_vvp, args.ticks, defines)
         print("[amber-run] Compiling testbench...")
         subprocess.check_call(cmd, cwd=str(REPO_ROOT))
 